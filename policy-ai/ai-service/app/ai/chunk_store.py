@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+from app.core.config import CHUNK_STORE_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    text BLOB NOT NULL,
+    metadata TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# SQLite's default limit on host parameters is 999
+_MAX_VARIABLES = 900
+
+
+class ChunkStore:
+    """
+    Local store for chunk text and full metadata, keyed by the deterministic vector id
+    (make_chunk_id). The vector index only carries ids and filterable fields; retrieval
+    fetches the text of all matches here in one batched lookup. Text is zlib-compressed.
+    """
+
+    def __init__(self, db_path: str = CHUNK_STORE_PATH):
+        self.db_path = db_path
+        # One connection per thread: lookups run on the tool pool and the speculative-retrieval pool
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put_many(self, ids: List[str], docs: List[Document]) -> None:
+        """Stores (or replaces) the text and metadata of the given chunks in one transaction."""
+        now = time.time()
+        rows = [
+            (chunk_id, zlib.compress(doc.page_content.encode("utf-8")), json.dumps(doc.metadata, ensure_ascii=False), now)
+            for chunk_id, doc in zip(ids, docs)
+        ]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, text, metadata, updated_at) VALUES (?, ?, ?, ?)", rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Document]:
+        """Returns {chunk_id: Document} for the ids found in the store."""
+        ids = list(dict.fromkeys(ids))
+        found: Dict[str, Document] = {}
+        conn = self._connection()
+        for start in range(0, len(ids), _MAX_VARIABLES):
+            batch = ids[start:start + _MAX_VARIABLES]
+            rows = conn.execute(
+                f"SELECT chunk_id, text, metadata FROM chunks WHERE chunk_id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            for chunk_id, text, metadata in rows:
+                found[chunk_id] = Document(page_content=zlib.decompress(text).decode("utf-8"), metadata=json.loads(metadata))
+        return found
+
+    def update_metadata(self, chunk_id: str, fields: dict) -> None:
+        conn = self._connection()
+        row = conn.execute("SELECT metadata FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        if row is None:
+            return
+        metadata = {**json.loads(row[0]), **fields}
+        conn.execute(
+            "UPDATE chunks SET metadata = ?, updated_at = ? WHERE chunk_id = ?",
+            (json.dumps(metadata, ensure_ascii=False), time.time(), chunk_id),
+        )
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+_chunk_store: Optional[ChunkStore] = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> ChunkStore:
+    """Returns the process-wide chunk text store."""
+    global _chunk_store
+    if _chunk_store is None:
+        with _chunk_store_lock:
+            if _chunk_store is None:
+                _chunk_store = ChunkStore()
+    return _chunk_store
@@ -0,0 +1,169 @@
+import logging
+import re
+from collections import Counter as CounterDict
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from app.core.config import CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_OVERLAP_CHARS, CONTEXT_DEDUP_THRESHOLD
+from app.core.metrics import CONTEXT_TOKENS
+from app.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Overlaps shorter than this are treated as coincidence, not splitter overlap
+_MIN_OVERLAP_CHARS = 20
+# Lines this short that repeat across passages are page headers/footers and the like
+_BOILERPLATE_MAX_CHARS = 120
+_WORD_RE = re.compile(r"\w+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _overlap_length(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    for size in range(min(max_overlap, len(left), len(right)), _MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_texts(left: str, right: str, max_overlap: int, known_overlap: int = 0) -> str:
+    if known_overlap:
+        # The chunker recorded what it repeated (carried clauses, article heading): drop exactly that
+        return left.rstrip() + "\n" + right[known_overlap:].lstrip()
+    overlap = _overlap_length(left, right, max_overlap)
+    if overlap:
+        return left + right[overlap:]
+    return left.rstrip() + "\n" + right.lstrip()
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Passage:
+    def __init__(self, doc: Document, rank: int):
+        self.source = doc.metadata.get("source")
+        self.chunk_indices = [doc.metadata.get("chunk_index")]
+        self.text = doc.page_content
+        self.rank = rank  # Best retrieval rank among the merged chunks
+        self.metadata = dict(doc.metadata)
+
+
+def merge_neighbours(docs: List[Document], max_overlap: int = CONTEXT_MAX_OVERLAP_CHARS) -> List[_Passage]:
+    """
+    Joins chunks of the same source with consecutive chunk_index, dropping the splitter overlap:
+    the overlap_chars the chunker recorded, or else the longest suffix/prefix match.
+    """
+    passages: List[_Passage] = []
+    by_source = {}
+    for rank, doc in enumerate(docs):
+        if doc.metadata.get("source") is None or doc.metadata.get("chunk_index") is None:
+            passages.append(_Passage(doc, rank))  # Can't place it: keep as is
+            continue
+        by_source.setdefault(doc.metadata["source"], []).append((int(doc.metadata["chunk_index"]), rank, doc))
+
+    for chunks in by_source.values():
+        chunks.sort(key=lambda item: item[0])
+        current: Optional[_Passage] = None
+        for index, rank, doc in chunks:
+            if current is not None and index == current.chunk_indices[-1]:
+                current.rank = min(current.rank, rank)  # Same chunk retrieved twice
+                continue
+            if current is not None and index == current.chunk_indices[-1] + 1:
+                current.text = _merge_texts(
+                    current.text, doc.page_content, max_overlap, int(doc.metadata.get("overlap_chars") or 0))
+                current.chunk_indices.append(index)
+                current.rank = min(current.rank, rank)
+                continue
+            current = _Passage(doc, rank)
+            passages.append(current)
+    passages.sort(key=lambda passage: passage.rank)
+    return passages
+
+
+def _strip_boilerplate(passages: List[_Passage]) -> None:
+    """Keeps only the first occurrence of short lines that repeat across passages (headers, footers)."""
+    counts = CounterDict()
+    for passage in passages:
+        counts.update({_SPACE_RE.sub(" ", line).strip().lower() for line in passage.text.splitlines()})
+    repeated = {line for line, count in counts.items() if count > 1 and 0 < len(line) <= _BOILERPLATE_MAX_CHARS}
+    if not repeated:
+        return
+    seen = set()
+    for passage in passages:
+        kept = []
+        for line in passage.text.splitlines():
+            key = _SPACE_RE.sub(" ", line).strip().lower()
+            if key in repeated:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        passage.text = "\n".join(kept)
+
+
+def _drop_near_duplicates(passages: List[_Passage], threshold: float) -> List[_Passage]:
+    """Drops passages whose word-shingle Jaccard with a better-ranked passage reaches the threshold."""
+    kept, kept_shingles = [], []
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        if any(_similarity(shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    cut = text[:int(len(text) * max_tokens / tokens)]
+    # End on a sentence or line boundary when one is reasonably close
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    return cut[:boundary + 1] if boundary > len(cut) * 0.6 else cut
+
+
+def compact_documents(docs: List[Document], token_budget: int = CONTEXT_TOKEN_BUDGET,
+                      max_overlap: int = CONTEXT_MAX_OVERLAP_CHARS,
+                      dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> List[Document]:
+    """
+    Shrinks retrieved chunks before they go into the prompt: merges neighbouring chunks of a
+    source (removing the splitter overlap), strips repeated boilerplate lines, drops near-identical
+    passages and keeps the best-ranked passages that fit the token budget.
+    """
+    if not docs:
+        return []
+    passages = merge_neighbours(docs, max_overlap)
+    # De-duplicate first: stripping a header from only one of two copies would make them look different
+    passages = _drop_near_duplicates(passages, dedup_threshold)
+    _strip_boilerplate(passages)
+
+    compacted, used = [], 0
+    for passage in passages:
+        remaining = token_budget - used
+        if remaining <= 0:
+            break
+        text = _truncate_to_tokens(passage.text, remaining)
+        used += count_tokens(text)
+        metadata = {**passage.metadata, "chunk_indices": passage.chunk_indices}
+        metadata.pop("chunk_index", None)
+        metadata.pop("overlap_chars", None)
+        compacted.append(Document(page_content=text, metadata=metadata))
+
+    before = count_tokens("\n\n".join(doc.page_content for doc in docs))
+    after = count_tokens("\n\n".join(doc.page_content for doc in compacted))
+    CONTEXT_TOKENS.labels("retrieved").inc(before)
+    CONTEXT_TOKENS.labels("compacted").inc(after)
+    logger.info("Context compaction: %d chunks -> %d passages, %d -> %d tokens", len(docs), len(compacted), before, after)
+    return compacted
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Optional
+
+from app.core.config import (
+    DRAFT_CACHE_PATH, DRAFT_CACHE_MAX_ENTRIES, DRAFT_CACHE_MAX_DISK_ENTRIES, DRAFT_CACHE_TTL_SECONDS,
+)
+from app.core.metrics import record_cache_lookup
+from app.utils.cache import TTLCache
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS drafts (
+    cache_key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    html BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS drafts_used_at ON drafts (used_at);
+"""
+
+
+def draft_cache_key(prompt: str, model: str, prompt_version: str) -> str:
+    """
+    Drafts are reusable for the same prompt, draft model and prompt template. Only the Unicode form
+    and whitespace of the prompt are normalised: case and punctuation can change what is drafted.
+    """
+    prompt = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", prompt)).strip()
+    return hashlib.sha256(f"{prompt_version}\0{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class DraftCache:
+    """
+    Cleaned policy drafts by draft_cache_key: an in-memory LRU in front of a SQLite table (HTML
+    zlib-compressed) that survives restarts. The table keeps the `max_disk_entries` most recently
+    used drafts; entries older than `ttl_seconds` are regenerated.
+    """
+
+    def __init__(self, db_path: str = DRAFT_CACHE_PATH, max_entries: int = DRAFT_CACHE_MAX_ENTRIES,
+                 max_disk_entries: int = DRAFT_CACHE_MAX_DISK_ENTRIES, ttl_seconds: float = DRAFT_CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = TTLCache("policy_draft", ttl_seconds, max_entries)
+        self._local = threading.local()
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        html = self._memory.get(key)
+        if html is not None or not self.db_path:
+            return html
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute("SELECT html, created_at FROM drafts WHERE cache_key = ?", (key,)).fetchone()
+        if row is not None and row[1] + self.ttl_seconds <= now:
+            conn.execute("DELETE FROM drafts WHERE cache_key = ?", (key,))
+            row = None
+        record_cache_lookup("policy_draft_disk", row is not None)
+        if row is None:
+            return None
+        conn.execute("UPDATE drafts SET used_at = ? WHERE cache_key = ?", (now, key))
+        html = zlib.decompress(row[0]).decode("utf-8")
+        self._memory.set(key, html, ttl_seconds=row[1] + self.ttl_seconds - now)
+        return html
+
+    def put(self, key: str, html: str, model: str = "", prompt_version: str = "") -> None:
+        self._memory.set(key, html)
+        if not self.db_path:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO drafts (cache_key, model, prompt_version, html, created_at, used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, prompt_version, zlib.compress(html.encode("utf-8")), now, now),
+        )
+        conn.execute(
+            "DELETE FROM drafts WHERE cache_key IN "
+            "(SELECT cache_key FROM drafts ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self.db_path:
+            self._connection().execute("DELETE FROM drafts")
+
+
+_draft_cache: Optional[DraftCache] = None
+_draft_cache_lock = threading.Lock()
+
+
+def get_draft_cache() -> DraftCache:
+    """Returns the process-wide draft cache."""
+    global _draft_cache
+    if _draft_cache is None:
+        with _draft_cache_lock:
+            if _draft_cache is None:
+                _draft_cache = DraftCache()
+    return _draft_cache
@@ -1,65 +1,183 @@
 import logging
-from typing import Annotated
+import time
+import uuid
+from typing import Annotated, Optional
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages, MessagesState
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
 
-# Import the tools list from the tools package
-from .tools import tools
+# Import the tools factory from the tools package
+from .tools import get_tools
+from app.core.metrics import NODE_LATENCY, LLM_TIER_ESCALATIONS
+from app.core.config import (
+    LLM_ROUTER_MAX_INPUT_TOKENS, DOCUMENT_QA_FAST_PATH, AGENT_TURN_DEADLINE_SECONDS, AGENT_MAX_TOOL_ITERATIONS,
+)
+from app.core.logging_config import log_payload
+from app.ai.llm_scheduler import llm_scheduler, estimate_message_tokens
+from app.ai.model_tiers import TIER_ROUTER, TIER_SYNTHESIS, with_tier
+from app.ai.tool_executor import ConcurrentToolExecutor, skipped_tool_messages
 
 logger = logging.getLogger(__name__)
 
 # Define the state for the graph using MessagesState for convenience
 class AgentState(MessagesState):
-    pass
+    # Set when the user asks about a specific uploaded document
+    document_url: Optional[str]
+    # Per-turn budget: wall-clock deadline (time.time()) and tool rounds executed so far
+    turn_deadline: Optional[float]
+    tool_iterations: int
+
+FINAL_ANSWER_INSTRUCTION = (
+    "The tool budget for this turn is exhausted. Do not call any more tools: answer the user now "
+    "with the information gathered so far, and say briefly if something could not be checked."
+)
+
+DOCUMENT_QA_TOOL_NAME = "specific_document_qa_tool"
+
+def select_tier(messages) -> tuple:
+    """
+    Picks the model tier for an agent step: (tier, escalation reason or None).
+    Tool selection and short follow-ups go to the router tier; answers written from tool
+    output and long-context turns (e.g. a pasted policy) go to the synthesis tier.
+    """
+    if messages and isinstance(messages[-1], ToolMessage):
+        return TIER_SYNTHESIS, None
+    if estimate_message_tokens(messages, completion_tokens=0) > LLM_ROUTER_MAX_INPUT_TOKENS:
+        return TIER_SYNTHESIS, "long_context"
+    return TIER_ROUTER, None
+
+def _invoke_model(llm_with_tools, messages, config):
+    # Admitted by the shared scheduler; priority comes from the caller's scope (interactive by default)
+    return llm_scheduler.run(
+        lambda: llm_with_tools.invoke(messages, config=config),
+        estimated_tokens=estimate_message_tokens(messages),
+    )
 
 # Function that defines how the agent node behaves
-def call_agent_model(state: AgentState, config, llm_with_tools):
-    """Calls the bound LLM."""
+def _turn_deadline(state: AgentState) -> float:
+    """The turn's deadline, started by whichever node runs first."""
+    return state.get("turn_deadline") or time.time() + AGENT_TURN_DEADLINE_SECONDS
+
+def call_agent_model(state: AgentState, config, models: dict):
+    """Calls the bound LLM of the tier selected for this step."""
     messages = state['messages']
-    logger.debug(f"Calling agent model with messages: {messages}")
-    response = llm_with_tools.invoke(messages, config=config)
-    logger.debug(f"Agent model response: {response}")
+    deadline = _turn_deadline(state)
+    log_payload(logger, "Calling agent model with messages", messages)
+    tier, reason = select_tier(messages)
+    with NODE_LATENCY.labels("agent").time():
+        response = _invoke_model(models[tier], messages, config)
+        if tier == TIER_ROUTER and not response.tool_calls and not str(response.content).strip():
+            # The small model neither picked a tool nor answered: retry the step on the large model
+            tier, reason = TIER_SYNTHESIS, "empty_answer"
+            response = _invoke_model(models[tier], messages, config)
+    if reason:
+        LLM_TIER_ESCALATIONS.labels(reason).inc()
+        logger.info("Agent step escalated to the %s tier (%s)", tier, reason)
+    log_payload(logger, "Agent model response", response)
     # Return a list, as add_messages expects an iterable
-    return {"messages": [response]}
+    return {"messages": [response], "turn_deadline": deadline}
+
+def route_entry(state: AgentState) -> str:
+    """Document questions skip the routing LLM call: the tool and its arguments are already known."""
+    return "document_qa" if state.get("document_url") else "agent"
+
+def call_document_qa(state: AgentState, config, tool_executor: ConcurrentToolExecutor):
+    """
+    Runs specific_document_qa_tool directly with the user's query and document URL.
+    The tool call is recorded as a regular AI message so the synthesis step (and any
+    follow-up tool calls) see the same history as on the LLM-routed path.
+    """
+    query = next((m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), "")
+    tool_call_message = AIMessage(content="", tool_calls=[{
+        "name": DOCUMENT_QA_TOOL_NAME,
+        "args": {"query": query, "document_url": state["document_url"]},
+        "id": f"call_{uuid.uuid4().hex[:24]}",
+    }])
+    deadline = _turn_deadline(state)
+    with NODE_LATENCY.labels("document_qa").time():
+        tool_messages = tool_executor.run(tool_call_message, config, deadline=deadline)
+    # Counts toward AGENT_MAX_TOOL_ITERATIONS like a routed tool round
+    return {"messages": [tool_call_message, *tool_messages], "turn_deadline": deadline,
+            "tool_iterations": state.get("tool_iterations", 0) + 1}
+
+def route_after_agent(state: AgentState) -> str:
+    """Ends the turn, runs the requested tools, or forces a final answer once the turn budget is spent."""
+    last_message = state["messages"][-1]
+    if not getattr(last_message, "tool_calls", None):
+        return END
+    if state.get("tool_iterations", 0) >= AGENT_MAX_TOOL_ITERATIONS:
+        logger.warning("Agent reached %d tool iterations; forcing a final answer.", AGENT_MAX_TOOL_ITERATIONS)
+        return "finalize"
+    if time.time() >= _turn_deadline(state):
+        logger.warning("Agent turn deadline passed; forcing a final answer.")
+        return "finalize"
+    return "tools"
+
+def call_tools(state: AgentState, config, tool_executor: ConcurrentToolExecutor):
+    """Runs the requested tools concurrently; per-tool latency is recorded by the metrics callback."""
+    with NODE_LATENCY.labels("tools").time():
+        tool_messages = tool_executor.run(state["messages"][-1], config, deadline=_turn_deadline(state))
+    return {"messages": tool_messages, "tool_iterations": state.get("tool_iterations", 0) + 1}
+
+def call_finalize(state: AgentState, config, final_llm):
+    """Answers without tools. Pending tool calls get a 'not run' result, as the API requires one per call."""
+    skipped = skipped_tool_messages(state["messages"][-1], "the tool budget for this turn was exhausted")
+    messages = [*state["messages"], *skipped, HumanMessage(content=FINAL_ANSWER_INSTRUCTION)]
+    with NODE_LATENCY.labels("finalize").time():
+        response = _invoke_model(final_llm, messages, config)
+    return {"messages": [*skipped, response]}
 
 
-def build_agent_executor(llm):
-    """Builds the LangGraph agent executor."""
+def build_agent_executor(router_llm, synthesis_llm):
+    """Builds the LangGraph agent executor with a small routing model and a large synthesis model."""
+    tools = get_tools()
     if not tools:
         raise ValueError("No tools available to build the agent executor.")
 
-    llm_with_tools = llm.bind_tools(tools)
+    models = {
+        TIER_ROUTER: with_tier(router_llm.bind_tools(tools), TIER_ROUTER),
+        TIER_SYNTHESIS: with_tier(synthesis_llm.bind_tools(tools), TIER_SYNTHESIS),
+    }
+    # Used when the turn budget is spent: same large model, no tools bound
+    final_llm = with_tier(synthesis_llm, TIER_SYNTHESIS)
 
     graph_builder = StateGraph(AgentState)
 
     # Node that calls the agent model
     graph_builder.add_node(
         "agent",
-        # Pass the bound LLM to the node function using partial or lambda
-        lambda state, config: call_agent_model(state, config, llm_with_tools)
+        # Pass the tiered models to the node function using partial or lambda
+        lambda state, config: call_agent_model(state, config, models)
     )
 
-    # Node that executes tools
-    tool_node = ToolNode(tools)
-    graph_builder.add_node("tools", tool_node)
+    # Node that executes tools (concurrently, each with its own timeout)
+    tool_executor = ConcurrentToolExecutor(tools)
+    graph_builder.add_node("tools", lambda state, config: call_tools(state, config, tool_executor))
+    graph_builder.add_node("finalize", lambda state, config: call_finalize(state, config, final_llm))
 
     # Define the edges
-    graph_builder.set_entry_point("agent")
+    if DOCUMENT_QA_FAST_PATH and any(tool.name == DOCUMENT_QA_TOOL_NAME for tool in tools):
+        graph_builder.add_node("document_qa", lambda state, config: call_document_qa(state, config, tool_executor))
+        graph_builder.set_conditional_entry_point(route_entry, {"document_qa": "document_qa", "agent": "agent"})
+        # Straight to synthesis: the agent sees a ToolMessage last and uses the synthesis tier
+        graph_builder.add_edge("document_qa", "agent")
+    else:
+        graph_builder.set_entry_point("agent")
 
-    # Conditional edge: Route based on whether tools were called
+    # Conditional edge: Route based on whether tools were called and the turn budget
     graph_builder.add_conditional_edges(
         "agent",
-        tools_condition,
+        route_after_agent,
         {
             "tools": "tools",
+            "finalize": "finalize",
             END: END,
         },
     )
 
     # Edge from tool execution back to the agent
     graph_builder.add_edge("tools", "agent")
+    graph_builder.add_edge("finalize", END)
 
     # Compile the graph
     try:
@@ -67,5 +185,5 @@ def build_agent_executor(llm):
         logger.info("LangGraph agent executor compiled successfully.")
         return agent_executor
     except Exception as e:
-        logger.error(f"Failed to compile LangGraph agent executor: {e}", exc_info=True)
+        logger.error("Failed to compile LangGraph agent executor: %s", e, exc_info=True)
         raise 
\ No newline at end of file
@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Callable, Iterable, List, Optional, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import (
+    LLM_SCHEDULER_ENABLED, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_RETRIES, LLM_RETRY_BASE_SECONDS, LLM_RETRY_MAX_SECONDS,
+    LLM_DEADLINE_INTERACTIVE_SECONDS, LLM_DEADLINE_EDIT_SECONDS, LLM_DEADLINE_BATCH_SECONDS,
+    RESILIENCE_GENERATION_TOKENS_PER_SECOND,
+)
+from app.core.metrics import LLM_SCHEDULER_WAIT, LLM_SCHEDULER_RETRIES, LLM_SCHEDULER_REJECTED
+from app.core.resilience import OPENAI_CHAT, OPENAI_CHAT_GENERATE, OPENAI_EMBEDDINGS, DependencyTimeout, get_dependency
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Lower value is served first."""
+    INTERACTIVE = 0  # Chat turns
+    EDIT = 1         # Policy drafts, edits and single analyses
+    BATCH = 2        # Ingestion embeddings, bulk analyses, evaluations
+
+
+class SchedulerTimeout(Exception):
+    """The call could not be admitted (or retried) before its deadline."""
+
+
+_DEFAULT_DEADLINES = {
+    Priority.INTERACTIVE: LLM_DEADLINE_INTERACTIVE_SECONDS,
+    Priority.EDIT: LLM_DEADLINE_EDIT_SECONDS,
+    Priority.BATCH: LLM_DEADLINE_BATCH_SECONDS,
+}
+
+# Errors worth retrying: rate limits and transient provider/network failures
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_ERRORS = {"RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError",
+                     "DependencyTimeout"}
+
+# A timed-out generation keeps running (and spending tokens) upstream; re-issuing it only adds load
+_TIMEOUTS_NOT_RETRIED = {OPENAI_CHAT_GENERATE}
+
+_current_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def priority_scope(priority: Priority):
+    """Sets the priority of every scheduled call made inside the block (including nested tools)."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def estimate_tokens(*texts: str, completion_tokens: int = 0) -> int:
+    """Cheap token estimate (~4 chars per token) used to reserve budget before a call."""
+    return sum(len(text) for text in texts if text) // 4 + completion_tokens
+
+
+def generation_timeout(completion_tokens: int) -> float:
+    """Minimum timeout for a call expected to write `completion_tokens` (RESILIENCE_GENERATION_TOKENS_PER_SECOND)."""
+    return completion_tokens / RESILIENCE_GENERATION_TOKENS_PER_SECOND if RESILIENCE_GENERATION_TOKENS_PER_SECOND else 0.0
+
+
+def estimate_message_tokens(messages: Iterable[Any], completion_tokens: int = 1000) -> int:
+    return estimate_tokens(*(str(getattr(message, "content", message)) for message in messages), completion_tokens=completion_tokens)
+
+
+class TokenBucket:
+    """Continuously refilling budget expressed per minute. The balance may go negative after settling actual usage."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)  # A single oversized call must still be admissible
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.available -= amount
+
+
+class LLMScheduler:
+    """
+    Central admission control for outbound LLM and embedding calls.
+    Callers wait in a priority queue (priority, then arrival order); only the head
+    of the queue may take budget, so batch work can't starve interactive chat.
+    Rate-limit and transient errors are retried with full-jitter backoff, and a
+    429 pauses every caller so the whole process backs off together. Each attempt goes
+    through the dependency's circuit breaker and adaptive timeout (app.core.resilience);
+    an open circuit fails the call at once instead of queueing it.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_retries: int = LLM_MAX_RETRIES,
+                 retry_base_seconds: float = LLM_RETRY_BASE_SECONDS, retry_max_seconds: float = LLM_RETRY_MAX_SECONDS,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+
+    def run(self, fn: Callable[[], T], *, estimated_tokens: int = 1000, priority: Optional[Priority] = None,
+            deadline_seconds: Optional[float] = None, dependency: str = OPENAI_CHAT,
+            min_timeout_seconds: float = 0.0) -> T:
+        """
+        Runs fn once admitted by the rate budgets, retrying retryable failures until the deadline.
+        Each attempt is guarded as `dependency`, with a timeout of at least `min_timeout_seconds`.
+        """
+        guard = get_dependency(dependency)
+        if not self.enabled:
+            return guard.call(fn, min_timeout=min_timeout_seconds)
+        if priority is None:
+            priority = _current_priority.get()
+        if deadline_seconds is None:
+            deadline_seconds = _DEFAULT_DEADLINES[priority]
+        deadline_at = time.monotonic() + deadline_seconds if deadline_seconds else None
+
+        attempt = 0
+        while True:
+            self._acquire(priority, estimated_tokens, deadline_at)
+            try:
+                result = guard.call(fn, min_timeout=min_timeout_seconds)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                if isinstance(e, DependencyTimeout) and dependency in _TIMEOUTS_NOT_RETRIED:
+                    raise
+                attempt += 1
+                delay = self._backoff(attempt, e)
+                LLM_SCHEDULER_RETRIES.labels(type(e).__name__).inc()
+                if deadline_at is not None and time.monotonic() + delay > deadline_at:
+                    LLM_SCHEDULER_REJECTED.labels(priority.name.lower()).inc()
+                    raise SchedulerTimeout(f"Retry after {type(e).__name__} would exceed the deadline") from e
+                logger.warning("LLM call failed with %s (attempt %d/%d); retrying in %.2fs",
+                               type(e).__name__, attempt, self.max_retries, delay)
+                # Slept outside the condition lock, so other callers keep being admitted meanwhile
+                time.sleep(delay)
+                continue
+            self._settle(estimated_tokens, result)
+            return result
+
+    def _acquire(self, priority: Priority, tokens: int, deadline_at: Optional[float]) -> None:
+        entry = (int(priority), next(self._sequence))
+        enqueued_at = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait: Optional[float] = None
+                    if self._queue[0] == entry:
+                        wait = max(
+                            self._requests.wait_time(1, now),
+                            self._tokens.wait_time(tokens, now),
+                            self._paused_until - now,
+                        )
+                        if wait <= 0:
+                            heapq.heappop(self._queue)
+                            self._requests.consume(1)
+                            self._tokens.consume(tokens)
+                            self._cond.notify_all()
+                            LLM_SCHEDULER_WAIT.labels(priority.name.lower()).observe(now - enqueued_at)
+                            return
+                    if deadline_at is not None:
+                        remaining = deadline_at - now
+                        if remaining <= 0:
+                            LLM_SCHEDULER_REJECTED.labels(priority.name.lower()).inc()
+                            raise SchedulerTimeout(f"LLM call not admitted within its deadline ({priority.name})")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                raise
+
+    def _settle(self, estimated_tokens: int, result: Any) -> None:
+        """Corrects the token bucket with the real usage reported by the provider."""
+        usage = getattr(result, "usage_metadata", None)
+        if not usage or not usage.get("total_tokens"):
+            return
+        with self._cond:
+            self._tokens.consume(usage["total_tokens"] - estimated_tokens)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        ceiling = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempt))
+        delay = random.uniform(0, ceiling)  # Full jitter avoids synchronized retries
+        retry_after = _retry_after_seconds(error)
+        if retry_after:
+            delay = max(delay, retry_after)
+        if getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError":
+            with self._cond:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._cond.notify_all()
+        return delay
+
+
+def _is_retryable(error: Exception) -> bool:
+    return type(error).__name__ in _RETRYABLE_ERRORS or getattr(error, "status_code", None) in _RETRYABLE_STATUS
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        return float(value) / 1000
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embeddings wrapper whose calls go through the scheduler (priority taken from the caller's scope)."""
+
+    def __init__(self, inner: Embeddings, scheduler: "LLMScheduler"):
+        self.inner = inner
+        self.scheduler = scheduler
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "inner":  # Not set yet (e.g. during copy); avoid infinite recursion
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.run(lambda: self.inner.embed_documents(texts), estimated_tokens=estimate_tokens(*texts),
+                                  dependency=OPENAI_EMBEDDINGS)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.scheduler.run(lambda: self.inner.embed_query(text), estimated_tokens=estimate_tokens(text),
+                                  dependency=OPENAI_EMBEDDINGS)
+
+
+llm_scheduler = LLMScheduler(
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    enabled=LLM_SCHEDULER_ENABLED,
+)
@@ -0,0 +1,234 @@
+import threading
+from numbers import Number
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+_INITIAL_CAPACITY = 1024
+
+
+class _Partition:
+    """
+    The vectors of one namespace, in a preallocated matrix grown by doubling, with filter indexes:
+    a boolean bitmap per (field, value) for strings/booleans (each element of a list counts), a
+    float column per numeric field (NaN where absent) and a presence bitmap per field.
+    """
+
+    def __init__(self, dimension: int):
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.metadata: List[dict] = []
+        self.vectors = np.zeros((_INITIAL_CAPACITY, dimension), dtype=np.float32)
+        self.bitmaps: Dict[tuple, np.ndarray] = {}
+        self.numeric: Dict[str, np.ndarray] = {}
+        self.present: Dict[str, np.ndarray] = {}
+
+    @property
+    def capacity(self) -> int:
+        return self.vectors.shape[0]
+
+    def _grow(self, needed: int) -> None:
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+        vectors[:len(self.ids)] = self.vectors[:len(self.ids)]
+        self.vectors = vectors
+        for table, fill in ((self.bitmaps, False), (self.present, False), (self.numeric, np.nan)):
+            for key, column in table.items():
+                grown = np.full(capacity, fill, dtype=column.dtype)
+                grown[:len(column)] = column
+                table[key] = grown
+
+    def _column(self, table: dict, key, dtype, fill) -> np.ndarray:
+        column = table.get(key)
+        if column is None:
+            column = table[key] = np.full(self.capacity, fill, dtype=dtype)
+        return column
+
+    def _index(self, position: int, metadata: dict, value: bool) -> None:
+        """Sets (value=True) or clears the filter index entries of one row."""
+        for field, field_value in metadata.items():
+            self._column(self.present, field, bool, False)[position] = value
+            if isinstance(field_value, Number) and not isinstance(field_value, bool):
+                self._column(self.numeric, field, np.float64, np.nan)[position] = field_value if value else np.nan
+                continue
+            for element in field_value if isinstance(field_value, list) else [field_value]:
+                self._column(self.bitmaps, (field, element), bool, False)[position] = value
+
+    def set_row(self, chunk_id: str, row: np.ndarray, metadata: dict) -> None:
+        position = self.positions.get(chunk_id)
+        if position is None:
+            position = len(self.ids)
+            self._grow(position + 1)
+            self.positions[chunk_id] = position
+            self.ids.append(chunk_id)
+            self.metadata.append({})
+        self._index(position, self.metadata[position], False)
+        self.vectors[position] = row
+        self.metadata[position] = metadata
+        self._index(position, metadata, True)
+
+    def update_metadata(self, chunk_id: str, fields: dict) -> None:
+        position = self.positions.get(chunk_id)
+        if position is None:
+            return
+        self._index(position, self.metadata[position], False)
+        self.metadata[position].update(fields)
+        self._index(position, self.metadata[position], True)
+
+    # --- Filters (Pinecone metadata filter syntax) ---
+
+    def _equals(self, field: str, value) -> np.ndarray:
+        if isinstance(value, Number) and not isinstance(value, bool):
+            column = self.numeric.get(field)
+            return column == value if column is not None else np.zeros(self.capacity, dtype=bool)
+        bitmap = self.bitmaps.get((field, value))
+        return bitmap if bitmap is not None else np.zeros(self.capacity, dtype=bool)
+
+    def _compare(self, field: str, operator: str, value) -> np.ndarray:
+        if operator == "$eq":
+            return self._equals(field, value)
+        if operator == "$ne":
+            return ~self._equals(field, value)
+        if operator in ("$in", "$nin"):
+            mask = np.zeros(self.capacity, dtype=bool)
+            for element in value:
+                mask |= self._equals(field, element)
+            return mask if operator == "$in" else ~mask
+        if operator == "$exists":
+            present = self.present.get(field, np.zeros(self.capacity, dtype=bool))
+            return present if value else ~present
+        column = self.numeric.get(field)
+        if column is None:
+            return np.zeros(self.capacity, dtype=bool)
+        with np.errstate(invalid="ignore"):  # NaN (field absent) compares False
+            if operator == "$gt":
+                return column > value
+            if operator == "$gte":
+                return column >= value
+            if operator == "$lt":
+                return column < value
+            if operator == "$lte":
+                return column <= value
+        raise ValueError(f"Unsupported filter operator: {operator}")
+
+    def mask(self, filter: dict) -> np.ndarray:
+        """Rows matching the filter, as a boolean array over the partition's capacity."""
+        mask = np.ones(self.capacity, dtype=bool)
+        for key, condition in filter.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self.mask(clause)
+            elif key == "$or":
+                any_clause = np.zeros(self.capacity, dtype=bool)
+                for clause in condition:
+                    any_clause |= self.mask(clause)
+                mask &= any_clause
+            elif isinstance(condition, dict):
+                for operator, value in condition.items():
+                    mask &= self._compare(key, operator, value)
+            else:
+                mask &= self._equals(key, condition)
+        return mask
+
+
+class LocalVectorIndex:
+    """
+    In-process stand-in for the Pinecone index (cosine similarity, exact search over a numpy matrix).
+    Implements the subset of the Pinecone Index API the service uses (upsert, query, update, fetch, list),
+    with namespaces and metadata filters, so offline runs, tests and benchmarks exercise the same
+    code paths as production. Filters are evaluated on precomputed bitmaps and numeric columns,
+    and only the matching rows are scored, so a selective filter makes a query cheaper.
+    """
+
+    def __init__(self, dimension: Optional[int] = None):
+        self.dimension = dimension
+        self._lock = threading.RLock()
+        self._partitions: Dict[str, _Partition] = {}
+
+    def __len__(self) -> int:
+        return sum(len(partition.ids) for partition in self._partitions.values())
+
+    def upsert(self, vectors: List[dict], namespace: Optional[str] = None) -> dict:
+        rows = np.asarray([vector["values"] for vector in vectors], dtype=np.float32)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = rows.shape[1]
+            if rows.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {rows.shape[1]} does not match index dimension {self.dimension}")
+            norms = np.linalg.norm(rows, axis=1, keepdims=True)
+            rows = rows / np.where(norms == 0, 1, norms)  # Store unit vectors: cosine becomes a dot product
+            partition = self._partitions.get(namespace or "")
+            if partition is None:
+                partition = self._partitions[namespace or ""] = _Partition(self.dimension)
+            for vector, row in zip(vectors, rows):
+                partition.set_row(vector["id"], row, dict(vector.get("metadata") or {}))
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = False, include_values: bool = False,
+              namespace: Optional[str] = None, filter: Optional[dict] = None, **kwargs) -> SimpleNamespace:
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        with self._lock:
+            partition = self._partitions.get(namespace or "")
+            if partition is None or not partition.ids:
+                return SimpleNamespace(matches=[], namespace=namespace or "")
+            size = len(partition.ids)
+            if filter:
+                candidates = np.flatnonzero(partition.mask(filter)[:size])
+                scores = partition.vectors[candidates] @ query
+            else:
+                candidates = None
+                scores = partition.vectors[:size] @ query
+            k = min(top_k, len(scores))
+            if k == 0:
+                return SimpleNamespace(matches=[], namespace=namespace or "")
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            matches = []
+            for i in best:
+                position = candidates[i] if candidates is not None else i
+                matches.append(SimpleNamespace(
+                    id=partition.ids[position],
+                    score=float(scores[i]),
+                    metadata=dict(partition.metadata[position]) if include_metadata else None,
+                    values=partition.vectors[position].tolist() if include_values else [],
+                ))
+        return SimpleNamespace(matches=matches, namespace=namespace or "")
+
+    def update(self, id: str, set_metadata: Optional[dict] = None, namespace: Optional[str] = None, **kwargs) -> dict:
+        with self._lock:
+            partition = self._partitions.get(namespace or "")
+            if partition is not None and set_metadata:
+                partition.update_metadata(id, set_metadata)
+        return {}
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> SimpleNamespace:
+        with self._lock:
+            partition = self._partitions.get(namespace or "")
+            vectors = {}
+            for chunk_id in ids if partition is not None else []:
+                position = partition.positions.get(chunk_id)
+                if position is not None:
+                    vectors[chunk_id] = SimpleNamespace(id=chunk_id, values=partition.vectors[position].tolist(),
+                                                        metadata=dict(partition.metadata[position]))
+        return SimpleNamespace(vectors=vectors, namespace=namespace or "")
+
+    def list(self, prefix: Optional[str] = None, limit: int = 100, namespace: Optional[str] = None) -> Iterator[List[str]]:
+        """Ids in a namespace, in pages of `limit` (like Pinecone's Index.list)."""
+        with self._lock:
+            partition = self._partitions.get(namespace or "")
+            ids = [i for i in (partition.ids if partition is not None else []) if not prefix or i.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def describe_index_stats(self) -> dict:
+        with self._lock:
+            namespaces = {name: {"vector_count": len(partition.ids)} for name, partition in self._partitions.items()}
+        return {"dimension": self.dimension, "total_vector_count": len(self), "namespaces": namespaces}
@@ -0,0 +1,47 @@
+"""
+Backfills the metadata retrieval filters rely on, on vectors indexed before it was recorded:
+`tenant` (the namespace's tenant, DEFAULT_TENANT in the default namespace) and `superseded_on`
+(NOT_SUPERSEDED). build_filter only uses $eq and range operators on these fields, so until this
+has run such vectors match neither a tenant filter nor an effective_on filter.
+
+Usage (from policy-ai/ai-service):
+    python -m app.ai.metadata_backfill [--namespace NS ...]
+"""
+import argparse
+from typing import Iterable, Optional
+
+from app.ai.vector_store import fetch_chunk_metadata, get_vector_index, update_chunk_metadata
+from app.core.config import DEFAULT_TENANT
+from app.services.document_attributes import NOT_SUPERSEDED
+
+
+def backfill_namespace(namespace: str = "") -> int:
+    """Sets the missing fields on every vector of a namespace. Returns the number of vectors updated."""
+    defaults = {"tenant": namespace or DEFAULT_TENANT, "superseded_on": NOT_SUPERSEDED}
+    updated = 0
+    for ids in get_vector_index().list(namespace=namespace):
+        for chunk_id, metadata in fetch_chunk_metadata(ids, namespace).items():
+            missing = {field: value for field, value in defaults.items() if field not in metadata}
+            if missing:
+                update_chunk_metadata(chunk_id, missing, namespace)
+                updated += 1
+    return updated
+
+
+def backfill(namespaces: Optional[Iterable[str]] = None) -> dict:
+    """Backfills the given namespaces (all of the index's by default). Returns the updates per namespace."""
+    if namespaces is None:
+        namespaces = get_vector_index().describe_index_stats()["namespaces"]
+    return {namespace: backfill_namespace(namespace) for namespace in namespaces}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--namespace", action="append", help="Namespace to backfill (repeatable; default: all)")
+    args = parser.parse_args()
+    for namespace, updated in backfill(args.namespace).items():
+        print(f"Namespace {namespace or '(default)'}: {updated} vectors updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import logging
+from functools import partial
+from typing import Any
+
+from app.core.components import register_component
+from app.core.config import LLM_ROUTER_MODEL, LLM_SYNTHESIS_MODEL, LLM_DRAFT_MODEL, LLM_ANALYSIS_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Tiers: which model serves which kind of step
+TIER_ROUTER = "router"        # Tool selection and simple follow-ups (small, fast model)
+TIER_SYNTHESIS = "synthesis"  # Answers written from tool output, long-context turns
+TIER_DRAFT = "draft"          # Policy drafting and editing
+TIER_ANALYSIS = "analysis"    # Structured policy analysis
+
+MODEL_TIERS = {
+    TIER_ROUTER: LLM_ROUTER_MODEL,
+    TIER_SYNTHESIS: LLM_SYNTHESIS_MODEL,
+    TIER_DRAFT: LLM_DRAFT_MODEL,
+    TIER_ANALYSIS: LLM_ANALYSIS_MODEL,
+}
+
+
+def build_chat_model(tier: str, **kwargs: Any):
+    """Creates the ChatOpenAI client for a tier. Extra kwargs override the defaults."""
+    from langchain_openai import ChatOpenAI
+    params = {
+        "model": MODEL_TIERS[tier],
+        "temperature": 0,
+        "streaming": True,
+        "stream_usage": True,  # Streamed responses carry token counts for the metrics callback
+        "max_retries": 0,  # Rate limits and retries are handled by the LLM scheduler
+    }
+    params.update(kwargs)
+    logger.info("Building '%s' tier chat model: %s", tier, params["model"])
+    return ChatOpenAI(**params)
+
+
+def with_tier(runnable, tier: str):
+    """Tags a model runnable with its tier; the metrics callback reads it to label latency and cost."""
+    return runnable.with_config(metadata={"model_tier": tier})
+
+
+# One lazily-built client per tier used by the agent and the drafting endpoints
+_tier_components = {
+    tier: register_component(f"llm_{tier}", partial(build_chat_model, tier))
+    for tier in (TIER_ROUTER, TIER_SYNTHESIS, TIER_DRAFT)
+}
+
+
+def get_chat_model(tier: str):
+    """Returns the shared chat model for a tier."""
+    return _tier_components[tier].get()
@@ -1,152 +1,229 @@
 import os
+import hashlib
 import logging
 from typing import Annotated, Optional, List
 import json
 
-from bs4 import BeautifulSoup
-from htmldiff2 import render_html_diff
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import BaseMessage, HumanMessage
 from pydantic import BaseModel, Field
 
 from dotenv import load_dotenv
 
-from .graph import build_agent_executor
+from app.core.components import register_component
+from app.core.metrics import metrics_callback
+from app.core.logging_config import log_payload, Truncated
+from app.ai.llm_scheduler import llm_scheduler, Priority, estimate_tokens, generation_timeout
+from app.core.resilience import OPENAI_CHAT_GENERATE
+from app.ai.model_tiers import (
+    TIER_ROUTER, TIER_SYNTHESIS, TIER_DRAFT, TIER_ANALYSIS, MODEL_TIERS, build_chat_model, get_chat_model, with_tier,
+)
+from app.core.config import DOCUMENT_QA_FAST_PATH, ANALYSIS_MAX_CHARS, DRAFT_CACHE_ENABLED
+from app.ai.draft_cache import draft_cache_key, get_draft_cache
+from app.ai.speculative_retrieval import speculative_retrieval
+from app.ai.tools.rag_tool import retrieve_policy_docs
 from app.utils.pdf_processor import download_pdf_content, extract_text_from_pdf
+from app.utils.html_processor import clean_html, html_diff
 
 load_dotenv()
 
-# Setup basic logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Logging is configured once by app.core.logging_config (see app/main.py)
 logger = logging.getLogger(__name__)
 
-# Print the API key for debugging
-logger.info(f"OpenAI API Key Loaded: '{os.getenv('OPENAI_API_KEY')[:5]}...'") # Print first 5 chars for security
+if not os.getenv("OPENAI_API_KEY"):
+    logger.warning("OPENAI_API_KEY is not set; LLM calls will fail.")
 
 # --- LangGraph Agent Setup ---
+# The LLM clients and the compiled graph are built lazily (first use or warm-up), so importing
+# this module is cheap and a missing key surfaces as a failed readiness check, not an import crash.
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0, streaming=True)
+# Chat models are configured per tier (router/synthesis/draft/analysis) in app/ai/model_tiers.py
+
+def _build_analysis_llm():
+    llm = build_chat_model(TIER_ANALYSIS, temperature=0.1, streaming=False)
+    return with_tier(llm.with_structured_output(PolicyAnalysisOutput), TIER_ANALYSIS)
+
+def _build_agent_executor():
+    from .graph import build_agent_executor
+    return build_agent_executor(get_chat_model(TIER_ROUTER), get_chat_model(TIER_SYNTHESIS))
+
+analysis_llm_component = register_component("analysis_llm", _build_analysis_llm)
+agent_executor_component = register_component("agent_executor", _build_agent_executor)
+
+def get_llm():
+    """Returns the chat model used for drafting and editing policies."""
+    return with_tier(get_chat_model(TIER_DRAFT), TIER_DRAFT)
+
+def get_agent_executor():
+    """Returns the compiled agent graph, or None if it could not be built."""
+    try:
+        return agent_executor_component.get()
+    except Exception as e:
+        logger.error("Agent executor could not be built (relying on graph.py): %s", e, exc_info=True)
+        return None
+
+# Callbacks attached to every LLM/agent invocation (Prometheus timings and token usage)
+METRICS_CONFIG = {"callbacks": [metrics_callback]}
+
+# Budget reserved in the scheduler for a full HTML policy draft
+DRAFT_COMPLETION_TOKENS = 3000
 
 # --- New Functions for Policy Generation and Editing ---
 
+# Prompts are built once, with all the fixed instructions first and the per-request content last,
+# so repeated calls share a long identical prefix that the provider's prompt caching can reuse.
+DRAFT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an AI assistant helping to draft insurance policies. "
+     "Based on the user\'s request (their message), generate a comprehensive initial draft for an insurance policy strictly in well-formed HTML format. "
+     "Your output MUST be a single, valid HTML string, and NOTHING ELSE. "
+     "Key HTML Structure Rules: "
+     "1. Use standard HTML tags: <h2>, <h3>, <h4> for headings; <p> for paragraphs; <ul>, <ol>, <li> for lists; <strong> for bold; <em> for italic. "
+     "2. ABSOLUTELY CRITICAL: ALL HTML tags MUST be correctly opened and closed (e.g., <h2>Title</h2>, NOT <h2>Title</h3> or <p>Text<h3>Section</h3></p>). Pay meticulous attention to heading levels and ensure they are distinct elements. "
+     "3. CRITICAL: Section titles or heading-like phrases (e.g., \"Sección 1: Cobertura\") MUST be in their own dedicated heading tags (e.g., <h3>Sección 1: Cobertura</h3>). DO NOT embed section titles or other heading tags within <p> tags. Each heading must be standalone. "
+     "4. Ensure text content within tags is coherent. Avoid jumbling unrelated sentences or phrases within a single tag. If content represents different ideas, use separate appropriate tags. "
+     "5. STRICTLY FORBIDDEN: DO NOT include any markdown syntax (like ## or *) in the HTML output. "
+     "6. STRICTLY FORBIDDEN: DO NOT include any code fence markers like ```html, ```, or any other text outside the main HTML structure. The response must start directly with the first HTML tag (e.g., <h2>) and end with the last closing tag. "
+     "7. DO NOT output any explanatory text before or after the HTML. The entire response must be the HTML itself. "
+     "8. VERY IMPORTANT: Ensure that distinct pieces of information are in distinct HTML elements. For example, a main title and a subtitle should be in separate tags (e.g., <h2>Main Title</h2><h4>Subtitle</h4>) OR clearly separated if in the same tag. DO NOT concatenate them like '<h2>Main TitleSubtitle</h2>'. Similarly, a paragraph must fully close before a new heading begins. Do not run paragraph text directly into a heading tag or vice-versa (e.g. AVOID: <p>end of paragraph<h3>Heading Start</h3></p> or <p>Paragraph<h3>Nested Heading</h3> Text</p>). Headings (h2, h3, h4) must always be on their own line and be distinct elements. "
+     "Example of a good structure: "
+     "<h2>Main Policy Title</h2>"
+     "<h3>Section A Title</h3>"
+     "<p>Paragraph about section A.</p>"
+     "<ul><li>Item 1</li><li>Item 2</li></ul>"
+     "<h3>Section B Title</h3>"
+     "<p>Paragraph about section B.</p>"
+     "Respond ONLY with the HTML content, starting with <h2> and ending with the final closing tag."
+     ),
+    ("human", "{user_request}")
+])
+# Cached drafts are only reused with the template that produced them
+DRAFT_PROMPT_VERSION = hashlib.sha1("\n".join(m.prompt.template for m in DRAFT_PROMPT.messages).encode("utf-8")).hexdigest()[:12]
+
+EDIT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an AI assistant helping to edit an existing insurance policy, which is provided in HTML format. "
+     "The user's message contains the existing policy in HTML followed by the change they want. "
+     "Apply this change to the provided HTML policy text. "
+     "Your output MUST be a single, valid HTML string representing the FULL modified policy. "
+     "Key HTML Structure Rules for Editing: "
+     "1. CRITICAL: ALL HTML tags (both existing and new) MUST be correctly opened and closed (e.g., <p>Text</p>). "
+     "2. Preserve the existing HTML structure as much as possible. Only change what is necessary based on the edit instruction. "
+     "3. If adding new section titles or heading-like phrases, they MUST be in their own heading tags (e.g., <h3>New Section</h3>). DO NOT put new section titles inside <p> tags. "
+     "4. Ensure text content within tags is coherent. "
+     "5. DO NOT introduce any markdown syntax (like ## or *) in the HTML output. "
+     "6. DO NOT include any ```html ... ``` markers or any text outside the main HTML structure. "
+     "Respond ONLY with the full modified HTML content."),
+    ("human", "Existing Policy (HTML):\n{policy_text}\n\nPlease apply the edit: '{edit_instruction}' to the HTML policy above.")
+])
+
+def draft_policy_html(user_prompt: str) -> str:
+    """
+    The model's policy draft for the prompt, as cleaned HTML. Raises on LLM errors. Drafts are
+    deterministic (temperature 0), so they are served from the draft cache when possible.
+    """
+    model = MODEL_TIERS[TIER_DRAFT]
+    cache_key = draft_cache_key(user_prompt, model, DRAFT_PROMPT_VERSION)
+    if DRAFT_CACHE_ENABLED:
+        cached = get_draft_cache().get(cache_key)
+        if cached is not None:
+            logger.info("Policy draft served from the draft cache. Length: %d", len(cached))
+            return cached
+
+    chain = DRAFT_PROMPT | get_llm()
+    response = llm_scheduler.run(
+        lambda: chain.invoke({"user_request": user_prompt}, config=METRICS_CONFIG),
+        priority=Priority.EDIT,
+        estimated_tokens=estimate_tokens(user_prompt, completion_tokens=DRAFT_COMPLETION_TOKENS),
+        dependency=OPENAI_CHAT_GENERATE,
+        min_timeout_seconds=generation_timeout(DRAFT_COMPLETION_TOKENS),
+    )
+    draft_text = response.content if hasattr(response, 'content') else str(response)
+
+    # Forcefully remove known problematic markers
+    draft_text = draft_text.replace("```html", "").replace("```", "")
+    # Attempt to strip any leading/trailing whitespace that might remain
+    draft_text = draft_text.strip()
+
+    # Clean with BeautifulSoup (on the CPU pool)
+    try:
+        # soup.prettify() can add newlines, and does more aggressive cleaning.
+        cleaned_draft_text = clean_html(draft_text) # Use a different variable for the cleaned version
+        logger.info("HTML Policy draft after BeautifulSoup prettify. Length: %d", len(cleaned_draft_text))
+        log_payload(logger, "Prettified HTML", cleaned_draft_text) # Sampled and size-capped
+    except Exception as bs_error:
+        logger.error("BeautifulSoup cleaning error: %s", bs_error, exc_info=True)
+        return draft_text # Fallback to the uncleaned (but marker-stripped) text if BS fails; not cached
+
+    logger.info("HTML Policy draft generated successfully. Original Length: %d, Cleaned Length: %d", len(draft_text), len(cleaned_draft_text))
+    if DRAFT_CACHE_ENABLED and cleaned_draft_text:
+        get_draft_cache().put(cache_key, cleaned_draft_text, model=model, prompt_version=DRAFT_PROMPT_VERSION)
+    return cleaned_draft_text
+
 def generate_policy_draft(user_prompt: str, current_policy_text: Optional[str] = None) -> str:
     """
     Generates an initial insurance policy draft based on the user's prompt, outputting clean, well-formed HTML.
     If current_policy_text is provided, it will return a diff of the generated draft against current_policy_text.
     """
-    logger.info(f"Generating policy draft (HTML) for prompt: {user_prompt[:100]}...")
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system",
-         "You are an AI assistant helping to draft insurance policies. "
-         "Based on the user\'s request, generate a comprehensive initial draft for an insurance policy strictly in well-formed HTML format. "
-         "User request: '{user_request}'. "
-         "Your output MUST be a single, valid HTML string, and NOTHING ELSE. "
-         "Key HTML Structure Rules: "
-         "1. Use standard HTML tags: <h2>, <h3>, <h4> for headings; <p> for paragraphs; <ul>, <ol>, <li> for lists; <strong> for bold; <em> for italic. "
-         "2. ABSOLUTELY CRITICAL: ALL HTML tags MUST be correctly opened and closed (e.g., <h2>Title</h2>, NOT <h2>Title</h3> or <p>Text<h3>Section</h3></p>). Pay meticulous attention to heading levels and ensure they are distinct elements. "
-         "3. CRITICAL: Section titles or heading-like phrases (e.g., \"Sección 1: Cobertura\") MUST be in their own dedicated heading tags (e.g., <h3>Sección 1: Cobertura</h3>). DO NOT embed section titles or other heading tags within <p> tags. Each heading must be standalone. "
-         "4. Ensure text content within tags is coherent. Avoid jumbling unrelated sentences or phrases within a single tag. If content represents different ideas, use separate appropriate tags. "
-         "5. STRICTLY FORBIDDEN: DO NOT include any markdown syntax (like ## or *) in the HTML output. "
-         "6. STRICTLY FORBIDDEN: DO NOT include any code fence markers like ```html, ```, or any other text outside the main HTML structure. The response must start directly with the first HTML tag (e.g., <h2>) and end with the last closing tag. "
-         "7. DO NOT output any explanatory text before or after the HTML. The entire response must be the HTML itself. "
-         "8. VERY IMPORTANT: Ensure that distinct pieces of information are in distinct HTML elements. For example, a main title and a subtitle should be in separate tags (e.g., <h2>Main Title</h2><h4>Subtitle</h4>) OR clearly separated if in the same tag. DO NOT concatenate them like '<h2>Main TitleSubtitle</h2>'. Similarly, a paragraph must fully close before a new heading begins. Do not run paragraph text directly into a heading tag or vice-versa (e.g. AVOID: <p>end of paragraph<h3>Heading Start</h3></p> or <p>Paragraph<h3>Nested Heading</h3> Text</p>). Headings (h2, h3, h4) must always be on their own line and be distinct elements. "
-         "Example of a good structure: "
-         "<h2>Main Policy Title</h2>"
-         "<h3>Section A Title</h3>"
-         "<p>Paragraph about section A.</p>"
-         "<ul><li>Item 1</li><li>Item 2</li></ul>"
-         "<h3>Section B Title</h3>"
-         "<p>Paragraph about section B.</p>"
-         "Respond ONLY with the HTML content, starting with <h2> and ending with the final closing tag."
-         ),
-        ("human", "{user_request}")
-    ])
+    logger.info("Generating policy draft (HTML) for prompt: %s", Truncated(user_prompt, 100))
     
-    chain = prompt_template | llm
     try:
-        response = chain.invoke({"user_request": user_prompt})
-        draft_text = response.content if hasattr(response, 'content') else str(response)
-        
-        # Forcefully remove known problematic markers
-        draft_text = draft_text.replace("```html", "").replace("```", "")
-        # Attempt to strip any leading/trailing whitespace that might remain
-        draft_text = draft_text.strip()
-
-        # Clean with BeautifulSoup
-        try:
-            soup = BeautifulSoup(draft_text, 'html.parser')
-            # Convert back to string. soup.prettify() can add newlines, 
-            # and does more aggressive cleaning.
-            cleaned_draft_text = soup.prettify() # Use a different variable for the cleaned version
-            logger.info(f"HTML Policy draft after BeautifulSoup prettify. Length: {len(cleaned_draft_text)}")
-            logger.debug(f"--- Prettified HTML Start ---\n{cleaned_draft_text}\n--- Prettified HTML End ---") # DETAILED LOGGING
-        except Exception as bs_error:
-            logger.error(f"BeautifulSoup cleaning error: {bs_error}", exc_info=True)
-            cleaned_draft_text = draft_text # Fallback to the uncleaned (but marker-stripped) text if BS fails
-
-        logger.info(f"HTML Policy draft generated successfully. Original Length: {len(draft_text)}, Cleaned Length: {len(cleaned_draft_text)}")
+        cleaned_draft_text = draft_policy_html(user_prompt)
 
         if current_policy_text and current_policy_text.strip() != cleaned_draft_text.strip():
             logger.info("Current policy text provided, generating diff.")
-            diffed_html = render_html_diff(current_policy_text, cleaned_draft_text)
-            logger.info(f"Diff generated. Length: {len(diffed_html)}")
+            diffed_html = html_diff(current_policy_text, cleaned_draft_text)
+            logger.info("Diff generated. Length: %d", len(diffed_html))
             return diffed_html
         else:
             logger.info("No current policy text or no changes, returning cleaned draft.")
             return cleaned_draft_text
     except Exception as e:
-        logger.error(f"Error generating HTML policy draft: {e}", exc_info=True)
+        logger.error("Error generating HTML policy draft: %s", e, exc_info=True)
         return "<p>Error: Could not generate policy draft.</p>"
 
+def edit_policy_html(current_policy_text: str, edit_instruction: str) -> str:
+    """The full policy with the edit applied, as cleaned HTML. Raises on LLM errors."""
+    chain = EDIT_PROMPT | get_llm()
+    response = llm_scheduler.run(
+        lambda: chain.invoke({
+            "policy_text": current_policy_text,
+            "edit_instruction": edit_instruction
+        }, config=METRICS_CONFIG),
+        priority=Priority.EDIT,
+        # The full policy goes in and comes back out
+        estimated_tokens=estimate_tokens(current_policy_text, edit_instruction, current_policy_text),
+        dependency=OPENAI_CHAT_GENERATE,
+        min_timeout_seconds=generation_timeout(estimate_tokens(current_policy_text)),
+    )
+    edited_text_raw = response.content if hasattr(response, 'content') else str(response)
+    logger.info("Raw edited HTML policy received from LLM. Length: %d", len(edited_text_raw))
+
+    # Clean with BeautifulSoup before diffing (on the CPU pool)
+    try:
+        cleaned_edited_text = clean_html(edited_text_raw)
+        logger.info("Cleaned edited HTML with BeautifulSoup. Length: %d", len(cleaned_edited_text))
+    except Exception as bs_error:
+        logger.error("BeautifulSoup cleaning error on edited text: %s", bs_error, exc_info=True)
+        cleaned_edited_text = edited_text_raw # Fallback
+    return cleaned_edited_text
+
 def edit_policy(current_policy_text: str, edit_instruction: str) -> str:
     """
     Edits an existing insurance policy (in HTML format) based on the user's instruction, 
     returning an HTML diff of the changes.
     """
-    logger.info(f"Editing HTML policy based on instruction: {edit_instruction[:100]}...")
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system",
-         "You are an AI assistant helping to edit an existing insurance policy, which is provided in HTML format. "
-         "The user wants to make the following change: '{edit_instruction}'. "
-         "Apply this change to the provided HTML policy text. "
-         "Your output MUST be a single, valid HTML string representing the FULL modified policy. "
-         "Key HTML Structure Rules for Editing: "
-         "1. CRITICAL: ALL HTML tags (both existing and new) MUST be correctly opened and closed (e.g., <p>Text</p>). "
-         "2. Preserve the existing HTML structure as much as possible. Only change what is necessary based on the edit instruction. "
-         "3. If adding new section titles or heading-like phrases, they MUST be in their own heading tags (e.g., <h3>New Section</h3>). DO NOT put new section titles inside <p> tags. "
-         "4. Ensure text content within tags is coherent. "
-         "5. DO NOT introduce any markdown syntax (like ## or *) in the HTML output. "
-         "6. DO NOT include any ```html ... ``` markers or any text outside the main HTML structure. "
-         "Respond ONLY with the full modified HTML content. "
-         "\\n\\nExisting Policy (HTML):\\n{policy_text}"),
-        ("human", "Please apply the edit: '{edit_instruction}' to the HTML policy provided in the system message.")
-    ])
-
-    chain = prompt_template | llm
-    try:
-        response = chain.invoke({
-            "policy_text": current_policy_text,
-            "edit_instruction": edit_instruction
-        })
-        edited_text_raw = response.content if hasattr(response, 'content') else str(response)
-        logger.info(f"Raw edited HTML policy received from LLM. Length: {len(edited_text_raw)}")
+    logger.info("Editing HTML policy based on instruction: %s", Truncated(edit_instruction, 100))
 
-        # Clean with BeautifulSoup before diffing
-        try:
-            soup = BeautifulSoup(edited_text_raw, 'html.parser')
-            cleaned_edited_text = soup.prettify()
-            logger.info(f"Cleaned edited HTML with BeautifulSoup. Length: {len(cleaned_edited_text)}")
-        except Exception as bs_error:
-            logger.error(f"BeautifulSoup cleaning error on edited text: {bs_error}", exc_info=True)
-            cleaned_edited_text = edited_text_raw # Fallback
+    try:
+        cleaned_edited_text = edit_policy_html(current_policy_text, edit_instruction)
 
         # Compute the diff
-        diffed_html = render_html_diff(current_policy_text, cleaned_edited_text)
-        logger.info(f"Diff generated for edited policy. Length: {len(diffed_html)}")
+        diffed_html = html_diff(current_policy_text, cleaned_edited_text)
+        logger.info("Diff generated for edited policy. Length: %d", len(diffed_html))
         return diffed_html
     except Exception as e:
-        logger.error(f"Error editing HTML policy or generating diff: {e}", exc_info=True)
+        logger.error("Error editing HTML policy or generating diff: %s", e, exc_info=True)
         return "<p>Error: Could not edit policy or generate diff.</p>"
 
 # --- Define structured output model ---
@@ -156,15 +233,35 @@ class PolicyAnalysisOutput(BaseModel):
     weaknesses: List[str] = Field(..., description="Una lista de debilidades clave o áreas de mejora de la póliza")
     recommendations: List[str] = Field(..., description="Una lista de recomendaciones concretas para el titular de la póliza")
 
-# --- Build Agent Executor ---
-agent_executor = None
-if llm:
-    try:
-        agent_executor = build_agent_executor(llm)
-    except Exception as e:
-        logger.error(f"Agent executor could not be built from rag_agent.py (relying on graph.py): {e}", exc_info=True)
-else:
-    logger.error("LLM not available, cannot build agent executor.")
+ANALYSIS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """
+            Eres un experto analista de pólizas de seguros. Analiza el siguiente texto de una póliza de seguro.
+            Debes generar una respuesta JSON con la siguiente estructura:
+            {{
+              "score": <un número entero entre 0 y 100 representando la calidad general de la póliza>,
+              "strengths": ["<una lista de fortalezas clave de la póliza>"],
+              "weaknesses": ["<una lista de debilidades clave o áreas de mejora de la póliza>"],
+              "recommendations": ["<una lista de recomendaciones concretas para el titular de la póliza>"]
+            }}
+            Asegúrate de que la salida sea únicamente un objeto JSON válido y nada más.
+            No incluyas explicaciones adicionales fuera del JSON.
+            Calcula el 'score' basándote en tu análisis general de las fortalezas y debilidades.
+            El idioma de las fortalezas, debilidades y recomendaciones debe ser español.
+            """),
+    ("human", "Texto de la póliza para analizar:\n\n{policy_text}"),
+])
+
+def analyze_policy_text(text: str, priority: Priority = Priority.EDIT) -> PolicyAnalysisOutput:
+    """Structured analysis of a policy's text (its first ANALYSIS_MAX_CHARS characters)."""
+    policy_text = text[:ANALYSIS_MAX_CHARS]
+    chain = ANALYSIS_PROMPT | analysis_llm_component.get()
+    return llm_scheduler.run(
+        lambda: chain.invoke({"policy_text": policy_text}, config=METRICS_CONFIG),
+        priority=priority,
+        estimated_tokens=estimate_tokens(policy_text, completion_tokens=1000),
+        dependency=OPENAI_CHAT_GENERATE,
+        min_timeout_seconds=generation_timeout(1000),
+    )
 
 # --- Main Function to Interact with Agent ---
 
@@ -177,6 +274,8 @@ def get_agent_response(query: str, current_policy_text: Optional[str] = None, co
     it returns a structured JSON analysis. Otherwise, it uses the conversational agent.
     Optionally, current_policy_text can be provided to give context to the agent.
     """
+    # The analysis query uses a direct LLM call, so it doesn't need the graph to be built
+    agent_executor = get_agent_executor() if query != ANALYSIS_QUERY_TEXT else None
     if not agent_executor and query != ANALYSIS_QUERY_TEXT:
         if query != ANALYSIS_QUERY_TEXT: # Allow analysis query even if main agent fails, but log
              logger.error("Agent executor is not available for conversational query.")
@@ -188,22 +287,22 @@ def get_agent_response(query: str, current_policy_text: Optional[str] = None, co
             "score": 0, "strengths": [], "weaknesses": ["Error: No se proporcionó ninguna consulta."], "recommendations": []
         })
 
-    if config is None:
-        config = {}
-    
-    # Ensure 'configurable' and 'thread_id' are initialized in config
-    config.setdefault("configurable", {}).setdefault("thread_id", "default_thread")
+    # A copy with 'configurable', 'thread_id' and this call's callbacks: the caller's config (which it
+    # may reuse across calls) is left untouched
+    config = dict(config or {})
+    config["configurable"] = {"thread_id": "default_thread", **(config.get("configurable") or {})}
+    config["callbacks"] = [*(config.get("callbacks") or []), metrics_callback]
     if config["configurable"]["thread_id"] == "default_thread":
-        logger.warning(f"Using default thread_id for conversational agent: {config['configurable']['thread_id']}")
+        logger.warning("Using default thread_id for conversational agent: %s", config['configurable']['thread_id'])
     
     if query == ANALYSIS_QUERY_TEXT and "document_context" in config and "url" in config["document_context"]:
         doc_url = config["document_context"]["url"]
-        logger.info(f"Performing structured analysis for query: '{query}' on document: {doc_url}")
+        logger.info("Performing structured analysis for query: '%s' on document: %s", query, doc_url)
 
         try:
             pdf_bytes = download_pdf_content(doc_url)
             if not pdf_bytes:
-                logger.error(f"Failed to download PDF for analysis: {doc_url}")
+                logger.error("Failed to download PDF for analysis: %s", doc_url)
                 return json.dumps({
                     "score": 0, "strengths": [],
                     "weaknesses": ["Error: No se pudo descargar el documento PDF para el análisis."],
@@ -212,46 +311,21 @@ def get_agent_response(query: str, current_policy_text: Optional[str] = None, co
 
             text_content = extract_text_from_pdf(pdf_bytes)
             if not text_content:
-                logger.error(f"Failed to extract text for analysis from PDF: {doc_url}")
+                logger.error("Failed to extract text for analysis from PDF: %s", doc_url)
                 return json.dumps({
                     "score": 0, "strengths": [],
                     "weaknesses": ["Error: No se pudo extraer texto del documento PDF. Puede estar vacío o corrupto."],
                     "recommendations": ["Por favor, intente con otro documento."]
                 })
 
-            system_prompt_template = """
-            Eres un experto analista de pólizas de seguros. Analiza el siguiente texto de una póliza de seguro.
-            Debes generar una respuesta JSON con la siguiente estructura:
-            {{
-              "score": <un número entero entre 0 y 100 representando la calidad general de la póliza>,
-              "strengths": ["<una lista de fortalezas clave de la póliza>"],
-              "weaknesses": ["<una lista de debilidades clave o áreas de mejora de la póliza>"],
-              "recommendations": ["<una lista de recomendaciones concretas para el titular de la póliza>"]
-            }}
-            Asegúrate de que la salida sea únicamente un objeto JSON válido y nada más.
-            No incluyas explicaciones adicionales fuera del JSON.
-            Calcula el 'score' basándote en tu análisis general de las fortalezas y debilidades.
-            El idioma de las fortalezas, debilidades y recomendaciones debe ser español.
-            """
-            
-            human_prompt_template = "Texto de la póliza para analizar:\n\n{policy_text}"
-
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", system_prompt_template),
-                ("human", human_prompt_template)
-            ])
-            
-            structured_llm = ChatOpenAI(model="gpt-4o", temperature=0.1).with_structured_output(PolicyAnalysisOutput)
-            
-            chain = prompt | structured_llm
-            analysis_result_pydantic = chain.invoke({"policy_text": text_content[:16000]})
+            analysis_result_pydantic = analyze_policy_text(text_content)
 
             json_response_str = analysis_result_pydantic.model_dump_json()
-            logger.info(f"Structured analysis JSON response generated: {json_response_str[:200]}...")
+            logger.info("Structured analysis JSON response generated: %s", Truncated(json_response_str, 200))
             return json_response_str
 
         except Exception as e:
-            logger.error(f"Error generating structured JSON analysis: {e}", exc_info=True)
+            logger.error("Error generating structured JSON analysis: %s", e, exc_info=True)
             return json.dumps({
                 "score": 0, "strengths": [],
                 "weaknesses": ["Error: Ocurrió un error interno al generar el análisis estructurado."],
@@ -259,6 +333,8 @@ def get_agent_response(query: str, current_policy_text: Optional[str] = None, co
             })
     
     # Fallback to conversational agent for all other queries or if analysis conditions not met
+    if not agent_executor:
+        agent_executor = get_agent_executor()
     if not agent_executor:
         logger.error("Agent executor is not available for conversational query after analysis attempt.")
         return "Error: El agente de conversación no está disponible."
@@ -266,8 +342,17 @@ def get_agent_response(query: str, current_policy_text: Optional[str] = None, co
     actual_query_for_agent = query
     document_context_info = ""
 
+    agent_input = {}
+    speculative_query = None
+
     # Specific Document Q&A (via URL) takes precedence
-    if "document_context" in config and "url" in config["document_context"] and not (query == ANALYSIS_QUERY_TEXT): # analysis query handled above
+    if "document_context" in config and "url" in config["document_context"] and DOCUMENT_QA_FAST_PATH and not (query == ANALYSIS_QUERY_TEXT):
+        # The graph runs specific_document_qa_tool directly and goes straight to synthesis
+        doc_url = config["document_context"]["url"]
+        agent_input["document_url"] = doc_url
+        document_context_info = f" with document_url: {doc_url} (direct document QA)"
+        logger.info("Conversational agent will run specific_document_qa_tool directly. User query: '%s', Doc URL: %s", Truncated(query, 300), doc_url)
+    elif "document_context" in config and "url" in config["document_context"] and not (query == ANALYSIS_QUERY_TEXT): # analysis query handled above
         doc_url = config["document_context"]["url"]
         actual_query_for_agent = (
             f"The user's query is: '{query}'.\\n"
@@ -279,28 +364,33 @@ def get_agent_response(query: str, current_policy_text: Optional[str] = None, co
             f"Ensure your tool call to 'specific_document_qa_tool' includes both these arguments with these exact values. Do not use any other tool if this document URL is present."
         )
         document_context_info = f" with document_url: {doc_url}"
-        logger.info(f"Conversational agent will be invoked with a highly directive query for specific_document_qa_tool. User query: '{query}', Doc URL: {doc_url}")
+        logger.info("Conversational agent will be invoked with a highly directive query for specific_document_qa_tool. User query: '%s', Doc URL: %s", Truncated(query, 300), doc_url)
     # General query with current_policy_text context
     elif current_policy_text and not (query == ANALYSIS_QUERY_TEXT and "document_context" in config): # Exclude analysis query which has its own context handling
+        # The document goes first and the query last, so follow-up questions on the same policy share the prompt prefix
         actual_query_for_agent = (
-            f"The user's query is: '{query}'.\\n"
-            f"They are currently working on the following insurance policy document. Use this document as the primary context for your response:\\n"
+            f"The user is currently working on the following insurance policy document. Use this document as the primary context for your response:\\n"
             f"--- POLICY DOCUMENT START ---\\n{current_policy_text}\\n--- POLICY DOCUMENT END ---\\n"
-            f"Please respond to the user's query based on this context. If the query is a request for modification, explain what you would change or provide the change directly. If it's a question, answer it based on the document."
+            f"Please respond to the user's query based on this context. If the query is a request for modification, explain what you would change or provide the change directly. If it's a question, answer it based on the document.\\n"
+            f"The user's query is: '{query}'."
         )
         document_context_info = " with current policy text context"
-        logger.info(f"Conversational agent will be invoked with user query AND current policy context. Query: '{query}'")
+        logger.info("Conversational agent will be invoked with user query AND current policy context. Query: '%s'", Truncated(query, 300))
     # General query without specific document or policy text context
     else:
-        logger.info(f"Conversational agent will be invoked for a general query (no specific document_url or policy_text). User query: '{query}'")
+        logger.info("Conversational agent will be invoked for a general query (no specific document_url or policy_text). User query: '%s'", Truncated(query, 300))
+        # Most general questions end up in policy_rag_tool: start that retrieval alongside the routing call
+        speculative_query = query
     
-    logger.info(f"Invoking conversational agent. Effective query for agent: '{actual_query_for_agent[:500]}...'{document_context_info}, Config: {config}")
+    logger.info("Invoking conversational agent%s. Thread: %s", document_context_info, config["configurable"]["thread_id"])
+    log_payload(logger, "Effective query for agent", actual_query_for_agent)
 
     try:
-        final_state = agent_executor.invoke(
-            {"messages": [HumanMessage(content=actual_query_for_agent)]}, 
-            config=config
-        )
+        with speculative_retrieval(speculative_query, retrieve_policy_docs):
+            final_state = agent_executor.invoke(
+                {"messages": [HumanMessage(content=actual_query_for_agent)], **agent_input},
+                config=config
+            )
 
         final_response_message = None
         if final_state and 'messages' in final_state:
@@ -311,14 +401,15 @@ def get_agent_response(query: str, current_policy_text: Optional[str] = None, co
 
         if final_response_message:
             response_content = final_response_message.content
-            logger.info(f"Agent final response: '{response_content}'")
+            logger.info("Agent final response (%d chars): '%s'", len(response_content), Truncated(response_content, 300))
             return response_content
         else:
-            logger.warning(f"Agent finished, but could not extract a final AI response. Full state: {final_state}")
+            logger.warning("Agent finished, but could not extract a final AI response.")
+            log_payload(logger, "Final agent state", final_state, level=logging.WARNING)
             return "Agent finished, but could not extract a final response."
 
     except Exception as e:
-        logger.error(f"Error invoking agent executor: {e}", exc_info=True)
+        logger.error("Error invoking agent executor: %s", e, exc_info=True)
         return "An error occurred while processing your request."
 
 # Example usage (can be uncommented for direct testing)
@@ -0,0 +1,62 @@
+import logging
+import time
+from typing import List
+
+from app.core.components import register_component, STATUS_FAILED
+from app.core.config import (
+    RERANK_ENABLED, RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_MAX_LENGTH, RERANK_THREADS, RERANK_RETRY_SECONDS,
+)
+from app.core.metrics import RERANK_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+def _build_cross_encoder():
+    """Loads the local CPU cross-encoder, or returns None when reranking is disabled."""
+    if not RERANK_ENABLED:
+        return None
+    # Imported lazily: sentence-transformers pulls in torch, which takes seconds to import
+    import torch
+    from sentence_transformers import CrossEncoder
+    if RERANK_THREADS:
+        torch.set_num_threads(RERANK_THREADS)
+    logger.info("Loading cross-encoder for reranking: %s", RERANK_MODEL)
+    return CrossEncoder(RERANK_MODEL, max_length=RERANK_MAX_LENGTH, device="cpu")
+
+# Optional: retrieval falls back to plain top-k when the reranker is disabled or fails to load
+reranker_component = register_component("reranker", _build_cross_encoder, required=False)
+# Monotonic time before which queries don't retry a failed load (a warm-up still does)
+_retry_after = 0.0
+
+
+def get_reranker():
+    """Returns the cross-encoder, or None if reranking is disabled or its load failed recently."""
+    global _retry_after
+    if reranker_component.status == STATUS_FAILED and time.monotonic() < _retry_after:
+        return None
+    try:
+        return reranker_component.get()
+    except Exception:
+        # Logged by the component. A load takes seconds: don't repeat it on every query
+        _retry_after = time.monotonic() + RERANK_RETRY_SECONDS
+        return None
+
+
+def rerank(query: str, docs: List, top_n: int, model=None) -> List:
+    """
+    Scores (query, chunk) pairs with the cross-encoder in batches and returns the best
+    top_n documents, best first. Each kept document gets its score in metadata["rerank_score"].
+    """
+    model = model or get_reranker()
+    if model is None or len(docs) <= 1:
+        return docs[:top_n]
+    with RERANK_LATENCY.time():
+        scores = model.predict(
+            [(query, doc.page_content) for doc in docs],
+            batch_size=RERANK_BATCH_SIZE,
+            show_progress_bar=False,
+        )
+    ranked = sorted(zip(scores, docs), key=lambda pair: float(pair[0]), reverse=True)[:top_n]
+    for score, doc in ranked:
+        doc.metadata["rerank_score"] = float(score)
+    return [doc for _, doc in ranked]
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.config import ALLOWED_TENANTS, DEFAULT_TENANT, VECTOR_NAMESPACE_PER_TENANT
+from app.services.document_attributes import normalize_attributes, parse_date
+
+class TenantNotAllowedError(ValueError):
+    """Raised for a tenant this service does not serve."""
+
+
+_current_tenant: ContextVar[str] = ContextVar("retrieval_tenant", default=DEFAULT_TENANT)
+
+
+@contextmanager
+def tenant_scope(tenant: Optional[str]):
+    """Restricts every knowledge-base retrieval made inside the block (including tools) to a tenant."""
+    token = _current_tenant.set(tenant or DEFAULT_TENANT)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def current_tenant() -> str:
+    return _current_tenant.get()
+
+
+def resolve_tenant(tenant: Optional[str]) -> str:
+    """
+    Normalized tenant a request may search (DEFAULT_TENANT if not given). The tenant is taken from the
+    request body, so only DEFAULT_TENANT and ALLOWED_TENANTS are accepted; others raise TenantNotAllowedError.
+    """
+    if not tenant:
+        return DEFAULT_TENANT
+    normalized = normalize_attributes({"tenant": tenant}).get("tenant")
+    allowed = {DEFAULT_TENANT} | {normalize_attributes({"tenant": name})["tenant"] for name in ALLOWED_TENANTS}
+    if normalized not in allowed:
+        raise TenantNotAllowedError(f"Tenant {tenant!r} is not allowed.")
+    return normalized
+
+
+def namespace_for(tenant: str) -> str:
+    """
+    Index namespace holding a tenant's chunks. The default tenant (and every tenant unless
+    VECTOR_NAMESPACE_PER_TENANT) uses the default namespace, where the existing vectors are.
+    """
+    return tenant if VECTOR_NAMESPACE_PER_TENANT and tenant != DEFAULT_TENANT else ""
+
+
+def build_filter(tenant: Optional[str] = None, product_line: Optional[str] = None, document_type: Optional[str] = None,
+                 insurer: Optional[str] = None, effective_on: Optional[str] = None) -> Optional[dict]:
+    """
+    Metadata filter (Pinecone syntax) for the given attributes, normalized like they are at ingestion.
+    `effective_on` (YYYY-MM-DD) keeps the chunks in effect on that date: in a version that took effect on
+    or before it and not superseded by a newer version by then. With per-tenant namespaces the tenant is
+    implied by the namespace and not filtered on. Only $eq and range operators are used, so vectors
+    indexed before `tenant` and `superseded_on` were recorded need app.ai.metadata_backfill to match.
+    """
+    attributes = normalize_attributes({
+        "tenant": None if VECTOR_NAMESPACE_PER_TENANT else tenant,
+        "product_line": product_line, "document_type": document_type, "insurer": insurer,
+    })
+    clauses = [{field: {"$eq": value}} for field, value in attributes.items()]
+    if effective_on:
+        date = parse_date(effective_on)
+        clauses.append({"effective_date": {"$lte": date}})
+        clauses.append({"superseded_on": {"$gt": date}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,126 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable, List, Optional
+
+from app.core.config import (
+    SPECULATIVE_RETRIEVAL, SPECULATIVE_RETRIEVAL_MIN_SIMILARITY, SPECULATIVE_RETRIEVAL_CLAIM_TIMEOUT_SECONDS,
+)
+from app.core.metrics import SPECULATIVE_RETRIEVALS, SPECULATIVE_RETRIEVAL_WASTED_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Outcomes reported by the speculative_retrieval_total metric
+OUTCOME_USED = "used"            # The tool was served from the prefetch
+OUTCOME_MISMATCH = "mismatch"    # The tool asked for a different query; the prefetch was discarded
+OUTCOME_UNUSED = "unused"        # The turn ended without the RAG tool being called
+OUTCOME_FAILED = "failed"        # The prefetch raised; the tool retrieved normally
+OUTCOME_TIMEOUT = "timeout"      # The prefetch was still running at the claim timeout; the tool retrieved normally
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculative-retrieval")
+_current: ContextVar[Optional["SpeculativeRetrieval"]] = ContextVar("speculative_retrieval", default=None)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def query_similarity(a: str, b: str) -> float:
+    """
+    Overlap coefficient of the lowercased word sets of two queries. Unlike Jaccard it
+    doesn't penalise the model for condensing the user's sentence into a few keywords.
+    """
+    tokens_a, tokens_b = set(_TOKEN_RE.findall(a.lower())), set(_TOKEN_RE.findall(b.lower()))
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / min(len(tokens_a), len(tokens_b))
+
+
+class SpeculativeRetrieval:
+    """A retrieval started for the user's message before the model has decided to call the RAG tool."""
+
+    def __init__(self, query: str, retrieve: Callable[[str], List]):
+        self.query = query
+        self.claimed = False
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.seconds: Optional[float] = None
+        # copy_context keeps the caller's scheduler priority for the embedding call
+        self.future: Future = _pool.submit(copy_context().run, self._run, retrieve)
+
+    def _run(self, retrieve: Callable[[str], List]) -> List:
+        try:
+            return retrieve(self.query)
+        finally:
+            self.seconds = time.perf_counter() - self._started
+
+    def claim(self, query: str, timeout: Optional[float] = None) -> Optional[List]:
+        """
+        Returns the prefetched documents if `query` is close enough to the speculated one, else None.
+        Waits at most `timeout` (SPECULATIVE_RETRIEVAL_CLAIM_TIMEOUT_SECONDS by default) for the prefetch.
+        """
+        with self._lock:
+            if self.claimed:
+                return None  # Served once per turn; later calls retrieve normally
+            self.claimed = True
+        similarity = query_similarity(self.query, query)
+        if similarity < SPECULATIVE_RETRIEVAL_MIN_SIMILARITY:
+            logger.info("Speculative retrieval discarded (similarity %.2f): '%s' vs '%s'", similarity, self.query, query)
+            self._discard(OUTCOME_MISMATCH)
+            return None
+        timeout = SPECULATIVE_RETRIEVAL_CLAIM_TIMEOUT_SECONDS if timeout is None else timeout
+        try:
+            docs = self.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning("Speculative retrieval still running after %.1fs, retrieving normally", timeout)
+            self._discard(OUTCOME_TIMEOUT)
+            return None
+        except Exception as e:
+            logger.warning("Speculative retrieval failed, retrieving normally: %s", e)
+            SPECULATIVE_RETRIEVALS.labels(OUTCOME_FAILED).inc()
+            return None
+        SPECULATIVE_RETRIEVALS.labels(OUTCOME_USED).inc()
+        return docs
+
+    def close(self) -> None:
+        """Called when the turn ends; a prefetch nobody claimed is counted as waste."""
+        with self._lock:
+            if self.claimed:
+                return
+            self.claimed = True
+        self._discard(OUTCOME_UNUSED)
+
+    def _discard(self, outcome: str) -> None:
+        SPECULATIVE_RETRIEVALS.labels(outcome).inc()
+        if self.future.cancel():
+            return  # Never started: nothing was wasted
+        # Count the work once it finishes (it may still be running)
+        self.future.add_done_callback(lambda _: SPECULATIVE_RETRIEVAL_WASTED_SECONDS.inc(self.seconds or 0.0))
+
+
+@contextmanager
+def speculative_retrieval(query: str, retrieve: Callable[[str], List]):
+    """
+    Starts retrieving for `query` in the background for the duration of an agent turn.
+    Tools called inside the block can take the result with claim_speculative_retrieval().
+    """
+    if not SPECULATIVE_RETRIEVAL or not query:
+        yield None
+        return
+    speculation = SpeculativeRetrieval(query, retrieve)
+    token = _current.set(speculation)
+    try:
+        yield speculation
+    finally:
+        _current.reset(token)
+        speculation.close()
+
+
+def claim_speculative_retrieval(query: str, timeout: Optional[float] = None) -> Optional[List]:
+    """Prefetched documents for this turn if they match `query`, otherwise None."""
+    speculation = _current.get()
+    if speculation is None:
+        return None
+    return speculation.claim(query, timeout=timeout)
@@ -0,0 +1,85 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextvars import copy_context
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import BaseTool
+
+from app.core.config import TOOL_DEFAULT_TIMEOUT_SECONDS, TOOL_TIMEOUTS, TOOL_MAX_WORKERS
+from app.core.metrics import TOOL_LATENCY
+from app.core.resilience import DependencyUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Shared by every agent turn. A timed-out tool keeps its thread until it returns
+# (threads can't be killed), so the pool is sized to absorb a few stragglers.
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="agent-tool")
+
+
+class ConcurrentToolExecutor:
+    """
+    Runs every tool call of one AI message concurrently, each with its own timeout.
+    A call that times out or raises gets a fallback ToolMessage (status "error") so the
+    model can still answer with what the other tools returned.
+    """
+
+    def __init__(self, tools: List[BaseTool], timeouts: Optional[Dict[str, float]] = None,
+                 default_timeout: float = TOOL_DEFAULT_TIMEOUT_SECONDS):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.timeouts = dict(TOOL_TIMEOUTS if timeouts is None else timeouts)
+        self.default_timeout = default_timeout
+
+    def run(self, message: AIMessage, config=None, deadline: Optional[float] = None) -> List[ToolMessage]:
+        """Executes message.tool_calls; `deadline` (time.time()) caps every call's timeout."""
+        calls = message.tool_calls
+        started = time.perf_counter()
+        # copy_context keeps contextvars (scheduler priority, etc.) in the worker threads
+        futures = [_tool_pool.submit(copy_context().run, self._invoke, call, config) for call in calls]
+
+        results = []
+        for call, future in zip(calls, futures):
+            timeout = self.timeouts.get(call["name"], self.default_timeout)
+            # The turn's deadline is absolute: it may already have passed when a later call is awaited
+            turn_left = deadline - time.time() if deadline is not None else timeout
+            cut_by_deadline = turn_left < timeout
+            timeout = max(0.0, min(timeout, turn_left))
+            remaining = max(0.0, timeout - (time.perf_counter() - started))
+            try:
+                results.append(future.result(timeout=remaining))
+            except FutureTimeoutError:
+                future.cancel()
+                TOOL_LATENCY.labels(call["name"], "timeout").observe(time.perf_counter() - started)
+                if cut_by_deadline:
+                    logger.warning("Tool '%s' cut off by the turn deadline", call["name"])
+                    reason = f"Tool '{call['name']}' did not respond before this turn's time budget ran out. "
+                else:
+                    logger.warning("Tool '%s' timed out after %.1fs", call["name"], timeout)
+                    reason = f"Tool '{call['name']}' did not respond within {timeout:.0f}s. "
+                results.append(_fallback(call, reason + "Answer with the information available from other sources."))
+            except DependencyUnavailable as e:
+                # Open circuit or adaptive timeout: expected while a dependency is down, no traceback
+                logger.warning("Tool '%s' skipped: %s", call["name"], e)
+                results.append(_fallback(call, f"Tool '{call['name']}' is temporarily unavailable. "
+                                               "Answer with the information available from other sources."))
+            except Exception as e:
+                logger.error("Tool '%s' failed: %s", call["name"], e, exc_info=True)
+                results.append(_fallback(call, f"Tool '{call['name']}' failed: {e}"))
+        return results
+
+    def _invoke(self, call: dict, config) -> ToolMessage:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return _fallback(call, f"Tool '{call['name']}' is not available. Available tools: {', '.join(self.tools_by_name)}.")
+        # Invoking with the ToolCall dict returns a ToolMessage bound to the call id
+        return tool.invoke({**call, "type": "tool_call"}, config)
+
+
+def _fallback(call: dict, text: str) -> ToolMessage:
+    return ToolMessage(content=text, tool_call_id=call["id"], name=call["name"], status="error")
+
+
+def skipped_tool_messages(message: AIMessage, reason: str) -> List[ToolMessage]:
+    """Answers pending tool calls without running them (the API requires a result for every call id)."""
+    return [_fallback(call, f"Tool '{call['name']}' was not run: {reason}.") for call in message.tool_calls]
@@ -1,30 +1,34 @@
 import logging
 from .rag_tool import policy_rag_tool
-from .web_search import tavily_tool
+from .web_search import get_web_search_tool
 from .specific_doc_qa import specific_document_qa_tool
 
 logger = logging.getLogger(__name__)
 
-# Build the list of tools, filtering out any that failed to initialize
-tools = [] # Start with an empty list
+def get_tools() -> list:
+    """Builds the list of tools, filtering out any that failed to initialize."""
+    web_search_tool = get_web_search_tool()
 
-# Add tools if they are available
-if policy_rag_tool:
-    tools.append(policy_rag_tool)
-if specific_document_qa_tool:
-    tools.append(specific_document_qa_tool)
-if tavily_tool:
-    tools.append(tavily_tool)
+    tools = [] # Start with an empty list
 
-if tools:
-    logger.info(f"Available tools: {[tool.name for tool in tools]}")
-else:
-    logger.warning("No tools are available. All tool initializations might have failed or they are not defined.")
+    # Add tools if they are available
+    if policy_rag_tool:
+        tools.append(policy_rag_tool)
+    if specific_document_qa_tool:
+        tools.append(specific_document_qa_tool)
+    if web_search_tool:
+        tools.append(web_search_tool)
 
-# Fallback message if some tools are missing, for more granular logging
-if not policy_rag_tool:
-    logger.warning("General RAG tool (policy_rag_tool) is not available.")
-if not specific_document_qa_tool:
-    logger.warning("Specific Document QA tool (specific_document_qa_tool) is not available.")
-if not tavily_tool:
-    logger.warning("Tavily Search tool (web_search_tool) is not available.") 
\ No newline at end of file
+    if tools:
+        logger.info("Available tools: %s", [tool.name for tool in tools])
+    else:
+        logger.warning("No tools are available. All tool initializations might have failed or they are not defined.")
+
+    # Fallback message if some tools are missing, for more granular logging
+    if not policy_rag_tool:
+        logger.warning("General RAG tool (policy_rag_tool) is not available.")
+    if not specific_document_qa_tool:
+        logger.warning("Specific Document QA tool (specific_document_qa_tool) is not available.")
+    if not web_search_tool:
+        logger.warning("Web search tool (web_search_tool) is not available.")
+    return tools
@@ -1,12 +1,21 @@
 import logging
+from typing import Optional
 from langchain_core.tools import tool
-from langchain_core.runnables import RunnableLambda
 
 # Correct relative import assuming vector_store.py is in the parent directory 'ai'
-from ..vector_store import get_vector_store
+from ..vector_store import get_embedding_model, query_chunks, EMBEDDING_MODEL_NAME
+from ..speculative_retrieval import claim_speculative_retrieval
+from ..reranker import get_reranker, rerank
+from ..context_compaction import compact_documents
+from ..retrieval_filters import build_filter, current_tenant, namespace_for
+from app.core.config import RERANK_CANDIDATES, CONTEXT_COMPACTION
+from app.core.metrics import EMBEDDING_LATENCY
+from app.core.resilience import DependencyUnavailable
 
 logger = logging.getLogger(__name__)
 
+RAG_TOP_K = 3 # Reduced K for tool context
+
 def format_docs(docs):
     """Formats list of documents into a single string."""
     return "\n\n".join(doc.page_content for doc in docs)
@@ -14,34 +23,62 @@ def format_docs(docs):
 def log_retrieved_docs(docs):
     """Logs retrieved documents (simplified for tool context)."""
     if docs:
-        logger.info(f"Retrieved {len(docs)} documents for RAG tool.")
+        logger.info("Retrieved %d documents for RAG tool.", len(docs))
     else:
         logger.info("No documents retrieved for RAG tool.")
     return docs
 
+def retrieve_policy_docs(query: str, k: int = RAG_TOP_K, **filters) -> list:
+    """
+    Embeds the query and returns the top-k chunks from the current tenant's knowledge base, restricted
+    by `filters` (product_line, document_type, insurer, effective_on; see build_filter) in the index.
+    With reranking enabled, RERANK_CANDIDATES chunks are fetched and the cross-encoder keeps the best k.
+    """
+    tenant = current_tenant()
+    reranker = get_reranker()
+    fetch_k = max(k, RERANK_CANDIDATES) if reranker is not None else k
+    # Embedding and index query are timed separately so Pinecone latency is visible on its own
+    with EMBEDDING_LATENCY.labels(EMBEDDING_MODEL_NAME).time():
+        query_embedding = get_embedding_model().embed_query(query)
+    docs = query_chunks(query_embedding, k=fetch_k, filter=build_filter(tenant=tenant, **filters), namespace=namespace_for(tenant))
+    if reranker is not None:
+        docs = rerank(query, docs, top_n=k, model=reranker)
+    return docs
+
 @tool
-def policy_rag_tool(query: str) -> str:
+def policy_rag_tool(query: str, product_line: Optional[str] = None, document_type: Optional[str] = None,
+                    insurer: Optional[str] = None, effective_on: Optional[str] = None) -> str:
     """
     Searches and answers questions about insurance policies using the general internal knowledge base (e.g., Pinecone).
     This tool should NOT be used if a specific document_url is available for context.
     If a specific document_url is provided elsewhere in the conversation, use the 'specific_document_qa_tool' instead.
+    Only set the optional filters when the user's question clearly restricts the search:
+    product_line: hogar, autos, vida, salud, comercio or responsabilidad_civil.
+    document_type: condiciones_generales, condiciones_particulares, condiciones_especiales or nota_informativa.
+    insurer: the insurer's name. effective_on: YYYY-MM-DD, for the wordings in effect on that date.
     """
-    logger.info(f"Executing GENERAL RAG tool for query: '{query}'")
+    filters = {name: value for name, value in (("product_line", product_line), ("document_type", document_type),
+                                               ("insurer", insurer), ("effective_on", effective_on)) if value}
+    logger.info("Executing GENERAL RAG tool for query: '%s' (filters: %s)", query, filters or "none")
     try:
-        vector_store = get_vector_store()
-        retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={'k': 3}) # Reduced K for tool context
-
-        # Simplified RAG chain for tool - Agent LLM will handle final answer synthesis
-        rag_chain_for_tool = (
-            retriever
-            | RunnableLambda(log_retrieved_docs)
-            | format_docs
-        )
-        context = rag_chain_for_tool.invoke(query)
+        # Reuse the retrieval started alongside the routing call when the queries match (it is unfiltered)
+        docs = claim_speculative_retrieval(query) if not filters else None
+        if docs is None:
+            docs = retrieve_policy_docs(query, **filters)
+
+        docs = log_retrieved_docs(docs)
+        if CONTEXT_COMPACTION:
+            # Merge neighbouring chunks, drop overlap/duplicates and cap the context size
+            docs = compact_documents(docs)
+        # Agent LLM will handle final answer synthesis
+        context = format_docs(docs)
         if not context:
             return "No relevant policy information found in the internal knowledge base."
         # Return context for the agent to synthesize the answer
         return f"Retrieved context:\n{context}"
+    except DependencyUnavailable as e:
+        logger.warning("RAG tool skipped: %s", e)
+        return "The internal knowledge base is temporarily unavailable. Tell the user and answer only with what is known."
     except Exception as e:
-        logger.error(f"Error in RAG tool: {e}", exc_info=True)
+        logger.error("Error in RAG tool: %s", e, exc_info=True)
         return "Error executing the policy RAG tool." 
\ No newline at end of file
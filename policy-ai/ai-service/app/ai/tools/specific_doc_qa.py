@@ -1,6 +1,7 @@
 import logging
 from langchain_core.tools import tool
 from app.utils.pdf_processor import download_pdf_content, extract_text_from_pdf # Adjusted import path
+from app.core.logging_config import Truncated
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +15,13 @@ def specific_document_qa_tool(query: str, document_url: str) -> str:
         query (str): The user's question about the document.
         document_url (str): The URL of the document to query.
     """
-    logger.info(f"Executing SPECIFIC DOCUMENT QA tool for query: '{query}'. Document URL: {document_url}")
+    logger.info("Executing SPECIFIC DOCUMENT QA tool for query: '%s'. Document URL: %s", query, document_url)
 
     if not document_url:
         logger.error("specific_document_qa_tool called without a document_url, though it is a required parameter.")
         return "Error: This tool requires a document_url, but none was provided effectively by the agent."
 
-    logger.info(f"Processing specific document from URL: {document_url}")
+    logger.info("Processing specific document from URL: %s", document_url)
     pdf_bytes = download_pdf_content(document_url)
     if not pdf_bytes:
         return "Failed to download the specified document. Please check the URL or network."
@@ -30,7 +31,7 @@ def specific_document_qa_tool(query: str, document_url: str) -> str:
         return "Failed to extract text from the specified document. It might be empty, corrupted, or a non-text PDF."
 
     context_snippet = text_content[:12000]
-    logger.info(f"Extracted text snippet for SPECIFIC DOCUMENT QA tool (first 200 chars): {context_snippet[:200]}...")
+    logger.info("Extracted text snippet for SPECIFIC DOCUMENT QA tool (first 200 chars): %s", Truncated(context_snippet, 200))
     
     # The tool returns context. The agent LLM will use this to synthesize the final answer.
     return f"Context from the uploaded document ({document_url}):\\n\\n{context_snippet}" 
\ No newline at end of file
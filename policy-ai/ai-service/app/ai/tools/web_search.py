@@ -1,20 +1,131 @@
+import json
 import logging
-from langchain_community.tools.tavily_search import TavilySearchResults
 import os
+import re
+from typing import List, Optional
+
+from langchain_core.tools import StructuredTool
+
+from app.core.components import register_component
+from app.core.config import (
+    WEB_SEARCH_BACKEND, WEB_SEARCH_FIXTURES_PATH, WEB_SEARCH_MAX_RESULTS,
+    WEB_SEARCH_CACHE_TTL_SECONDS, WEB_SEARCH_CACHE_MAX_ENTRIES,
+)
+from app.core.resilience import TAVILY, get_dependency
+from app.utils.cache import TTLCache, normalize_query
 
 logger = logging.getLogger(__name__)
 
-# Requires TAVILY_API_KEY environment variable
-# Ensure tavily-python is installed: pip install tavily-python
-tavily_tool = None
-try:
-    if os.getenv("TAVILY_API_KEY"):
-        tavily_tool = TavilySearchResults(max_results=3)
-        tavily_tool.name = "web_search_tool"
-        tavily_tool.description = "Searches the web for information. Use this for general knowledge questions, current events, or regulations not covered by internal documents or a specific provided policy document."
-        logger.info("Tavily Search tool initialized successfully.")
-    else:
+WEB_SEARCH_DESCRIPTION = "Searches the web for information. Use this for general knowledge questions, current events, or regulations not covered by internal documents or a specific provided policy document."
+
+_TOKEN_RE = re.compile(r"\w+")
+_UNAVAILABLE = "Web search is temporarily unavailable; answer from the internal documents or say so."
+
+
+class TavilySearchBackend:
+    """Live web search through Tavily."""
+    name = "tavily"
+
+    def __init__(self, max_results: int):
+        # Imported lazily: langchain_community is slow to import
+        from langchain_community.tools.tavily_search import TavilySearchResults
+        self._tool = TavilySearchResults(max_results=max_results)
+
+    def search(self, query: str):
+        # Hedged, timed out and circuit-broken; while Tavily is down the agent is told so (not cached)
+        return get_dependency(TAVILY).call(lambda: self._tool.invoke({"query": query}), fallback=lambda: _UNAVAILABLE)
+
+
+class LocalSearchBackend:
+    """
+    Offline stand-in backed by a JSON fixture ([{"url", "title", "content"}, ...]).
+    Results are ranked by word overlap with the query, so the agent graph can be
+    tested and benchmarked without network access.
+    """
+    name = "local"
+
+    def __init__(self, fixtures_path: str, max_results: int):
+        with open(fixtures_path, encoding="utf-8") as f:
+            self.documents = json.load(f)
+        self.max_results = max_results
+        self._tokens = [set(_TOKEN_RE.findall(f"{d.get('title', '')} {d['content']}".lower())) for d in self.documents]
+
+    def search(self, query: str) -> List[dict]:
+        query_tokens = set(_TOKEN_RE.findall(query.lower()))
+        scored = [(len(query_tokens & tokens), i) for i, tokens in enumerate(self._tokens)]
+        ranked = sorted((item for item in scored if item[0] > 0), reverse=True)[:self.max_results]
+        return [{"url": self.documents[i]["url"], "content": self.documents[i]["content"]} for _, i in ranked]
+
+
+class CachedWebSearch:
+    """Search backend wrapper with a TTL cache keyed by the normalized query."""
+
+    def __init__(self, backend, cache: TTLCache):
+        self.backend = backend
+        self.cache = cache
+
+    def search(self, query: str):
+        key = normalize_query(query)
+        results = self.cache.get(key)
+        if results is not None:
+            logger.info("Web search cache hit for query: '%s'", query)
+            return results
+        results = self.backend.search(query)
+        # Tavily reports failures as a string; only real result lists are cached
+        if isinstance(results, list):
+            self.cache.set(key, results)
+        return results
+
+
+def _build_backend():
+    if WEB_SEARCH_BACKEND == "local":
+        logger.info("Using local web search fixtures: %s", WEB_SEARCH_FIXTURES_PATH)
+        return LocalSearchBackend(WEB_SEARCH_FIXTURES_PATH, WEB_SEARCH_MAX_RESULTS)
+    # Requires TAVILY_API_KEY environment variable
+    # Ensure tavily-python is installed: pip install tavily-python
+    if not os.getenv("TAVILY_API_KEY"):
         logger.warning("TAVILY_API_KEY not found in environment. Tavily Search tool is disabled.")
-except Exception as e:
-    logger.error(f"Failed to initialize Tavily Search tool: {e}", exc_info=True)
-    tavily_tool = None # Ensure it's None if initialization fails 
\ No newline at end of file
+        return None
+    return TavilySearchBackend(WEB_SEARCH_MAX_RESULTS)
+
+
+def build_web_search_tool(backend, cache: Optional[TTLCache] = None) -> StructuredTool:
+    """Wraps a search backend as the agent's web_search_tool."""
+    cached_search = CachedWebSearch(
+        backend, cache or TTLCache("web_search", WEB_SEARCH_CACHE_TTL_SECONDS, WEB_SEARCH_CACHE_MAX_ENTRIES)
+    )
+
+    def web_search_tool(query: str) -> str:
+        results = cached_search.search(query)
+        return json.dumps(results, ensure_ascii=False) if isinstance(results, list) else str(results)
+
+    return StructuredTool.from_function(web_search_tool, name="web_search_tool", description=WEB_SEARCH_DESCRIPTION)
+
+
+def _build_web_search_tool():
+    """
+    Initializes the web search tool, or returns None if it is not configured. A misconfigured local
+    backend raises, so the component reports the failure instead of the tool silently disappearing.
+    """
+    if WEB_SEARCH_BACKEND == "local" and not os.path.isfile(WEB_SEARCH_FIXTURES_PATH):
+        raise FileNotFoundError(
+            f"WEB_SEARCH_BACKEND=local but the fixtures file {WEB_SEARCH_FIXTURES_PATH} does not exist "
+            "(set WEB_SEARCH_FIXTURES_PATH)"
+        )
+    try:
+        backend = _build_backend()
+        if backend is None:
+            return None
+        tool = build_web_search_tool(backend)
+        logger.info("Web search tool initialized successfully (%s backend).", backend.name)
+        return tool
+    except Exception as e:
+        logger.error("Failed to initialize web search tool: %s", e, exc_info=True)
+        return None # Treated as disabled if initialization fails
+
+# Optional dependency: the agent works without web search
+web_search_component = register_component("web_search", _build_web_search_tool, required=False)
+
+def get_web_search_tool():
+    """Returns the web search tool, or None if it is disabled."""
+    return web_search_component.get()
@@ -1,14 +1,27 @@
 import os
-from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import Pinecone as LangchainPinecone
-# Importa la clase de embeddings correcta
-from langchain_openai import OpenAIEmbeddings # Ya no la usamos por defecto
+import hashlib
+import logging
+from typing import Optional
+# pinecone, langchain_pinecone and langchain_openai are imported inside the factories below:
+# they account for a large share of the service's import time and are only needed once used.
 # from langchain_community.embeddings import HuggingFaceEmbeddings # Ejemplo
 # from langchain_community.embeddings import OllamaEmbeddings # Si usas Ollama
 from dotenv import load_dotenv
 
+from langchain_core.documents import Document
+
+from app.core.components import register_component
+from app.core.config import CHUNK_STORE_ENABLED, PINECONE_METADATA_FIELDS, VECTOR_INDEX_BACKEND
+from app.core.metrics import VECTOR_QUERY_LATENCY
+from app.ai.llm_scheduler import llm_scheduler, ScheduledEmbeddings
+from app.core.resilience import PINECONE, get_dependency
+from app.ai.chunk_store import get_chunk_store
+from app.ai.local_index import LocalVectorIndex
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT") # Lee el environment de .env
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
@@ -19,6 +32,12 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") # Asegúrate que esta línea existe
 # Ejemplo: "sentence-transformers/all-mpnet-base-v2" (¡ESTE NO ES!, es solo un ejemplo de formato)
 # Ejemplo: "intfloat/multilingual-e5-large" (Otro ejemplo, verifica dimensiones)
 # EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2" # <-- YA NO SE USA DIRECTAMENTE
+EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+
+# Metadata key the Langchain vector store (and vectors ingested before the chunk store) keep the text under
+TEXT_KEY = "text"
+# Pinecone recommends upserting at most ~100 vectors per request
+UPSERT_BATCH_SIZE = 100
 
 pinecone_client = None
 pinecone_index = None
@@ -29,6 +48,7 @@ def get_pinecone_client():
     if pinecone_client is None:
         if not PINECONE_API_KEY or not PINECONE_ENVIRONMENT:
             raise ValueError("PINECONE_API_KEY or PINECONE_ENVIRONMENT not found in environment variables.")
+        from pinecone import Pinecone
         pinecone_client = Pinecone(api_key=PINECONE_API_KEY)
         # Código opcional de creación de índice actualizado (Dimension 1024, Serverless AWS us-east-1)
         # if PINECONE_INDEX_NAME not in pinecone_client.list_indexes().names:
@@ -54,18 +74,20 @@ def get_pinecone_index():
         pinecone_index = client.Index(PINECONE_INDEX_NAME)
     return pinecone_index
 
-def get_embedding_model():
-    """Initializes and returns the specified embedding model."""
+def _build_embedding_model():
+    """Initializes the specified embedding model."""
     # Verifica que la API key esté presente
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY not found in environment variables.")
+    from langchain_openai import OpenAIEmbeddings
 
     # Usa OpenAIEmbeddings
     # Puedes especificar el modelo si no quieres el default, ej: model="text-embedding-ada-002"
-    print("Loading OpenAI embedding model: text-embedding-3-small")
+    print(f"Loading OpenAI embedding model: {EMBEDDING_MODEL_NAME}")
     embeddings = OpenAIEmbeddings(
         openai_api_key=OPENAI_API_KEY,
-        model="text-embedding-3-small" # Especifica el modelo
+        model=EMBEDDING_MODEL_NAME, # Especifica el modelo
+        max_retries=0, # Retries and rate limits are handled by the LLM scheduler
     )
 
     # Ejemplo con HuggingFaceEmbeddings
@@ -81,28 +103,151 @@ def get_embedding_model():
     # ollama_base_url = os.getenv("OLLAMA_BASE_URL") # Leer la URL base de .env
     # embeddings = OllamaEmbeddings(model="llama-text-embed-v2", base_url=ollama_base_url) # Ajusta el nombre del modelo si es necesario
 
-    return embeddings
+    # Every embedding call (queries and ingestion) goes through the shared rate-limit scheduler
+    return ScheduledEmbeddings(embeddings, llm_scheduler)
 
-def get_vector_store():
-    """Initializes and returns the Langchain Pinecone vector store."""
+def _build_vector_store():
+    """Initializes the Langchain Pinecone vector store."""
+    from langchain_pinecone import Pinecone as LangchainPinecone
     index = get_pinecone_index()
     embeddings = get_embedding_model()
-    vector_store = LangchainPinecone(index=index, embedding=embeddings, text_key="text")
+    vector_store = LangchainPinecone(index=index, embedding=embeddings, text_key=TEXT_KEY)
     return vector_store
 
-def add_documents_to_pinecone(docs):
-    """Adds Langchain Document objects to the Pinecone index."""
+def _build_local_index():
+    return LocalVectorIndex() if VECTOR_INDEX_BACKEND == "local" else None
+
+# Built once on first use (or during warm-up) instead of on every tool call
+embedding_model_component = register_component("embeddings", _build_embedding_model)
+vector_store_component = register_component("vector_store", _build_vector_store)
+local_index_component = register_component("local_vector_index", _build_local_index, required=False)
+
+def get_vector_index():
+    """Returns the raw vector index: the Pinecone index, or the in-process one with VECTOR_INDEX_BACKEND=local."""
+    if VECTOR_INDEX_BACKEND == "local":
+        return local_index_component.get()
+    return get_pinecone_index()
+
+def _uses_chunk_store() -> bool:
+    # Local vectors never carry text, so the local backend always reads it from the chunk store
+    return CHUNK_STORE_ENABLED or VECTOR_INDEX_BACKEND == "local"
+
+def get_embedding_model():
+    """Returns the shared embedding model."""
+    return embedding_model_component.get()
+
+def get_vector_store():
+    """Returns the shared Langchain Pinecone vector store."""
+    return vector_store_component.get()
+
+def make_chunk_id(source: str, chunk_index: int) -> str:
+    """Deterministic vector id for a chunk, so re-ingesting a file overwrites instead of duplicating."""
+    return hashlib.sha1(f"{source}#{chunk_index}".encode("utf-8")).hexdigest()
+
+def add_documents_to_pinecone(docs, ids=None, namespace: str = "") -> bool:
+    """Adds Langchain Document objects to the Pinecone index (in `namespace`). Returns True on success."""
     if not docs:
         print("No documents provided to add.")
-        return
+        return False
 
-    vector_store = get_vector_store()
     try:
-        print(f"Adding {len(docs)} documents/chunks to Pinecone index '{PINECONE_INDEX_NAME}'...")
-        vector_store.add_documents(docs)
+        target = f"Pinecone index '{PINECONE_INDEX_NAME}'" if VECTOR_INDEX_BACKEND == "pinecone" else "the local vector index"
+        print(f"Adding {len(docs)} documents/chunks to {target}...")
+        if _uses_chunk_store():
+            _upsert_chunks(docs, ids, namespace)
+        else:
+            get_vector_store().add_documents(docs, ids=ids, namespace=namespace or None)
         print(f"Successfully added documents/chunks.")
+        return True
     except Exception as e:
-        print(f"Error adding documents to Pinecone: {e}")
+        print(f"Error adding documents to the vector index: {e}")
+        return False
+
+def index_metadata(metadata: dict) -> dict:
+    """The subset of a chunk's metadata kept on its vector (PINECONE_METADATA_FIELDS, no nulls)."""
+    return {key: value for key, value in metadata.items() if key in PINECONE_METADATA_FIELDS and value is not None}
+
+def _upsert_chunks(docs, ids=None, namespace: str = ""):
+    """Stores text and metadata locally, then upserts vectors that carry only ids and filterable fields."""
+    if ids is None:
+        ids = [make_chunk_id(doc.metadata.get("source", ""), doc.metadata.get("chunk_index", i)) for i, doc in enumerate(docs)]
+    # Text first: a vector must never be returned by a query before its text can be looked up
+    get_chunk_store().put_many(ids, docs)
+    embeddings = get_embedding_model().embed_documents([doc.page_content for doc in docs])
+    vectors = [
+        {"id": chunk_id, "values": values, "metadata": index_metadata(doc.metadata)}
+        for chunk_id, values, doc in zip(ids, embeddings, docs)
+    ]
+    index = get_vector_index()
+    for start in range(0, len(vectors), UPSERT_BATCH_SIZE):
+        index.upsert(vectors=vectors[start:start + UPSERT_BATCH_SIZE], namespace=namespace)
+
+def query_chunks(query_embedding, k: int, filter: Optional[dict] = None, namespace: str = "") -> list:
+    """
+    Returns the k chunks closest to the embedding among those matching the metadata filter (evaluated
+    by the index). The index returns ids and filterable metadata; the text is fetched from the chunk
+    store in one batched lookup.
+    """
+    if not _uses_chunk_store():
+        with VECTOR_QUERY_LATENCY.labels("pinecone").time():
+            return get_dependency(PINECONE).call(lambda: get_vector_store().similarity_search_by_vector(
+                query_embedding, k=k, filter=filter, namespace=namespace or None))
+
+    def query():
+        return get_vector_index().query(vector=query_embedding, top_k=k, include_metadata=True, include_values=False,
+                                        filter=filter, namespace=namespace)
+    with VECTOR_QUERY_LATENCY.labels(VECTOR_INDEX_BACKEND).time():
+        # Only the remote index needs the breaker, timeout and hedging; the local one is in-process
+        response = get_dependency(PINECONE).call(query) if VECTOR_INDEX_BACKEND == "pinecone" else query()
+    matches = response.matches or []
+    with VECTOR_QUERY_LATENCY.labels("chunk_store").time():
+        stored = get_chunk_store().get_many(match.id for match in matches)
+
+    docs = []
+    for match in matches:
+        doc = stored.get(match.id)
+        if doc is None:
+            # Vectors ingested before the chunk store still carry their text in metadata
+            metadata = dict(match.metadata or {})
+            text = metadata.pop(TEXT_KEY, None)
+            if text is None:
+                logger.warning("Chunk %s has no stored text; skipping it.", match.id)
+                continue
+            doc = Document(page_content=text, metadata=metadata)
+        docs.append(doc)
+    return docs
+
+def update_chunk_metadata(chunk_id: str, metadata: dict, namespace: str = "") -> None:
+    """Sets metadata fields on an indexed chunk without re-embedding it."""
+    if _uses_chunk_store():
+        get_chunk_store().update_metadata(chunk_id, metadata)
+        metadata = index_metadata(metadata)
+        if not metadata:
+            return
+    get_vector_index().update(id=chunk_id, set_metadata=metadata, namespace=namespace)
+
+def fetch_chunk_metadata(chunk_ids: list, namespace: str = "") -> dict:
+    """Metadata kept on the vectors of indexed chunks, by chunk id (missing ids are left out)."""
+    if not chunk_ids:
+        return {}
+    response = get_vector_index().fetch(ids=list(chunk_ids), namespace=namespace)
+    return {chunk_id: dict(vector.metadata or {}) for chunk_id, vector in response.vectors.items()}
+
+def find_chunks(filter: dict, namespace: str = "", limit: int = 1000) -> dict:
+    """
+    Metadata kept on the vectors of (up to `limit`) indexed chunks matching a metadata filter, by chunk id.
+    Queries with a constant vector: the index has no filter-only lookup, and the order does not matter here.
+    """
+    index = get_vector_index()
+    dimension = index.describe_index_stats()["dimension"]
+    if not dimension:
+        return {}
+    response = index.query(vector=[1.0] * dimension, top_k=limit, include_metadata=True, include_values=False,
+                           filter=filter, namespace=namespace)
+    matches = response.matches or []
+    if len(matches) == limit:
+        logger.warning("find_chunks hit its limit of %d chunks for %s", limit, filter)
+    return {match.id: dict(match.metadata or {}) for match in matches}
 
 # Puedes añadir aquí funciones para añadir documentos/vectores al índice
 # def add_documents_to_pinecone(docs):
@@ -1,16 +1,27 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File, Form, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import os
+import json
 import uuid
-from typing import Optional
+from typing import List, Optional
 import magic
 import logging
 from datetime import datetime
 
-from app.ai.rag_agent import get_agent_response, generate_policy_draft, edit_policy
+from app.ai.rag_agent import get_agent_response, generate_policy_draft, edit_policy, draft_policy_html, edit_policy_html
+from app.ai.retrieval_filters import resolve_tenant, tenant_scope, TenantNotAllowedError
 from app.schemas.internal_api import QueryRequest, QueryResponse, PolicyDraftRequest, PolicyDraftResponse, PolicyEditRequest, PolicyEditResponse
-from app.services.document_processor import process_s3_documents
+from app.schemas.internal_api import JobStartResponse, JobStatusResponse, JobFileStatus, BatchAnalysisRequest
+from app.services.document_processor import process_s3_documents, start_s3_ingestion_job
+from app.services.batch_analysis import analyze_documents
+from app.core.config import BATCH_ANALYSIS_CONCURRENCY, BATCH_ANALYSIS_MAX_DOCUMENTS
+from app.services.job_store import get_job_store, JobConflictError, JobNotFoundError
+from app.core.logging_config import Truncated
 from app.services.storage_service import upload_pdf_to_supabase
+from app.utils.cpu_pool import run_cpu_async
+from app.utils.pdf_processor import count_pdf_pages
+from app.utils.html_processor import html_diff_ops
 
 router = APIRouter()
 
@@ -20,6 +31,10 @@ logger = logging.getLogger(__name__)
 @router.post("/answer_query", response_model=QueryResponse)
 def answer_query(request: QueryRequest):
     """Receives a query and returns the RAG agent's answer."""
+    try:
+        tenant = resolve_tenant(request.tenant)
+    except TenantNotAllowedError as e:
+        raise HTTPException(status_code=403, detail=str(e))
     try:
         config = {}
         if request.thread_id:
@@ -37,20 +52,90 @@ def answer_query(request: QueryRequest):
         if request.document_url:
             config["document_context"] = {"url": request.document_url}
             
-        answer = get_agent_response(request.query, current_policy_text=request.current_policy_text, config=config)
+        # Knowledge-base retrievals made while answering only see the tenant's documents
+        with tenant_scope(tenant):
+            answer = get_agent_response(request.query, current_policy_text=request.current_policy_text, config=config)
         return QueryResponse(answer=answer)
     except Exception as e:
-        # Log the error e
-        print(f"Error processing query: {e}")
+        logger.error("Error processing query: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to process query using RAG agent.")
 
-@router.post("/load-documents-from-s3", status_code=202) # 202 Accepted
-async def load_s3_documents(background_tasks: BackgroundTasks):
-    """Triggers the background task to load and process documents from S3."""
-    print("Received request to load documents from S3. Starting background task.")
+@router.post("/analyze-policies")
+def analyze_policies(request: BatchAnalysisRequest):
+    """
+    Analyses a list of policy PDFs (PolicyAnalysisOutput for each) and streams the results as NDJSON:
+    one {"type": "result", "index": ..., "status": "ok"|"error", ...} line per document as soon as it
+    is ready, then a {"type": "summary", ...} line. A failed document does not fail the batch.
+    """
+    if not request.document_urls:
+        raise HTTPException(status_code=422, detail="document_urls must not be empty.")
+    if len(request.document_urls) > BATCH_ANALYSIS_MAX_DOCUMENTS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_ANALYSIS_MAX_DOCUMENTS} documents per request.")
+    concurrency = min(max(request.concurrency or BATCH_ANALYSIS_CONCURRENCY, 1), BATCH_ANALYSIS_CONCURRENCY)
+    logger.info("Received bulk analysis request for %d documents (concurrency %d).", len(request.document_urls), concurrency)
+
+    def lines():
+        for item in analyze_documents(request.document_urls, concurrency=concurrency):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    # A sync generator is iterated in the threadpool, so waiting for results never blocks the event loop
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/load-documents-from-s3", status_code=202, response_model=JobStartResponse) # 202 Accepted
+def load_s3_documents(background_tasks: BackgroundTasks):
+    """Creates an S3 ingestion job and runs it in the background. Only one job may be active at a time."""
+    logger.info("Received request to load documents from S3. Starting background task.")
+    try:
+        job = start_s3_ingestion_job()
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail=f"An S3 ingestion job is already active: {e.active_job_id}")
     # Ejecuta el proceso de carga en segundo plano
-    background_tasks.add_task(process_s3_documents)
-    return {"message": "Document processing from S3 started in the background."}
+    background_tasks.add_task(process_s3_documents, job["id"])
+    return JobStartResponse(
+        message="Document processing from S3 started in the background.",
+        job_id=job["id"],
+        status=job["status"],
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job_status(job_id: str):
+    """Returns the job status, per-state file counts and throughput (files/sec, chunks/sec)."""
+    try:
+        return get_job_store().progress(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+
+@router.get("/jobs/{job_id}/files", response_model=List[JobFileStatus])
+def get_job_files(job_id: str, state: Optional[str] = None):
+    """Lists the per-file state of a job, optionally filtered by state (e.g. 'failed')."""
+    try:
+        return get_job_store().list_files(job_id, state=state)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+
+@router.post("/jobs/{job_id}/cancel", status_code=202, response_model=JobStatusResponse)
+def cancel_job(job_id: str):
+    """Requests cancellation; the worker stops before starting its next file."""
+    store = get_job_store()
+    try:
+        store.request_cancel(job_id)
+        return store.progress(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+
+@router.post("/jobs/{job_id}/resume", status_code=202, response_model=JobStartResponse)
+def resume_job(job_id: str, background_tasks: BackgroundTasks):
+    """Resumes a cancelled, failed or interrupted job from its last checkpoint."""
+    try:
+        job = get_job_store().prepare_resume(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail=f"An S3 ingestion job is already active: {e.active_job_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    background_tasks.add_task(process_s3_documents, job["id"])
+    return JobStartResponse(message="Job resumed in the background.", job_id=job["id"], status=job["status"])
 
 @router.post("/upload-pdf", status_code=201)
 async def upload_pdf_document(
@@ -79,6 +164,13 @@ async def upload_pdf_document(
                 status_code=400, 
                 detail=f"Invalid document type. Must be one of: {', '.join(allowed_types)}"
             )
+
+        # Parse on the CPU pool: keeps the event loop free, and a malformed PDF only affects a worker
+        try:
+            page_count = await run_cpu_async("pdf_validate", count_pdf_pages, content, size=file_size)
+        except Exception as e:
+            logger.warning("Rejected unreadable PDF %s: %s", file.filename, e)
+            raise HTTPException(status_code=422, detail="The file is not a readable PDF")
             
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         unique_id = str(uuid.uuid4())[:8]
@@ -88,9 +180,10 @@ async def upload_pdf_document(
         filename = f"{timestamp}_{unique_id}_{sanitized_filename}"
         
         bucket_path = f"documents/{document_type}"
-        file_url = upload_pdf_to_supabase(content, filename, bucket_path)
+        # The Supabase client is synchronous
+        file_url = await run_in_threadpool(upload_pdf_to_supabase, content, filename, bucket_path)
         
-        logging.info(f"Document uploaded successfully: {filename} ({file_size} bytes)")
+        logger.info("Document uploaded successfully: %s (%d bytes)", filename, file_size)
         
         
         return JSONResponse(
@@ -101,6 +194,7 @@ async def upload_pdf_document(
                     "filename": filename,
                     "original_filename": original_filename,
                     "size": file_size,
+                    "pages": page_count,
                     "type": document_type,
                     "description": description,
                     "url": file_url,
@@ -112,47 +206,60 @@ async def upload_pdf_document(
     except HTTPException as he:
         raise he
     except Exception as e:
-        logging.error(f"Error uploading PDF: {str(e)}")
+        logger.error("Error uploading PDF: %s", e)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 # --- Policy Creation and Editing Endpoints ---
 
-@router.post("/generate-policy-draft", response_model=PolicyDraftResponse)
+@router.post("/generate-policy-draft", response_model=PolicyDraftResponse, response_model_exclude_none=True)
 async def generate_draft_endpoint(request: PolicyDraftRequest):
     """
     Receives a prompt and optionally the current policy text. 
     Returns a generated policy draft, possibly diffed against the current text.
+    With response_format "ops", returns edit operations against the current text instead.
     """
-    logger.info(f"Received request to generate policy draft. Prompt: {request.prompt[:100]}... Current text provided: {request.current_policy_text is not None}")
+    logger.info("Received request to generate policy draft. Prompt: %s Current text provided: %s", Truncated(request.prompt, 100), request.current_policy_text is not None)
     try:
-        draft_text = generate_policy_draft(request.prompt, request.current_policy_text)
+        if request.response_format == "ops":
+            draft_html = await run_in_threadpool(draft_policy_html, request.prompt)
+            changes = await run_in_threadpool(html_diff_ops, request.current_policy_text or "", draft_html)
+            logger.info("Policy draft generated. Returning %d edit operations to client.", len(changes["ops"]))
+            return PolicyDraftResponse(changes=changes)
+        # Run in the threadpool: the LLM call (and any wait in the LLM scheduler) must not block the event loop
+        draft_text = await run_in_threadpool(generate_policy_draft, request.prompt, request.current_policy_text)
         if "<p>Error:" in draft_text: # Check for error snippet more robustly
-            logger.error(f"Failed to generate policy draft: {draft_text}")
+            logger.error("Failed to generate policy draft: %s", draft_text)
             raise HTTPException(status_code=500, detail=draft_text)
-        logger.info(f"Policy draft (or diff) generated successfully. Returning to client. Length: {len(draft_text)}")
+        logger.info("Policy draft (or diff) generated successfully. Returning to client. Length: %d", len(draft_text))
         return PolicyDraftResponse(draft_text=draft_text)
     except HTTPException as he:
         raise he
     except Exception as e:
-        logger.error(f"Error in generate-policy-draft endpoint: {e}", exc_info=True)
+        logger.error("Error in generate-policy-draft endpoint: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to generate policy draft.")
 
-@router.post("/edit-policy", response_model=PolicyEditResponse)
+@router.post("/edit-policy", response_model=PolicyEditResponse, response_model_exclude_none=True)
 async def edit_policy_endpoint(request: PolicyEditRequest):
     """
     Receives current policy text and an edit instruction, 
-    returns an HTML diff of the modified policy text against the current text.
+    returns an HTML diff of the modified policy text against the current text
+    (or, with response_format "ops", the edit operations to apply to it).
     """
-    logger.info(f"Received request to edit policy. Instruction: {request.edit_instruction[:100]}...")
+    logger.info("Received request to edit policy. Instruction: %s", Truncated(request.edit_instruction, 100))
     try:
-        edited_text_diff = edit_policy(request.current_policy_text, request.edit_instruction)
+        if request.response_format == "ops":
+            edited_html = await run_in_threadpool(edit_policy_html, request.current_policy_text, request.edit_instruction)
+            changes = await run_in_threadpool(html_diff_ops, request.current_policy_text, edited_html)
+            logger.info("Policy edited. Returning %d edit operations to client.", len(changes["ops"]))
+            return PolicyEditResponse(changes=changes)
+        edited_text_diff = await run_in_threadpool(edit_policy, request.current_policy_text, request.edit_instruction)
         if "<p>Error:" in edited_text_diff: # Check for error snippet more robustly
-            logger.error(f"Failed to edit policy and generate diff: {edited_text_diff}")
+            logger.error("Failed to edit policy and generate diff: %s", edited_text_diff)
             raise HTTPException(status_code=500, detail=edited_text_diff)
-        logger.info(f"Policy edit diff generated successfully. Returning to client. Length: {len(edited_text_diff)}")
+        logger.info("Policy edit diff generated successfully. Returning to client. Length: %d", len(edited_text_diff))
         return PolicyEditResponse(edited_policy_text=edited_text_diff)
     except HTTPException as he:
         raise he
     except Exception as e:
-        logger.error(f"Error in edit-policy endpoint: {e}", exc_info=True)
+        logger.error("Error in edit-policy endpoint: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to edit policy.")
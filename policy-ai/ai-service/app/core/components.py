@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_NOT_STARTED = "not_started"
+STATUS_INITIALIZING = "initializing"
+STATUS_READY = "ready"
+STATUS_DISABLED = "disabled"  # Factory returned None (e.g. optional API key not configured)
+STATUS_FAILED = "failed"
+
+
+class LazyComponent:
+    """
+    A heavy dependency (LLM client, compiled graph, vector store...) built on first use.
+    Initialisation is timed and thread-safe; a failed build is recorded and retried on the next call.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], required: bool = True):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.status = STATUS_NOT_STARTED
+        self.init_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._value: Any = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if self.status in (STATUS_READY, STATUS_DISABLED):
+            return self._value
+        with self._lock:
+            if self.status in (STATUS_READY, STATUS_DISABLED):
+                return self._value
+            self.status = STATUS_INITIALIZING
+            start = time.perf_counter()
+            try:
+                value = self.factory()
+            except Exception as e:
+                self.init_seconds = time.perf_counter() - start
+                self.status = STATUS_FAILED
+                self.error = str(e)
+                logger.error("Component '%s' failed to initialise after %.2fs: %s", self.name, self.init_seconds, e)
+                raise
+            self.init_seconds = time.perf_counter() - start
+            self._value = value
+            self.error = None
+            self.status = STATUS_READY if value is not None else STATUS_DISABLED
+            logger.info("Component '%s' %s in %.2fs", self.name, self.status, self.init_seconds)
+            return value
+
+    def reset(self) -> None:
+        """Drops the built value so the next get() rebuilds it (used by tests and benchmarks)."""
+        with self._lock:
+            self._value = None
+            self.status = STATUS_NOT_STARTED
+            self.init_seconds = None
+            self.error = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "required": self.required,
+            "init_seconds": round(self.init_seconds, 4) if self.init_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+_registry: Dict[str, LazyComponent] = {}
+_warmup_state: Dict[str, Any] = {"status": STATUS_NOT_STARTED, "seconds": None}
+_warmup_lock = threading.Lock()
+
+
+def register_component(name: str, factory: Callable[[], Any], required: bool = True) -> LazyComponent:
+    component = LazyComponent(name, factory, required=required)
+    _registry[name] = component
+    return component
+
+
+def get_component(name: str) -> LazyComponent:
+    return _registry[name]
+
+
+def warm_up(names: Optional[Iterable[str]] = None, max_workers: int = 4) -> Dict[str, Any]:
+    """
+    Initialises components in parallel and returns the readiness report.
+    Components that depend on each other simply wait on the dependency's lock.
+    """
+    selected = [_registry[name] for name in names] if names else list(_registry.values())
+    _warmup_state["status"] = STATUS_INITIALIZING
+    start = time.perf_counter()
+
+    def _init(component: LazyComponent):
+        try:
+            component.get()
+        except Exception:
+            pass  # Recorded on the component; readiness reports it
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warmup") as executor:
+        list(executor.map(_init, selected))
+
+    _warmup_state["seconds"] = round(time.perf_counter() - start, 4)
+    _warmup_state["status"] = STATUS_READY
+    logger.info("Warm-up finished in %.2fs", _warmup_state["seconds"])
+    return readiness_report()
+
+
+def warm_up_in_background(names: Iterable[str], max_workers: int = 4) -> bool:
+    """Starts warm_up(names) in a daemon thread unless a warm-up is already running. Returns whether it started."""
+    with _warmup_lock:
+        if _warmup_state["status"] == STATUS_INITIALIZING:
+            return False
+        _warmup_state["status"] = STATUS_INITIALIZING
+    threading.Thread(target=warm_up, args=(list(names), max_workers), name="warmup", daemon=True).start()
+    return True
+
+
+def unbuilt_required_components() -> List[str]:
+    """Required components not built yet: never started, or whose last build failed."""
+    return [name for name, component in _registry.items()
+            if component.required and component.status in (STATUS_NOT_STARTED, STATUS_FAILED)]
+
+
+def readiness_report() -> Dict[str, Any]:
+    """
+    Per-dependency status. The service is ready once every required component has
+    been built (or disabled itself) and any warm-up in progress has finished.
+    """
+    components = {name: component.describe() for name, component in _registry.items()}
+    unbuilt = [name for name, c in components.items() if c["required"] and c["status"] not in (STATUS_READY, STATUS_DISABLED)]
+    warming = _warmup_state["status"] == STATUS_INITIALIZING
+    return {
+        "ready": not unbuilt and not warming,
+        "pending": unbuilt,
+        "warmup": dict(_warmup_state),
+        "components": components,
+    }
@@ -0,0 +1,282 @@
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# policy-ai/ai-service: relative paths in the settings below that point at repository files resolve
+# against it rather than against the working directory
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# --- Background jobs (S3 ingestion) ---
+# SQLite file that keeps job and per-file state so a crash or redeploy can resume.
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.db")
+# A running job whose heartbeat is older than this is considered dead (interrupted).
+JOB_STALE_AFTER_SECONDS = _env_int("JOB_STALE_AFTER_SECONDS", 300)
+# How often a worker refreshes its job's heartbeat while it runs (well under JOB_STALE_AFTER_SECONDS).
+JOB_HEARTBEAT_INTERVAL_SECONDS = _env_float("JOB_HEARTBEAT_INTERVAL_SECONDS", 30)
+
+# --- Logging ---
+# "dev" logs synchronously as text; "production" uses a background queue listener.
+LOG_MODE = os.getenv("LOG_MODE", "dev").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if LOG_MODE == "dev" else "INFO")
+LOG_JSON = _env_bool("LOG_JSON", LOG_MODE == "production")
+# Large payloads (message lists, HTML, graph state) are capped and sampled before being logged.
+LOG_PAYLOAD_MAX_CHARS = _env_int("LOG_PAYLOAD_MAX_CHARS", 2000)
+LOG_PAYLOAD_SAMPLE_RATE = _env_float("LOG_PAYLOAD_SAMPLE_RATE", 1.0 if LOG_MODE == "dev" else 0.01)
+
+# --- Startup ---
+# Build LLM clients, the agent graph, the vector store and tools in parallel during startup
+# instead of on the first request. /ready reports false until the warm-up finishes; without it,
+# the first /ready probe starts building the required components and reports false until they are built.
+WARMUP_ON_STARTUP = _env_bool("WARMUP_ON_STARTUP", False)
+WARMUP_MAX_WORKERS = _env_int("WARMUP_MAX_WORKERS", 4)
+
+# --- Outbound LLM scheduler ---
+# Every chat/embedding call is admitted against these budgets (match your OpenAI tier).
+LLM_SCHEDULER_ENABLED = _env_bool("LLM_SCHEDULER_ENABLED", True)
+LLM_REQUESTS_PER_MINUTE = _env_int("LLM_REQUESTS_PER_MINUTE", 500)
+LLM_TOKENS_PER_MINUTE = _env_int("LLM_TOKENS_PER_MINUTE", 450000)
+# Rate-limit (429) and transient errors are retried with full-jitter exponential backoff.
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 4)
+LLM_RETRY_BASE_SECONDS = _env_float("LLM_RETRY_BASE_SECONDS", 0.5)
+LLM_RETRY_MAX_SECONDS = _env_float("LLM_RETRY_MAX_SECONDS", 20.0)
+# How long a call may wait for admission per priority class (0 = wait indefinitely).
+LLM_DEADLINE_INTERACTIVE_SECONDS = _env_float("LLM_DEADLINE_INTERACTIVE_SECONDS", 30.0)
+LLM_DEADLINE_EDIT_SECONDS = _env_float("LLM_DEADLINE_EDIT_SECONDS", 90.0)
+LLM_DEADLINE_BATCH_SECONDS = _env_float("LLM_DEADLINE_BATCH_SECONDS", 0)
+
+# --- Model tiers ---
+# The router tier picks tools and answers simple follow-ups; synthesis writes answers from tool output.
+LLM_ROUTER_MODEL = os.getenv("LLM_ROUTER_MODEL", "gpt-4o-mini")
+LLM_SYNTHESIS_MODEL = os.getenv("LLM_SYNTHESIS_MODEL", "gpt-4o")
+LLM_DRAFT_MODEL = os.getenv("LLM_DRAFT_MODEL", "gpt-4o")
+LLM_ANALYSIS_MODEL = os.getenv("LLM_ANALYSIS_MODEL", "gpt-4o")
+# Turns with more input than this (e.g. a pasted policy) skip the router tier.
+LLM_ROUTER_MAX_INPUT_TOKENS = _env_int("LLM_ROUTER_MAX_INPUT_TOKENS", 6000)
+# USD per 1M tokens (input, output[, cached input]), used for the cost metric. Override with a JSON object.
+# Input tokens served from the provider's prompt cache are billed at the cached price (input price if absent).
+LLM_PRICES = {
+    "gpt-4o": (2.50, 10.00, 1.25),
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "gpt-4.1": (2.00, 8.00, 0.50),
+    "gpt-4.1-mini": (0.40, 1.60, 0.10),
+    "gpt-4.1-nano": (0.10, 0.40, 0.025),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+LLM_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES_JSON") or "{}").items()})
+
+# --- Agent graph ---
+# Questions about an uploaded document (document_url) run specific_document_qa_tool directly
+# instead of spending an LLM call to emit a tool call we already know.
+DOCUMENT_QA_FAST_PATH = _env_bool("DOCUMENT_QA_FAST_PATH", True)
+# Tool calls from one agent step run concurrently, each bounded by its own timeout (seconds).
+TOOL_DEFAULT_TIMEOUT_SECONDS = _env_float("TOOL_DEFAULT_TIMEOUT_SECONDS", 20.0)
+TOOL_TIMEOUTS = {
+    "policy_rag_tool": 10.0,
+    "web_search_tool": 8.0,
+    "specific_document_qa_tool": 30.0,
+}
+TOOL_TIMEOUTS.update({name: float(seconds) for name, seconds in json.loads(os.getenv("TOOL_TIMEOUTS_JSON") or "{}").items()})
+TOOL_MAX_WORKERS = _env_int("TOOL_MAX_WORKERS", 16)
+# Per-turn budget: after the deadline or this many tool rounds the agent answers without tools.
+AGENT_TURN_DEADLINE_SECONDS = _env_float("AGENT_TURN_DEADLINE_SECONDS", 60.0)
+AGENT_MAX_TOOL_ITERATIONS = _env_int("AGENT_MAX_TOOL_ITERATIONS", 4)
+# Start embedding + top-k retrieval for the user's message in parallel with the first LLM call;
+# policy_rag_tool reuses it when its query is at least this similar (word overlap) to the message.
+SPECULATIVE_RETRIEVAL = _env_bool("SPECULATIVE_RETRIEVAL", True)
+SPECULATIVE_RETRIEVAL_MIN_SIMILARITY = _env_float("SPECULATIVE_RETRIEVAL_MIN_SIMILARITY", 0.6)
+# How long the tool waits for a prefetch still running before giving up on it and retrieving itself.
+SPECULATIVE_RETRIEVAL_CLAIM_TIMEOUT_SECONDS = _env_float("SPECULATIVE_RETRIEVAL_CLAIM_TIMEOUT_SECONDS", 5.0)
+
+# --- Web search tool ---
+# "tavily" (live, needs TAVILY_API_KEY) or "local" (JSON fixtures, for offline tests and benchmarks).
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "tavily").lower()
+# Relative to SERVICE_DIR; benchmarks/ is not in the service image, so "local" there needs a path.
+WEB_SEARCH_FIXTURES_PATH = os.path.join(
+    SERVICE_DIR, os.getenv("WEB_SEARCH_FIXTURES_PATH", "benchmarks/fixtures/web_search.json")
+)
+WEB_SEARCH_MAX_RESULTS = _env_int("WEB_SEARCH_MAX_RESULTS", 3)
+# Results are cached per normalized query; regulations change slowly.
+WEB_SEARCH_CACHE_TTL_SECONDS = _env_float("WEB_SEARCH_CACHE_TTL_SECONDS", 6 * 3600)
+WEB_SEARCH_CACHE_MAX_ENTRIES = _env_int("WEB_SEARCH_CACHE_MAX_ENTRIES", 512)
+
+# --- Retrieval ---
+# Optional rerank stage: over-fetch RERANK_CANDIDATES chunks, score them with a local CPU
+# cross-encoder (sentence-transformers) and keep only the best ones for the prompt.
+RERANK_ENABLED = _env_bool("RERANK_ENABLED", False)
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")  # Multilingual (Spanish corpus)
+RERANK_CANDIDATES = _env_int("RERANK_CANDIDATES", 30)
+RERANK_BATCH_SIZE = _env_int("RERANK_BATCH_SIZE", 16)
+RERANK_MAX_LENGTH = _env_int("RERANK_MAX_LENGTH", 512)
+RERANK_THREADS = _env_int("RERANK_THREADS", 0)  # 0 = torch default
+# After a failed model load, queries skip reranking for this long before a query retries the load
+RERANK_RETRY_SECONDS = _env_float("RERANK_RETRY_SECONDS", 300.0)
+# Retrieved chunks are compacted before reaching the prompt: neighbours of the same source are
+# merged (dropping the splitter overlap), boilerplate and near-duplicates removed, size capped.
+CONTEXT_COMPACTION = _env_bool("CONTEXT_COMPACTION", True)
+CONTEXT_TOKEN_BUDGET = _env_int("CONTEXT_TOKEN_BUDGET", 2500)
+CONTEXT_MAX_OVERLAP_CHARS = _env_int("CONTEXT_MAX_OVERLAP_CHARS", 400)
+CONTEXT_DEDUP_THRESHOLD = _env_float("CONTEXT_DEDUP_THRESHOLD", 0.85)
+
+# --- Ingestion ---
+# "structured" splits wordings on chapters/articles/clauses and sizes chunks in tokens;
+# "recursive" keeps the previous RecursiveCharacterTextSplitter(1000, 200) behaviour.
+CHUNKER = os.getenv("CHUNKER", "structured").lower()
+CHUNK_MAX_TOKENS = _env_int("CHUNK_MAX_TOKENS", 350)
+CHUNK_MIN_TOKENS = _env_int("CHUNK_MIN_TOKENS", 80)  # Short articles share a chunk with the next one
+CHUNK_OVERLAP_TOKENS = _env_int("CHUNK_OVERLAP_TOKENS", 60)
+# Near-duplicate chunks (the same clause in several versions of a product wording) are indexed once,
+# with every source listed in their metadata. MinHash signatures are persisted next to the job store.
+INGEST_DEDUP = _env_bool("INGEST_DEDUP", True)
+DEDUP_DB_PATH = os.getenv("DEDUP_DB_PATH", "data/dedup.db")
+DEDUP_THRESHOLD = _env_float("DEDUP_THRESHOLD", 0.9)  # Estimated Jaccard similarity of word shingles
+DEDUP_NUM_PERM = _env_int("DEDUP_NUM_PERM", 128)
+DEDUP_BANDS = _env_int("DEDUP_BANDS", 16)  # LSH bands: 16 x 8 rows finds pairs from ~0.7 similarity
+DEDUP_SHINGLE_WORDS = _env_int("DEDUP_SHINGLE_WORDS", 5)
+# "pinecone" or "local" (in-process exact search, for offline development, tests and benchmarks;
+# needs the chunk store since local vectors carry no text).
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "pinecone").lower()
+# Chunk text and full metadata live in a local SQLite store keyed by vector id; Pinecone only keeps
+# the fields below (for filtering and provenance). Retrieval fetches the text of all matches at once.
+CHUNK_STORE_ENABLED = _env_bool("CHUNK_STORE_ENABLED", True)
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "data/chunks.db")
+PINECONE_METADATA_FIELDS = [
+    field.strip()
+    for field in os.getenv(
+        "PINECONE_METADATA_FIELDS",
+        "source,sources,chunk_index,page_start,page_end,tenant,product_line,document_type,insurer,effective_date,superseded_on,overlap_chars",
+    ).split(",")
+    if field.strip()
+]
+# Document attributes recorded on every chunk at ingestion (S3 object metadata first, then
+# INGEST_KEY_PATTERN, then what the wording itself says) and usable as policy_rag_tool filters.
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+# Named groups of this regex, matched against the S3 key, become attributes,
+# e.g. "(?P<tenant>[^/]+)/(?P<product_line>[^/]+)/[^/]+\.pdf$"
+INGEST_KEY_PATTERN = os.getenv("INGEST_KEY_PATTERN", "")
+# One index namespace per tenant, so a tenant's queries only search its own vectors; otherwise the
+# tenant is a metadata filter on the shared namespace.
+VECTOR_NAMESPACE_PER_TENANT = _env_bool("VECTOR_NAMESPACE_PER_TENANT", False)
+# Tenants /answer_query may be asked to search besides DEFAULT_TENANT (comma-separated). The tenant
+# comes from the request body, so any other tenant is rejected.
+ALLOWED_TENANTS = [tenant.strip() for tenant in os.getenv("ALLOWED_TENANTS", "").split(",") if tenant.strip()]
+
+# --- CPU offload ---
+# PDF text extraction, HTML prettify/diff and chunking run in a pool of worker processes, so they
+# neither block the event loop nor hold the GIL of the threads serving other requests.
+CPU_POOL_ENABLED = _env_bool("CPU_POOL_ENABLED", True)
+CPU_POOL_WORKERS = _env_int("CPU_POOL_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1)))
+# Workers are recycled after this many tasks (bounds memory growth from large documents).
+CPU_POOL_MAX_TASKS_PER_WORKER = _env_int("CPU_POOL_MAX_TASKS_PER_WORKER", 200)
+# A task running longer than this has its worker killed (e.g. a pathological PDF).
+CPU_TASK_TIMEOUT_SECONDS = _env_float("CPU_TASK_TIMEOUT_SECONDS", 60.0)
+# Inputs larger than this are rejected; inputs smaller than CPU_TASK_INLINE_BYTES run in the calling
+# thread, where they finish faster than the round trip to a worker.
+CPU_TASK_MAX_BYTES = _env_int("CPU_TASK_MAX_BYTES", 50 * 1024 * 1024)
+CPU_TASK_INLINE_BYTES = _env_int("CPU_TASK_INLINE_BYTES", 16 * 1024)
+# Address-space limit per worker in MB (0 = none), so a runaway document fails with MemoryError in the worker.
+CPU_WORKER_MAX_MEMORY_MB = _env_int("CPU_WORKER_MAX_MEMORY_MB", 0)
+
+# --- Policy analysis ---
+# Characters of the policy text sent to the analysis model (longer documents are cut and flagged).
+ANALYSIS_MAX_CHARS = _env_int("ANALYSIS_MAX_CHARS", 16000)
+# Bulk analysis (/analyze-policies): documents downloaded and extracted in parallel, and analyses
+# in flight per request. Analyses run at BATCH priority, within the LLM scheduler's global budget.
+# Downloads stay at most BATCH_FETCH_CONCURRENCY documents ahead of the analyses.
+BATCH_FETCH_CONCURRENCY = _env_int("BATCH_FETCH_CONCURRENCY", 8)
+BATCH_ANALYSIS_CONCURRENCY = _env_int("BATCH_ANALYSIS_CONCURRENCY", 4)
+BATCH_ANALYSIS_MAX_DOCUMENTS = _env_int("BATCH_ANALYSIS_MAX_DOCUMENTS", 500)
+
+# --- Document downloads ---
+# Policy PDFs fetched by URL (document Q&A, analysis) go through one pooled HTTP client. Bodies
+# stream to a spooled temporary file and are rejected past DOWNLOAD_MAX_BYTES; transient failures
+# (connection errors, 429, 5xx) are retried with exponential backoff.
+DOWNLOAD_TIMEOUT_SECONDS = _env_float("DOWNLOAD_TIMEOUT_SECONDS", 10.0)
+# Bodies slower than this on average (after DOWNLOAD_TIMEOUT_SECONDS of grace) are abandoned and retried.
+# The adaptive document_download timeout only covers the time to the response headers.
+DOWNLOAD_MIN_BYTES_PER_SECOND = _env_int("DOWNLOAD_MIN_BYTES_PER_SECOND", 64 * 1024)
+DOWNLOAD_MAX_BYTES = _env_int("DOWNLOAD_MAX_BYTES", 50 * 1024 * 1024)
+DOWNLOAD_SPOOL_BYTES = _env_int("DOWNLOAD_SPOOL_BYTES", 4 * 1024 * 1024)
+DOWNLOAD_RETRIES = _env_int("DOWNLOAD_RETRIES", 2)
+DOWNLOAD_BACKOFF_SECONDS = _env_float("DOWNLOAD_BACKOFF_SECONDS", 0.5)
+DOWNLOAD_POOL_SIZE = _env_int("DOWNLOAD_POOL_SIZE", 16)
+# Downloaded files with an ETag or Last-Modified are kept here and revalidated with a conditional
+# request (Cache-Control max-age is honoured); the oldest files are evicted past the size budget.
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", "data/downloads")
+DOWNLOAD_CACHE_MAX_BYTES = _env_int("DOWNLOAD_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+# --- Response compression ---
+# JSON, HTML, NDJSON and other text responses of at least RESPONSE_COMPRESSION_MIN_BYTES are
+# compressed for clients that accept it: brotli when the brotli package is installed, else gzip.
+# Streamed responses are flushed chunk by chunk so NDJSON lines are not held back.
+RESPONSE_COMPRESSION_ENABLED = _env_bool("RESPONSE_COMPRESSION_ENABLED", True)
+RESPONSE_COMPRESSION_MIN_BYTES = _env_int("RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+RESPONSE_GZIP_LEVEL = _env_int("RESPONSE_GZIP_LEVEL", 6)
+RESPONSE_BROTLI_QUALITY = _env_int("RESPONSE_BROTLI_QUALITY", 5)
+
+# --- Draft cache ---
+# Cleaned policy drafts are cached by (normalised prompt, draft model, draft prompt template),
+# in memory (LRU, DRAFT_CACHE_MAX_ENTRIES) and in SQLite at DRAFT_CACHE_PATH ("" = memory only),
+# so template prompts are generated once. The diff against the current text is still per request.
+DRAFT_CACHE_ENABLED = _env_bool("DRAFT_CACHE_ENABLED", True)
+DRAFT_CACHE_PATH = os.getenv("DRAFT_CACHE_PATH", "data/drafts.db")
+DRAFT_CACHE_MAX_ENTRIES = _env_int("DRAFT_CACHE_MAX_ENTRIES", 256)
+DRAFT_CACHE_MAX_DISK_ENTRIES = _env_int("DRAFT_CACHE_MAX_DISK_ENTRIES", 5000)
+DRAFT_CACHE_TTL_SECONDS = _env_float("DRAFT_CACHE_TTL_SECONDS", 30 * 24 * 3600)
+
+# --- Resilience (external dependencies) ---
+# Calls to OpenAI, Pinecone, Tavily and document hosts go through app.core.resilience: a
+# per-dependency circuit breaker, a timeout adapted to the dependency's recent latency
+# (RESILIENCE_TIMEOUT_MULTIPLIER x its p99, within the bounds below) and, for idempotent
+# dependencies in RESILIENCE_HEDGED_DEPENDENCIES, a duplicate request once the first one is
+# slower than the dependency's RESILIENCE_HEDGE_PERCENTILE latency.
+RESILIENCE_ENABLED = _env_bool("RESILIENCE_ENABLED", True)
+RESILIENCE_HEDGED_DEPENDENCIES = [
+    name.strip() for name in os.getenv("RESILIENCE_HEDGED_DEPENDENCIES", "openai_embeddings,pinecone,tavily").split(",")
+    if name.strip()
+]
+RESILIENCE_HEDGE_PERCENTILE = _env_float("RESILIENCE_HEDGE_PERCENTILE", 95)
+RESILIENCE_HEDGE_MIN_SECONDS = _env_float("RESILIENCE_HEDGE_MIN_SECONDS", 0.05)
+# Hedges are capped at this fraction of a dependency's calls, so a slow provider is not hit twice as hard
+RESILIENCE_HEDGE_MAX_RATIO = _env_float("RESILIENCE_HEDGE_MAX_RATIO", 0.1)
+RESILIENCE_TIMEOUT_PERCENTILE = _env_float("RESILIENCE_TIMEOUT_PERCENTILE", 99)
+RESILIENCE_TIMEOUT_MULTIPLIER = _env_float("RESILIENCE_TIMEOUT_MULTIPLIER", 3.0)
+# Latency samples needed before hedging and adaptive timeouts kick in (the ceiling applies until then)
+RESILIENCE_MIN_SAMPLES = _env_int("RESILIENCE_MIN_SAMPLES", 20)
+# Seconds (floor, ceiling) of each dependency's timeout. Override with a JSON object.
+RESILIENCE_TIMEOUT_BOUNDS = {
+    "openai_chat": (15.0, 120.0),  # Agent turns (routing, tool selection, answers)
+    "openai_chat_generate": (60.0, 300.0),  # Full-document generations: drafts, edits, analyses
+    "openai_embeddings": (2.0, 20.0),
+    "pinecone": (1.0, 10.0),
+    "tavily": (3.0, 15.0),
+    "document_download": (5.0, 30.0),
+}
+RESILIENCE_TIMEOUT_BOUNDS.update({name: tuple(bounds) for name, bounds in
+                                  json.loads(os.getenv("RESILIENCE_TIMEOUT_BOUNDS_JSON") or "{}").items()})
+# A generation's timeout is at least its expected completion tokens at this rate (within the ceiling),
+# so a long draft or edit is not cut off by the latency of shorter ones.
+RESILIENCE_GENERATION_TOKENS_PER_SECOND = _env_float("RESILIENCE_GENERATION_TOKENS_PER_SECOND", 20.0)
+# Consecutive failures (errors or timeouts) that open a breaker, and how long it stays open
+RESILIENCE_BREAKER_FAILURES = _env_int("RESILIENCE_BREAKER_FAILURES", 5)
+RESILIENCE_BREAKER_COOLDOWN_SECONDS = _env_float("RESILIENCE_BREAKER_COOLDOWN_SECONDS", 30.0)
+RESILIENCE_MAX_WORKERS = _env_int("RESILIENCE_MAX_WORKERS", 64)
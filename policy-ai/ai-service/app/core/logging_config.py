@@ -0,0 +1,178 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+from typing import Any, Optional
+
+from app.core.config import LOG_MODE, LOG_LEVEL, LOG_JSON, LOG_PAYLOAD_MAX_CHARS, LOG_PAYLOAD_SAMPLE_RATE
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Secrets that must never reach the log sink (OpenAI, Pinecone, Tavily, AWS, JWT/Supabase, bearer tokens)
+_REDACTION_PATTERNS = [
+    re.compile(r"sk-[A-Za-z0-9_\-]{8,}"),
+    re.compile(r"pcsk_[A-Za-z0-9_]{8,}"),
+    re.compile(r"tvly-[A-Za-z0-9_\-]{8,}"),
+    re.compile(r"AKIA[0-9A-Z]{16}"),
+    re.compile(r"eyJ[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+"),
+    re.compile(r"(?i)(bearer\s+)[A-Za-z0-9._\-]+"),
+]
+_REDACTED = "[REDACTED]"
+# Log arguments that can be formatted later, on the listener thread, without showing later changes
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+_UNSAFE = object()
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redact(text: str) -> str:
+    """Masks API keys and tokens in an already formatted log line."""
+    for pattern in _REDACTION_PATTERNS:
+        if pattern.groups:
+            text = pattern.sub(lambda m: m.group(1) + _REDACTED, text)
+        else:
+            text = pattern.sub(_REDACTED, text)
+    return text
+
+
+class Truncated:
+    """
+    Wraps a log argument so its str() is computed only when the record is
+    actually emitted, and capped at max_chars.
+    """
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Any, max_chars: Optional[int] = None):
+        self.value = value
+        self.max_chars = LOG_PAYLOAD_MAX_CHARS if max_chars is None else max_chars
+
+    def __str__(self) -> str:
+        text = self.value if isinstance(self.value, str) else str(self.value)
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}... [truncated {len(text) - self.max_chars} chars]"
+
+    __repr__ = __str__
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any, level: int = logging.DEBUG) -> None:
+    """
+    Logs a potentially large payload (message lists, HTML, graph state).
+    Nothing is formatted unless the level is enabled and the call is sampled in;
+    the emitted text is size-capped.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1.0 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.log(level, "%s: %s", label, Truncated(payload), stacklevel=2)
+
+
+class RedactingFormatter(logging.Formatter):
+    """Plain-text formatter that redacts secrets from the final line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with secrets redacted."""
+
+    # Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field
+    _RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._RESERVED:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return redact(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread.
+    The stdlib handler formats every record in the caller's thread; here only
+    the traceback (which can't outlive the frame) is rendered eagerly, and so are
+    messages with mutable arguments, which the caller may change before the
+    listener gets to them. Truncated payloads stay deferred on a shallow copy.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        args = tuple(_snapshot(arg) for arg in record.args) if isinstance(record.args, tuple) else (_UNSAFE,)
+        if record.args and any(arg is _UNSAFE for arg in args):  # A mapping (for %(name)s) counts as mutable too
+            record.msg, record.args = record.getMessage(), None
+        elif record.args:
+            record.args = args
+        return record
+
+
+def _snapshot(arg: Any) -> Any:
+    """A copy of a log argument that later changes can't reach, or _UNSAFE if it must be formatted now."""
+    if isinstance(arg, _IMMUTABLE_ARGS):
+        return arg
+    if isinstance(arg, Truncated):
+        value = arg.value
+        if isinstance(value, (list, dict, set)):
+            value = value.copy()  # Message lists and graph state grow after the call
+        return Truncated(value, arg.max_chars)
+    return _UNSAFE
+
+
+def configure_logging(mode: str = LOG_MODE, level: str = LOG_LEVEL, json_output: bool = LOG_JSON) -> None:
+    """
+    Configures the root logger once for the process.
+    - "dev": synchronous text output (the previous behaviour).
+    - "production": records go through an in-memory queue to a background
+      listener thread, so request threads never block on I/O or formatting.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level.upper())
+
+    sink = logging.StreamHandler(sys.stdout)
+    sink.setFormatter(JsonFormatter() if json_output else RedactingFormatter(TEXT_FORMAT))
+
+    if mode == "production":
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(DeferredQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, sink, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    else:
+        root.addHandler(sink)
+
+    # Third-party clients are chatty at DEBUG and log full request bodies
+    for noisy in ("httpx", "httpcore", "openai", "urllib3", "botocore", "hpack"):
+        logging.getLogger(noisy).setLevel(max(root.level, logging.INFO))
+
+
+def shutdown_logging() -> None:
+    """Flushes queued records; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,341 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+from app.core.config import LLM_PRICES
+
+logger = logging.getLogger(__name__)
+
+# Buckets tuned for LLM/agent work: sub-second lookups up to minute-long drafts.
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by endpoint.",
+    ["method", "endpoint", "status"], buckets=_LATENCY_BUCKETS,
+)
+NODE_LATENCY = Histogram(
+    "agent_node_duration_seconds", "Latency of each LangGraph node execution.",
+    ["node"], buckets=_LATENCY_BUCKETS,
+)
+TOOL_LATENCY = Histogram(
+    "agent_tool_duration_seconds", "Latency of each agent tool call.",
+    ["tool", "status"], buckets=_LATENCY_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time until the first streamed token of an LLM call.",
+    ["model"], buckets=_LATENCY_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "Total duration of an LLM call.",
+    ["model", "status"], buckets=_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "LLM tokens consumed, by model and direction (input/output/cached_input). "
+    "cached_input is the part of input served from the provider's prompt cache; cache hit ratio = cached_input / input.",
+    ["model", "direction"],
+)
+EMBEDDING_LATENCY = Histogram(
+    "embedding_request_duration_seconds", "Latency of embedding calls.",
+    ["model"], buckets=_LATENCY_BUCKETS,
+)
+VECTOR_QUERY_LATENCY = Histogram(
+    "vector_store_query_duration_seconds", "Latency of vector index similarity queries.",
+    ["backend"], buckets=_LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache name and result (hit/miss). Hit ratio = hit / (hit + miss).",
+    ["cache", "result"],
+)
+LLM_TIER_LATENCY = Histogram(
+    "llm_tier_duration_seconds", "Duration of LLM calls by model tier (router/synthesis/draft/analysis).",
+    ["tier", "model"], buckets=_LATENCY_BUCKETS,
+)
+LLM_COST = Counter(
+    "llm_cost_usd_total", "Estimated LLM spend in USD by model tier, from the configured price table.",
+    ["tier", "model"],
+)
+LLM_TIER_ESCALATIONS = Counter(
+    "llm_tier_escalations_total", "Agent turns moved from the router tier to the synthesis tier, by reason.",
+    ["reason"],
+)
+RERANK_LATENCY = Histogram(
+    "rerank_duration_seconds", "Latency of cross-encoder reranking of retrieved chunks.",
+    buckets=_LATENCY_BUCKETS,
+)
+CONTEXT_TOKENS = Counter(
+    "rag_context_tokens_total", "Tokens of retrieved RAG context before and after compaction (stage=retrieved/compacted).",
+    ["stage"],
+)
+SPECULATIVE_RETRIEVALS = Counter(
+    "speculative_retrieval_total", "Speculative RAG retrievals by outcome (used/mismatch/unused/failed/timeout).",
+    ["outcome"],
+)
+SPECULATIVE_RETRIEVAL_WASTED_SECONDS = Counter(
+    "speculative_retrieval_wasted_seconds_total", "Time spent on speculative retrievals whose result was discarded.",
+)
+LLM_SCHEDULER_WAIT = Histogram(
+    "llm_scheduler_wait_seconds", "Time an LLM/embedding call waited for admission, by priority class.",
+    ["priority"], buckets=_LATENCY_BUCKETS,
+)
+LLM_SCHEDULER_RETRIES = Counter(
+    "llm_scheduler_retries_total", "LLM/embedding calls retried by the scheduler, by error type.",
+    ["error"],
+)
+LLM_SCHEDULER_REJECTED = Counter(
+    "llm_scheduler_rejected_total", "LLM/embedding calls abandoned because their deadline passed, by priority class.",
+    ["priority"],
+)
+
+INGEST_CHUNKS = Counter(
+    "ingest_chunks_total", "Chunks seen at ingestion, by outcome (indexed/duplicate of an indexed chunk).",
+    ["outcome"],
+)
+INGEST_DEDUP_LATENCY = Histogram(
+    "ingest_dedup_duration_seconds", "Time spent de-duplicating one file's chunks against the signature index.",
+    buckets=_LATENCY_BUCKETS,
+)
+
+CPU_TASK_LATENCY = Histogram(
+    "cpu_task_duration_seconds", "Duration of CPU-bound tasks (PDF extraction, HTML prettify/diff, chunking), by where they ran.",
+    ["task", "mode"], buckets=_LATENCY_BUCKETS,
+)
+CPU_TASK_FAILURES = Counter(
+    "cpu_task_failures_total", "CPU-bound tasks that failed, by reason (too_large/timeout/crashed/error).",
+    ["task", "reason"],
+)
+CPU_POOL_RESTARTS = Counter(
+    "cpu_pool_restarts_total", "Process pool restarts after a worker timed out or died.",
+    ["reason"],
+)
+
+BATCH_ANALYSIS_DOCUMENTS = Counter(
+    "batch_analysis_documents_total", "Documents processed by bulk analysis requests, by outcome (ok or the error code).",
+    ["outcome"],
+)
+
+DOWNLOADS = Counter(
+    "document_downloads_total", "Document downloads by outcome (downloaded/revalidated/fresh/too_large/error).",
+    ["outcome"],
+)
+DOWNLOAD_LATENCY = Histogram(
+    "document_download_duration_seconds", "Duration of document downloads, by outcome.",
+    ["outcome"], buckets=_LATENCY_BUCKETS,
+)
+DOWNLOAD_BYTES = Counter(
+    "document_download_bytes_total", "Document bytes returned to callers, by where they came from (network/cache).",
+    ["source"],
+)
+DOWNLOAD_SECONDS_SAVED = Counter(
+    "document_download_seconds_saved_total", "Download time saved by cache hits, relative to the file's last full download.",
+)
+DOWNLOAD_RETRY_ATTEMPTS = Counter(
+    "document_download_retries_total", "Document download attempts retried, by reason.",
+    ["reason"],
+)
+
+RESPONSE_COMPRESSION_BYTES = Counter(
+    "http_response_compression_bytes_total", "Compressed response bodies: bytes before (raw) and after (sent) compression, by encoding.",
+    ["encoding", "stage"],
+)
+
+DEPENDENCY_CALLS = Counter(
+    "dependency_calls_total", "Calls to external dependencies by outcome (ok/error/timeout/rejected/fallback).",
+    ["dependency", "outcome"],
+)
+DEPENDENCY_LATENCY = Histogram(
+    "dependency_call_duration_seconds", "Duration of successful calls to external dependencies (hedges included).",
+    ["dependency"], buckets=_LATENCY_BUCKETS,
+)
+DEPENDENCY_HEDGES = Counter(
+    "dependency_hedges_total", "Hedged duplicate requests: issued, and won (the duplicate answered first).",
+    ["dependency", "outcome"],
+)
+CIRCUIT_STATE = Gauge(
+    "dependency_circuit_state", "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open).",
+    ["dependency"],
+)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Counts a cache lookup so hit ratios can be derived per cache."""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    USD cost of a call; dated model names (gpt-4o-2024-08-06) match their base price.
+    `cached_tokens` (part of `input_tokens`) are billed at the model's cached input price.
+    """
+    prices = LLM_PRICES.get(model)
+    if prices is None:
+        matches = [name for name in LLM_PRICES if model.startswith(name)]
+        if not matches:
+            return 0.0
+        prices = LLM_PRICES[max(matches, key=len)]
+    cached_price = prices[2] if len(prices) > 2 else prices[0]
+    return ((input_tokens - cached_tokens) * prices[0] + cached_tokens * cached_price + output_tokens * prices[1]) / 1_000_000
+
+
+class TokenUsage:
+    """LLM token totals of one request (see track_token_usage)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = self.input_tokens = self.cached_tokens = self.output_tokens = 0
+
+    def add(self, input_tokens: int, cached_tokens: int, output_tokens: int) -> None:
+        # LLM calls of one request can run in several threads (tools, bulk analysis)
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.cached_tokens += cached_tokens
+            self.output_tokens += output_tokens
+
+
+_request_usage: ContextVar[Optional[TokenUsage]] = ContextVar("request_token_usage", default=None)
+
+
+@contextmanager
+def track_token_usage() -> Iterator[TokenUsage]:
+    """Totals the tokens of every LLM call made inside the block (including worker threads that copy the context)."""
+    usage = TokenUsage()
+    token = _request_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _request_usage.reset(token)
+
+
+def endpoint_label(scope: dict) -> str:
+    """
+    Route template for a request (e.g. /api/internal/v1/jobs/{job_id}), so path
+    parameters don't explode label cardinality. Unrouted requests share one label.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    params = scope.get("path_params") or {}
+    if params:
+        names_by_value = {str(value): name for name, value in params.items()}
+        path = "/".join(
+            f"{{{names_by_value[segment]}}}" if segment in names_by_value else segment
+            for segment in path.split("/")
+        )
+    return path
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Returns the Prometheus exposition payload and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that records LLM timings/token usage and tool latency.
+    Only stores a start timestamp per run, so the per-token cost is a dict lookup.
+    """
+
+    # Run synchronously in the caller's thread instead of being dispatched to an executor
+    run_inline = True
+
+    def __init__(self):
+        self._llm_runs: Dict[UUID, list] = {}
+        self._tool_runs: Dict[UUID, tuple] = {}
+
+    # --- LLM ---
+
+    def _start_llm(self, run_id: UUID, kwargs: Dict[str, Any]) -> None:
+        params = kwargs.get("invocation_params") or {}
+        metadata = kwargs.get("metadata") or {}
+        model = params.get("model") or params.get("model_name") or metadata.get("ls_model_name") or "unknown"
+        # [start, model, first_token_seen, tier]
+        self._llm_runs[run_id] = [time.perf_counter(), model, False, metadata.get("model_tier", "untiered")]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start_llm(run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start_llm(run_id, kwargs)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._llm_runs.get(run_id)
+        if run is not None and not run[2]:
+            run[2] = True
+            LLM_TIME_TO_FIRST_TOKEN.labels(run[1]).observe(time.perf_counter() - run[0])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._llm_runs.pop(run_id, None)
+        if run is None:
+            return
+        start, model, first_token_seen, tier = run
+        elapsed = time.perf_counter() - start
+        LLM_LATENCY.labels(model, "ok").observe(elapsed)
+        LLM_TIER_LATENCY.labels(tier, model).observe(elapsed)
+        if not first_token_seen:
+            # Non-streaming call: the whole response arrives at once
+            LLM_TIME_TO_FIRST_TOKEN.labels(model).observe(elapsed)
+
+        input_tokens, output_tokens, cached_tokens = _extract_token_usage(response)
+        if input_tokens:
+            LLM_TOKENS.labels(model, "input").inc(input_tokens)
+        if output_tokens:
+            LLM_TOKENS.labels(model, "output").inc(output_tokens)
+        if cached_tokens:
+            LLM_TOKENS.labels(model, "cached_input").inc(cached_tokens)
+        usage = _request_usage.get()
+        if usage is not None:
+            usage.add(input_tokens, cached_tokens, output_tokens)
+        cost = estimate_cost(model, input_tokens, output_tokens, cached_tokens)
+        if cost:
+            LLM_COST.labels(tier, model).inc(cost)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._llm_runs.pop(run_id, None)
+        if run is not None:
+            LLM_LATENCY.labels(run[1], "error").observe(time.perf_counter() - run[0])
+
+    # --- Tools ---
+
+    def on_tool_start(self, serialized, input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "unknown"
+        self._tool_runs[run_id] = (time.perf_counter(), name)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._tool_runs.pop(run_id, None)
+        if run is not None:
+            TOOL_LATENCY.labels(run[1], "ok").observe(time.perf_counter() - run[0])
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._tool_runs.pop(run_id, None)
+        if run is not None:
+            TOOL_LATENCY.labels(run[1], "error").observe(time.perf_counter() - run[0])
+
+
+def _extract_token_usage(response: LLMResult) -> tuple[int, int, int]:
+    """Reads (input, output, cached input) token counts from usage_metadata or the provider's llm_output."""
+    input_tokens = output_tokens = cached_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage: Optional[dict] = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                cached_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    if not (input_tokens or output_tokens) and response.llm_output:
+        token_usage = response.llm_output.get("token_usage") or {}
+        input_tokens = token_usage.get("prompt_tokens", 0)
+        output_tokens = token_usage.get("completion_tokens", 0)
+        cached_tokens = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0
+    return input_tokens, output_tokens, cached_tokens
+
+
+# Shared handler; pass it in the `callbacks` of a RunnableConfig.
+metrics_callback = MetricsCallbackHandler()
@@ -0,0 +1,286 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, TypeVar
+
+import app.core.config as config
+from app.core.metrics import DEPENDENCY_CALLS, DEPENDENCY_LATENCY, DEPENDENCY_HEDGES, CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Dependency names (metrics labels, RESILIENCE_* settings)
+OPENAI_CHAT = "openai_chat"
+OPENAI_CHAT_GENERATE = "openai_chat_generate"  # Long generations, with their own latency window and breaker
+OPENAI_EMBEDDINGS = "openai_embeddings"
+PINECONE = "pinecone"
+TAVILY = "tavily"
+DOCUMENT_DOWNLOAD = "document_download"
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Client errors say nothing about the dependency's health; timeouts and rate limits do
+_HEALTHY_STATUS = range(400, 500)
+_UNHEALTHY_STATUS = {408, 429}
+
+
+class DependencyUnavailable(Exception):
+    """The dependency did not answer: its circuit is open or the call timed out."""
+
+
+class CircuitOpenError(DependencyUnavailable):
+    pass
+
+
+class DependencyTimeout(DependencyUnavailable):
+    pass
+
+
+def _is_failure(error: Exception, failures: tuple) -> bool:
+    if not isinstance(error, failures):
+        return False
+    status = getattr(error, "status_code", None)
+    return status is None or status not in _HEALTHY_STATUS or status in _UNHEALTHY_STATUS
+
+
+class LatencyWindow:
+    """The most recent call latencies of a dependency, for percentile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float, min_samples: int) -> Optional[float]:
+        """None until there are `min_samples` samples."""
+        with self._lock:
+            if len(self._samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; calls are then rejected without being
+    made until `cooldown_seconds` have passed, when a single probe call is let through (half-open).
+    The probe's success closes the circuit again, its failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() >= self._opened_at + self.cooldown_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.warning("Circuit for %s is now %s", self.name, state)
+        self._state = state
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == OPEN and self._clock() >= self._opened_at + self.cooldown_seconds:
+                self._set_state(HALF_OPEN)
+                self._probing = False
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._set_state(OPEN)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=config.RESILIENCE_MAX_WORKERS, thread_name_prefix="dependency")
+    return _executor
+
+
+class Dependency:
+    """
+    An external dependency's calls, guarded by a circuit breaker and an adaptive timeout, and
+    hedged (when `hedged`) with one duplicate request once the first is slower than the
+    dependency's usual latency. Calls run on a shared worker pool, in a copy of the caller's
+    context (priority, tenant and token-usage tracking carry over); a timed-out call is
+    abandoned, not interrupted.
+    """
+
+    def __init__(self, name: str, hedged: bool = False, timeout_bounds: tuple = (5.0, 60.0),
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.hedged = hedged
+        self.timeout_floor, self.timeout_ceiling = timeout_bounds
+        self.breaker = breaker or CircuitBreaker(name, config.RESILIENCE_BREAKER_FAILURES,
+                                                 config.RESILIENCE_BREAKER_COOLDOWN_SECONDS)
+        self.latency = LatencyWindow()
+        self._calls = 0
+        self._hedges = 0
+        self._counter_lock = threading.Lock()
+
+    def timeout(self) -> float:
+        """RESILIENCE_TIMEOUT_MULTIPLIER x the recent p99 latency, within the dependency's bounds."""
+        p99 = self.latency.percentile(config.RESILIENCE_TIMEOUT_PERCENTILE, config.RESILIENCE_MIN_SAMPLES)
+        if p99 is None:
+            return self.timeout_ceiling
+        return min(self.timeout_ceiling, max(self.timeout_floor, p99 * config.RESILIENCE_TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a duplicate request is sent, or None (not hedged / too few samples)."""
+        if not self.hedged:
+            return None
+        delay = self.latency.percentile(config.RESILIENCE_HEDGE_PERCENTILE, config.RESILIENCE_MIN_SAMPLES)
+        return None if delay is None else max(delay, config.RESILIENCE_HEDGE_MIN_SECONDS)
+
+    def _take_hedge(self) -> bool:
+        with self._counter_lock:
+            if self._hedges + 1 > config.RESILIENCE_HEDGE_MAX_RATIO * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+    def _submit(self, fn: Callable[[], T]):
+        def timed():
+            start = time.monotonic()
+            return fn(), time.monotonic() - start
+        return _get_executor().submit(contextvars.copy_context().run, timed)
+
+    def call(self, fn: Callable[[], T], fallback: Optional[Callable[[], T]] = None,
+             failures: tuple = (Exception,), min_timeout: float = 0.0) -> T:
+        """
+        fn() under the dependency's breaker, timeout (at least `min_timeout`, within the ceiling) and hedging. When the circuit is open or the
+        call times out, returns fallback() if given, else raises CircuitOpenError / DependencyTimeout.
+        Errors raised by fn are re-raised; those of the `failures` types count against the breaker
+        unless they carry a 4xx status_code (other than 408/429).
+        """
+        if not config.RESILIENCE_ENABLED:
+            return fn()
+        if not self.breaker.allow():
+            DEPENDENCY_CALLS.labels(self.name, "rejected").inc()
+            return self._fallback(fallback, CircuitOpenError(f"The {self.name} circuit is open"))
+        with self._counter_lock:
+            self._calls += 1
+        timeout = min(self.timeout_ceiling, max(self.timeout(), min_timeout))
+        try:
+            result, seconds = self._run(fn, timeout)
+        except DependencyTimeout as e:
+            self.latency.add(timeout)
+            self.breaker.record_failure()
+            DEPENDENCY_CALLS.labels(self.name, "timeout").inc()
+            return self._fallback(fallback, e)
+        except Exception as e:
+            if _is_failure(e, failures):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            DEPENDENCY_CALLS.labels(self.name, "error").inc()
+            raise
+        self.latency.add(seconds)
+        self.breaker.record_success()
+        DEPENDENCY_CALLS.labels(self.name, "ok").inc()
+        DEPENDENCY_LATENCY.labels(self.name).observe(seconds)
+        return result
+
+    def _run(self, fn: Callable[[], T], timeout: float) -> tuple:
+        start = time.monotonic()
+        deadline = start + timeout
+        hedge_delay = self.hedge_delay()
+        primary = self._submit(fn)
+        pending = {primary}
+        error: Optional[BaseException] = None
+        while pending:
+            now = time.monotonic()
+            wait_seconds = deadline - now
+            if hedge_delay is not None:
+                wait_seconds = min(wait_seconds, start + hedge_delay - now)
+            done, pending = wait(pending, timeout=max(wait_seconds, 0.0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        DEPENDENCY_HEDGES.labels(self.name, "won").inc()
+                    return future.result()
+                error = error or future.exception()
+            if not pending:
+                break
+            if time.monotonic() >= deadline:
+                raise DependencyTimeout(f"{self.name} did not answer within {timeout:.2f}s")
+            if hedge_delay is not None and time.monotonic() >= start + hedge_delay:
+                hedge_delay = None  # At most one duplicate
+                if self._take_hedge():
+                    DEPENDENCY_HEDGES.labels(self.name, "issued").inc()
+                    pending.add(self._submit(fn))
+        raise error
+
+    def _fallback(self, fallback: Optional[Callable[[], T]], error: DependencyUnavailable) -> T:
+        if fallback is None:
+            raise error
+        logger.warning("%s unavailable (%s); using the fallback", self.name, error)
+        DEPENDENCY_CALLS.labels(self.name, "fallback").inc()
+        return fallback()
+
+
+_dependencies: Dict[str, Dependency] = {}
+_dependencies_lock = threading.Lock()
+
+
+def get_dependency(name: str) -> Dependency:
+    """Returns the process-wide guard for a dependency, configured from RESILIENCE_* settings."""
+    dependency = _dependencies.get(name)
+    if dependency is None:
+        with _dependencies_lock:
+            dependency = _dependencies.get(name)
+            if dependency is None:
+                dependency = Dependency(name, hedged=name in config.RESILIENCE_HEDGED_DEPENDENCIES,
+                                        timeout_bounds=config.RESILIENCE_TIMEOUT_BOUNDS.get(name, (5.0, 60.0)))
+                _dependencies[name] = dependency
+    return dependency
+
+
+def reset_dependencies() -> None:
+    """Forgets breaker states and latency history (tests and benchmarks)."""
+    with _dependencies_lock:
+        _dependencies.clear()
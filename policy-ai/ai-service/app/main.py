@@ -1,11 +1,40 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from app.core.logging_config import configure_logging
+
+# Configure logging before importing modules that log at import time
+configure_logging()
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api import internal_v1, auth
+from app.core.components import readiness_report, unbuilt_required_components, warm_up, warm_up_in_background
+from app.core.compression import CompressionMiddleware
+from app.core.config import WARMUP_ON_STARTUP, WARMUP_MAX_WORKERS, RESPONSE_COMPRESSION_ENABLED
+from app.core.metrics import REQUEST_LATENCY, endpoint_label, render_metrics, track_token_usage
+from app.utils.cpu_pool import shutdown_cpu_pool
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    if WARMUP_ON_STARTUP:
+        # Runs in a worker thread so the server accepts requests (and /health, /ready) meanwhile
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, max_workers=WARMUP_MAX_WORKERS))
+    yield
+    if warmup_task and not warmup_task.done():
+        await warmup_task
+    await asyncio.to_thread(shutdown_cpu_pool)
 
 app = FastAPI(
     title="Policy AI - AI Service",
     description="Handles AI/ML tasks like RAG, document processing, and embedding for Policy AI.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -23,10 +52,53 @@ app.add_middleware(
     allow_headers=["*"],    
 )
 
+if RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """
+    Observes request latency labelled by route template (not raw path) to keep cardinality bounded,
+    and logs the request's LLM token usage, including input tokens served from the prompt cache.
+    """
+    start = time.perf_counter()
+    status = 500
+    with track_token_usage() as usage:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            endpoint = endpoint_label(request.scope)
+            REQUEST_LATENCY.labels(request.method, endpoint, str(status)).observe(time.perf_counter() - start)
+            if usage.calls:
+                # Streamed responses are logged when their headers go out, before all their calls are made
+                logger.info("%s %s: %d LLM calls, %d input tokens (%d cached), %d output tokens",
+                            request.method, endpoint, usage.calls, usage.input_tokens, usage.cached_tokens, usage.output_tokens)
+
 app.include_router(internal_v1.router, prefix="/api/internal/v1")
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 
 @app.get("/health", tags=["Health"])
 def read_root():
-    """Health check endpoint."""
+    """Health check endpoint (liveness: the process is up)."""
     return {"status": "OK"}
+
+@app.get("/ready", tags=["Health"])
+def read_ready():
+    """
+    Readiness endpoint: per-dependency status and initialisation timings. 503 until usable.
+    Required components not built yet (no warm-up on startup, or a failed build) are built in
+    the background, so a fresh or recovering instance turns ready without waiting for traffic.
+    """
+    report = readiness_report()
+    unbuilt = unbuilt_required_components()
+    if unbuilt and warm_up_in_background(unbuilt, max_workers=WARMUP_MAX_WORKERS):
+        report = readiness_report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def metrics():
+    """Prometheus metrics endpoint."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
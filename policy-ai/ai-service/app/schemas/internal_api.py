@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 
 class QueryRequest(BaseModel):
     query: str
@@ -7,6 +7,7 @@ class QueryRequest(BaseModel):
     user_id: Optional[str] = None
     current_policy_text: Optional[str] = None
     document_url: str | None = None
+    tenant: Optional[str] = None  # Knowledge base to search (DEFAULT_TENANT if not given; see ALLOWED_TENANTS)
 
 class QueryResponse(BaseModel):
     answer: str
@@ -20,18 +21,80 @@ class QueryResponse(BaseModel):
 #     success: bool
 #     message: str | None = None
 
+# --- Schemas for background jobs ---
+
+class JobStartResponse(BaseModel):
+    message: str
+    job_id: str
+    status: str
+
+class JobFileCounts(BaseModel):
+    pending: int = 0
+    processing: int = 0
+    done: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    params: Dict[str, Any] = {}
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    files_total: int
+    files: JobFileCounts
+    chunks_indexed: int
+    elapsed_seconds: float
+    files_per_sec: float
+    chunks_per_sec: float
+    eta_seconds: Optional[float] = None
+
+class JobFileStatus(BaseModel):
+    file_key: str
+    state: str
+    chunks: int
+    error: Optional[str] = None
+    updated_at: float
+
 # --- Schemas for Policy Creation and Editing ---
 
+class BatchAnalysisRequest(BaseModel):
+    document_urls: List[str]
+    concurrency: Optional[int] = None  # Analyses in flight (capped at BATCH_ANALYSIS_CONCURRENCY)
+
+# "html_diff": the whole policy with <ins>/<del> markup; "ops": edit operations against current_policy_text
+PolicyResponseFormat = Literal["html_diff", "ops"]
+
+class PolicyDiffOp(BaseModel):
+    block: int  # Block of current_policy_text the change falls in
+    start: int  # Replace current_policy_text[start:end] with text
+    end: int
+    text: str
+
+class PolicyDiffOps(BaseModel):
+    base_length: int  # Length and SHA-1 of the text the operations apply to
+    base_sha1: str
+    blocks: int
+    ops: List[PolicyDiffOp]
+
 class PolicyDraftRequest(BaseModel):
     prompt: str
     current_policy_text: Optional[str] = None
+    response_format: PolicyResponseFormat = "html_diff"
 
 class PolicyDraftResponse(BaseModel):
-    draft_text: str
+    draft_text: Optional[str] = None
+    changes: Optional[PolicyDiffOps] = None  # With response_format "ops"
 
 class PolicyEditRequest(BaseModel):
     current_policy_text: str
     edit_instruction: str
+    response_format: PolicyResponseFormat = "html_diff"
 
 class PolicyEditResponse(BaseModel):
-    edited_policy_text: str
+    edited_policy_text: Optional[str] = None
+    changes: Optional[PolicyDiffOps] = None  # With response_format "ops"
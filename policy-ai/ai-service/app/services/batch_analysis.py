@@ -0,0 +1,114 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+from app.ai.llm_scheduler import Priority
+from app.ai.rag_agent import analyze_policy_text
+from app.core.config import ANALYSIS_MAX_CHARS, BATCH_FETCH_CONCURRENCY, BATCH_ANALYSIS_CONCURRENCY
+from app.core.metrics import BATCH_ANALYSIS_DOCUMENTS
+from app.utils.pdf_processor import download_pdf_content, extract_text_from_pdf
+
+logger = logging.getLogger(__name__)
+
+# Error codes reported per document
+ERROR_DOWNLOAD = "download_failed"
+ERROR_NO_TEXT = "no_text"
+ERROR_ANALYSIS = "analysis_failed"
+
+
+class BatchItemError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _fetch_text(url: str) -> str:
+    pdf_bytes = download_pdf_content(url)
+    if not pdf_bytes:
+        raise BatchItemError(ERROR_DOWNLOAD, "The document could not be downloaded.")
+    text = extract_text_from_pdf(pdf_bytes)
+    if not text:
+        raise BatchItemError(ERROR_NO_TEXT, "No text could be extracted from the document.")
+    return text
+
+
+def _result(index: int, url: str, started: float, **fields) -> dict:
+    BATCH_ANALYSIS_DOCUMENTS.labels(fields.get("error_code", "ok")).inc()
+    return {"type": "result", "index": index, "document_url": url,
+            "status": "error" if "error_code" in fields else "ok",
+            "seconds": round(time.perf_counter() - started, 3), **fields}
+
+
+def analyze_documents(urls: List[str], concurrency: Optional[int] = None) -> Iterator[dict]:
+    """
+    Analyses policy PDFs and yields one result per document as soon as it is ready (in completion
+    order, with its `index` in `urls`), then a summary. Downloads and text extraction run
+    BATCH_FETCH_CONCURRENCY at a time and feed the analyses, which run `concurrency` at a time at
+    BATCH priority, so a large batch neither exceeds the LLM rate budget nor delays interactive calls.
+    A failed document yields an error result; the others carry on. Closing the iterator early
+    (e.g. the client disconnected) cancels the documents not started yet.
+
+    Downloads stay ahead of the analyses by at most BATCH_FETCH_CONCURRENCY documents: a fetch takes
+    a slot before downloading and the analysis frees it, and only the first ANALYSIS_MAX_CHARS
+    characters of a text are kept while it waits, so a batch of large PDFs holds bounded memory.
+    """
+    workers = concurrency or BATCH_ANALYSIS_CONCURRENCY
+    results: "queue.Queue[dict]" = queue.Queue()
+    slots = threading.Semaphore(workers + BATCH_FETCH_CONCURRENCY)
+    closed = threading.Event()
+    fetch_pool = ThreadPoolExecutor(max_workers=BATCH_FETCH_CONCURRENCY, thread_name_prefix="batch-fetch")
+    analysis_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-analysis")
+
+    def analyse(index: int, url: str, text: str, characters: int, started: float) -> None:
+        try:
+            analysis = analyze_policy_text(text, priority=Priority.BATCH)
+            results.put(_result(index, url, started, analysis=analysis.model_dump(),
+                                truncated=characters > ANALYSIS_MAX_CHARS, characters=characters))
+        except Exception as e:
+            logger.error("Bulk analysis of %s failed: %s", url, e, exc_info=True)
+            results.put(_result(index, url, started, error_code=ERROR_ANALYSIS, error=str(e)))
+        finally:
+            slots.release()
+
+    def fetch(index: int, url: str) -> None:
+        # Waits for the analyses to catch up; gives up once the batch is closed
+        while not slots.acquire(timeout=0.5):
+            if closed.is_set():
+                return
+        started = time.perf_counter()
+        try:
+            text = _fetch_text(url)
+        except BatchItemError as e:
+            slots.release()
+            results.put(_result(index, url, started, error_code=e.code, error=str(e)))
+            return
+        except Exception as e:
+            slots.release()
+            logger.error("Bulk analysis could not load %s: %s", url, e, exc_info=True)
+            results.put(_result(index, url, started, error_code=ERROR_DOWNLOAD, error=str(e)))
+            return
+        try:
+            analysis_pool.submit(analyse, index, url, text[:ANALYSIS_MAX_CHARS], len(text), started)
+        except RuntimeError:
+            slots.release()  # The batch was closed while this document was downloading
+
+    started = time.perf_counter()
+    succeeded = 0
+    try:
+        for index, url in enumerate(urls):
+            fetch_pool.submit(fetch, index, url)
+        for _ in urls:
+            result = results.get()
+            succeeded += result["status"] == "ok"
+            yield result
+        yield {"type": "summary", "total": len(urls), "succeeded": succeeded, "failed": len(urls) - succeeded,
+               "seconds": round(time.perf_counter() - started, 3)}
+    finally:
+        closed.set()
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        analysis_pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("Bulk analysis finished: %d of %d documents analysed in %.1fs",
+                    succeeded, len(urls), time.perf_counter() - started)
@@ -0,0 +1,185 @@
+import re
+from collections import Counter
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from app.core.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_MIN_TOKENS
+from app.utils.tokens import count_tokens
+
+# Top-level divisions of a wording: a new one resets the current article
+_CHAPTER_RE = re.compile(
+    r"^(cap[íi]tulo|t[íi]tulo|secci[óo]n|anexo|condiciones\s+(generales|particulares|especiales))\b", re.IGNORECASE
+)
+_ARTICLE_RE = re.compile(r"^(art[íi]culo|art\.|cl[áa]usula)\s+(\d+|[ivxlc]+|[úu]nic[oa])\b", re.IGNORECASE)
+# Numbered clauses and list items: "3.", "3.2.", "3.2.1", "a)", "iv)"
+_CLAUSE_RE = re.compile(r"^(\d+(\.\d+)*[.)]?|[a-z][).]|[ivx]+[).])\s+\S", re.IGNORECASE)
+_PAGE_NUMBER_RE = re.compile(r"^(p[áa]g(ina)?\.?\s*)?\d+(\s*(de|/)\s*\d+)?$", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.;:])\s+")
+_DIGITS_RE = re.compile(r"\d+")
+
+_CHAPTER, _ARTICLE, _CLAUSE, _TEXT = range(4)
+# Header/footer candidates: this many lines at the top and bottom of each page
+_FURNITURE_LINES = 2
+
+
+def _classify(line: str) -> int:
+    if _ARTICLE_RE.match(line):
+        return _ARTICLE
+    if _CHAPTER_RE.match(line):
+        return _CHAPTER
+    # Cheap checks first: this runs on every line of every page
+    if len(line) <= 80 and " " in line and line.isupper() and sum(c.isalpha() for c in line) >= 6:
+        return _CHAPTER  # Short all-caps line: a heading in almost every wording
+    if _CLAUSE_RE.match(line):
+        return _CLAUSE
+    return _TEXT
+
+
+def _page_furniture(pages: List[List[str]]) -> set:
+    """Lines repeated at the top or bottom of most pages (running headers/footers), digits normalized."""
+    if len(pages) < 3:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        edge = lines[:_FURNITURE_LINES] + lines[-_FURNITURE_LINES:]
+        counts.update({_DIGITS_RE.sub("#", line) for line in edge})
+    return {line for line, count in counts.items() if count >= len(pages) / 2}
+
+
+class _Unit:
+    """A heading, a clause or a paragraph: the smallest piece a chunk boundary never splits."""
+
+    def __init__(self, text: str, page: int, chapter: Optional[str], section: Optional[str], boundary: bool):
+        self.text = text
+        self.page_start = self.page_end = page
+        self.chapter = chapter
+        self.section = section
+        self.boundary = boundary  # Starts a chapter or article: preferred place to start a chunk
+        self.tokens = 0
+
+
+def _structural_units(pages: List[str]) -> List[_Unit]:
+    page_lines = [[line.strip() for line in page.splitlines() if line.strip()] for page in pages]
+    furniture = _page_furniture(page_lines)
+
+    units: List[_Unit] = []
+    chapter = section = None
+    current: Optional[_Unit] = None
+    for page_number, lines in enumerate(page_lines, start=1):
+        for line in lines:
+            if _PAGE_NUMBER_RE.match(line) or _DIGITS_RE.sub("#", line) in furniture:
+                continue
+            kind = _classify(line)
+            if kind == _CHAPTER:
+                chapter, section = line, None
+            elif kind == _ARTICLE:
+                section = line
+            if kind != _TEXT or current is None:
+                current = _Unit(line, page_number, chapter, section, boundary=kind in (_CHAPTER, _ARTICLE))
+                units.append(current)
+            else:
+                # Wrapped line or paragraph continuing onto the next page
+                current.text += "\n" + line
+                current.page_end = page_number
+    for unit in units:
+        unit.tokens = count_tokens(unit.text)
+    return units
+
+
+def _split_unit(unit: _Unit, max_tokens: int) -> List[_Unit]:
+    """Splits a clause longer than max_tokens on sentence ends (or words, for a run-on sentence)."""
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END_RE.split(unit.text):
+        candidate = f"{current} {sentence}" if current else sentence
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            candidate = sentence
+        current = candidate
+    if current:
+        pieces.append(current)
+
+    parts = []
+    for piece in pieces:
+        tokens = count_tokens(piece)
+        if tokens <= max_tokens:
+            parts.append(piece)
+            continue
+        words = piece.split()
+        step = max(1, int(len(words) * max_tokens / tokens))
+        parts.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+
+    split = []
+    for i, part in enumerate(parts):
+        piece = _Unit(part, unit.page_start, unit.chapter, unit.section, boundary=unit.boundary and i == 0)
+        piece.page_end = unit.page_end
+        piece.tokens = count_tokens(part)
+        split.append(piece)
+    return split
+
+
+def _to_document(units: List[_Unit], continued: bool, carried: int = 0) -> Document:
+    first = units[0]
+    text = "\n".join(unit.text for unit in units)
+    # Leading characters that repeat the previous chunk: the carried clauses and the heading
+    overlap = len("\n".join(unit.text for unit in units[:carried])) + 1 if carried else 0
+    if continued and first.section and not text.startswith(first.section):
+        # Chunks that start mid-article repeat its heading so they still make sense on their own
+        text = f"{first.section}\n{text}"
+        overlap += len(first.section) + 1
+    metadata = {"page_start": first.page_start, "page_end": max(unit.page_end for unit in units)}
+    # A chunk opening with a chapter heading takes its section from the first article in it.
+    # Pinecone rejects null metadata values: only set what was detected.
+    chapter = next((unit.chapter for unit in units if unit.chapter), None)
+    section = next((unit.section for unit in units if unit.section), None)
+    if chapter:
+        metadata["chapter"] = chapter
+    if section:
+        metadata["section"] = section
+    if overlap:
+        # Lets context compaction drop the repetition when it merges this chunk with the previous one
+        metadata["overlap_chars"] = overlap
+    return Document(page_content=text, metadata=metadata)
+
+
+def chunk_pages(pages: List[str], max_tokens: int = CHUNK_MAX_TOKENS,
+                overlap_tokens: int = CHUNK_OVERLAP_TOKENS, min_tokens: int = CHUNK_MIN_TOKENS) -> List[Document]:
+    """
+    Splits the pages of a policy wording into chunks of at most max_tokens (plus a repeated article
+    heading). Chunks start at chapter/article boundaries once they hold min_tokens, never split a
+    clause unless it alone exceeds max_tokens, and carry page_start/page_end, chapter and section
+    metadata. Running headers, footers and page numbers are dropped. When an article has to be split
+    by size, whole trailing clauses up to overlap_tokens are repeated in the next chunk, whose
+    overlap_chars metadata gives the length of that repetition (heading included).
+    """
+    units: List[_Unit] = []
+    for unit in _structural_units(pages):
+        units.extend(_split_unit(unit, max_tokens) if unit.tokens > max_tokens else [unit])
+
+    documents: List[Document] = []
+    current: List[_Unit] = []
+    tokens = 0
+    continued = False
+    carried_units = 0  # Leading units of `current` repeated from the previous chunk
+    for unit in units:
+        if current and unit.boundary and tokens >= min_tokens:
+            documents.append(_to_document(current, continued, carried_units))
+            current, tokens, continued, carried_units = [], 0, False, 0
+        elif current and tokens + unit.tokens > max_tokens:
+            documents.append(_to_document(current, continued, carried_units))
+            carried = []
+            if not unit.boundary:
+                carried_tokens = 0
+                for previous in reversed(current):
+                    if (previous.boundary or carried_tokens + previous.tokens > overlap_tokens
+                            or carried_tokens + previous.tokens + unit.tokens > max_tokens):
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous.tokens
+            current, tokens, carried_units = carried, sum(u.tokens for u in carried), len(carried)
+            continued = not unit.boundary
+        current.append(unit)
+        tokens += unit.tokens
+    if current:
+        documents.append(_to_document(current, continued, carried_units))
+    return documents
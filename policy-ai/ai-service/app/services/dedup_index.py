@@ -0,0 +1,280 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.config import (
+    DEDUP_DB_PATH, DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_WORDS,
+)
+from app.core.metrics import INGEST_CHUNKS, INGEST_DEDUP_LATENCY
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_signatures (
+    chunk_id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL,
+    numbers TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signature_bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    chunk_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, chunk_id)
+) WITHOUT ROWID;
+"""
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+class MinHasher:
+    """MinHash signatures over word shingles (stable across processes: the index is persisted)."""
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, shingle_words: int = DEDUP_SHINGLE_WORDS, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _WORD_RE.findall(text.lower())
+        size = self.shingle_words
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # Universal hashing (a*x + b) mod p, vectorised over all permutations at once
+        permuted = (hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+def numbers_fingerprint(text: str) -> str:
+    """
+    The set of numbers in a chunk. Two versions of a clause that only differ in an amount or a
+    deadline ("7 días" vs "10 días") look near-identical to MinHash but must both stay indexed.
+    """
+    numbers = sorted(set(_NUMBER_RE.findall(text)))
+    return hashlib.sha1(" ".join(numbers).encode("utf-8")).hexdigest()[:16]
+
+
+class DedupResult:
+    """Outcome of de-duplicating one file's chunks."""
+
+    def __init__(self):
+        self.documents: List[Document] = []  # Chunks to upsert (first occurrence of their text)
+        self.ids: List[str] = []
+        self.duplicates = 0
+        # Chunks indexed by earlier files that gained sources (known once the dedup block exits):
+        # their vector metadata needs updating
+        self.updated_sources: Dict[str, List[str]] = {}
+
+
+class DedupIndex:
+    """
+    Persisted MinHash/LSH index of every chunk indexed in Pinecone. A new chunk whose estimated
+    Jaccard similarity with an indexed chunk reaches the threshold (and that has the same numbers)
+    is not indexed again; its source is added to the indexed chunk's `sources` instead.
+    """
+
+    def __init__(self, db_path: str = DEDUP_DB_PATH, threshold: float = DEDUP_THRESHOLD,
+                 num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS, shingle_words: int = DEDUP_SHINGLE_WORDS):
+        if num_perm % bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) must be a multiple of DEDUP_BANDS ({bands}).")
+        self.db_path = db_path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_words)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _band_buckets(self, signature: np.ndarray, scope: str = "") -> List[int]:
+        # The scope seeds the bucket hash, so chunks only collide with chunks of the same scope;
+        # the default scope ("") hashes exactly like buckets stored before scopes existed
+        seed = zlib.crc32(scope.encode("utf-8")) if scope else 0
+        return [zlib.crc32(signature[band * self.rows:(band + 1) * self.rows].tobytes(), seed) for band in range(self.bands)]
+
+    def _most_similar(self, candidates, signature: np.ndarray, numbers: str) -> Optional[str]:
+        """The candidate (chunk_id, signature, numbers) most similar to the signature, at or above the threshold."""
+        best, best_similarity = None, self.threshold
+        for candidate, stored_signature, stored_numbers in candidates:
+            if stored_numbers != numbers:
+                continue
+            similarity = float(np.mean(stored_signature == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def _best_match(self, conn, chunk_id: str, signature: np.ndarray, numbers: str, scope: str) -> Optional[str]:
+        candidates = set()
+        for band, bucket in enumerate(self._band_buckets(signature, scope)):
+            rows = conn.execute(
+                "SELECT chunk_id FROM signature_bands WHERE band = ? AND bucket = ?", (band, bucket)
+            ).fetchall()
+            candidates.update(row[0] for row in rows)
+        candidates.discard(chunk_id)
+
+        def stored():
+            for candidate in candidates:
+                stored_signature, stored_numbers = conn.execute(
+                    "SELECT signature, numbers FROM chunk_signatures WHERE chunk_id = ?", (candidate,)
+                ).fetchone()
+                yield candidate, np.frombuffer(stored_signature, dtype=np.uint32), stored_numbers
+        return self._most_similar(stored(), signature, numbers)
+
+    def _insert(self, conn, chunk_id: str, signature: np.ndarray, numbers: str, source: str, scope: str) -> None:
+        existing = conn.execute("SELECT sources FROM chunk_signatures WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        sources = json.loads(existing[0]) if existing else []
+        if source not in sources:
+            sources.insert(0, source)
+        # Re-ingesting a changed file replaces the chunk's signature but keeps the sources pointing at it
+        conn.execute("DELETE FROM signature_bands WHERE chunk_id = ?", (chunk_id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO chunk_signatures (chunk_id, signature, numbers, sources, created_at) VALUES (?, ?, ?, ?, ?)",
+            (chunk_id, signature.tobytes(), numbers, json.dumps(sources), time.time()),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO signature_bands (band, bucket, chunk_id) VALUES (?, ?, ?)",
+            [(band, bucket, chunk_id) for band, bucket in enumerate(self._band_buckets(signature, scope))],
+        )
+
+    def _add_source(self, conn, chunk_id: str, source: str) -> Optional[List[str]]:
+        """Adds a source to an indexed chunk. Returns the new list, or None if it was already there."""
+        sources = json.loads(conn.execute("SELECT sources FROM chunk_signatures WHERE chunk_id = ?", (chunk_id,)).fetchone()[0])
+        if source in sources:
+            return None
+        sources.append(source)
+        conn.execute("UPDATE chunk_signatures SET sources = ? WHERE chunk_id = ?", (json.dumps(sources), chunk_id))
+        return sources
+
+    def _stored_sources(self, conn, chunk_id: str) -> List[str]:
+        row = conn.execute("SELECT sources FROM chunk_signatures WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    @contextmanager
+    def deduplicate(self, docs: List[Document], ids: List[str], scope: str = "") -> Iterator[DedupResult]:
+        """
+        De-duplicates one file's chunks against the index (and each other). Yields the chunks to
+        upsert, each with a `sources` metadata list. Matching runs in a short read transaction and
+        the signatures are recorded in a second short write transaction once the block exits
+        cleanly, so the index is not locked while the block embeds and upserts, and a failed upsert
+        leaves no chunk registered that isn't in Pinecone. `updated_sources` is only final after
+        the block: update the vector metadata of those chunks then.
+        Only chunks indexed with the same `scope` (e.g. tenant and product line) count as duplicates.
+        """
+        result = DedupResult()
+        start = time.perf_counter()
+        new, matches = self._plan(docs, ids, scope, result)
+        INGEST_DEDUP_LATENCY.observe(time.perf_counter() - start)
+        yield result
+        self._record(new, matches, scope, result)
+        INGEST_CHUNKS.labels("indexed").inc(len(result.documents))
+        INGEST_CHUNKS.labels("duplicate").inc(result.duplicates)
+        logger.info("Dedup: %d chunks, %d duplicates, %d indexed chunks gained sources",
+                    len(docs), result.duplicates, len(result.updated_sources))
+
+    def _plan(self, docs: List[Document], ids: List[str], scope: str, result: DedupResult) -> tuple:
+        """
+        Matches the chunks against one snapshot of the index. Returns the chunks to register,
+        as (chunk_id, signature, numbers, source), and the (indexed chunk, source) pairs to link.
+        """
+        new, matches = [], []
+        planned: Dict[str, tuple] = {}  # Chunks of this file to be indexed: id -> (signature, numbers)
+        planned_buckets: Dict[tuple, List[str]] = {}
+        with self._connect() as conn:
+            conn.execute("BEGIN")  # Read-only: one consistent snapshot, no write lock
+            try:
+                for doc, chunk_id in zip(docs, ids):
+                    source = doc.metadata.get("source", "")
+                    signature = self.hasher.signature(doc.page_content)
+                    numbers = numbers_fingerprint(doc.page_content)
+                    buckets = list(enumerate(self._band_buckets(signature, scope)))
+                    match = self._best_match(conn, chunk_id, signature, numbers, scope)
+                    if match is None:
+                        # Near-duplicates within the file itself are indexed once too
+                        candidates = {c for key in buckets for c in planned_buckets.get(key, ())} - {chunk_id}
+                        match = self._most_similar(((c, *planned[c]) for c in candidates), signature, numbers)
+                    if match is None:
+                        planned[chunk_id] = (signature, numbers)
+                        for key in buckets:
+                            planned_buckets.setdefault(key, []).append(chunk_id)
+                        new.append((chunk_id, signature, numbers, source))
+                        sources = self._stored_sources(conn, chunk_id)
+                        doc.metadata["sources"] = sources if source in sources else [source] + sources
+                        result.documents.append(doc)
+                        result.ids.append(chunk_id)
+                        continue
+                    result.duplicates += 1
+                    if match not in planned:
+                        matches.append((match, source))
+            finally:
+                conn.execute("COMMIT")
+        return new, matches
+
+    def _record(self, new: list, matches: list, scope: str, result: DedupResult) -> None:
+        """
+        Registers the upserted chunks and links the duplicates' sources. Sources are re-read here, so
+        files ingested concurrently don't overwrite each other's; a near-duplicate indexed by another
+        file since _plan is logged, and both stay registered since both vectors are in Pinecone.
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for chunk_id, signature, numbers, source in new:
+                    raced = self._best_match(conn, chunk_id, signature, numbers, scope)
+                    if raced is not None:
+                        logger.info("Chunk %s was indexed concurrently with its near-duplicate %s", chunk_id, raced)
+                    self._insert(conn, chunk_id, signature, numbers, source, scope)
+                for match, source in matches:
+                    sources = self._add_source(conn, match, source)
+                    if sources is not None:
+                        result.updated_sources[match] = sources
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            chunks = conn.execute("SELECT COUNT(*) FROM chunk_signatures").fetchone()[0]
+            sources = sum(len(json.loads(row[0])) for row in conn.execute("SELECT sources FROM chunk_signatures"))
+        return {"indexed_chunks": chunks, "chunk_sources": sources}
+
+
+_dedup_index: Optional[DedupIndex] = None
+_dedup_index_lock = threading.Lock()
+
+
+def get_dedup_index() -> DedupIndex:
+    """Returns the process-wide de-duplication index."""
+    global _dedup_index
+    if _dedup_index is None:
+        with _dedup_index_lock:
+            if _dedup_index is None:
+                _dedup_index = DedupIndex()
+    return _dedup_index
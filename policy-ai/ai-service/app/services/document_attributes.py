@@ -0,0 +1,134 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.core.config import DEFAULT_TENANT, INGEST_KEY_PATTERN
+
+ATTRIBUTE_FIELDS = ("tenant", "product_line", "document_type", "insurer", "effective_date")
+# Attributes that scope de-duplication: a clause is only shared between documents that agree on these
+DEDUP_SCOPE_FIELDS = ("tenant", "product_line", "document_type", "insurer")
+# `superseded_on` of a chunk still in effect in the latest version of its wording (yyyymmdd, like the dates)
+NOT_SUPERSEDED = 99991231
+
+# Values policy_rag_tool accepts for its filters, with the keywords that identify them in a wording
+PRODUCT_LINES = {
+    "hogar": ("hogar", "vivienda", "multirriesgo del hogar"),
+    "autos": ("automóvil", "vehículo", "autos", "conductor"),
+    "vida": ("seguro de vida", "fallecimiento", "vida riesgo"),
+    "salud": ("asistencia sanitaria", "seguro de salud", "cuadro médico"),
+    "comercio": ("comercio", "pyme", "establecimiento comercial", "multirriesgo empresarial"),
+    "responsabilidad_civil": ("responsabilidad civil general", "seguro de responsabilidad civil"),
+}
+DOCUMENT_TYPES = {
+    "condiciones_particulares": ("condiciones particulares",),
+    "condiciones_especiales": ("condiciones especiales",),
+    "condiciones_generales": ("condiciones generales",),
+    "nota_informativa": ("nota informativa", "documento de información previa"),
+}
+
+_INSURER_RE = re.compile(
+    r"^([A-ZÁÉÍÓÚÑ][\w.,&' -]{2,80}?\b(?:S\.A\.U?\.?|Seguros|Mutua|Mutualidad|Aseguradora|Compañía de Seguros)[\w.,' -]{0,40})$",
+    re.MULTILINE,
+)
+_EFFECTIVE_DATE_RE = re.compile(
+    r"(?:fecha de efecto|entrada en vigor|vigente desde|efecto desde)\D{0,30}?(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})",
+    re.IGNORECASE,
+)
+_ISO_DATE_RE = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})$")
+
+
+def _slug(value: str) -> str:
+    value = unicodedata.normalize("NFKD", value.strip().lower())
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", "_", value).strip("_")
+
+
+def parse_date(value) -> Optional[int]:
+    """YYYY-MM-DD / YYYYMMDD / DD/MM/YYYY (or an int) to the yyyymmdd number stored in the index."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, int):
+        return value
+    text = str(value).strip()
+    match = _ISO_DATE_RE.match(text)
+    if match:
+        year, month, day = match.groups()
+    else:
+        parts = re.split(r"[/.-]", text)
+        if len(parts) != 3:
+            raise ValueError(f"Unrecognised date: {value!r}")
+        day, month, year = parts
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+
+def _earliest_mention(text: str, values: Dict[str, tuple]) -> Optional[str]:
+    """The value whose keywords appear first: titles come before the clauses that mention other documents."""
+    positions = {}
+    for value, keywords in values.items():
+        found = [text.find(keyword) for keyword in keywords if keyword in text]
+        if found:
+            positions[value] = min(found)
+    return min(positions, key=positions.get) if positions else None
+
+
+def _from_text(pages: List[str]) -> Dict[str, object]:
+    head = "\n".join(pages[:3])
+    lowered = head.lower()
+    attributes = {}
+    for field, values in (("product_line", PRODUCT_LINES), ("document_type", DOCUMENT_TYPES)):
+        value = _earliest_mention(lowered, values)
+        if value:
+            attributes[field] = value
+    # The insurer's name is usually the running header, so the most repeated candidate line wins
+    insurers = Counter(match.strip() for page in pages[:10] for match in _INSURER_RE.findall(page))
+    if insurers:
+        attributes["insurer"] = insurers.most_common(1)[0][0]
+    match = _EFFECTIVE_DATE_RE.search(head)
+    if match:
+        day, month, year = match.groups()
+        attributes["effective_date"] = int(year) * 10000 + int(month) * 100 + int(day)
+    return attributes
+
+
+def normalize_attributes(attributes: Dict[str, object]) -> Dict[str, object]:
+    """Slugs the categorical attributes and converts dates, dropping empty values."""
+    normalized = {}
+    for field, value in attributes.items():
+        if value is None or value == "" or field not in ATTRIBUTE_FIELDS:
+            continue
+        if field == "effective_date":
+            normalized[field] = parse_date(value)
+        elif field == "insurer":
+            normalized[field] = str(value).strip()
+        else:
+            normalized[field] = _slug(str(value))
+    return normalized
+
+
+def extract_attributes(source: str, pages: List[str], object_metadata: Optional[Dict[str, str]] = None) -> Dict[str, object]:
+    """
+    Filterable attributes of a document. Precedence: object metadata (e.g. S3 x-amz-meta-product-line),
+    then named groups of INGEST_KEY_PATTERN matched against the source, then the wording itself.
+    The tenant defaults to DEFAULT_TENANT.
+    """
+    attributes: Dict[str, object] = {"tenant": DEFAULT_TENANT}
+    attributes.update(_from_text(pages))
+    if INGEST_KEY_PATTERN:
+        match = re.search(INGEST_KEY_PATTERN, source)
+        if match:
+            attributes.update({k: v for k, v in match.groupdict().items() if v})
+    for key, value in (object_metadata or {}).items():
+        field = key.lower().replace("-", "_")
+        if field in ATTRIBUTE_FIELDS and value:
+            attributes[field] = value
+    return normalize_attributes(attributes)
+
+
+def dedup_scope(attributes: Dict[str, object]) -> str:
+    """De-duplication scope of a document; "" for documents with only default attributes."""
+    parts = [
+        f"{field}={attributes[field]}" for field in DEDUP_SCOPE_FIELDS
+        if attributes.get(field) and not (field == "tenant" and attributes[field] == DEFAULT_TENANT)
+    ]
+    return "|".join(parts)
@@ -1,12 +1,25 @@
 import os
+from typing import Optional
 import boto3
-from pypdf import PdfReader
-from io import BytesIO
 from langchain.docstore.document import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
 
-from app.ai.vector_store import add_documents_to_pinecone
+from app.ai.vector_store import (
+    add_documents_to_pinecone, make_chunk_id, update_chunk_metadata, fetch_chunk_metadata, find_chunks,
+)
+from app.ai.retrieval_filters import build_filter, namespace_for
+from app.ai.llm_scheduler import priority_scope, Priority
+from app.core.config import CHUNKER, INGEST_DEDUP
+from app.services.chunking import chunk_pages
+from app.utils.cpu_pool import run_cpu
+from app.utils.pdf_processor import extract_pdf_pages
+from app.services.dedup_index import get_dedup_index
+from app.services.document_attributes import extract_attributes, dedup_scope, DEDUP_SCOPE_FIELDS, NOT_SUPERSEDED
+from app.services.job_store import (
+    get_job_store, JobConflictError, JobReapedError, JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED,
+    FILE_DONE, FILE_FAILED, FILE_PROCESSING, FILE_SKIPPED,
+)
 
 load_dotenv()
 
@@ -16,19 +29,20 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 S3_PREFIX = os.getenv("S3_PREFIX")
 
-def extract_text_from_pdf(pdf_content: bytes) -> str:
-    """Extracts text from PDF content bytes."""
-    text = ""
+S3_INGEST_JOB_KIND = "s3_ingest"
+
+def extract_pages_from_pdf(pdf_content: bytes) -> list[str]:
+    """Extracts the text of each page from PDF content bytes (empty string for pages without text)."""
     try:
-        reader = PdfReader(BytesIO(pdf_content))
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n" # Add newline between pages
+        return extract_pdf_pages(pdf_content)
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
         # Handle cases where PDF might be corrupted or unreadable
-    return text
+        return []
+
+def extract_text_from_pdf(pdf_content: bytes) -> str:
+    """Extracts text from PDF content bytes."""
+    return "".join(page + "\n" for page in extract_pages_from_pdf(pdf_content) if page) # Add newline between pages
 
 def get_text_chunks(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list[str]:
     """Splits text into chunks using RecursiveCharacterTextSplitter."""
@@ -41,71 +55,233 @@ def get_text_chunks(text: str, chunk_size: int = 1000, chunk_overlap: int = 200)
     chunks = text_splitter.split_text(text)
     return chunks
 
-def process_s3_documents():
-    """Downloads PDFs from S3, processes them, and adds them to Pinecone."""
+def split_pages(pages: list[str]) -> list[Document]:
+    """Chunks a document's pages with the configured chunker (see CHUNKER)."""
+    if CHUNKER == "recursive":
+        return [Document(page_content=chunk, metadata={}) for chunk in get_text_chunks("".join(p + "\n" for p in pages if p))]
+    return run_cpu("chunking", chunk_pages, pages, size=sum(len(page) for page in pages))
+
+def _list_s3_pdf_keys(s3_client) -> list[str]:
+    """Lists the PDF keys under the configured S3 prefix."""
+    keys = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=S3_PREFIX):
+        for obj in page.get("Contents", []):
+            s3_key = obj['Key']
+            if not s3_key.lower().endswith('.pdf'):
+                print(f"Skipping non-PDF file: {s3_key}")
+                continue
+            keys.append(s3_key)
+    return keys
+
+def _process_s3_file(s3_client, s3_key: str) -> int:
+    """Downloads, chunks and indexes a single PDF. Returns the number of chunks indexed."""
+    # Download PDF content
+    response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+    pdf_content = response['Body'].read()
+
+    # Extract text, page by page so chunks can record where they come from
+    pages = extract_pages_from_pdf(pdf_content)
+    if not any(page.strip() for page in pages):
+        print(f"No text extracted from {s3_key}. Skipping.")
+        return 0
+    source = f"s3://{S3_BUCKET_NAME}/{s3_key}"
+    # S3 user metadata (x-amz-meta-*) takes precedence over the key pattern and the wording
+    attributes = extract_attributes(source, pages, response.get('Metadata'))
+    return index_document(source, pages, attributes)
+
+def index_document(source: str, pages: list[str], attributes: Optional[dict] = None) -> int:
+    """
+    Chunks a document's pages and indexes the chunks under `source`. Returns the number of chunks.
+    Every chunk carries the document's filterable attributes (extracted from the pages if not given).
+    """
+    if attributes is None:
+        attributes = extract_attributes(source, pages)
+    namespace = namespace_for(attributes.get("tenant", ""))
+    # A wording ingested after a newer version of it is superseded from that version's effective date
+    superseded_on, newer_sources = _newer_versions(source, attributes, namespace)
+    # Split into chunks
+    text_chunks = split_pages(pages)
+    if not text_chunks:
+        print(f"No chunks created from {source}. Skipping.")
+        return 0
+
+    # Create Langchain Document objects for chunks
+    docs_to_add = []
+    ids = []
+    for i, chunk in enumerate(text_chunks):
+        # Add relevant metadata (the chunker adds page and section when it detects them)
+        metadata = {
+            **chunk.metadata,
+            **attributes,
+            "superseded_on": superseded_on,
+            "source": source,
+            "chunk_index": i,
+            # Add other relevant metadata if available, e.g., policy_id
+        }
+        docs_to_add.append(Document(page_content=chunk.page_content, metadata=metadata))
+        # Deterministic ids make a resumed file overwrite its partial upload instead of duplicating it
+        ids.append(make_chunk_id(source, i))
+
+    if not INGEST_DEDUP:
+        _index_chunks(source, docs_to_add, ids, namespace)
+        _supersede_older_versions(source, attributes, namespace, newer_sources)
+        return len(docs_to_add)
+
+    # Chunks already indexed from another version of the wording (same tenant, product line, document
+    # type and insurer) only get this file added to their sources
+    with get_dedup_index().deduplicate(docs_to_add, ids, scope=dedup_scope(attributes)) as dedup:
+        if dedup.documents:
+            _index_chunks(source, dedup.documents, dedup.ids, namespace)
+    # The sources of matched chunks are final once the signatures are recorded
+    effective = attributes.get("effective_date")
+    indexed = fetch_chunk_metadata(list(dedup.updated_sources), namespace) if effective else {}
+    for chunk_id, sources in dedup.updated_sources.items():
+        fields = {"sources": sources}
+        # A shared clause is in effect since the earliest version that contains it
+        current = indexed.get(chunk_id, {}).get("effective_date")
+        if effective and (current is None or effective < current):
+            fields["effective_date"] = effective
+        update_chunk_metadata(chunk_id, fields, namespace)
+    # After the sources update: clauses this version shares with older ones stay in effect
+    _supersede_older_versions(source, attributes, namespace, newer_sources)
+    print(f"{source}: {dedup.duplicates} of {len(docs_to_add)} chunks were duplicates of indexed chunks")
+    return len(docs_to_add)
+
+def _chunk_sources(metadata: dict) -> set:
+    return set(metadata.get("sources") or []) | {metadata.get("source")}
+
+def _version_filter(attributes: dict) -> Optional[dict]:
+    """Filter for the chunks of every version of the document's wording; None if it cannot be versioned."""
+    if not attributes.get("effective_date") or not all(attributes.get(field) for field in DEDUP_SCOPE_FIELDS):
+        return None
+    return build_filter(**{field: attributes[field] for field in DEDUP_SCOPE_FIELDS})
+
+def _newer_versions(source: str, attributes: dict, namespace: str) -> tuple[int, set]:
+    """
+    superseded_on for the document's own chunks (the effective date of the next newer version already
+    indexed, NOT_SUPERSEDED if none) and the sources of the newer versions.
+    """
+    family = _version_filter(attributes)
+    if family is None:
+        return NOT_SUPERSEDED, set()
+    newer = [
+        metadata for metadata in find_chunks(
+            {"$and": [family, {"effective_date": {"$gt": attributes["effective_date"]}}]}, namespace).values()
+        if source not in _chunk_sources(metadata)
+    ]
+    if not newer:
+        return NOT_SUPERSEDED, set()
+    return min(metadata["effective_date"] for metadata in newer), set().union(*map(_chunk_sources, newer))
+
+def _supersede_older_versions(source: str, attributes: dict, namespace: str, newer_sources: set) -> int:
+    """
+    Marks the chunks of older versions that this version dropped as superseded on its effective date,
+    so effective_on filters from then on return only this version. Returns the number of chunks updated.
+    """
+    family = _version_filter(attributes)
+    if family is None:
+        return 0
+    effective = attributes["effective_date"]
+    older = find_chunks({"$and": [
+        family, {"effective_date": {"$lt": effective}}, {"superseded_on": {"$gt": effective}},
+    ]}, namespace)
+    superseded = 0
+    for chunk_id, metadata in older.items():
+        sources = _chunk_sources(metadata)
+        # Kept by this version, or by a newer one ingested before it
+        if source in sources or sources & newer_sources:
+            continue
+        update_chunk_metadata(chunk_id, {"superseded_on": effective}, namespace)
+        superseded += 1
+    if superseded:
+        print(f"{source}: {superseded} chunks of older versions superseded from {effective}")
+    return superseded
+
+def _index_chunks(source: str, docs: list[Document], ids: list[str], namespace: str = "") -> None:
+    # Add documents (with embeddings) to Pinecone. Ingestion embeddings yield to interactive traffic.
+    with priority_scope(Priority.BATCH):
+        indexed = add_documents_to_pinecone(docs, ids=ids, namespace=namespace)
+    if not indexed:
+        raise RuntimeError(f"Failed to index chunks for {source}")
+
+def start_s3_ingestion_job() -> dict:
+    """Creates a pending S3 ingestion job. Raises JobConflictError if one is already active."""
+    return get_job_store().create_job(
+        S3_INGEST_JOB_KIND, {"bucket": S3_BUCKET_NAME, "prefix": S3_PREFIX}
+    )
+
+def process_s3_documents(job_id: Optional[str] = None):
+    """
+    Downloads PDFs from S3, processes them, and adds them to Pinecone.
+    Progress is checkpointed per file in the job store, so a cancelled, failed or
+    interrupted job can be resumed and only the remaining files are processed.
+    """
+    store = get_job_store()
+    if job_id is None:
+        try:
+            job_id = start_s3_ingestion_job()["id"]
+        except JobConflictError as e:
+            print(f"S3 document processing not started: {e}")
+            return
+
     if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, S3_BUCKET_NAME, S3_PREFIX]):
         print("Error: AWS credentials or S3 configuration missing in environment variables.")
+        store.finish(job_id, JOB_FAILED, error="AWS credentials or S3 configuration missing.")
         return
 
-    print(f"Starting S3 document processing from bucket '{S3_BUCKET_NAME}' prefix '{S3_PREFIX}'")
+    if store.is_cancel_requested(job_id):
+        store.finish(job_id, JOB_CANCELLED)
+        return
 
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY
-    )
+    try:
+        store.mark_running(job_id)
+    except JobReapedError as e:
+        print(f"S3 document processing not started: {e}")
+        return
+    print(f"Starting S3 document processing (job {job_id}) from bucket '{S3_BUCKET_NAME}' prefix '{S3_PREFIX}'")
 
-    paginator = s3_client.get_paginator('list_objects_v2')
-    pages = paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=S3_PREFIX)
+    # The heartbeat is also refreshed in the background: one large file can outlast the stale timeout
+    with store.keep_alive(job_id):
+        try:
+            s3_client = boto3.client(
+                's3',
+                aws_access_key_id=AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=AWS_SECRET_ACCESS_KEY
+            )
 
-    total_files_processed = 0
-    for page in pages:
-        if "Contents" not in page:
-            continue
-        for obj in page['Contents']:
-            s3_key = obj['Key']
-            if not s3_key.lower().endswith('.pdf'):
-                print(f"Skipping non-PDF file: {s3_key}")
-                continue
+            # Known files keep their checkpointed state; new keys are appended as pending
+            store.register_files(job_id, _list_s3_pdf_keys(s3_client))
+
+            total_files_processed = 0
+            for s3_key in store.pending_files(job_id):
+                if store.is_cancel_requested(job_id):
+                    print(f"Job {job_id} cancelled. Files processed in this run: {total_files_processed}")
+                    store.finish(job_id, JOB_CANCELLED)
+                    return
+
+                print(f"Processing file: {s3_key}...")
+                store.set_file_state(job_id, s3_key, FILE_PROCESSING)
+                try:
+                    chunks_indexed = _process_s3_file(s3_client, s3_key)
+                    state = FILE_DONE if chunks_indexed else FILE_SKIPPED
+                    store.set_file_state(job_id, s3_key, state, chunks=chunks_indexed)
+                    total_files_processed += 1
+                except JobReapedError:
+                    raise
+                except Exception as e:
+                    print(f"Error processing file {s3_key}: {e}")
+                    store.set_file_state(job_id, s3_key, FILE_FAILED, error=str(e))
+                    # Continue with the next file
 
-            print(f"Processing file: {s3_key}...")
-            try:
-                # Download PDF content
-                response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
-                pdf_content = response['Body'].read()
-
-                # Extract text
-                extracted_text = extract_text_from_pdf(pdf_content)
-                if not extracted_text:
-                    print(f"No text extracted from {s3_key}. Skipping.")
-                    continue
-
-                # Split into chunks
-                text_chunks = get_text_chunks(extracted_text)
-                if not text_chunks:
-                    print(f"No chunks created from {s3_key}. Skipping.")
-                    continue
-                
-                # Create Langchain Document objects for chunks
-                docs_to_add = []
-                for i, chunk in enumerate(text_chunks):
-                    # Add relevant metadata
-                    metadata = {
-                        "source": f"s3://{S3_BUCKET_NAME}/{s3_key}",
-                        "chunk_index": i,
-                        # Add other relevant metadata if available, e.g., policy_id
-                    }
-                    docs_to_add.append(Document(page_content=chunk, metadata=metadata))
-                
-                # Add documents (with embeddings) to Pinecone
-                add_documents_to_pinecone(docs_to_add)
-                total_files_processed += 1
-
-            except Exception as e:
-                print(f"Error processing file {s3_key}: {e}")
-                # Continue with the next file
-
-    print(f"Finished S3 document processing. Total files processed: {total_files_processed}")
+            store.finish(job_id, JOB_COMPLETED)
+            print(f"Finished S3 document processing. Total files processed: {total_files_processed}")
+        except JobReapedError as e:
+            # Reaped as interrupted (e.g. the process was stalled): a resume will pick up the remaining files
+            print(f"S3 document processing stopped: {e}")
+        except Exception as e:
+            print(f"S3 document processing job {job_id} failed: {e}")
+            store.finish(job_id, JOB_FAILED, error=str(e))
 
 # Example usage (you would typically trigger this from an API endpoint or a script)
 # if __name__ == "__main__":
@@ -0,0 +1,384 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.core.config import JOBS_DB_PATH, JOB_STALE_AFTER_SECONDS, JOB_HEARTBEAT_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_INTERRUPTED = "interrupted"  # Worker died (crash/redeploy) without finishing
+ACTIVE_JOB_STATUSES = (JOB_PENDING, JOB_RUNNING)
+
+# Per-file lifecycle
+FILE_PENDING = "pending"
+FILE_PROCESSING = "processing"
+FILE_DONE = "done"
+FILE_SKIPPED = "skipped"
+FILE_FAILED = "failed"
+FINISHED_FILE_STATES = (FILE_DONE, FILE_SKIPPED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL,
+    elapsed_seconds REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    file_key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, file_key)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_kind_status ON jobs (kind, status);
+"""
+
+
+class JobConflictError(Exception):
+    """Raised when a job of the same kind is already active."""
+
+    def __init__(self, active_job_id: str):
+        super().__init__(f"Job {active_job_id} is already active.")
+        self.active_job_id = active_job_id
+
+
+class JobNotFoundError(Exception):
+    """Raised when a job id does not exist."""
+
+
+class JobReapedError(Exception):
+    """Raised when a worker writes to a job that is no longer its own (reaped as interrupted, or finished)."""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Job {job_id} is no longer running; its worker's updates are refused.")
+        self.job_id = job_id
+
+
+class JobStore:
+    """SQLite-backed store for background jobs and their per-file checkpoints."""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, stale_after_seconds: int = JOB_STALE_AFTER_SECONDS):
+        self.db_path = db_path
+        self.stale_after_seconds = stale_after_seconds
+        # Serialises check-and-insert in this process; BEGIN IMMEDIATE covers other processes.
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit mode; multi-statement updates open their own transactions.
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    # --- Jobs ---
+
+    def create_job(self, kind: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Creates a pending job, refusing if another job of the same kind is active."""
+        job_id = str(uuid.uuid4())
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._reap_stale(conn)
+                active = self._active_job(conn, kind)
+                if active:
+                    raise JobConflictError(active["id"])
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, status, params, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, kind, JOB_PENDING, json.dumps(params or {}), time.time()),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.info("Created %s job %s", kind, job_id)
+        return self.get_job(job_id)
+
+    def prepare_resume(self, job_id: str) -> Dict[str, Any]:
+        """Moves a cancelled/failed/interrupted job back to pending so its remaining files can run."""
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._reap_stale(conn)
+                job = self._get(conn, job_id)
+                if job["status"] == JOB_COMPLETED:
+                    raise ValueError(f"Job {job_id} already completed; nothing to resume.")
+                active = self._active_job(conn, job["kind"])
+                if active:
+                    raise JobConflictError(active["id"])
+                # The heartbeat restarts the pending timeout (see _reap_stale)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, cancel_requested = 0, error = NULL, finished_at = NULL, "
+                    "heartbeat_at = ? WHERE id = ?",
+                    (JOB_PENDING, time.time(), job_id),
+                )
+                # Files that were mid-flight when the worker stopped are retried from scratch.
+                conn.execute(
+                    "UPDATE job_files SET state = ?, error = NULL, updated_at = ? WHERE job_id = ? AND state IN (?, ?)",
+                    (FILE_PENDING, time.time(), job_id, FILE_PROCESSING, FILE_FAILED),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.info("Job %s prepared for resume", job_id)
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        with self._connect() as conn:
+            self._reap_stale(conn)
+            return self._get(conn, job_id)
+
+    def list_jobs(self, kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            self._reap_stale(conn)
+            if kind:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE kind = ? ORDER BY created_at DESC LIMIT ?", (kind, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def mark_running(self, job_id: str) -> None:
+        """Starts a pending job. Raises JobReapedError if it was reaped before the worker got to it."""
+        now = time.time()
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (JOB_RUNNING, now, now, job_id, JOB_PENDING),
+            ).rowcount
+        if not updated:
+            raise JobReapedError(job_id)
+
+    def heartbeat(self, job_id: str) -> bool:
+        """Refreshes a running job's heartbeat; False once the job is no longer running."""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, JOB_RUNNING)
+            ).rowcount > 0
+
+    @contextmanager
+    def keep_alive(self, job_id: str, interval: float = JOB_HEARTBEAT_INTERVAL_SECONDS) -> Iterator[None]:
+        """
+        Refreshes the job's heartbeat from a background thread while the block runs, so a worker
+        spending minutes on one large file is not taken for dead. Stops once the job is no longer running.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    if not self.heartbeat(job_id):
+                        return
+                except sqlite3.Error as e:
+                    logger.warning("Heartbeat of job %s failed: %s", job_id, e)
+
+        thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id[:8]}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        """
+        Records the final status of the current run and accumulates its elapsed time. Ignored (with a
+        warning) when the job is no longer active, e.g. it was reaped as interrupted meanwhile.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, "
+                "elapsed_seconds = elapsed_seconds + (? - COALESCE(started_at, ?)) WHERE id = ? AND status IN (?, ?)",
+                (status, error, now, now, now, job_id, *ACTIVE_JOB_STATUSES),
+            ).rowcount
+        if not updated:
+            logger.warning("Job %s is no longer active; its final status '%s' is ignored", job_id, status)
+            return
+        logger.info("Job %s finished with status '%s'", job_id, status)
+
+    def request_cancel(self, job_id: str) -> Dict[str, Any]:
+        """Flags a job for cancellation; the worker stops before its next file."""
+        with self._connect() as conn:
+            job = self._get(conn, job_id)
+            if job["status"] not in ACTIVE_JOB_STATUSES:
+                return job
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        logger.info("Cancellation requested for job %s", job_id)
+        return self.get_job(job_id)
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    # --- Files ---
+
+    def register_files(self, job_id: str, file_keys: Iterable[str]) -> None:
+        """Adds files to the job; files already known keep their checkpointed state."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO job_files (job_id, file_key, state, updated_at) VALUES (?, ?, ?, ?)",
+                [(job_id, key, FILE_PENDING, now) for key in file_keys],
+            )
+
+    def pending_files(self, job_id: str) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT file_key FROM job_files WHERE job_id = ? AND state NOT IN (?, ?) ORDER BY file_key",
+                (job_id, *FINISHED_FILE_STATES),
+            ).fetchall()
+        return [row["file_key"] for row in rows]
+
+    def set_file_state(self, job_id: str, file_key: str, state: str, chunks: int = 0, error: Optional[str] = None) -> None:
+        """
+        Checkpoints a file's state and refreshes the job heartbeat in the same transaction.
+        Raises JobReapedError if the job is no longer running.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?", (now, job_id, JOB_RUNNING)
+            ).rowcount:
+                conn.execute("ROLLBACK")
+                raise JobReapedError(job_id)
+            conn.execute(
+                "UPDATE job_files SET state = ?, chunks = ?, error = ?, updated_at = ? WHERE job_id = ? AND file_key = ?",
+                (state, chunks, error, now, job_id, file_key),
+            )
+            conn.execute("COMMIT")
+
+    def list_files(self, job_id: str, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            self._get(conn, job_id)
+            query = "SELECT file_key, state, chunks, error, updated_at FROM job_files WHERE job_id = ?"
+            args: tuple = (job_id,)
+            if state:
+                query += " AND state = ?"
+                args += (state,)
+            rows = conn.execute(query + " ORDER BY file_key", args).fetchall()
+        return [dict(row) for row in rows]
+
+    def progress(self, job_id: str) -> Dict[str, Any]:
+        """Returns the job together with per-state file counts and throughput."""
+        with self._connect() as conn:
+            self._reap_stale(conn)
+            job = self._get(conn, job_id)
+            rows = conn.execute(
+                "SELECT state, COUNT(*) AS files, SUM(chunks) AS chunks FROM job_files WHERE job_id = ? GROUP BY state",
+                (job_id,),
+            ).fetchall()
+
+        counts = {FILE_PENDING: 0, FILE_PROCESSING: 0, FILE_DONE: 0, FILE_SKIPPED: 0, FILE_FAILED: 0}
+        chunks_done = 0
+        for row in rows:
+            counts[row["state"]] = row["files"]
+            if row["state"] == FILE_DONE:
+                chunks_done = row["chunks"] or 0
+        total = sum(counts.values())
+
+        elapsed = job["elapsed_seconds"]
+        if job["status"] == JOB_RUNNING and job["started_at"]:
+            elapsed += time.time() - job["started_at"]
+        files_finished = counts[FILE_DONE] + counts[FILE_SKIPPED]
+        files_per_sec = files_finished / elapsed if elapsed > 0 else 0.0
+        chunks_per_sec = chunks_done / elapsed if elapsed > 0 else 0.0
+        remaining = total - files_finished - counts[FILE_FAILED]
+        eta = remaining / files_per_sec if files_per_sec > 0 and job["status"] == JOB_RUNNING else None
+
+        return {
+            **job,
+            "files_total": total,
+            "files": counts,
+            "chunks_indexed": chunks_done,
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_sec": round(files_per_sec, 4),
+            "chunks_per_sec": round(chunks_per_sec, 4),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
+
+    # --- Internal helpers ---
+
+    def _get(self, conn: sqlite3.Connection, job_id: str) -> Dict[str, Any]:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFoundError(job_id)
+        return self._row_to_job(row)
+
+    def _active_job(self, conn: sqlite3.Connection, kind: str) -> Optional[sqlite3.Row]:
+        return conn.execute(
+            "SELECT id FROM jobs WHERE kind = ? AND status IN (?, ?) LIMIT 1",
+            (kind, *ACTIVE_JOB_STATUSES),
+        ).fetchone()
+
+    def _reap_stale(self, conn: sqlite3.Connection) -> None:
+        """
+        Marks as interrupted running jobs whose worker stopped heartbeating, and pending jobs no worker
+        picked up in time (since creation, or since prepare_resume for resumed jobs).
+        """
+        now = time.time()
+        cutoff = now - self.stale_after_seconds
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = heartbeat_at, "
+            "elapsed_seconds = elapsed_seconds + (heartbeat_at - started_at) "
+            "WHERE status = ? AND heartbeat_at < ?",
+            (JOB_INTERRUPTED, JOB_RUNNING, cutoff),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, error = ? "
+            "WHERE status = ? AND COALESCE(heartbeat_at, created_at) < ?",
+            (JOB_INTERRUPTED, now, "No worker started the job.", JOB_PENDING, cutoff),
+        )
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"]) if job["params"] else {}
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+
+_job_store: Optional[JobStore] = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Returns the process-wide job store."""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = JobStore()
+    return _job_store
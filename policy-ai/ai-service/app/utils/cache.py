@@ -0,0 +1,58 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.core.metrics import record_cache_lookup
+
+_MISSING = object()
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for free-text queries: case, repeated whitespace and surrounding punctuation don't matter."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _WHITESPACE_RE.sub(" ", text).strip(" ?¿!¡.,;:")
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with a per-entry TTL and a bounded number of entries
+    (least recently used evicted first). Lookups are reported to the cache_requests_total metric.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= self._clock():
+                del self._entries[key]  # Expired
+                entry = _MISSING
+            if entry is not _MISSING:
+                self._entries.move_to_end(key)
+        record_cache_lookup(self.name, entry is not _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = self._clock() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,273 @@
+import asyncio
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, Optional
+
+from app.core.components import register_component, STATUS_READY
+from app.core.config import (
+    CPU_POOL_ENABLED, CPU_POOL_WORKERS, CPU_POOL_MAX_TASKS_PER_WORKER, CPU_TASK_TIMEOUT_SECONDS,
+    CPU_TASK_MAX_BYTES, CPU_TASK_INLINE_BYTES, CPU_WORKER_MAX_MEMORY_MB,
+)
+from app.core.metrics import CPU_TASK_LATENCY, CPU_TASK_FAILURES, CPU_POOL_RESTARTS
+
+logger = logging.getLogger(__name__)
+
+# Imported by every worker at start, so the first real task doesn't pay for it
+PRELOAD_MODULES = ("app.utils.pdf_processor", "app.utils.html_processor", "app.services.chunking")
+
+
+class CpuTaskError(RuntimeError):
+    """A CPU-bound task could not be completed by the pool."""
+
+
+class CpuTaskTooLarge(CpuTaskError):
+    pass
+
+
+class CpuTaskTimeout(CpuTaskError):
+    pass
+
+
+class CpuWorkerCrashed(CpuTaskError):
+    pass
+
+
+# Set in each worker: where it reports the tasks it starts
+_started_queue = None
+
+
+def _init_worker(modules: Iterable[str], max_memory_mb: int, started_queue=None) -> None:
+    global _started_queue
+    _started_queue = started_queue
+    if max_memory_mb:
+        import resource
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _run_task(task_id: int, fn: Callable, *args) -> Any:
+    # Tells the parent the task left the queue, and which process runs it
+    if _started_queue is not None:
+        _started_queue.put((task_id, os.getpid()))
+    return fn(*args)
+
+
+def _worker_ready() -> bool:
+    # Short pause so concurrent warm-up calls land on distinct workers
+    time.sleep(0.05)
+    return True
+
+
+class CpuPool:
+    """
+    Process pool for CPU-bound steps. Workers are started with "spawn" (forking a process
+    that runs threads and an event loop is unsafe) and pre-import PRELOAD_MODULES.
+
+    A task's timeout runs from when a worker picks it up (workers report the tasks they start),
+    not from when it was queued. A task that exceeds it gets its own worker killed; a worker
+    that dies (that kill, a crash, MemoryError under CPU_WORKER_MAX_MEMORY_MB) breaks the pool,
+    which is then replaced. The tasks failed by a crash are each retried once in a one-off worker of their own,
+    so the ones that were merely sharing the broken pool complete and the one that crashes it
+    fails with CpuWorkerCrashed without breaking the pool again.
+    """
+
+    def __init__(self, workers: int = CPU_POOL_WORKERS, timeout: float = CPU_TASK_TIMEOUT_SECONDS,
+                 max_tasks_per_worker: int = CPU_POOL_MAX_TASKS_PER_WORKER,
+                 preload: Iterable[str] = PRELOAD_MODULES, max_memory_mb: int = CPU_WORKER_MAX_MEMORY_MB):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.preload = tuple(preload)
+        self.max_memory_mb = max_memory_mb
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._generation = 0
+        # One-off workers for retries after a crash, at most as many as the pool has
+        self._isolated = threading.BoundedSemaphore(workers)
+        # Started tasks: id -> (worker pid, monotonic start), filled by a listener thread
+        self._task_ids = itertools.count()
+        self._started: dict = {}
+        self._started_queue = multiprocessing.get_context("spawn").SimpleQueue()
+        threading.Thread(target=self._listen, name="cpu-pool-started", daemon=True).start()
+
+    def _listen(self) -> None:
+        while True:
+            message = self._started_queue.get()
+            if message is None:
+                return
+            task_id, pid = message
+            with self._lock:
+                self._started[task_id] = (pid, time.monotonic())
+
+    def _new_executor(self, workers: int, max_tasks_per_worker: Optional[int] = None) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.preload, self.max_memory_mb, self._started_queue),
+            max_tasks_per_child=max_tasks_per_worker,
+        )
+
+    @staticmethod
+    def _kill(executor: ProcessPoolExecutor, pid: int) -> None:
+        # No public API stops a busy worker; killing it breaks the pool, which is replaced anyway
+        process = (executor._processes or {}).get(pid)
+        if process is not None:
+            process.kill()
+
+    def _current(self) -> tuple:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor(self.workers, self.max_tasks_per_worker or None)
+            return self._executor, self._generation
+
+    def _restart(self, generation: int, reason: str, kill_pid: Optional[int] = None) -> None:
+        with self._lock:
+            if generation != self._generation or self._executor is None:
+                return  # Another caller already replaced this pool
+            executor, self._executor = self._executor, None
+            self._generation += 1
+        if kill_pid is not None:
+            self._kill(executor, kill_pid)
+        executor.shutdown(wait=False, cancel_futures=True)
+        CPU_POOL_RESTARTS.labels(reason).inc()
+        logger.warning("CPU pool restarted (%s)", reason)
+
+    def warm(self) -> None:
+        """Starts every worker now instead of on the first requests."""
+        executor, _ = self._current()
+        for future in [executor.submit(_worker_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def _submit(self, executor: ProcessPoolExecutor, fn: Callable, args: tuple) -> tuple:
+        task_id = next(self._task_ids)
+        return task_id, executor.submit(_run_task, task_id, fn, *args)
+
+    def _wait(self, task_id: int, future, timeout: float) -> Any:
+        """
+        The task's result. Raises FutureTimeoutError with the pid of its worker once it has been
+        running for `timeout` seconds; time spent queued behind other tasks does not count.
+        """
+        try:
+            while True:
+                with self._lock:
+                    started = self._started.get(task_id)
+                if started is None:
+                    wait = 0.05  # Still queued: check again shortly
+                else:
+                    wait = started[1] + timeout - time.monotonic()
+                    if wait <= 0:
+                        raise FutureTimeoutError(started[0])
+                try:
+                    return future.result(timeout=wait)
+                except FutureTimeoutError:
+                    continue
+        finally:
+            with self._lock:
+                self._started.pop(task_id, None)
+
+    def run(self, task: str, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Runs fn(*args) in a worker and returns its result; exceptions raised by fn propagate."""
+        timeout = timeout or self.timeout
+        executor, generation = self._current()
+        start = time.perf_counter()
+        try:
+            task_id, future = self._submit(executor, fn, args)
+            result = self._wait(task_id, future, timeout)
+        except FutureTimeoutError as e:
+            # Only the overdue task's worker is killed; tasks it breaks the pool for are retried
+            self._restart(generation, "timeout", kill_pid=e.args[0])
+            CPU_TASK_FAILURES.labels(task, "timeout").inc()
+            raise CpuTaskTimeout(f"{task} did not finish within {timeout:.0f}s")
+        except BrokenProcessPool:
+            self._restart(generation, "crash")
+            # Every task in flight fails with the pool, not only the one that killed its worker, and
+            # there is no telling which it was: retry this one alone, where a crash can only be its own
+            # and cannot take the replacement pool down with it
+            result = self._run_isolated(task, fn, args, timeout)
+        except Exception:
+            CPU_TASK_FAILURES.labels(task, "error").inc()
+            raise
+        CPU_TASK_LATENCY.labels(task, "pool").observe(time.perf_counter() - start)
+        return result
+
+    def _run_isolated(self, task: str, fn: Callable, args: tuple, timeout: float) -> Any:
+        with self._isolated:
+            executor = self._new_executor(1)
+            try:
+                task_id, future = self._submit(executor, fn, args)
+                return self._wait(task_id, future, timeout)
+            except FutureTimeoutError as e:
+                self._kill(executor, e.args[0])
+                CPU_TASK_FAILURES.labels(task, "timeout").inc()
+                raise CpuTaskTimeout(f"{task} did not finish within {timeout:.0f}s")
+            except BrokenProcessPool:
+                CPU_TASK_FAILURES.labels(task, "crashed").inc()
+                raise CpuWorkerCrashed(f"{task} crashed its worker, also when run on its own")
+            except Exception:
+                CPU_TASK_FAILURES.labels(task, "error").inc()
+                raise
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._started_queue.put(None)  # Stops the listener
+
+
+def _build_cpu_pool() -> Optional[CpuPool]:
+    if not CPU_POOL_ENABLED:
+        return None
+    pool = CpuPool()
+    pool.warm()
+    return pool
+
+
+# Not required: with the pool unavailable, tasks run in the calling thread
+cpu_pool_component = register_component("cpu_pool", _build_cpu_pool, required=False)
+
+
+def run_cpu(task: str, fn: Callable, *args, size: int = 0, timeout: Optional[float] = None) -> Any:
+    """
+    Runs a CPU-bound fn(*args) on the process pool. `size` (input bytes) decides whether it is
+    rejected (over CPU_TASK_MAX_BYTES) or run inline (under CPU_TASK_INLINE_BYTES). fn must be a
+    module-level function and its arguments and result picklable.
+    """
+    if size > CPU_TASK_MAX_BYTES:
+        CPU_TASK_FAILURES.labels(task, "too_large").inc()
+        raise CpuTaskTooLarge(f"{task} input of {size} bytes exceeds the {CPU_TASK_MAX_BYTES} byte limit")
+    pool = None
+    if size >= CPU_TASK_INLINE_BYTES:
+        try:
+            pool = cpu_pool_component.get()
+        except Exception:
+            pass  # Recorded on the component; run inline
+    if pool is not None:
+        return pool.run(task, fn, *args, timeout=timeout)
+    start = time.perf_counter()
+    result = fn(*args)
+    CPU_TASK_LATENCY.labels(task, "inline").observe(time.perf_counter() - start)
+    return result
+
+
+async def run_cpu_async(task: str, fn: Callable, *args, size: int = 0, timeout: Optional[float] = None) -> Any:
+    """run_cpu for async endpoints: waits on a worker thread so the event loop stays free."""
+    return await asyncio.to_thread(run_cpu, task, fn, *args, size=size, timeout=timeout)
+
+
+def shutdown_cpu_pool() -> None:
+    """Stops the workers if the pool was started (application shutdown)."""
+    if cpu_pool_component.status == STATUS_READY and cpu_pool_component.get() is not None:
+        cpu_pool_component.get().shutdown()
@@ -0,0 +1,123 @@
+"""
+Compact edit operations between two versions of an HTML policy.
+
+Instead of the whole policy re-rendered with <ins>/<del> markup (html_diff), the client gets
+the few changes to apply to the text it already holds. The old text is split into blocks,
+each starting at a block-level opening tag (<p>, <h3>, <li>, ...); blocks are matched by their
+whitespace-normalised content, so re-indentation (the model's output is prettified) is not a
+change. Each operation replaces old[start:end] (character offsets into the client's text, in
+the block numbered `block`) with `text`: an empty `text` is a deletion and start == end an
+insertion. Operations come in text order and do not overlap, so applying them from the last to
+the first keeps the offsets valid. Changed blocks that are still mostly alike get word-level operations;
+otherwise the block is replaced whole.
+"""
+import difflib
+import hashlib
+import html
+import re
+from typing import List, Optional, Tuple
+
+_BLOCK_START_RE = re.compile(
+    r"<(?:p|h[1-6]|li|ul|ol|dl|dt|dd|table|thead|tbody|tfoot|tr|td|th|div|section|article|header|footer|"
+    r"blockquote|pre|hr)\b", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"<[^>]*>|[^\s<]+")
+_SPACE_AROUND_TAGS_RE = re.compile(r"\s*(<[^>]*>)\s*")
+_SPACE_RE = re.compile(r"\s+")
+_SELF_CLOSING_RE = re.compile(r"\s*/>")
+
+# Changed blocks less alike than this are replaced whole rather than word by word
+WORD_DIFF_MIN_RATIO = 0.5
+
+
+def _normalize(fragment: str) -> str:
+    fragment = _SELF_CLOSING_RE.sub(">", fragment)
+    fragment = _SPACE_AROUND_TAGS_RE.sub(r"\1", fragment)
+    return html.unescape(_SPACE_RE.sub(" ", fragment).strip())
+
+
+def split_blocks(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the blocks of `text`; blank text before the first block is skipped."""
+    starts = [m.start() for m in _BLOCK_START_RE.finditer(text)]
+    if not starts or (starts[0] > 0 and text[:starts[0]].strip()):
+        starts.insert(0, 0)
+    if not text.strip():
+        return []
+    return list(zip(starts, starts[1:] + [len(text)]))
+
+
+def _tokens(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    return [(m.start(), m.end()) for m in _TOKEN_RE.finditer(text, start, end)]
+
+
+def _span(text: str, spans: List[Tuple[int, int]]) -> str:
+    """The text covering `spans`, on one line (indentation from prettify dropped)."""
+    return _SPACE_RE.sub(" ", text[spans[0][0]:spans[-1][1]]) if spans else ""
+
+
+def _word_ops(old: str, new: str, block: int, old_range: Tuple[int, int], new_range: Tuple[int, int]) -> Optional[List[dict]]:
+    """Word-level operations for one changed block, or None if the two versions are too different."""
+    old_tokens, new_tokens = _tokens(old, *old_range), _tokens(new, *new_range)
+    matcher = difflib.SequenceMatcher(
+        None, [_normalize(old[s:e]) for s, e in old_tokens], [_normalize(new[s:e]) for s, e in new_tokens],
+        autojunk=False)
+    if not old_tokens or matcher.ratio() < WORD_DIFF_MIN_RATIO:
+        return None
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        text = _span(new, new_tokens[j1:j2])
+        if i1 < i2:
+            ops.append({"block": block, "start": old_tokens[i1][0], "end": old_tokens[i2 - 1][1], "text": text})
+        elif i1 < len(old_tokens):
+            ops.append({"block": block, "start": old_tokens[i1][0], "end": old_tokens[i1][0], "text": text + " "})
+        else:
+            ops.append({"block": block, "start": old_tokens[-1][1], "end": old_tokens[-1][1], "text": " " + text})
+    return ops
+
+
+def diff_ops(old: str, new: str) -> dict:
+    """
+    The operations turning `old` into `new`, with the length and SHA-1 of `old` so the client can
+    check it applies them to the same text. Runs in a CPU pool worker.
+    """
+    old_blocks, new_blocks = split_blocks(old), split_blocks(new)
+    matcher = difflib.SequenceMatcher(
+        None, [_normalize(old[s:e]) for s, e in old_blocks], [_normalize(new[s:e]) for s, e in new_blocks],
+        autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        # Changed blocks paired in order get word-level operations while they stay alike...
+        while i1 < i2 and j1 < j2:
+            word_ops = _word_ops(old, new, i1, old_blocks[i1], new_blocks[j1])
+            if word_ops is None:
+                break
+            ops.extend(word_ops)
+            i1, j1 = i1 + 1, j1 + 1
+        if i1 == i2 and j1 == j2:
+            continue
+        # ...and the rest is replaced, inserted or deleted whole
+        start = old_blocks[i1][0] if i1 < len(old_blocks) else len(old)
+        end = old_blocks[i2 - 1][1] if i1 < i2 else start
+        text = _span(new, [(new_blocks[j1][0], new_blocks[j2 - 1][1])]).strip() if j1 < j2 else ""
+        ops.append({"block": i1, "start": start, "end": end, "text": text})
+    return {
+        "base_length": len(old),
+        "base_sha1": hashlib.sha1(old.encode("utf-8")).hexdigest(),
+        "blocks": len(old_blocks),
+        "ops": ops,
+    }
+
+
+def apply_ops(old: str, ops: List[dict]) -> str:
+    """Applies diff_ops operations to the text they were computed against."""
+    for op in reversed(ops):
+        old = old[:op["start"]] + op["text"] + old[op["end"]:]
+    return old
+
+
+def same_content(a: str, b: str) -> bool:
+    """Whether two HTML texts differ only in whitespace and serialisation details."""
+    return _normalize(a) == _normalize(b)
@@ -0,0 +1,335 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import (
+    DOWNLOAD_TIMEOUT_SECONDS, DOWNLOAD_MIN_BYTES_PER_SECOND, DOWNLOAD_MAX_BYTES, DOWNLOAD_SPOOL_BYTES, DOWNLOAD_RETRIES, DOWNLOAD_BACKOFF_SECONDS,
+    DOWNLOAD_POOL_SIZE, DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES,
+)
+from app.core.metrics import DOWNLOADS, DOWNLOAD_LATENCY, DOWNLOAD_BYTES, DOWNLOAD_SECONDS_SAVED, DOWNLOAD_RETRY_ATTEMPTS
+from app.core.resilience import DOCUMENT_DOWNLOAD, CircuitOpenError, DependencyTimeout, get_dependency
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_BYTES = 64 * 1024
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_MAX_RETRY_AFTER_SECONDS = 30.0
+
+
+class DownloadError(Exception):
+    """A document could not be downloaded."""
+
+
+class DownloadTooLarge(DownloadError):
+    pass
+
+
+class _Retryable(Exception):
+    def __init__(self, reason: str, delay: Optional[float] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.delay = delay
+
+
+def _retry_after(response) -> Optional[float]:
+    try:
+        return min(float(response.headers.get("Retry-After", "")), _MAX_RETRY_AFTER_SECONDS)
+    except ValueError:
+        return None
+
+
+def _max_age(headers) -> Optional[int]:
+    """Seconds the response may be reused without revalidation; None if it must not be stored."""
+    directives = [d.strip().lower() for d in headers.get("Cache-Control", "").split(",")]
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    for directive in directives:
+        if directive.startswith("max-age="):
+            try:
+                return max(int(directive[8:]), 0)
+            except ValueError:
+                return 0
+    return 0
+
+
+class DocumentDownloadClient:
+    """
+    HTTP client for policy documents. One pooled session (connections are kept alive and reused);
+    bodies are streamed into a spooled temporary file (in memory up to `spool_bytes`) and abandoned
+    past `max_bytes`. Responses with an ETag or Last-Modified are kept in `cache_dir`, keyed by URL,
+    and served again after a 304 to a conditional request, or without a request while fresh per
+    Cache-Control max-age. Connection errors, timeouts, 429 and 5xx are retried with exponential
+    backoff (honouring Retry-After). The document_download breaker and adaptive timeout cover the
+    request up to the response headers; the body only has to keep up `min_bytes_per_second`.
+    """
+
+    def __init__(self, cache_dir: str = DOWNLOAD_CACHE_DIR, cache_max_bytes: int = DOWNLOAD_CACHE_MAX_BYTES,
+                 max_bytes: int = DOWNLOAD_MAX_BYTES, spool_bytes: int = DOWNLOAD_SPOOL_BYTES,
+                 timeout: float = DOWNLOAD_TIMEOUT_SECONDS, retries: int = DOWNLOAD_RETRIES,
+                 backoff: float = DOWNLOAD_BACKOFF_SECONDS, pool_size: int = DOWNLOAD_POOL_SIZE,
+                 min_bytes_per_second: int = DOWNLOAD_MIN_BYTES_PER_SECOND):
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.min_bytes_per_second = min_bytes_per_second
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._evict_lock = threading.Lock()
+        if cache_max_bytes:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # --- Cache ---
+
+    def _paths(self, url: str) -> tuple:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".body"), os.path.join(self.cache_dir, key + ".json")
+
+    def _cached(self, url: str) -> Optional[dict]:
+        if not self.cache_max_bytes:
+            return None
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry.get("url") != url or os.path.getsize(body_path) != entry["size"]:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry
+
+    def _read_cached(self, url: str) -> Optional[bytes]:
+        body_path, _ = self._paths(url)
+        try:
+            with open(body_path, "rb") as f:
+                content = f.read()
+            os.utime(body_path)  # Recently used files are evicted last
+            return content
+        except OSError:
+            return None
+
+    def _write_meta(self, url: str, entry: dict) -> None:
+        _, meta_path = self._paths(url)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, meta_path)
+
+    def _store(self, url: str, headers, spool, size: int, seconds: float) -> None:
+        max_age = _max_age(headers)
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if max_age is None or not (etag or last_modified or max_age) or size > self.cache_max_bytes // 4:
+            return
+        body_path, _ = self._paths(url)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+            os.replace(tmp, body_path)
+            self._write_meta(url, {"url": url, "size": size, "etag": etag, "last_modified": last_modified,
+                                   "expires": time.time() + max_age, "seconds": seconds})
+        except OSError as e:
+            logger.warning("Could not cache download of %s: %s", url, e)
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """Deletes the least recently used files until the cache fits its budget."""
+        with self._evict_lock:
+            bodies = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".body"):
+                    path = os.path.join(self.cache_dir, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    bodies.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in bodies)
+            for _, size, path in sorted(bodies):
+                if total <= self.cache_max_bytes:
+                    break
+                for stale in (path, path[:-len(".body")] + ".json"):
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+                total -= size
+
+    # --- Network ---
+
+    def _request(self, url: str, headers: dict, abandoned: threading.Event):
+        """
+        Sends the request and checks the response headers. Returns the response with its body unread;
+        raises _Retryable or DownloadError. A response that arrives after the caller gave up is closed.
+        """
+        try:
+            response = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise _Retryable(type(e).__name__) from e
+        except requests.RequestException as e:
+            raise DownloadError(str(e)) from e
+        try:
+            if abandoned.is_set():
+                raise _Retryable("abandoned")
+            if response.status_code in _RETRYABLE_STATUS:
+                raise _Retryable(str(response.status_code), _retry_after(response))
+            if response.status_code >= 400:
+                raise DownloadError(f"HTTP {response.status_code} for {url}")
+            length = response.headers.get("Content-Length")
+            if response.status_code != 304 and length and length.isdigit() and int(length) > self.max_bytes:
+                raise DownloadTooLarge(f"{url} is {length} bytes; the limit is {self.max_bytes}")
+            return response
+        except BaseException:
+            response.close()
+            raise
+
+    def _spool(self, url: str, response):
+        """
+        Streams the body into a spooled file; once fully read the connection returns to the pool.
+        A body slower than min_bytes_per_second on average (after `timeout` seconds of grace) is abandoned.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        size = 0
+        start = time.monotonic()
+        try:
+            for chunk in response.iter_content(_CHUNK_BYTES):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise DownloadTooLarge(f"{url} exceeds the {self.max_bytes} byte limit")
+                spool.write(chunk)
+                if self.min_bytes_per_second and \
+                        time.monotonic() - start > self.timeout + size / self.min_bytes_per_second:
+                    raise _Retryable("slow_body")
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            spool.close()
+            raise _Retryable(type(e).__name__) from e
+        except BaseException:
+            spool.close()
+            raise
+        return spool
+
+    def _attempt(self, url: str, headers: dict):
+        """
+        One request. Returns (response, spool or None for a 304); raises _Retryable or DownloadError.
+        Only the request up to the headers runs under the document_download breaker and adaptive
+        timeout, and only its transient failures count against the breaker (not 4xx answers,
+        oversized documents or slow bodies).
+        """
+        abandoned = threading.Event()
+        try:
+            response = get_dependency(DOCUMENT_DOWNLOAD).call(
+                lambda: self._request(url, headers, abandoned), failures=(_Retryable,))
+        except DependencyTimeout as e:
+            abandoned.set()
+            raise _Retryable("timeout") from e
+        except CircuitOpenError as e:
+            raise DownloadError(f"{url} not requested: {e}") from e
+        try:
+            if response.status_code == 304:
+                response.content  # Drains the (empty) body so the connection goes back to the pool
+                return response, None
+            return response, self._spool(url, response)
+        except BaseException:
+            response.close()
+            raise
+
+    def _fetch(self, url: str, headers: dict):
+        for attempt in range(self.retries + 1):
+            try:
+                return self._attempt(url, headers)
+            except _Retryable as e:
+                if attempt == self.retries:
+                    raise DownloadError(f"{url} failed after {attempt + 1} attempts ({e.reason})") from e
+                delay = e.delay if e.delay is not None else self.backoff * 2 ** attempt * (0.5 + random.random())
+                DOWNLOAD_RETRY_ATTEMPTS.labels(e.reason).inc()
+                logger.warning("Download of %s failed (%s); retrying in %.2fs", url, e.reason, delay)
+                time.sleep(delay)
+
+    def get(self, url: str) -> bytes:
+        """The document's content. Raises DownloadTooLarge or DownloadError."""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            entry = self._cached(url)
+            if entry is not None and entry["expires"] > time.time():
+                content = self._read_cached(url)
+                if content is not None:
+                    outcome = "fresh"
+                    self._record_hit(entry, content, start)
+                    return content
+            headers = {}
+            if entry is not None:
+                if entry.get("etag"):
+                    headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    headers["If-Modified-Since"] = entry["last_modified"]
+
+            response, spool = self._fetch(url, headers)
+            if spool is None:
+                content = self._read_cached(url) if entry is not None else None
+                if content is None:
+                    # The cached copy vanished (evicted meanwhile): fetch it unconditionally
+                    response, spool = self._fetch(url, {})
+                else:
+                    outcome = "revalidated"
+                    max_age = _max_age(response.headers)
+                    self._write_meta(url, {**entry, "expires": time.time() + (max_age or 0)})
+                    self._record_hit(entry, content, start)
+                    return content
+
+            with spool:
+                size = spool.tell()
+                if self.cache_max_bytes:
+                    self._store(url, response.headers, spool, size, time.perf_counter() - start)
+                spool.seek(0)
+                content = spool.read()
+            outcome = "downloaded"
+            DOWNLOAD_BYTES.labels("network").inc(size)
+            return content
+        except DownloadTooLarge:
+            outcome = "too_large"
+            raise
+        finally:
+            DOWNLOADS.labels(outcome).inc()
+            DOWNLOAD_LATENCY.labels(outcome).observe(time.perf_counter() - start)
+
+    @staticmethod
+    def _record_hit(entry: dict, content: bytes, start: float) -> None:
+        DOWNLOAD_BYTES.labels("cache").inc(len(content))
+        DOWNLOAD_SECONDS_SAVED.inc(max(entry.get("seconds", 0.0) - (time.perf_counter() - start), 0.0))
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_download_client: Optional[DocumentDownloadClient] = None
+_download_client_lock = threading.Lock()
+
+
+def get_download_client() -> DocumentDownloadClient:
+    """Returns the process-wide download client."""
+    global _download_client
+    if _download_client is None:
+        with _download_client_lock:
+            if _download_client is None:
+                _download_client = DocumentDownloadClient()
+    return _download_client
@@ -0,0 +1,30 @@
+from bs4 import BeautifulSoup
+from htmldiff2 import render_html_diff
+
+from app.utils.cpu_pool import run_cpu
+from app.utils.diff_ops import diff_ops
+
+
+def prettify_html(html: str) -> str:
+    """Re-serialises HTML with BeautifulSoup (closes tags, normalises nesting). Runs in a CPU pool worker."""
+    return BeautifulSoup(html, "html.parser").prettify()
+
+
+def diff_html(old_html: str, new_html: str) -> str:
+    """HTML with <ins>/<del> markup for the changes between two policies. Runs in a CPU pool worker."""
+    return render_html_diff(old_html, new_html)
+
+
+def clean_html(html: str) -> str:
+    """prettify_html on the CPU pool."""
+    return run_cpu("html_prettify", prettify_html, html, size=len(html))
+
+
+def html_diff(old_html: str, new_html: str) -> str:
+    """diff_html on the CPU pool."""
+    return run_cpu("html_diff", diff_html, old_html, new_html, size=len(old_html) + len(new_html))
+
+
+def html_diff_ops(old_html: str, new_html: str) -> dict:
+    """diff_ops (compact edit operations against old_html) on the CPU pool."""
+    return run_cpu("html_diff_ops", diff_ops, old_html, new_html, size=len(old_html) + len(new_html))
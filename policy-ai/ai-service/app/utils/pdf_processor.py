@@ -1,31 +1,40 @@
 import logging
-import requests
 from io import BytesIO
 import pypdf # Or from PyPDF2 import PdfReader
 
+from app.utils.cpu_pool import run_cpu
+from app.utils.download_client import DownloadError, get_download_client
+
 logger = logging.getLogger(__name__)
 
 def download_pdf_content(url: str) -> bytes | None:
+    """PDF bytes via the shared download client (pooled, cached, size-capped), or None on failure."""
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.content
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to download PDF from {url}: {e}")
+        return get_download_client().get(url)
+    except DownloadError as e:
+        logger.error("Failed to download PDF from %s: %s", url, e)
         return None
 
+def read_pdf_pages(pdf_content: bytes) -> list[str]:
+    """Text of each page ("" for pages without text). Raises on unreadable PDFs. Runs in a CPU pool worker."""
+    reader = pypdf.PdfReader(BytesIO(pdf_content))
+    return [page.extract_text() or "" for page in reader.pages]
+
+def count_pdf_pages(pdf_content: bytes) -> int:
+    """Number of pages; raises if the PDF cannot be parsed. Runs in a CPU pool worker."""
+    return len(pypdf.PdfReader(BytesIO(pdf_content)).pages)
+
+def extract_pdf_pages(pdf_content: bytes) -> list[str]:
+    """Page texts extracted on the CPU pool (a malformed PDF can only take down a worker)."""
+    return run_cpu("pdf_extract", read_pdf_pages, pdf_content, size=len(pdf_content))
+
 def extract_text_from_pdf(pdf_content: bytes) -> str | None:
     try:
-        reader = pypdf.PdfReader(BytesIO(pdf_content))
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text: # Ensure text was extracted
-                text += page_text
+        text = "".join(extract_pdf_pages(pdf_content))
         if not text: # If no text was extracted from any page
             logger.warning("No text could be extracted from the PDF.")
             return None
         return text
     except Exception as e: # Catch more general pypdf errors
-        logger.error(f"Failed to extract text from PDF: {e}", exc_info=True)
+        logger.error("Failed to extract text from PDF: %s", e, exc_info=True)
         return None 
\ No newline at end of file
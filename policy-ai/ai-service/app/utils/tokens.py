@@ -0,0 +1,33 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_loaded = False
+_lock = threading.Lock()
+
+
+def _get_encoding():
+    """The gpt-4o tokenizer, or None if tiktoken can't load it (it downloads the BPE file on first use)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    logger.warning("tiktoken encoding unavailable, estimating tokens as chars/4: %s", e)
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of gpt-4o tokens in text (approximated as chars/4 when the tokenizer is unavailable)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
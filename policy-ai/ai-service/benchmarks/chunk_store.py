@@ -0,0 +1,128 @@
+"""
+Chunk text in Pinecone metadata vs. a local chunk store: payload size and lookup latency.
+
+Offline (default): chunks the synthetic corpus, builds the query responses Pinecone
+would return for top-k matches with text in metadata (previous layout) and with only
+ids and PINECONE_METADATA_FIELDS (chunk store layout), and reports response/upsert
+metadata bytes and JSON decode time for each. It also fills a temporary chunk store
+and times the batched text lookup retrieval now does after each query.
+
+--live times real queries against the configured index (needs the usual API keys),
+reporting query latency and response size for the vectors currently indexed.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.chunk_store [--documents 30] [--k 3 10 30] [--lookups 2000]
+    python -m benchmarks.chunk_store --live [--k 3 10 30]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from langchain_core.documents import Document
+
+from app.ai.chunk_store import ChunkStore
+from app.ai.vector_store import index_metadata, make_chunk_id, TEXT_KEY
+from app.services.document_processor import split_pages
+from benchmarks.corpus import synthetic_corpus
+
+DEFAULT_QUERIES = [
+    "¿Qué cubre la póliza de hogar en caso de inundación?",
+    "¿Cuál es el plazo para comunicar un siniestro?",
+    "¿Qué exclusiones tiene la cobertura de responsabilidad civil?",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _response(matches):
+    return json.dumps({"matches": matches, "namespace": ""}, ensure_ascii=False).encode("utf-8")
+
+
+def _offline(args):
+    chunks = {}
+    for source, pages in synthetic_corpus(documents=args.documents).items():
+        for i, chunk in enumerate(split_pages(pages)):
+            metadata = {**chunk.metadata, "source": source, "chunk_index": i, "sources": [source]}
+            chunks[make_chunk_id(source, i)] = Document(page_content=chunk.page_content, metadata=metadata)
+    ids = list(chunks)
+    rng = random.Random(0)
+    print(f"{len(chunks)} chunks")
+
+    full_meta = [len(json.dumps({**d.metadata, TEXT_KEY: d.page_content}, ensure_ascii=False).encode()) for d in chunks.values()]
+    slim_meta = [len(json.dumps(index_metadata(d.metadata), ensure_ascii=False).encode()) for d in chunks.values()]
+    print(f"Vector metadata per chunk: {statistics.mean(full_meta):.0f} B with text (max {max(full_meta)} B, "
+          f"Pinecone limit 40960 B) -> {statistics.mean(slim_meta):.0f} B without")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChunkStore(db_path=os.path.join(tmp, "chunks.db"))
+        start = time.perf_counter()
+        store.put_many(ids, list(chunks.values()))
+        write_seconds = time.perf_counter() - start
+        db_size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        text_size = sum(len(d.page_content.encode()) for d in chunks.values())
+        print(f"Chunk store: {db_size / 1024:.0f} KiB on disk for {text_size / 1024:.0f} KiB of text, "
+              f"written in {write_seconds * 1000:.0f} ms")
+
+        print(f"\n{'k':>4} {'resp text':>10} {'resp slim':>10} {'decode text':>12} {'decode slim':>12} "
+              f"{'store p50':>10} {'store p95':>10}")
+        for k in args.k:
+            full_bytes, slim_bytes, full_decode, slim_decode, lookups = [], [], [], [], []
+            for _ in range(args.lookups):
+                hits = rng.sample(ids, k)
+                full = _response([{"id": i, "score": 0.8, "values": [],
+                                   "metadata": {**chunks[i].metadata, TEXT_KEY: chunks[i].page_content}} for i in hits])
+                slim = _response([{"id": i, "score": 0.8, "values": [], "metadata": index_metadata(chunks[i].metadata)}
+                                  for i in hits])
+                full_bytes.append(len(full))
+                slim_bytes.append(len(slim))
+                start = time.perf_counter()
+                json.loads(full)
+                full_decode.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                json.loads(slim)
+                slim_decode.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                store.get_many(hits)
+                lookups.append(time.perf_counter() - start)
+            print(f"{k:>4} {statistics.mean(full_bytes):>9.0f}B {statistics.mean(slim_bytes):>9.0f}B "
+                  f"{statistics.mean(full_decode) * 1e6:>10.0f}us {statistics.mean(slim_decode) * 1e6:>10.0f}us "
+                  f"{_percentile(lookups, 50) * 1e6:>8.0f}us {_percentile(lookups, 95) * 1e6:>8.0f}us")
+
+
+def _live(args):
+    from app.ai.vector_store import get_embedding_model, get_pinecone_index
+    index = get_pinecone_index()
+    embeddings = get_embedding_model()
+    vectors = [embeddings.embed_query(query) for query in DEFAULT_QUERIES]
+    print(f"{'k':>4} {'query p50':>10} {'query p95':>10} {'response':>10}")
+    for k in args.k:
+        latencies, sizes = [], []
+        for _ in range(5):
+            for vector in vectors:
+                start = time.perf_counter()
+                response = index.query(vector=vector, top_k=k, include_metadata=True, include_values=False)
+                latencies.append(time.perf_counter() - start)
+                sizes.append(len(json.dumps(response.to_dict(), ensure_ascii=False).encode("utf-8")))
+        print(f"{k:>4} {_percentile(latencies, 50) * 1000:>8.0f}ms {_percentile(latencies, 95) * 1000:>8.0f}ms "
+              f"{statistics.mean(sizes):>9.0f}B")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="Time queries against the configured Pinecone index")
+    parser.add_argument("--documents", type=int, default=30)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 10, 30])
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+    _live(args) if args.live else _offline(args)
+
+
+if __name__ == "__main__":
+    main()
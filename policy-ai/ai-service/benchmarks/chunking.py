@@ -0,0 +1,98 @@
+"""
+Ingestion chunking: structure-aware token chunker vs. RecursiveCharacterTextSplitter(1000, 200).
+
+For each chunker reports throughput (pages/s and MB/s of extracted text), chunks per
+document, chunk size in tokens (mean/p95/max), how many chunks start at a structural
+boundary (chapter, article or numbered clause) instead of mid-sentence, and how many
+span a page break.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.chunking [--documents 30] [--repeat 3] [--pdf policy.pdf ...]
+"""
+import argparse
+import statistics
+import time
+
+from app.services.chunking import chunk_pages, _classify, _TEXT
+from app.services.document_processor import get_text_chunks, extract_pages_from_pdf
+from app.utils.tokens import count_tokens
+from benchmarks.corpus import synthetic_corpus
+
+
+def _recursive(pages):
+    return get_text_chunks("".join(page + "\n" for page in pages if page))
+
+
+def _structured(pages):
+    return chunk_pages(pages)
+
+
+def _recursive_page_breaks(chunks, pages):
+    """Chunks of the flat text that span a page boundary (located by searching the text)."""
+    text = "\n".join(pages)
+    boundaries, position = [], 0
+    for page in pages[:-1]:
+        position += len(page) + 1
+        boundaries.append(position)
+    crossing, search_from = 0, 0
+    for chunk in chunks:
+        start = text.find(chunk, search_from)
+        if start < 0:
+            continue
+        search_from = start + 1
+        crossing += any(start < boundary < start + len(chunk) for boundary in boundaries)
+    return crossing
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per chunker (best is reported)")
+    parser.add_argument("--pdf", nargs="*", help="Use these PDFs instead of the synthetic corpus")
+    args = parser.parse_args()
+
+    if args.pdf:
+        corpus = {}
+        for path in args.pdf:
+            with open(path, "rb") as f:
+                corpus[path] = extract_pages_from_pdf(f.read())
+    else:
+        corpus = synthetic_corpus(documents=args.documents)
+    page_count = sum(len(pages) for pages in corpus.values())
+    megabytes = sum(len(page.encode("utf-8")) for pages in corpus.values() for page in pages) / 1e6
+    print(f"Corpus: {len(corpus)} documents, {page_count} pages, {megabytes:.2f} MB of text")
+    print(f"{'chunker':<11} {'pages/s':>9} {'MB/s':>7} {'chunks/doc':>11} {'tok mean':>9} {'tok p95':>8} "
+          f"{'tok max':>8} {'at boundary':>12} {'cross page':>11}")
+
+    for name, chunker in (("recursive", _recursive), ("structured", _structured)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chunks = {source: chunker(pages) for source, pages in corpus.items()}
+            best = min(best, time.perf_counter() - start)
+
+        sizes, at_boundary, cross_page, total = [], 0, 0, 0
+        for source, pages in corpus.items():
+            if name == "structured":
+                cross_page += sum(doc.metadata["page_start"] != doc.metadata["page_end"] for doc in chunks[source])
+                texts = [doc.page_content for doc in chunks[source]]
+            else:
+                cross_page += _recursive_page_breaks(chunks[source], pages)
+                texts = chunks[source]
+            for chunk in texts:
+                total += 1
+                sizes.append(count_tokens(chunk))
+                first_line = chunk.lstrip().split("\n", 1)[0]
+                at_boundary += _classify(first_line) != _TEXT
+        print(f"{name:<11} {page_count / best:>9.0f} {megabytes / best:>7.2f} {total / len(corpus):>11.1f} "
+              f"{statistics.mean(sizes):>9.0f} {_percentile(sizes, 95):>8} {max(sizes):>8} "
+              f"{at_boundary / total:>11.0%} {cross_page / total:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+RAG context compaction: tokens saved and time spent.
+
+Chunks a set of policy wordings with the ingestion splitter, simulates retrieval
+results that mix neighbouring chunks, repeated chunks from other versions of the
+same product and unrelated hits, and compares the context policy_rag_tool sends
+with and without compaction.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.compaction [--queries 500] [--k 3 10] [--budget 2500] [--pdf policy.pdf ...]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from langchain_core.documents import Document
+
+from app.ai.context_compaction import compact_documents
+from app.services.document_processor import split_pages, extract_pages_from_pdf
+from app.utils.tokens import count_tokens
+from benchmarks.corpus import synthetic_corpus
+
+
+def _chunked_corpus(pdfs):
+    if pdfs:
+        corpus = {}
+        for path in pdfs:
+            with open(path, "rb") as f:
+                corpus[path] = extract_pages_from_pdf(f.read())
+    else:
+        corpus = synthetic_corpus(documents=12, versions=3)
+    return {
+        source: [Document(page_content=chunk.page_content, metadata={"source": source, "chunk_index": i})
+                 for i, chunk in enumerate(split_pages(pages))]
+        for source, pages in corpus.items()
+    }
+
+
+def _simulated_hits(corpus, k, rng):
+    """A retrieval result: a seed chunk, likely neighbours, the same chunk from other versions, random fill."""
+    sources = list(corpus)
+    source = rng.choice(sources)
+    chunks = corpus[source]
+    seed = rng.randrange(len(chunks))
+    hits = [chunks[seed]]
+    for offset in (1, -1, 2):
+        if rng.random() < 0.5 and 0 <= seed + offset < len(chunks):
+            hits.append(chunks[seed + offset])
+    for other in sources:
+        if other != source and other.rsplit("_v", 1)[0] == source.rsplit("_v", 1)[0] and seed < len(corpus[other]):
+            hits.append(corpus[other][seed])
+    while len(hits) < k:
+        other = corpus[rng.choice(sources)]
+        hits.append(other[rng.randrange(len(other))])
+    rng.shuffle(hits)
+    return hits[:k]
+
+
+def _context_tokens(docs):
+    return count_tokens("\n\n".join(doc.page_content for doc in docs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--budget", type=int, default=2500)
+    parser.add_argument("--pdf", nargs="*", help="Use these PDFs instead of the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = _chunked_corpus(args.pdf)
+    print(f"Corpus: {len(corpus)} documents, {sum(len(c) for c in corpus.values())} chunks")
+    print(f"{'k':>4} {'tokens raw':>11} {'compacted':>10} {'saved':>7} {'passages':>9} {'ms/query':>9}")
+    for k in args.k:
+        rng = random.Random(args.seed)
+        raw, compacted, passages, seconds = [], [], [], []
+        for _ in range(args.queries):
+            hits = _simulated_hits(corpus, k, rng)
+            start = time.perf_counter()
+            result = compact_documents(hits, token_budget=args.budget)
+            seconds.append(time.perf_counter() - start)
+            raw.append(_context_tokens(hits))
+            compacted.append(_context_tokens(result))
+            passages.append(len(result))
+        saved = 1 - statistics.mean(compacted) / statistics.mean(raw)
+        print(f"{k:>4} {statistics.mean(raw):>11.0f} {statistics.mean(compacted):>10.0f} {saved:>6.1%} "
+              f"{statistics.mean(passages):>9.1f} {statistics.mean(seconds) * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
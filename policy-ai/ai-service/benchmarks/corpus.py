@@ -0,0 +1,113 @@
+"""
+Synthetic insurance wordings for offline benchmarks.
+
+Generates page-structured Spanish policy texts (chapters, numbered articles and
+clauses, page headers/footers) so chunking, compaction and de-duplication can be
+measured without the S3 corpus. Real PDFs can be used instead via --pdf where a
+benchmark supports it.
+"""
+import io
+import random
+import textwrap
+from typing import List
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+_TOPICS = [
+    ("Objeto del seguro", "El asegurador se obliga, dentro de los límites pactados, a indemnizar los daños sufridos por los bienes asegurados"),
+    ("Riesgos cubiertos", "Quedan cubiertos los daños materiales directos causados por incendio, explosión, caída del rayo, humo y acción del agua"),
+    ("Exclusiones", "No quedan cubiertos los daños causados intencionadamente por el asegurado, los derivados de guerra o terrorismo ni el desgaste normal"),
+    ("Franquicia", "En cada siniestro el asegurado soportará a su cargo la cantidad fijada como franquicia en las condiciones particulares"),
+    ("Robo y expoliación", "Se garantiza la sustracción ilegítima de los bienes asegurados con fuerza en las cosas o violencia sobre las personas"),
+    ("Responsabilidad civil", "El asegurador asume el pago de las indemnizaciones de las que el asegurado sea civilmente responsable frente a terceros"),
+    ("Declaración del siniestro", "El tomador o el asegurado deberán comunicar el siniestro dentro del plazo máximo de siete días desde que fue conocido"),
+    ("Pago de la prima", "El tomador está obligado al pago de la primera prima en el momento de la perfección del contrato"),
+    ("Duración y rescisión", "El contrato se celebra por el periodo indicado en las condiciones particulares y se prorrogará tácitamente por periodos anuales"),
+    ("Valoración de los daños", "La tasación de los daños se efectuará por peritos designados por las partes conforme al artículo 38 de la Ley de Contrato de Seguro"),
+]
+
+_FILLER = [
+    "salvo pacto en contrario recogido expresamente en las condiciones particulares",
+    "siempre que el asegurado haya adoptado las medidas de seguridad exigidas",
+    "con el límite de la suma asegurada indicada para cada garantía",
+    "sin perjuicio de lo dispuesto en la legislación vigente",
+    "previa presentación de los justificantes y facturas correspondientes",
+    "en los términos y con los límites establecidos en esta póliza",
+]
+
+
+def synthetic_policy(seed: int = 0, articles: int = 30, clauses_per_article: int = 4, company: str = "Aseguradora Ejemplo S.A.") -> List[str]:
+    """Returns the pages of a synthetic policy wording (one string per page)."""
+    rng = random.Random(seed)
+    lines = []
+    for number in range(1, articles + 1):
+        if number % 10 == 1:
+            lines.append(f"CAPÍTULO {(number - 1) // 10 + 1}. CONDICIONES GENERALES")
+        title, lead = _TOPICS[(number - 1) % len(_TOPICS)]
+        lines.append(f"Artículo {number}. {title}")
+        for clause in range(1, clauses_per_article + 1):
+            sentences = [f"{lead}, {rng.choice(_FILLER)}." for _ in range(rng.randint(2, 4))]
+            lines.append(f"{number}.{clause}. " + " ".join(sentences))
+
+    pages, page, size = [], [], 0
+    for line in lines:
+        page.append(line)
+        size += len(line)
+        if size > 2500:
+            pages.append(page)
+            page, size = [], 0
+    if page:
+        pages.append(page)
+    total = len(pages)
+    return [
+        "\n".join([company, *body, f"Página {i} de {total}"])
+        for i, body in enumerate(pages, start=1)
+    ]
+
+
+def synthetic_corpus(documents: int = 20, versions: int = 3, seed: int = 0) -> dict:
+    """
+    {source: pages} for a corpus where each product wording exists in several versions
+    that differ only in a few clauses, like the product versions in the S3 bucket.
+    """
+    corpus = {}
+    for doc in range(documents // versions + (1 if documents % versions else 0)):
+        base = synthetic_policy(seed=seed + doc, articles=24)
+        for version in range(versions):
+            if len(corpus) >= documents:
+                break
+            pages = list(base)
+            if version:
+                # A new version changes one article's wording
+                rng = random.Random(seed + doc * 100 + version)
+                page = rng.randrange(len(pages))
+                pages[page] = pages[page].replace("siete días", f"{7 + version * 3} días").replace("anuales", "semestrales")
+            corpus[f"s3://bench/producto_{doc}_v{version + 1}.pdf"] = pages
+    return corpus
+
+
+def synthetic_pdf(pages: List[str], font_size: int = 8) -> bytes:
+    """A PDF with one A4 page per text page (Helvetica, wrapped lines), for extraction benchmarks."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    }))
+    for text in pages:
+        page = writer.add_blank_page(width=595, height=842)
+        operations = ["BT", f"/F1 {font_size} Tf", f"{font_size + 2} TL", "30 810 Td"]
+        for line in text.splitlines():
+            for wrapped in textwrap.wrap(line, 110) or [""]:
+                escaped = wrapped.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+                operations.append(f"({escaped}) Tj T*")
+        operations.append("ET")
+        content = DecodedStreamObject()
+        content.set_data("\n".join(operations).encode("cp1252", errors="replace"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,143 @@
+"""
+CPU offload benchmark: event-loop lag and throughput while concurrent requests
+process heavy documents (PDF text extraction, chunking, HTML prettify + diff).
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.cpu_offload [--requests 16] [--concurrency 8] [--articles 80] [--workers 4]
+                                     [--modes inline,threads,pool] [--output cpu.json] [--baseline cpu.json]
+
+Modes:
+    inline   the work runs on the event loop, like sync code inside an async endpoint
+    threads  asyncio.to_thread / run_in_threadpool: the loop is free but the GIL is shared
+    pool     the CPU pool (app.utils.cpu_pool), as the service runs it
+
+Event-loop lag is sampled every 10 ms on the loop serving the requests.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.chunking import chunk_pages
+from app.utils.cpu_pool import CpuPool
+from app.utils.html_processor import prettify_html, diff_html
+from app.utils.pdf_processor import read_pdf_pages
+from benchmarks.corpus import synthetic_pdf, synthetic_policy
+from benchmarks.harness import stats
+from benchmarks.loadtest.__main__ import LoopLagMonitor
+
+
+def _policy_html(pages) -> str:
+    return "".join(f"<p>{line}</p>" for page in pages for line in page.splitlines()[1:-1])
+
+
+def build_documents(count: int, articles: int) -> list:
+    """(pdf bytes, current html, edited html) per request; every document is distinct."""
+    documents = []
+    for seed in range(count):
+        pages = synthetic_policy(seed=seed, articles=articles)
+        html = _policy_html(pages)
+        edited = html.replace("siete días", "cinco días").replace("<p>", "<p class='clausula'>", 10)
+        documents.append((synthetic_pdf(pages), html, edited))
+    return documents
+
+
+def process(document) -> int:
+    """The full CPU-bound pipeline for one request, in-process."""
+    pdf, html, edited = document
+    chunks = chunk_pages(read_pdf_pages(pdf))
+    diff_html(html, prettify_html(edited))
+    return len(chunks)
+
+
+async def process_on_pool(pool: CpuPool, document) -> int:
+    pdf, html, edited = document
+    pages = await asyncio.to_thread(pool.run, "pdf_extract", read_pdf_pages, pdf)
+    chunks = await asyncio.to_thread(pool.run, "chunking", chunk_pages, pages)
+    cleaned = await asyncio.to_thread(pool.run, "html_prettify", prettify_html, edited)
+    await asyncio.to_thread(pool.run, "html_diff", diff_html, html, cleaned)
+    return len(chunks)
+
+
+async def run_mode(mode: str, documents: list, concurrency: int, pool: CpuPool) -> dict:
+    monitor = LoopLagMonitor(0.01)
+    lag_task = asyncio.create_task(monitor.run())
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def request(document):
+        async with limiter:
+            start = time.perf_counter()
+            if mode == "inline":
+                process(document)
+                await asyncio.sleep(0)  # An async endpoint returning after sync work
+            elif mode == "threads":
+                await asyncio.to_thread(process, document)
+            else:
+                await process_on_pool(pool, document)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.sleep(0.05)  # Let the monitor take a few idle samples first
+    start = time.perf_counter()
+    await asyncio.gather(*(request(document) for document in documents))
+    wall = time.perf_counter() - start
+    monitor.stop()
+    await lag_task
+    lag = stats.summarize(monitor.samples)
+    return {
+        "wall_seconds": wall,
+        "documents_per_second": len(documents) / wall,
+        "latency": stats.summarize(latencies),
+        "loop_lag": {**lag, "max": max(monitor.samples, default=0.0)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=16, help="Documents processed (one per request)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--articles", type=int, default=80, help="Articles per synthetic policy (~0.8 pages each)")
+    parser.add_argument("--workers", type=int, default=4, help="CPU pool workers")
+    parser.add_argument("--modes", default="inline,threads,pool")
+    parser.add_argument("--output", help="Save the measurements as JSON")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON run")
+    args = parser.parse_args()
+
+    documents = build_documents(args.requests, args.articles)
+    print(f"{args.requests} documents of {len(documents[0][0]) / 1024:.0f} KB PDF + {len(documents[0][1]) / 1024:.0f} KB HTML, "
+          f"concurrency {args.concurrency}, {args.workers} pool workers")
+    pool = CpuPool(workers=args.workers)
+    start = time.perf_counter()
+    pool.warm()
+    print(f"Pool warm-up: {time.perf_counter() - start:.2f}s")
+
+    result = {}
+    try:
+        for mode in args.modes.split(","):
+            result[mode] = asyncio.run(run_mode(mode, documents, args.concurrency, pool))
+    finally:
+        pool.shutdown()
+
+    print(f"\n{'mode':<8} {'docs/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+    for mode, row in result.items():
+        lag = row["loop_lag"]
+        print(f"{mode:<8} {row['documents_per_second']:>7.2f} {row['latency']['p50'] * 1000:>8.0f} "
+              f"{row['latency']['p95'] * 1000:>8.0f} {lag['p50'] * 1000:>8.1f} {lag['p99'] * 1000:>8.1f} {lag['max'] * 1000:>8.1f}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\nvs baseline:")
+        for mode, row in result.items():
+            if mode in baseline:
+                before = baseline[mode]
+                print(f"   {mode:<8} docs/s {before['documents_per_second']:.2f} -> {row['documents_per_second']:.2f}, "
+                      f"lag p99 {before['loop_lag']['p99'] * 1000:.1f} -> {row['loop_lag']['p99'] * 1000:.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Ingest-time near-duplicate elimination: index size reduction and overhead.
+
+Chunks a corpus where every product wording exists in several versions (synthetic,
+or real PDFs via --pdf), runs each file through the MinHash de-duplication index as
+ingestion does, and reports the chunks (vectors) that would be upserted with and
+without de-duplication, the embedding tokens saved, the de-duplication time next to
+the chunking time, and the size of the signature database.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.dedup [--documents 30] [--versions 3] [--threshold 0.9] [--pdf a.pdf b.pdf ...]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_core.documents import Document
+
+from app.ai.vector_store import make_chunk_id
+from app.services.dedup_index import DedupIndex
+from app.services.document_processor import split_pages, extract_pages_from_pdf
+from app.utils.tokens import count_tokens
+from benchmarks.corpus import synthetic_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=30)
+    parser.add_argument("--versions", type=int, default=3, help="Versions per product in the synthetic corpus")
+    parser.add_argument("--threshold", type=float, default=None, help="Override DEDUP_THRESHOLD")
+    parser.add_argument("--pdf", nargs="*", help="Use these PDFs instead of the synthetic corpus")
+    args = parser.parse_args()
+
+    if args.pdf:
+        corpus = {}
+        for path in args.pdf:
+            with open(path, "rb") as f:
+                corpus[path] = extract_pages_from_pdf(f.read())
+    else:
+        corpus = synthetic_corpus(documents=args.documents, versions=args.versions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "dedup.db")
+        index = DedupIndex(db_path=db_path) if args.threshold is None else DedupIndex(db_path=db_path, threshold=args.threshold)
+        chunking_seconds = dedup_seconds = 0.0
+        total = upserted = total_tokens = upserted_tokens = 0
+        for source, pages in corpus.items():
+            start = time.perf_counter()
+            chunks = split_pages(pages)
+            chunking_seconds += time.perf_counter() - start
+            docs = [Document(page_content=c.page_content, metadata={**c.metadata, "source": source, "chunk_index": i})
+                    for i, c in enumerate(chunks)]
+            ids = [make_chunk_id(source, i) for i in range(len(docs))]
+
+            start = time.perf_counter()
+            with index.deduplicate(docs, ids) as result:
+                pass
+            dedup_seconds += time.perf_counter() - start
+            total += len(docs)
+            upserted += len(result.documents)
+            total_tokens += sum(count_tokens(doc.page_content) for doc in docs)
+            upserted_tokens += sum(count_tokens(doc.page_content) for doc in result.documents)
+        db_size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        stats = index.stats()
+
+    print(f"Corpus: {len(corpus)} documents, {total} chunks")
+    print(f"Vectors upserted without dedup: {total}")
+    print(f"Vectors upserted with dedup:    {upserted} ({1 - upserted / total:.1%} smaller index)")
+    print(f"Embedding tokens:               {total_tokens} -> {upserted_tokens} ({1 - upserted_tokens / total_tokens:.1%} saved)")
+    print(f"Sources per indexed chunk:      {stats['chunk_sources'] / stats['indexed_chunks']:.2f}")
+    print(f"Chunking time:                  {chunking_seconds * 1000:.0f} ms")
+    print(f"Dedup time:                     {dedup_seconds * 1000:.0f} ms ({dedup_seconds / total * 1000:.2f} ms/chunk)")
+    print(f"Signature index size:           {db_size / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Edit responses: the htmldiff2-rendered policy vs compact edit operations, raw and compressed.
+
+Builds a synthetic policy of --articles articles, applies a few edits (a changed amount, an
+inserted clause, a deleted clause) to a prettified copy, as the edit endpoint does with the
+model's output, then measures for each response format: time to compute the diff, the JSON
+body the endpoint returns, that body gzipped and (when the brotli package is installed)
+brotli-compressed, and the total server-side time including serialisation and compression.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.diff_payload [--articles 120] [--repeat 5]
+                                      [--output diff_payload.json] [--baseline diff_payload.json]
+"""
+import argparse
+import json
+import time
+import zlib
+
+from app.core.compression import brotli
+from app.schemas.internal_api import PolicyEditResponse
+from app.utils.diff_ops import apply_ops, diff_ops, same_content
+from app.utils.html_processor import diff_html, prettify_html
+from benchmarks.corpus import synthetic_policy
+from benchmarks.harness import stats
+
+
+def build_policy(articles: int) -> str:
+    parts = ["<h2>Póliza de seguro multirriesgo del hogar</h2>"]
+    for page in synthetic_policy(seed=7, articles=articles, clauses_per_article=3):
+        for line in page.splitlines()[1:-1]:
+            if line.startswith("Artículo"):
+                parts.append(f"<h3>{line}</h3>")
+            elif not line.startswith("CAPÍTULO"):
+                parts.append(f"<p>{line}</p>")
+    return "".join(parts)
+
+
+def edit(policy: str) -> str:
+    """A prettified copy with a few local changes, like the model's answer to an edit instruction."""
+    paragraphs = policy.split("</p>")
+    middle = len(paragraphs) // 2
+    paragraphs[middle] = paragraphs[middle].replace(" ", " modificada ", 1)
+    paragraphs.insert(middle + 5, "<p>La franquicia general será de 150 euros por siniestro.")
+    del paragraphs[middle + 20]
+    return prettify_html("</p>".join(paragraphs))
+
+
+def _compressed_sizes(body: bytes) -> dict:
+    sizes = {"gzip": len(_gzip(body))}
+    if brotli is not None:
+        sizes["br"] = len(brotli.compress(body, quality=5))
+    return sizes
+
+
+def _gzip(body: bytes) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def measure(name: str, old: str, new: str, repeat: int) -> dict:
+    diff_times, total_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if name == "html_diff":
+            response = PolicyEditResponse(edited_policy_text=diff_html(old, new))
+        else:
+            response = PolicyEditResponse(changes=diff_ops(old, new))
+        diff_times.append(time.perf_counter() - start)
+        body = response.model_dump_json(exclude_none=True).encode("utf-8")
+        _gzip(body)
+        total_times.append(time.perf_counter() - start)
+    if name == "ops":
+        assert same_content(apply_ops(old, json.loads(body)["changes"]["ops"]), new)
+    return {"bytes": len(body), **_compressed_sizes(body),
+            "diff": stats.summarize(diff_times), "total": stats.summarize(total_times)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Save the measurements as JSON")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON run")
+    args = parser.parse_args()
+
+    old = build_policy(args.articles)
+    new = edit(old)
+    print(f"Policy: {len(old) / 1000:.0f} KB of HTML, {args.articles} articles")
+    result = {name: measure(name, old, new, args.repeat) for name in ("html_diff", "ops")}
+
+    print(f"\n{'format':<10} {'JSON KB':>8} {'gzip KB':>8} {'br KB':>7} {'diff p50 ms':>12} {'total p50 ms':>13}")
+    for name, row in result.items():
+        br = f"{row['br'] / 1000:>7.1f}" if "br" in row else f"{'-':>7}"
+        print(f"{name:<10} {row['bytes'] / 1000:>8.1f} {row['gzip'] / 1000:>8.1f} {br} "
+              f"{row['diff']['p50'] * 1000:>12.1f} {row['total']['p50'] * 1000:>13.1f}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\nvs baseline (gzip KB, total p50 ms):")
+        for name, row in result.items():
+            if name in baseline:
+                print(f"   {name:<10} {baseline[name]['gzip'] / 1000:.1f} -> {row['gzip'] / 1000:.1f} KB, "
+                      f"{baseline[name]['total']['p50'] * 1000:.1f} -> {row['total']['p50'] * 1000:.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Document downloads: one-off requests.get calls vs the pooled, conditional download client.
+
+Serves synthetic policy PDFs from a local HTTP/1.1 server that adds a delay to every new
+connection (standing in for the TCP + TLS handshake to a remote bucket) and throttles bodies
+to a given bandwidth. Each document is then fetched --rounds times, first with a plain
+requests.get per download (what download_pdf_content used to do), then with
+DocumentDownloadClient on an empty cache: the first round downloads, later rounds revalidate
+with If-None-Match and get a 304. Reports latency, connections opened and body bytes sent.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.downloads [--documents 20] [--rounds 3] [--size-kb 800] [--handshake-ms 60]
+                                   [--mbps 100] [--output downloads.json] [--baseline downloads.json]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import requests
+
+from app.utils.download_client import DocumentDownloadClient
+from benchmarks.harness import stats
+from tests.conftest import DocumentServer
+
+def _run(server: DocumentServer, urls: list, rounds: int, fetch) -> dict:
+    server.reset_counters()
+    timings = []
+    for _ in range(rounds):
+        for url in urls:
+            start = time.perf_counter()
+            content = fetch(url)
+            timings.append(time.perf_counter() - start)
+            assert content
+    return {"connections": server.connections, "requests": server.requests, "body_bytes": server.body_bytes,
+            "latency": stats.summarize(timings), "first_round": stats.summarize(timings[:len(urls)]),
+            "later_rounds": stats.summarize(timings[len(urls):]) if rounds > 1 else None}
+
+
+def plain_get(url: str) -> bytes:
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3, help="Times each document is fetched")
+    parser.add_argument("--size-kb", type=int, default=800)
+    parser.add_argument("--handshake-ms", type=float, default=60.0, help="Delay added to each new connection")
+    parser.add_argument("--mbps", type=float, default=100.0, help="Body bandwidth (0 = unthrottled)")
+    parser.add_argument("--output", help="Save the measurements as JSON")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON run")
+    args = parser.parse_args()
+
+    documents = {f"/policies/{i}.pdf": b"%PDF-1.7\n" + os.urandom(args.size_kb * 1024) for i in range(args.documents)}
+    with DocumentServer(documents, args.handshake_ms / 1000, args.mbps * 1_000_000 / 8) as server:
+        urls = [server.url(path) for path in documents]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = DocumentDownloadClient(cache_dir=cache_dir)
+            result = {
+                "requests.get": _run(server, urls, args.rounds, plain_get),
+                "download_client": _run(server, urls, args.rounds, client.get),
+            }
+            client.close()
+
+    print(f"{args.documents} documents of {args.size_kb} KB, fetched {args.rounds} times each")
+    print(f"\n{'mode':<16} {'conns':>6} {'body MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'1st round p50':>14} {'later p50':>10}")
+    for mode, row in result.items():
+        later = f"{row['later_rounds']['p50'] * 1000:>10.1f}" if row["later_rounds"] else f"{'-':>10}"
+        print(f"{mode:<16} {row['connections']:>6} {row['body_bytes'] / 1e6:>8.1f} {row['latency']['p50'] * 1000:>8.1f} "
+              f"{row['latency']['p95'] * 1000:>8.1f} {row['first_round']['p50'] * 1000:>14.1f} {later}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\nvs baseline (p50 ms, body MB):")
+        for mode, row in result.items():
+            if mode in baseline:
+                print(f"   {mode:<16} {baseline[mode]['latency']['p50'] * 1000:.1f} -> {row['latency']['p50'] * 1000:.1f} ms, "
+                      f"{baseline[mode]['body_bytes'] / 1e6:.1f} -> {row['body_bytes'] / 1e6:.1f} MB")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Metadata-filtered retrieval on the local vector index: query latency with and without filters.
+
+Fills a LocalVectorIndex with random unit vectors whose metadata is spread over tenants,
+product lines, document types and effective dates (like the attributes recorded at
+ingestion), then times the same queries unfiltered, post-filtered (over-fetch and drop
+non-matching hits, what a caller without index filters has to do) and filtered in the
+index, for filters of decreasing selectivity. Also reports how often post-filtering
+returned fewer than k hits.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.filtered_search [--vectors 200000] [--dimension 1536] [--queries 50] [--k 10]
+                                         [--output filtered.json] [--baseline filtered.json]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.ai.local_index import LocalVectorIndex
+from app.ai.retrieval_filters import build_filter
+from app.services.document_attributes import NOT_SUPERSEDED
+from benchmarks.harness import stats
+
+TENANTS = ["default"] + [f"tenant_{i}" for i in range(9)]
+PRODUCT_LINES = ["hogar", "autos", "vida", "salud", "comercio", "responsabilidad_civil"]
+DOCUMENT_TYPES = ["condiciones_generales", "condiciones_particulares", "condiciones_especiales", "nota_informativa"]
+POST_FILTER_FETCH = 10  # Post-filtering over-fetches k * this many hits
+
+SCENARIOS = {
+    "product_line": dict(product_line="hogar"),
+    "tenant+product_line": dict(tenant="tenant_3", product_line="hogar"),
+    "tenant+product_line+type+date": dict(tenant="tenant_3", product_line="hogar",
+                                          document_type="condiciones_generales", effective_on="2022-12-31"),
+}
+
+
+def build_index(vectors: int, dimension: int, seed: int) -> LocalVectorIndex:
+    rng = np.random.default_rng(seed)
+    index = LocalVectorIndex()
+    for start in range(0, vectors, 5000):
+        count = min(5000, vectors - start)
+        values = rng.standard_normal((count, dimension)).astype(np.float32)
+        index.upsert([
+            {"id": f"c{start + i}", "values": row, "metadata": {
+                "tenant": TENANTS[rng.integers(len(TENANTS))],
+                "product_line": PRODUCT_LINES[rng.integers(len(PRODUCT_LINES))],
+                "document_type": DOCUMENT_TYPES[rng.integers(len(DOCUMENT_TYPES))],
+                "effective_date": int(20190101 + rng.integers(6) * 10000 + rng.integers(1, 13) * 100 + 1),
+                "superseded_on": NOT_SUPERSEDED,
+            }}
+            for i, row in enumerate(values)
+        ])
+    return index
+
+
+def _matches(metadata: dict, filter_fields: dict) -> bool:
+    for field, value in filter_fields.items():
+        if field == "effective_on":
+            if metadata.get("effective_date", 99999999) > int(value.replace("-", "")):
+                return False
+        elif metadata.get(field) != value:
+            return False
+    return True
+
+
+def run_scenario(index: LocalVectorIndex, queries: np.ndarray, k: int, fields: dict) -> dict:
+    filter = build_filter(**fields)
+    timings = {"unfiltered": [], "post_filtered": [], "index_filtered": []}
+    short = 0
+    for query in queries:
+        start = time.perf_counter()
+        index.query(vector=query, top_k=k, include_metadata=True)
+        timings["unfiltered"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        hits = index.query(vector=query, top_k=k * POST_FILTER_FETCH, include_metadata=True).matches
+        kept = [hit for hit in hits if _matches(hit.metadata, fields)][:k]
+        timings["post_filtered"].append(time.perf_counter() - start)
+        short += len(kept) < k
+
+        start = time.perf_counter()
+        index.query(vector=query, top_k=k, include_metadata=True, filter=filter)
+        timings["index_filtered"].append(time.perf_counter() - start)
+    candidates = int(index._partitions[""].mask(filter)[:len(index)].sum())
+    return {
+        "candidates": candidates,
+        "post_filter_short_results": short / len(queries),
+        **{mode: stats.summarize(samples) for mode, samples in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dimension", type=int, default=1536, help="text-embedding-3-small size")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Save the measurements as JSON")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON run")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(args.vectors, args.dimension, args.seed)
+    print(f"Indexed {len(index)} vectors of dimension {args.dimension} in {time.perf_counter() - start:.1f}s")
+    queries = np.random.default_rng(args.seed + 1).standard_normal((args.queries, args.dimension)).astype(np.float32)
+
+    result = {name: run_scenario(index, queries, args.k, fields) for name, fields in SCENARIOS.items()}
+
+    print(f"\n{'filter':<32} {'rows':>8} {'unfiltered':>11} {'post-filter':>12} {'in index':>9} {'short':>6}   (p50 ms)")
+    for name, row in result.items():
+        print(f"{name:<32} {row['candidates']:>8} {row['unfiltered']['p50'] * 1000:>11.2f} "
+              f"{row['post_filtered']['p50'] * 1000:>12.2f} {row['index_filtered']['p50'] * 1000:>9.2f} "
+              f"{row['post_filter_short_results']:>6.0%}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\nvs baseline (in-index p50):")
+        for name, row in result.items():
+            if name in baseline:
+                print(f"   {name:<32} {baseline[name]['index_filtered']['p50'] * 1000:.2f} -> "
+                      f"{row['index_filtered']['p50'] * 1000:.2f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+Offline end-to-end benchmark harness.
+
+Runs ingestion, the conversational agent, drafting, editing and analysis through the
+production code paths with deterministic fakes for the external services (see
+environment.OfflineEnvironment), and reports per-stage latency percentiles, token
+counts, allocations and answer-quality scores. Entry point: python -m benchmarks.harness
+"""
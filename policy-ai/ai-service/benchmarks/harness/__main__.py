@@ -0,0 +1,221 @@
+"""
+Offline end-to-end benchmark: ingestion, agent answers (RAG, web search, document Q&A),
+policy drafting, editing and analysis, run through the production code with
+deterministic LLM, embedding, search and vector-index fakes.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.harness [--documents 12] [--concurrency 4] [--latency-scale 0.1]
+                                 [--cassettes DIR [--record]] [--ragas]
+                                 [--output harness.json] [--baseline harness.json]
+
+Reports, per scenario: exact p50/p95/p99 of each operation, per-stage percentiles from
+the service's Prometheus histograms (LLM tier, tool, vector query, scheduler wait...),
+token and cost counters, and peak/net allocations (tracemalloc; --no-tracemalloc to
+skip, it slows Python code down). Quality is scored offline with word-recall proxies,
+or with ragas (--ragas, needs a judge API key), concurrently in both cases.
+
+--latency-scale multiplies the simulated provider latency (0 = no sleeps, 1 = roughly
+real OpenAI timings). --cassettes replays recorded responses from llm.json and
+embeddings.json in DIR; with --record, missing responses are fetched from the real
+APIs and saved there. --output / --baseline save a run and diff against a saved one.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks.corpus import synthetic_corpus, synthetic_policy
+from benchmarks.harness import quality, stats
+from benchmarks.harness.environment import OfflineEnvironment
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(__file__), "..", "fixtures", "harness_questions.json")
+
+
+class ContextCollector(BaseCallbackHandler):
+    """Collects tool outputs of one agent run: the contexts the answer was based on."""
+
+    def __init__(self):
+        self.contexts: List[str] = []
+
+    def on_tool_end(self, output, **kwargs) -> None:
+        self.contexts.append(str(getattr(output, "content", output)))
+
+
+def load_dataset(path: str = QUESTIONS_PATH) -> dict:
+    """The question set, with each fixture document rendered to text from its synthetic spec."""
+    with open(path, encoding="utf-8") as f:
+        dataset = json.load(f)
+    dataset["document_texts"] = {
+        url: "\n".join(synthetic_policy(seed=spec["seed"], articles=spec["articles"]))
+        for url, spec in dataset["documents"].items()
+    }
+    return dataset
+
+
+def _timed_map(fn: Callable, items: list, concurrency: int) -> tuple:
+    """Runs fn over items on a thread pool; returns (results, per-item seconds, wall seconds)."""
+    def timed(item):
+        start = time.perf_counter()
+        result = fn(item)
+        return result, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        outcomes = list(pool.map(timed, items))
+    return [result for result, _ in outcomes], [seconds for _, seconds in outcomes], time.perf_counter() - start
+
+
+def run_scenario(name: str, fn: Callable, items: list, concurrency: int, trace_memory: bool) -> dict:
+    before = stats.snapshot()
+    if trace_memory:
+        tracemalloc.start()
+        baseline_bytes = tracemalloc.get_traced_memory()[0]
+    results, seconds, wall = _timed_map(fn, items, concurrency)
+    memory = {}
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory = {"peak_mb": (peak - baseline_bytes) / 2**20, "net_mb": (current - baseline_bytes) / 2**20}
+    after = stats.snapshot()
+    return {
+        "name": name,
+        "results": results,
+        "latency": stats.summarize(seconds),
+        "wall_seconds": wall,
+        "throughput_per_second": len(items) / wall if wall else 0.0,
+        "stages": stats.stage_report(before, after),
+        "counters": stats.counter_report(before, after),
+        "memory": memory,
+    }
+
+
+# --- Scenarios ---
+
+def ingest(item) -> int:
+    from app.services.document_processor import index_document
+    source, pages = item
+    return index_document(source, pages)
+
+
+def ask(question: dict) -> dict:
+    from app.ai.rag_agent import get_agent_response
+    collector = ContextCollector()
+    config = {"configurable": {"thread_id": f"harness-{uuid.uuid4().hex}"}, "callbacks": [collector]}
+    if question.get("url"):
+        config["document_context"] = {"url": question["url"]}
+    answer = get_agent_response(question["question"], config=config)
+    return {"question": question["question"], "answer": answer, "contexts": collector.contexts or [""],
+            "ground_truth": question["ground_truth"]}
+
+
+def draft(prompt: str) -> str:
+    from app.ai.rag_agent import generate_policy_draft
+    return generate_policy_draft(prompt)
+
+
+def analyse(url: str) -> str:
+    from app.ai.rag_agent import get_agent_response, ANALYSIS_QUERY_TEXT
+    config = {"configurable": {"thread_id": f"harness-{uuid.uuid4().hex}"}, "document_context": {"url": url}}
+    return get_agent_response(ANALYSIS_QUERY_TEXT, config=config)
+
+
+def run(args) -> dict:
+    dataset = load_dataset(args.questions)
+    corpus = synthetic_corpus(documents=args.documents, seed=args.seed)
+    trace = not args.no_tracemalloc
+    scenarios = []
+    with tempfile.TemporaryDirectory() as workdir, OfflineEnvironment(
+        workdir, cassette_dir=args.cassettes, record=args.record, latency_scale=args.latency_scale,
+        documents=dataset["document_texts"],
+    ):
+        from app.ai.rag_agent import edit_policy
+
+        scenarios.append(run_scenario("ingest", ingest, list(corpus.items()), 1, trace))
+        questions = dataset["questions"] * args.repeat
+        scenarios.append(run_scenario("agent", ask, questions, args.concurrency, trace))
+        drafts = run_scenario("draft", draft, dataset["drafts"], args.concurrency, trace)
+        scenarios.append(drafts)
+        edit_items = list(zip(drafts["results"], dataset["edits"]))
+        scenarios.append(run_scenario("edit", lambda item: edit_policy(*item), edit_items, args.concurrency, trace))
+        scenarios.append(run_scenario("analysis", analyse, dataset["analyses"], args.concurrency, trace))
+
+    samples = scenarios[1]["results"][:len(dataset["questions"])]
+    scores = quality.offline_scores(samples)
+    if args.ragas:
+        scores.update({f"ragas_{k}": v for k, v in quality.ragas_scores(samples, max_workers=args.concurrency).items()})
+    return {
+        "config": {"documents": args.documents, "concurrency": args.concurrency, "latency_scale": args.latency_scale,
+                   "repeat": args.repeat, "cassettes": bool(args.cassettes)},
+        "scenarios": {s["name"]: {k: v for k, v in s.items() if k not in ("name", "results")} for s in scenarios},
+        "quality": scores,
+    }
+
+
+def print_report(result: dict) -> None:
+    for name, scenario in result["scenarios"].items():
+        latency = scenario["latency"]
+        print(f"\n== {name}: {latency['count']} ops, {scenario['throughput_per_second']:.1f}/s, "
+              f"p50 {latency['p50'] * 1000:.0f} ms, p95 {latency['p95'] * 1000:.0f} ms, p99 {latency['p99'] * 1000:.0f} ms")
+        if scenario["memory"]:
+            print(f"   allocations: peak {scenario['memory']['peak_mb']:.1f} MB, net {scenario['memory']['net_mb']:+.1f} MB")
+        if scenario["stages"]:
+            print(stats.format_rows(sorted(scenario["stages"].items())))
+        for counter, value in sorted(scenario["counters"].items()):
+            print(f"   {counter:<46} {value:>10.4g}")
+    print("\nQuality:")
+    for metric, value in result["quality"].items():
+        print(f"   {metric:<24} {value:.3f}")
+
+
+def print_diff(result: dict, baseline: dict) -> None:
+    print("\nvs baseline (p50 / p95 ms, quality):")
+    for name, scenario in result["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if not previous:
+            continue
+        for pct in ("p50", "p95"):
+            now, before = scenario["latency"][pct] * 1000, previous["latency"][pct] * 1000
+            print(f"   {name:<10} {pct}: {before:>8.0f} -> {now:>8.0f} ({now - before:+.0f})")
+    for metric, value in result["quality"].items():
+        if metric in baseline.get("quality", {}):
+            print(f"   {metric:<24} {baseline['quality'][metric]:.3f} -> {value:.3f} ({value - baseline['quality'][metric]:+.3f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=12, help="Synthetic documents to ingest")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="Question set (JSON)")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each question is asked")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests per scenario")
+    parser.add_argument("--latency-scale", type=float, default=0.1, help="Scale of the simulated provider latency")
+    parser.add_argument("--cassettes", help="Directory with recorded llm.json / embeddings.json")
+    parser.add_argument("--record", action="store_true", help="Record missing responses from the real APIs")
+    parser.add_argument("--ragas", action="store_true", help="Also score with ragas (needs a judge API key)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip allocation tracking")
+    parser.add_argument("--output", help="Save the measurements as JSON")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON run")
+    args = parser.parse_args()
+    if args.record and not args.cassettes:
+        parser.error("--record needs --cassettes")
+
+    result = run(args)
+    print_report(result)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_diff(result, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
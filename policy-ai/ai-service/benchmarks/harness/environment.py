@@ -0,0 +1,143 @@
+"""
+Installs the offline fakes into the running service and restores it afterwards.
+
+Components (chat models per tier, analysis LLM, embeddings, web search) get fake
+factories; the vector index switches to the in-process LocalVectorIndex; the chunk
+store, de-duplication index and draft cache move to a scratch directory; document URLs resolve
+to fixture texts instead of being downloaded. Everything else (agent graph, tool
+executor, scheduler, circuit breakers, compaction, chunking, metrics) is the production code;
+dependency latency histories start empty on entry and are dropped again on exit.
+"""
+import os
+from typing import Dict, Optional
+
+import app.ai.chunk_store as chunk_store
+import app.ai.draft_cache as draft_cache
+import app.ai.rag_agent as rag_agent
+import app.ai.tools.specific_doc_qa as specific_doc_qa
+import app.ai.vector_store as vector_store
+import app.ai.tools.web_search as web_search
+import app.core.resilience as resilience
+import app.services.dedup_index as dedup_index
+from app.ai.chunk_store import ChunkStore
+from app.ai.draft_cache import DraftCache
+from app.ai.llm_scheduler import llm_scheduler, ScheduledEmbeddings
+from app.ai.local_index import LocalVectorIndex
+from app.ai.model_tiers import TIER_ANALYSIS, MODEL_TIERS, with_tier
+from app.core.components import get_component
+from app.core.config import WEB_SEARCH_FIXTURES_PATH, WEB_SEARCH_MAX_RESULTS
+from app.services.dedup_index import DedupIndex
+from benchmarks.harness.fakes import (
+    Cassette, LatencyModel, PromptCache, ReplayChatModel, ReplayEmbeddings, TIER_LATENCY, EMBEDDING_LATENCY,
+)
+
+_TIER_COMPONENTS = {"router": "llm_router", "synthesis": "llm_synthesis", "draft": "llm_draft"}
+_RESET_COMPONENTS = ("agent_executor",)
+
+
+class OfflineEnvironment:
+    """
+    Context manager that runs the service against deterministic fakes.
+
+    With `cassette_dir`, chat and embedding responses are replayed from (or, with record=True,
+    recorded into) llm.json / embeddings.json there; recording needs the real API keys.
+    """
+
+    def __init__(self, workdir: str, cassette_dir: Optional[str] = None, record: bool = False,
+                 latency_scale: float = 0.1, documents: Optional[Dict[str, str]] = None,
+                 web_fixtures: str = WEB_SEARCH_FIXTURES_PATH, stall_rate: float = 0.0, stall_seconds: float = 0.0,
+                 stall_on: tuple = ("llm", "embeddings")):
+        self.workdir = workdir
+        self.record = record
+        self.latency_scale = latency_scale
+        self.stall = {target: (stall_rate, stall_seconds) if target in stall_on else (0.0, 0.0)
+                      for target in ("llm", "embeddings")}
+        self.documents = dict(documents or {})
+        self.web_fixtures = web_fixtures
+        self.llm_cassette = Cassette(os.path.join(cassette_dir, "llm.json")) if cassette_dir else None
+        self.embedding_cassette = Cassette(os.path.join(cassette_dir, "embeddings.json")) if cassette_dir else None
+        self.prompt_cache = PromptCache()
+        self._saved = {}
+
+    # --- Fakes ---
+
+    def _chat_model(self, tier: str, original_factory):
+        base, per_token = TIER_LATENCY[tier]
+        return ReplayChatModel(
+            model_name=MODEL_TIERS[tier], tier=tier, cassette=self.llm_cassette,
+            recorder=original_factory() if self.record else None,
+            latency=LatencyModel(base, per_token, self.latency_scale, *self.stall["llm"]), prompt_cache=self.prompt_cache,
+        )
+
+    def _embeddings(self, original_factory):
+        recorder = original_factory().inner if self.record else None
+        fake = ReplayEmbeddings(
+            cassette=self.embedding_cassette, recorder=recorder,
+            latency=LatencyModel(*EMBEDDING_LATENCY, self.latency_scale, *self.stall["embeddings"]),
+            model_name=vector_store.EMBEDDING_MODEL_NAME,
+        )
+        return ScheduledEmbeddings(fake, llm_scheduler)
+
+    def _download(self, url: str):
+        return url.encode("utf-8") if url in self.documents else None
+
+    def _extract(self, content: bytes):
+        return self.documents.get(content.decode("utf-8"))
+
+    # --- Install / restore ---
+
+    def _override(self, name: str, factory) -> None:
+        component = get_component(name)
+        self._saved.setdefault(("component", name), component.factory)
+        component.factory = factory
+        component.reset()
+
+    def _patch(self, module, attribute: str, value) -> None:
+        self._saved.setdefault((module, attribute), getattr(module, attribute))
+        setattr(module, attribute, value)
+
+    def __enter__(self) -> "OfflineEnvironment":
+        os.makedirs(self.workdir, exist_ok=True)
+        resilience.reset_dependencies()
+        for tier, name in _TIER_COMPONENTS.items():
+            original = get_component(name).factory
+            self._override(name, lambda tier=tier, original=original: self._chat_model(tier, original))
+
+        def analysis_llm():
+            # Recording uses the plain model: the analysis prompt already asks for the JSON object
+            model = self._chat_model(TIER_ANALYSIS, lambda: rag_agent.build_chat_model(TIER_ANALYSIS, streaming=False))
+            return with_tier(model.with_structured_output(rag_agent.PolicyAnalysisOutput), TIER_ANALYSIS)
+        self._override("analysis_llm", analysis_llm)
+
+        original_embeddings = get_component("embeddings").factory
+        self._override("embeddings", lambda: self._embeddings(original_embeddings))
+        self._override("local_vector_index", LocalVectorIndex)
+        self._override("web_search", lambda: web_search.build_web_search_tool(
+            web_search.LocalSearchBackend(self.web_fixtures, WEB_SEARCH_MAX_RESULTS)))
+        for name in _RESET_COMPONENTS:
+            get_component(name).reset()
+
+        self._patch(vector_store, "VECTOR_INDEX_BACKEND", "local")
+        self._patch(chunk_store, "_chunk_store", ChunkStore(os.path.join(self.workdir, "chunks.db")))
+        self._patch(dedup_index, "_dedup_index", DedupIndex(os.path.join(self.workdir, "dedup.db")))
+        self._patch(draft_cache, "_draft_cache", DraftCache(os.path.join(self.workdir, "drafts.db")))
+        for module in (specific_doc_qa, rag_agent):
+            self._patch(module, "download_pdf_content", self._download)
+            self._patch(module, "extract_text_from_pdf", self._extract)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for key, value in self._saved.items():
+            if key[0] == "component":
+                component = get_component(key[1])
+                component.factory = value
+                component.reset()
+            else:
+                setattr(key[0], key[1], value)
+        for name in _RESET_COMPONENTS:
+            get_component(name).reset()
+        resilience.reset_dependencies()
+        self._saved.clear()
+        for cassette in (self.llm_cassette, self.embedding_cassette):
+            if cassette is not None and self.record:
+                cassette.save()
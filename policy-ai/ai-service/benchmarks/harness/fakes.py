@@ -0,0 +1,312 @@
+"""
+Deterministic stand-ins for the OpenAI chat and embedding models.
+
+Both replay responses from a JSON cassette when one is given, record into it when
+wrapping a real model, and otherwise synthesise deterministic output (a tool call
+for the first agent step, an extractive answer after a tool result, an HTML policy
+for drafts, a JSON analysis). Latency is simulated from a per-tier model or from the
+recorded latency, scaled so runs stay fast. Usage reports cached input tokens the way
+the provider's automatic prompt caching would (see PromptCache).
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage, SystemMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from app.utils.tokens import count_tokens
+from benchmarks.corpus import synthetic_policy
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_URL_RE = re.compile(r"https?://\S+?(?=['\"\s]|$)")
+_QUOTED_QUERY_RE = re.compile(r"The user's query is: '(.*?)'\.", re.DOTALL)
+# Questions about current regulation go to web search, like the real router does
+_WEB_KEYWORDS = ("normativa", "regulación", "reglamento", "ley ", "boe", "dgsfp", "actualidad", "reciente")
+
+
+class LatencyModel:
+    """
+    Simulated provider latency: a fixed overhead plus a per-token cost, times `scale`.
+    With `stall_rate`, that fraction of calls additionally stalls for `stall_seconds` (unscaled),
+    like a provider's long tail of slow requests.
+    """
+
+    def __init__(self, base_seconds: float, per_token_seconds: float, scale: float = 1.0,
+                 stall_rate: float = 0.0, stall_seconds: float = 0.0):
+        self.base_seconds = base_seconds
+        self.per_token_seconds = per_token_seconds
+        self.scale = scale
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+
+    def seconds(self, tokens: int) -> float:
+        return (self.base_seconds + self.per_token_seconds * tokens) * self.scale
+
+    def sleep(self, tokens: int, recorded: Optional[float] = None) -> None:
+        delay = recorded * self.scale if recorded is not None else self.seconds(tokens)
+        if self.stall_rate and random.random() < self.stall_rate:
+            delay += self.stall_seconds
+        if delay > 0:
+            time.sleep(delay)
+
+
+# Rough public figures: time to first token plus output speed (chat) / per input token (embeddings)
+TIER_LATENCY = {
+    "router": (0.30, 0.008),
+    "synthesis": (0.45, 0.012),
+    "draft": (0.45, 0.012),
+    "analysis": (0.45, 0.012),
+}
+EMBEDDING_LATENCY = (0.08, 0.00002)
+
+
+class PromptCache:
+    """
+    Emulates OpenAI's automatic prompt caching: once a prompt has been seen, a later prompt of the
+    same model sharing its first 1024+ tokens is served from cache in 128-token increments.
+    Prompts are compared as serialized text, in blocks of ~128 tokens (512 characters).
+    """
+
+    BLOCK_CHARS = 512
+    MIN_CHARS = 4096
+
+    def __init__(self):
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, model: str, text: str) -> float:
+        """Records the prompt and returns the fraction of it that was already cached."""
+        digest = hashlib.sha1(model.encode("utf-8"))
+        hashes = []
+        for end in range(self.BLOCK_CHARS, len(text) + 1, self.BLOCK_CHARS):
+            digest.update(text[end - self.BLOCK_CHARS:end].encode("utf-8"))
+            hashes.append((end, digest.copy().hexdigest()))
+        with self._lock:
+            cached = max((end for end, h in hashes if h in self._prefixes), default=0)
+            self._prefixes.update(h for end, h in hashes if end >= self.MIN_CHARS)
+        return cached / len(text) if cached >= self.MIN_CHARS else 0.0
+
+
+class Cassette:
+    """Recorded responses keyed by a hash of the request, kept in one JSON file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.entries = {}
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        return entry
+
+    def put(self, key: str, value) -> None:
+        with self._lock:
+            self.entries[key] = value
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock, open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+
+
+def _message_key(message) -> list:
+    return [message.type, message.content, getattr(message, "tool_calls", None) or []]
+
+
+def _user_question(text: str) -> str:
+    match = _QUOTED_QUERY_RE.search(text)
+    return match.group(1) if match else text
+
+
+def _extractive_answer(question: str, sources: List[str], max_words: int = 90) -> str:
+    """The source sentences sharing most words with the question, in source order."""
+    question_words = set(_WORD_RE.findall(question.lower()))
+    sentences = [s.strip() for text in sources for s in _SENTENCE_RE.split(text) if len(s.strip()) > 20]
+    ranked = sorted(range(len(sentences)), key=lambda i: -len(question_words & set(_WORD_RE.findall(sentences[i].lower()))))
+    chosen, words = [], 0
+    for i in sorted(ranked[:4]):
+        chosen.append(sentences[i])
+        words += len(sentences[i].split())
+        if words >= max_words:
+            break
+    return " ".join(chosen) if chosen else "No he encontrado información sobre esa consulta."
+
+
+def _policy_html(prompt: str) -> str:
+    seed = zlib.crc32(prompt.encode("utf-8"))
+    parts = [f"<h2>Póliza de seguro: {prompt[:80]}</h2>"]
+    for page in synthetic_policy(seed=seed, articles=8, clauses_per_article=3):
+        for line in page.splitlines()[1:-1]:  # Drop the running header and page number
+            if line.startswith("Artículo"):
+                parts.append(f"<h3>{line}</h3>")
+            elif not line.startswith("CAPÍTULO"):
+                parts.append(f"<p>{line}</p>")
+    return "".join(parts)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that replays, records or synthesises responses deterministically."""
+    model_name: str = "replay"
+    tier: str = "synthesis"
+    cassette: Any = None
+    recorder: Any = None  # Real chat model to record from (record mode)
+    latency: Any = None
+    prompt_cache: Any = None  # Shared PromptCache, to report cached input tokens
+    tools: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tools": list(tools)})
+
+    def with_structured_output(self, schema, **kwargs):
+        """Parses the JSON the model writes into the schema (the analysis LLM uses this)."""
+        def parse(message):
+            return schema.model_validate_json(message.content)
+        return self | RunnableLambda(parse)
+
+    def _tool_names(self) -> List[str]:
+        return [convert_to_openai_tool(tool)["function"]["name"] for tool in self.tools]
+
+    def _synthesise(self, messages) -> AIMessage:
+        tool_names = self._tool_names()
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        tool_results = [m.content for m in messages[last_human + 1:] if isinstance(m, ToolMessage)]
+        system = " ".join(m.content for m in messages if isinstance(m, SystemMessage))
+        question = _user_question(messages[last_human].content) if last_human >= 0 else ""
+
+        if tool_names and not tool_results and last_human >= 0:
+            text = messages[last_human].content
+            url = _URL_RE.search(text)
+            if url and "specific_document_qa_tool" in tool_names:
+                name, args = "specific_document_qa_tool", {"query": question, "document_url": url.group(0)}
+            elif any(keyword in question.lower() for keyword in _WEB_KEYWORDS) and "web_search_tool" in tool_names:
+                name, args = "web_search_tool", {"query": question}
+            else:
+                name, args = "policy_rag_tool", {"query": question}
+            call_id = "call_" + Cassette.key(name, args)[:24]
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+        if tool_results:
+            return AIMessage(content=_extractive_answer(question, tool_results))
+        if "analista" in system or "JSON" in system:
+            return AIMessage(content=json.dumps({
+                "score": 60 + zlib.crc32(question.encode("utf-8")) % 30,
+                "strengths": ["Cobertura amplia de daños materiales"],
+                "weaknesses": ["Plazos de declaración de siniestro poco claros"],
+                "recommendations": ["Revisar la franquicia aplicable a daños por agua"],
+            }, ensure_ascii=False))
+        if question.startswith("Existing Policy (HTML):"):
+            policy, instruction = question[len("Existing Policy (HTML):"):].rsplit("Please apply the edit:", 1)
+            instruction = instruction.strip().split("' to the HTML policy", 1)[0].lstrip("'")
+            return AIMessage(content=policy.strip().replace("</h2>", f"</h2><p>{instruction}</p>", 1))
+        if "HTML" in system:
+            return AIMessage(content=_policy_html(question))
+        return AIMessage(content=_extractive_answer(question, [system]))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = Cassette.key(self.model_name, self._tool_names(), [_message_key(m) for m in messages])
+        entry = self.cassette.get(key) if self.cassette is not None else None
+        recorded_latency = None
+        if entry is None and self.recorder is not None:
+            recorder = self.recorder.bind_tools(self.tools) if self.tools else self.recorder
+            start = time.perf_counter()
+            real = recorder.invoke(messages)
+            entry = {"content": real.content, "tool_calls": real.tool_calls,
+                     "latency_seconds": time.perf_counter() - start}
+            self.cassette.put(key, entry)
+        if entry is not None:
+            message = AIMessage(content=entry["content"], tool_calls=entry.get("tool_calls") or [])
+            recorded_latency = entry.get("latency_seconds") if self.recorder is None else None
+        else:
+            message = self._synthesise(messages)
+
+        input_tokens = sum(count_tokens(str(m.content)) for m in messages)
+        output_tokens = count_tokens(message.content) + sum(count_tokens(json.dumps(c["args"])) for c in message.tool_calls)
+        if self.latency is not None and self.recorder is None:
+            self.latency.sleep(output_tokens, recorded_latency)
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        if self.prompt_cache is not None:
+            # Tool definitions come before the messages in the provider's prompt
+            prompt = json.dumps(self._tool_names()) + "".join(f"\n{m.type}: {m.content}" for m in messages)
+            cached = int(input_tokens * self.prompt_cache.lookup(self.model_name, prompt))
+            usage["input_token_details"] = {"cache_read": cached}
+        message.usage_metadata = usage
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"model_name": self.model_name,
+                        "token_usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens}},
+        )
+
+
+class ReplayEmbeddings(Embeddings):
+    """
+    Feature-hashed bag-of-words embeddings (unigrams and bigrams): deterministic, and similar
+    texts get similar vectors, so retrieval quality is meaningful offline. With a cassette,
+    recorded vectors of the real model are replayed (or recorded, when wrapping one).
+    """
+
+    def __init__(self, dimension: int = 256, cassette: Optional[Cassette] = None, recorder: Optional[Embeddings] = None,
+                 latency: Optional[LatencyModel] = None, model_name: str = "replay-embeddings"):
+        self.dimension = dimension
+        self.cassette = cassette
+        self.recorder = recorder
+        self.latency = latency
+        self.model_name = model_name
+
+    def _hashed(self, text: str) -> List[float]:
+        words = _WORD_RE.findall(text.lower())
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dimension] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if self.cassette is None:
+            vectors = [self._hashed(text) for text in texts]
+        else:
+            keys = [Cassette.key(self.model_name, text) for text in texts]
+            missing = [text for key, text in zip(keys, texts) if key not in self.cassette.entries]
+            if missing and self.recorder is not None:
+                for text, vector in zip(missing, self.recorder.embed_documents(missing)):
+                    self.cassette.put(Cassette.key(self.model_name, text), vector)
+            elif missing:
+                raise KeyError(f"{len(missing)} texts were not recorded in the embeddings cassette; re-run with --record")
+            vectors = [self.cassette.entries[key] for key in keys]
+        if self.latency is not None and self.recorder is None:
+            self.latency.sleep(sum(count_tokens(text) for text in texts))
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
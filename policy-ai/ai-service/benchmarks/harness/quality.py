@@ -0,0 +1,57 @@
+"""
+Answer-quality scores for the harness dataset.
+
+The offline scores are cheap proxies that need no judge model: the share of the
+ground-truth content words found in the retrieved contexts (context recall) and in
+the answer (answer recall). With --ragas the same samples are scored by ragas,
+concurrently (RunConfig.max_workers), which needs a live judge LLM (OPENAI_API_KEY).
+"""
+import re
+from typing import Dict, List
+
+_WORD_RE = re.compile(r"\w+")
+# Function words carry no evidence of a correct answer
+_STOPWORDS = {
+    "el", "la", "los", "las", "de", "del", "y", "o", "en", "a", "al", "por", "para", "con", "que",
+    "se", "su", "sus", "un", "una", "lo", "le", "les", "ni", "es", "sea", "desde", "dentro",
+}
+
+
+def _content_words(text: str) -> set:
+    return {word for word in _WORD_RE.findall(text.lower()) if word not in _STOPWORDS and len(word) > 2}
+
+
+def word_recall(reference: str, text: str) -> float:
+    """Fraction of the reference's content words that appear in `text`."""
+    expected = _content_words(reference)
+    if not expected:
+        return 1.0
+    return len(expected & _content_words(text)) / len(expected)
+
+
+def offline_scores(samples: List[dict]) -> Dict[str, float]:
+    """Mean context and answer recall over samples with question/answer/contexts/ground_truth."""
+    if not samples:
+        return {}
+    context = [word_recall(s["ground_truth"], " ".join(s["contexts"])) for s in samples]
+    answer = [word_recall(s["ground_truth"], s["answer"]) for s in samples]
+    return {"context_recall": sum(context) / len(context), "answer_recall": sum(answer) / len(answer)}
+
+
+def ragas_scores(samples: List[dict], max_workers: int = 8) -> Dict[str, float]:
+    """Scores the samples with ragas (faithfulness, relevancy, context precision/recall) concurrently."""
+    from datasets import Dataset
+    from ragas import RunConfig
+    from ragas.evaluation import evaluate
+    from ragas.metrics import answer_relevancy, context_precision, context_recall, faithfulness
+
+    result = evaluate(
+        Dataset.from_list(samples),
+        metrics=[faithfulness, answer_relevancy, context_precision, context_recall],
+        run_config=RunConfig(max_workers=max_workers),
+    )
+    scores = {}
+    for row in result.scores:
+        for metric, value in row.items():
+            scores.setdefault(metric, []).append(value)
+    return {metric: sum(values) / len(values) for metric, values in scores.items()}
@@ -0,0 +1,112 @@
+"""
+Measurements for the harness: exact percentiles of directly timed operations, and
+per-stage percentiles derived from the service's own Prometheus histograms (bucket
+deltas between two snapshots, linearly interpolated inside the bucket).
+"""
+import math
+from typing import Dict, Iterable, List, Tuple
+
+from prometheus_client import REGISTRY
+
+# Histograms of internal stages reported per label set
+STAGE_HISTOGRAMS = {
+    "agent_node_duration_seconds": "node",
+    "agent_tool_duration_seconds": "tool",
+    "llm_request_duration_seconds": "llm",
+    "llm_tier_duration_seconds": "llm tier",
+    "embedding_request_duration_seconds": "embedding",
+    "vector_store_query_duration_seconds": "vector query",
+    "llm_scheduler_wait_seconds": "scheduler wait",
+    "ingest_dedup_duration_seconds": "dedup",
+    "rerank_duration_seconds": "rerank",
+}
+# Counters reported as deltas (names without the _total suffix, as the registry exposes them)
+COUNTERS = ("llm_tokens", "llm_cost_usd", "rag_context_tokens", "speculative_retrieval", "ingest_chunks")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else math.nan,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def _labels_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((k, v) for k, v in labels.items() if k != "le"))
+
+
+def snapshot() -> Dict:
+    """Current bucket counts of the stage histograms and values of the reported counters."""
+    histograms, counters = {}, {}
+    for metric in REGISTRY.collect():
+        if metric.type == "histogram" and metric.name in STAGE_HISTOGRAMS:
+            for sample in metric.samples:
+                if sample.name.endswith("_bucket"):
+                    series = histograms.setdefault((metric.name, _labels_key(sample.labels)), {})
+                    series[float(sample.labels["le"])] = sample.value
+        elif metric.type == "counter" and metric.name in COUNTERS:
+            for sample in metric.samples:
+                if sample.name.endswith("_total"):
+                    counters[(metric.name, _labels_key(sample.labels))] = sample.value
+    return {"histograms": histograms, "counters": counters}
+
+
+def _bucket_percentile(buckets: List[Tuple[float, float]], total: float, pct: float) -> float:
+    """Percentile from cumulative (upper bound, count) pairs, interpolating inside the bucket."""
+    target = total * pct / 100
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= target:
+            if math.isinf(bound):
+                return lower_bound  # Above the last finite bucket: report its bound
+            width = count - lower_count
+            fraction = (target - lower_count) / width if width else 1.0
+            return lower_bound + (bound - lower_bound) * fraction
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def stage_report(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    """Per-stage count and p50/p95/p99 (seconds) for observations made between the snapshots."""
+    report = {}
+    for (name, labels), series in after["histograms"].items():
+        previous = before["histograms"].get((name, labels), {})
+        buckets = sorted((bound, count - previous.get(bound, 0.0)) for bound, count in series.items())
+        total = buckets[-1][1] if buckets else 0
+        if not total:
+            continue
+        label = STAGE_HISTOGRAMS[name] + " " + ",".join(value for _, value in labels)
+        report[label.strip()] = {
+            "count": int(total),
+            "p50": _bucket_percentile(buckets, total, 50),
+            "p95": _bucket_percentile(buckets, total, 95),
+            "p99": _bucket_percentile(buckets, total, 99),
+        }
+    return report
+
+
+def counter_report(before: Dict, after: Dict) -> Dict[str, float]:
+    report = {}
+    for (name, labels), value in after["counters"].items():
+        delta = value - before["counters"].get((name, labels), 0.0)
+        if delta:
+            report[f"{name} " + ",".join(v for _, v in labels)] = delta
+    return report
+
+
+def format_rows(rows: Iterable[Tuple[str, Dict[str, float]]], unit_scale: float = 1000) -> str:
+    lines = [f"{'stage':<48} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for name, stats in rows:
+        lines.append(f"{name:<48} {stats['count']:>6} {stats['p50'] * unit_scale:>9.1f} "
+                     f"{stats['p95'] * unit_scale:>9.1f} {stats['p99'] * unit_scale:>9.1f}")
+    return "\n".join(lines)
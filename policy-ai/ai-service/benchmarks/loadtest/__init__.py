@@ -0,0 +1,8 @@
+"""
+HTTP load test for the FastAPI service.
+
+Starts app.main:app under uvicorn with the offline harness fakes (LLM, embeddings,
+vector index, web search) plus stubbed Supabase auth/storage, drives a mixed workload
+at a target request rate and reports latency percentiles, error rates and event-loop
+lag. Entry point: python -m benchmarks.loadtest
+"""
@@ -0,0 +1,288 @@
+"""
+HTTP load test: drives a mixed workload at a target request rate against the
+FastAPI service and reports per-endpoint p50/p95/p99, error rates, achieved
+throughput and event-loop lag of the server.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.loadtest [--rps 20] [--duration 30] [--mix answer_query=6,draft=1,edit=1,upload=1,login=1]
+                                  [--latency-scale 0.1] [--supabase-latency 0.05] [--arrivals poisson]
+                                  [--stall-rate 0.02 --stall-seconds 3 --stall-on llm,embeddings] [--no-resilience]
+                                  [--output load.json] [--baseline load.json]
+    python -m benchmarks.loadtest --url http://staging:8000 ...   (existing deployment, no stubs)
+
+By default app.main:app is started in-process under uvicorn with the offline
+harness fakes (LLM, embeddings, local vector index, fixture web search) and a
+stubbed Supabase, each with configurable latency, after ingesting the synthetic
+corpus. The generator is open-loop: requests are issued on schedule whether or
+not earlier ones finished, and latency is measured from the scheduled send time,
+so a stalled server shows up in the percentiles instead of slowing the generator.
+
+Event-loop lag is sampled on the server's loop (in-process mode only): a task that
+sleeps --lag-interval and records how late it wakes up. Anything that blocks the
+loop (sync I/O or CPU work in an async endpoint) shows up there.
+
+--stall-rate makes that fraction of fake LLM and/or embedding calls (--stall-on) stall
+for --stall-seconds, a provider's long tail; compare a run against one with
+--no-resilience (RESILIENCE_ENABLED off: no hedging, adaptive timeouts or circuit
+breakers) to see what they recover.
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+
+import app.core.config as config
+from app.services.document_processor import index_document
+from benchmarks.corpus import synthetic_corpus
+from benchmarks.harness import stats
+from benchmarks.harness.environment import OfflineEnvironment
+from benchmarks.loadtest.stubs import SupabaseStub
+from benchmarks.loadtest.workloads import Workload, DEFAULT_MIX
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic sleep wakes up on the loop it runs on."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._stopped = False
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._stopped:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def stop(self) -> None:
+        self._stopped = True
+
+
+class ServerThread:
+    """Runs a uvicorn server on its own event loop in a background thread."""
+
+    def __init__(self, app: str = "app.main:app", host: str = "127.0.0.1", port: Optional[int] = None):
+        if port is None:
+            with socket.socket() as sock:
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="loadtest-server", daemon=True)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self, timeout: float = 30) -> None:
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("The server did not start")
+            time.sleep(0.05)
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=30)
+
+
+async def _send(client: httpx.AsyncClient, name: str, request: dict, scheduled: float, samples: list) -> None:
+    status, error = None, None
+    try:
+        response = await client.request(**request)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    samples.append({"endpoint": name, "latency": time.perf_counter() - scheduled, "status": status, "error": error})
+
+
+async def generate_load(base_url: str, workload: Workload, rps: float, duration: float, arrivals: str = "uniform",
+                        timeout: float = 60, max_in_flight: int = 1000, seed: int = 0) -> dict:
+    """Issues requests at `rps` for `duration` seconds; returns the samples and the achieved send rate."""
+    rng = random.Random(seed)
+    samples: list = []
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for request in workload.setup_requests():
+            await client.request(**request)
+
+        in_flight = asyncio.Semaphore(max_in_flight)
+        tasks, dropped = [], 0
+
+        async def send(name, request, scheduled):
+            async with in_flight:
+                await _send(client, name, request, scheduled, samples)
+
+        start = time.perf_counter()
+        next_at = start
+        while next_at - start < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight.locked():
+                dropped += 1  # Client saturated: counted instead of silently queueing
+            else:
+                name, request = workload.next()
+                tasks.append(asyncio.create_task(send(name, request, next_at)))
+            next_at += rng.expovariate(rps) if arrivals == "poisson" else 1 / rps
+        send_seconds = time.perf_counter() - start
+        await asyncio.gather(*tasks)
+    return {"samples": samples, "send_seconds": send_seconds, "dropped": dropped}
+
+
+def summarize_samples(samples: list, wall_seconds: float) -> Dict[str, dict]:
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample["endpoint"]].append(sample)
+        by_endpoint["all"].append(sample)
+    report = {}
+    for endpoint, items in by_endpoint.items():
+        errors = [s for s in items if s["error"] or s["status"] >= 400]
+        report[endpoint] = {
+            **stats.summarize([s["latency"] for s in items]),
+            "errors": len(errors),
+            "error_rate": len(errors) / len(items),
+            "statuses": dict(sorted(
+                (str(key), sum(1 for s in items if (s["status"] or s["error"]) == key))
+                for key in {s["status"] or s["error"] for s in items}
+            )),
+            "throughput_per_second": len(items) / wall_seconds if wall_seconds else 0.0,
+        }
+    return report
+
+
+def run(args) -> dict:
+    workload = Workload(args.mix, users=args.users, seed=args.seed)
+    if args.url:
+        load = asyncio.run(generate_load(args.url, workload, args.rps, args.duration, args.arrivals,
+                                         args.timeout, args.max_in_flight, args.seed))
+        return _result(args, load, lag=None, stages=None)
+
+    resilience_enabled = config.RESILIENCE_ENABLED
+    config.RESILIENCE_ENABLED = resilience_enabled and not args.no_resilience
+    with tempfile.TemporaryDirectory() as workdir, OfflineEnvironment(
+        workdir, cassette_dir=args.cassettes, latency_scale=args.latency_scale,
+        documents=workload.dataset["document_texts"], stall_rate=args.stall_rate, stall_seconds=args.stall_seconds,
+        stall_on=tuple(args.stall_on.split(",")),
+    ), SupabaseStub(args.supabase_latency):
+        for source, pages in synthetic_corpus(documents=args.documents, seed=args.seed).items():
+            index_document(source, pages)
+        server = ServerThread()
+        server.start()
+        monitor = LoopLagMonitor(args.lag_interval)
+        try:
+            lag_future = server.submit(monitor.run())
+            before = stats.snapshot()
+            load = asyncio.run(generate_load(server.url, workload, args.rps, args.duration, args.arrivals,
+                                             args.timeout, args.max_in_flight, args.seed))
+            after = stats.snapshot()
+            monitor.stop()
+            lag_future.result(timeout=5)
+        finally:
+            server.stop()
+            config.RESILIENCE_ENABLED = resilience_enabled
+    lag = stats.summarize(monitor.samples)
+    lag["max"] = max(monitor.samples, default=0.0)
+    return _result(args, load, lag=lag, stages=stats.stage_report(before, after))
+
+
+def _result(args, load: dict, lag: Optional[dict], stages: Optional[dict]) -> dict:
+    wall = max(load["send_seconds"], 1e-9)
+    return {
+        "config": {"rps": args.rps, "duration": args.duration, "mix": args.mix, "arrivals": args.arrivals,
+                   "latency_scale": args.latency_scale, "supabase_latency": args.supabase_latency,
+                   "stall_rate": args.stall_rate, "stall_seconds": args.stall_seconds, "stall_on": args.stall_on,
+                   "resilience": config.RESILIENCE_ENABLED and not args.no_resilience,
+                   "target": args.url or "in-process"},
+        "endpoints": summarize_samples(load["samples"], wall),
+        "dropped": load["dropped"],
+        "loop_lag": lag,
+        "stages": stages,
+    }
+
+
+def print_report(result: dict) -> None:
+    config = result["config"]
+    print(f"Target {config['target']}: {config['rps']} req/s for {config['duration']}s ({config['arrivals']}), mix {config['mix']}")
+    print(f"\n{'endpoint':<14} {'n':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}  statuses")
+    for endpoint, row in sorted(result["endpoints"].items(), key=lambda item: item[0] == "all"):
+        print(f"{endpoint:<14} {row['count']:>6} {row['throughput_per_second']:>7.1f} {row['p50'] * 1000:>9.0f} "
+              f"{row['p95'] * 1000:>9.0f} {row['p99'] * 1000:>9.0f} {row['error_rate']:>8.1%}  {row['statuses']}")
+    if result["dropped"]:
+        print(f"\n{result['dropped']} requests not sent: --max-in-flight reached")
+    lag = result["loop_lag"]
+    if lag:
+        print(f"\nEvent-loop lag: p50 {lag['p50'] * 1000:.1f} ms, p99 {lag['p99'] * 1000:.1f} ms, max {lag['max'] * 1000:.1f} ms "
+              f"({lag['count']} samples)")
+    if result["stages"]:
+        print("\nServer stages:")
+        print(stats.format_rows(sorted(result["stages"].items())))
+
+
+def print_diff(result: dict, baseline: dict) -> None:
+    print("\nvs baseline:")
+    for endpoint, row in sorted(result["endpoints"].items()):
+        previous = baseline["endpoints"].get(endpoint)
+        if not previous:
+            continue
+        changes = [f"{pct} {previous[pct] * 1000:.0f} -> {row[pct] * 1000:.0f} ms ({(row[pct] - previous[pct]) * 1000:+.0f})"
+                   for pct in ("p50", "p95", "p99")]
+        changes.append(f"errors {previous['error_rate']:.1%} -> {row['error_rate']:.1%}")
+        print(f"   {endpoint:<14} " + ", ".join(changes))
+    if result["loop_lag"] and baseline.get("loop_lag"):
+        before, now = baseline["loop_lag"]["p99"] * 1000, result["loop_lag"]["p99"] * 1000
+        print(f"   {'loop lag p99':<14} {before:.1f} -> {now:.1f} ms ({now - before:+.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Load an already running service instead of an in-process stubbed one")
+    parser.add_argument("--rps", type=float, default=20, help="Target request rate")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted endpoint mix")
+    parser.add_argument("--arrivals", choices=("uniform", "poisson"), default="uniform")
+    parser.add_argument("--users", type=int, default=20, help="Accounts registered before the run for login traffic")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="Client-side cap on concurrent requests")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout (seconds)")
+    parser.add_argument("--latency-scale", type=float, default=0.1, help="Scale of the simulated LLM/embedding latency")
+    parser.add_argument("--supabase-latency", type=float, default=0.05, help="Seconds each stubbed Supabase call takes")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of fake LLM/embedding calls that stall")
+    parser.add_argument("--stall-seconds", type=float, default=3.0, help="How long a stalled call takes on top")
+    parser.add_argument("--stall-on", default="llm,embeddings", help="Which fakes stall: llm, embeddings or both")
+    parser.add_argument("--no-resilience", action="store_true", help="Disable hedging, adaptive timeouts and breakers")
+    parser.add_argument("--cassettes", help="Replay recorded LLM/embedding responses from this directory")
+    parser.add_argument("--documents", type=int, default=12, help="Synthetic documents ingested before the run")
+    parser.add_argument("--lag-interval", type=float, default=0.01, help="Event-loop lag sampling interval (seconds)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Save the measurements as JSON")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON run")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_diff(result, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
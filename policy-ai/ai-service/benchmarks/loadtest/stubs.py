@@ -0,0 +1,129 @@
+"""
+Stand-in for the Supabase client used by auth_service and storage_service.
+
+Like the real (synchronous) client, every call blocks the calling thread for the
+configured latency, so endpoints that call it from the event loop show up as loop lag.
+"""
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Optional
+
+import app.services.auth_service as auth_service
+import app.services.storage_service as storage_service
+
+
+class _Query:
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.filters = {}
+        self.row = None
+
+    def insert(self, row: dict, upsert: bool = False) -> "_Query":
+        self.row = row
+        return self
+
+    def select(self, *columns) -> "_Query":
+        return self
+
+    def eq(self, column: str, value) -> "_Query":
+        self.filters[column] = value
+        return self
+
+    def single(self) -> "_Query":
+        return self
+
+    def execute(self) -> SimpleNamespace:
+        self.client.wait()
+        rows = self.client.tables.setdefault(self.table, {})
+        if self.row is not None:
+            with self.client.lock:
+                rows[self.row["id"]] = self.row
+            return SimpleNamespace(data=[self.row], error=None)
+        return SimpleNamespace(data=rows.get(self.filters.get("id")), error=None)
+
+
+class _Auth:
+    def __init__(self, client: "FakeSupabase"):
+        self.client = client
+        self.admin = SimpleNamespace(get_user_by_id=self.get_user_by_id)
+
+    def sign_up(self, credentials: dict) -> SimpleNamespace:
+        self.client.wait()
+        user = SimpleNamespace(id=str(uuid.uuid4()), email=credentials["email"])
+        with self.client.lock:
+            self.client.users[credentials["email"]] = (credentials["password"], user)
+        return SimpleNamespace(user=user)
+
+    def sign_in_with_password(self, credentials: dict) -> SimpleNamespace:
+        self.client.wait()
+        password, user = self.client.users.get(credentials["email"], (None, None))
+        if user is None or password != credentials["password"]:
+            return SimpleNamespace(user=None, session=None)
+        token = uuid.uuid4().hex
+        return SimpleNamespace(user=user, session=SimpleNamespace(access_token=token, refresh_token=token))
+
+    def get_user_by_id(self, user_id: str) -> SimpleNamespace:
+        self.client.wait()
+        for _, user in self.client.users.values():
+            if user.id == user_id:
+                return SimpleNamespace(user=user)
+        return SimpleNamespace(user=None)
+
+
+class _Bucket:
+    def __init__(self, client: "FakeSupabase", name: str):
+        self.client = client
+        self.name = name
+
+    def upload(self, path: str, file: bytes, file_options: Optional[dict] = None) -> SimpleNamespace:
+        self.client.wait()
+        with self.client.lock:
+            self.client.objects[f"{self.name}/{path}"] = len(file)
+        return SimpleNamespace(error=None)
+
+    def get_public_url(self, path: str) -> str:
+        return f"https://storage.fixtures.local/{self.name}/{path}"
+
+
+class FakeSupabase:
+    """In-memory users, profile rows and storage objects behind the supabase-py call shapes the service uses."""
+
+    def __init__(self, latency_seconds: float = 0.05):
+        self.latency_seconds = latency_seconds
+        self.lock = threading.Lock()
+        self.users = {}
+        self.tables = {}
+        self.objects = {}
+        self.auth = _Auth(self)
+        self.storage = SimpleNamespace(from_=lambda bucket: _Bucket(self, bucket))
+
+    def wait(self) -> None:
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    from_ = table
+
+
+class SupabaseStub:
+    """Context manager that points auth_service and storage_service at a FakeSupabase."""
+
+    def __init__(self, latency_seconds: float = 0.05):
+        self.client = FakeSupabase(latency_seconds)
+        self._saved = {}
+
+    def __enter__(self) -> FakeSupabase:
+        for module in (auth_service, storage_service):
+            self._saved[module] = module._sb
+            module._sb = lambda *args, **kwargs: self.client
+        return self.client
+
+    def __exit__(self, *exc_info) -> None:
+        for module, original in self._saved.items():
+            module._sb = original
+        self._saved.clear()
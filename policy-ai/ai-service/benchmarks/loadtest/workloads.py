@@ -0,0 +1,105 @@
+"""
+Request mix for the load test: one builder per endpoint, picked by weight.
+
+Each builder returns the keyword arguments of an httpx request. Question texts,
+draft prompts and edit instructions come from the harness dataset, so answers are
+computed over the same synthetic corpus the offline harness uses.
+"""
+import io
+import random
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+from pypdf import PdfWriter
+
+from benchmarks.corpus import synthetic_policy
+from benchmarks.harness.__main__ import load_dataset
+
+LOADTEST_PASSWORD = "loadtest-password"
+DEFAULT_MIX = "answer_query=6,draft=1,edit=1,upload=1,login=1"
+
+
+def _pdf_bytes(pages: int = 2) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _policy_html(seed: int) -> str:
+    parts = [f"<h2>Póliza {seed}</h2>"]
+    for page in synthetic_policy(seed=seed, articles=6, clauses_per_article=2):
+        parts.extend(f"<p>{line}</p>" for line in page.splitlines()[1:-1])
+    return "".join(parts)
+
+
+class Workload:
+    """Builds requests for a weighted endpoint mix, e.g. "answer_query=6,draft=1"."""
+
+    def __init__(self, mix: str = DEFAULT_MIX, users: int = 20, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.dataset = load_dataset()
+        self.users = [f"loadtest-{i}@example.com" for i in range(users)]
+        self.policies = [_policy_html(seed) for seed in range(4)]
+        self.pdf = _pdf_bytes()
+        builders: Dict[str, Callable[[], dict]] = {
+            "answer_query": self.answer_query,
+            "draft": self.draft,
+            "edit": self.edit,
+            "upload": self.upload,
+            "login": self.login,
+            "register": self.register,
+        }
+        self.entries: List[Tuple[str, Callable[[], dict]]] = []
+        self.weights: List[float] = []
+        for item in mix.split(","):
+            name, _, weight = item.partition("=")
+            if name.strip() not in builders:
+                raise ValueError(f"Unknown workload '{name}'; choose from {', '.join(builders)}")
+            self.entries.append((name.strip(), builders[name.strip()]))
+            self.weights.append(float(weight or 1))
+
+    def next(self) -> Tuple[str, dict]:
+        name, builder = self.rng.choices(self.entries, weights=self.weights)[0]
+        return name, builder()
+
+    def setup_requests(self) -> List[dict]:
+        """Registrations that must exist before login traffic starts."""
+        return [self._register_request(email) for email in self.users]
+
+    # --- Builders ---
+
+    def answer_query(self) -> dict:
+        question = self.rng.choice(self.dataset["questions"])
+        body = {"query": question["question"], "thread_id": f"loadtest-{uuid.uuid4().hex}"}
+        if question.get("url"):
+            body["document_url"] = question["url"]
+        return {"method": "POST", "url": "/api/internal/v1/answer_query", "json": body}
+
+    def draft(self) -> dict:
+        return {"method": "POST", "url": "/api/internal/v1/generate-policy-draft",
+                "json": {"prompt": self.rng.choice(self.dataset["drafts"])}}
+
+    def edit(self) -> dict:
+        return {"method": "POST", "url": "/api/internal/v1/edit-policy",
+                "json": {"current_policy_text": self.rng.choice(self.policies),
+                         "edit_instruction": self.rng.choice(self.dataset["edits"])}}
+
+    def upload(self) -> dict:
+        return {"method": "POST", "url": "/api/internal/v1/upload-pdf",
+                "files": {"file": ("poliza de prueba.pdf", self.pdf, "application/pdf")},
+                "data": {"document_type": "policy"}}
+
+    def login(self) -> dict:
+        return {"method": "POST", "url": "/api/auth/login",
+                "json": {"email": self.rng.choice(self.users), "password": LOADTEST_PASSWORD}}
+
+    def register(self) -> dict:
+        return self._register_request(f"loadtest-{uuid.uuid4().hex[:12]}@example.com")
+
+    @staticmethod
+    def _register_request(email: str) -> dict:
+        return {"method": "POST", "url": "/api/auth/register",
+                "json": {"email": email, "password": LOADTEST_PASSWORD, "first_name": "Carga"}}
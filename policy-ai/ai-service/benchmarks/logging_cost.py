@@ -0,0 +1,100 @@
+"""
+Per-request logging cost: the legacy eager f-string logging vs. the production mode.
+
+Replays the log calls made on one chat turn and one policy edit against a large
+policy (message lists, prettified HTML, final graph state) and reports the mean
+cost per request. Output goes to /dev/null so only formatting/dispatch is measured.
+
+Usage (from policy-ai/ai-service):
+    LOG_PAYLOAD_SAMPLE_RATE=0.01 python -m benchmarks.logging_cost [--iterations 200] [--policy-kb 200]
+"""
+import argparse
+import io
+import logging
+import statistics
+import time
+
+from app.core import logging_config
+from app.core.logging_config import Truncated, log_payload
+
+logger = logging.getLogger("benchmarks.logging_cost")
+
+
+def _fake_request_payloads(policy_kb: int):
+    section = "<h3>Sección</h3><p>" + ("Cobertura de robo y daños materiales. " * 20) + "</p>"
+    html = section * max(1, (policy_kb * 1024) // len(section))
+    messages = [{"type": "human", "content": html}, {"type": "ai", "content": "", "tool_calls": [{"name": "policy_rag_tool"}]},
+                {"type": "tool", "content": "Retrieved context:\n" + html[:8000]}]
+    final_state = {"messages": messages * 2}
+    return html, messages, final_state
+
+
+def legacy_request(html, messages, final_state, query):
+    """The log calls made before the production logging mode (eager f-strings)."""
+    logger.info(f"Received request to edit policy. Instruction: {query[:100]}...")
+    logger.debug(f"Calling agent model with messages: {messages}")
+    logger.debug(f"Agent model response: {messages[-1]}")
+    logger.info(f"HTML Policy draft after BeautifulSoup prettify. Length: {len(html)}")
+    logger.debug(f"--- Prettified HTML Start ---\n{html}\n--- Prettified HTML End ---")
+    logger.info(f"Invoking conversational agent. Effective query for agent: '{html[:500]}...', Config: {final_state['messages'][:1]}")
+    logger.warning(f"Agent finished, but could not extract a final AI response. Full state: {final_state}")
+
+
+def production_request(html, messages, final_state, query):
+    """The same log calls using lazy formatting and capped/sampled payloads."""
+    logger.info("Received request to edit policy. Instruction: %s", Truncated(query, 100))
+    log_payload(logger, "Calling agent model with messages", messages)
+    log_payload(logger, "Agent model response", messages[-1])
+    logger.info("HTML Policy draft after BeautifulSoup prettify. Length: %d", len(html))
+    log_payload(logger, "Prettified HTML", html)
+    logger.info("Invoking conversational agent. Thread: %s", "bench-thread")
+    log_payload(logger, "Effective query for agent", html)
+    logger.warning("Agent finished, but could not extract a final AI response.")
+    log_payload(logger, "Final agent state", final_state, level=logging.WARNING)
+
+
+def _measure(fn, iterations, *args):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return statistics.mean(samples) * 1e6, sorted(samples)[int(len(samples) * 0.99) - 1] * 1e6
+
+
+def _configure(mode: str, level: str, sink: io.TextIOBase):
+    logging_config.configure_logging(mode=mode, level=level, json_output=(mode == "production"))
+    root = logging.getLogger()
+    # Redirect the sink (stdout) handler to a throwaway stream
+    handlers = root.handlers if mode != "production" else logging_config._listener.handlers
+    for handler in handlers:
+        handler.setStream(sink)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--policy-kb", type=int, default=200)
+    args = parser.parse_args()
+
+    html, messages, final_state = _fake_request_payloads(args.policy_kb)
+    query = "Añade una cláusula de exclusión por terremoto a la sección de coberturas " * 3
+    sink = open("/dev/null", "w")
+
+    scenarios = [
+        ("legacy, DEBUG (previous basicConfig)", "dev", "DEBUG", legacy_request),
+        ("legacy, INFO", "dev", "INFO", legacy_request),
+        ("production mode, INFO", "production", "INFO", production_request),
+        ("production mode, DEBUG", "production", "DEBUG", production_request),
+    ]
+    print(f"Policy size: {len(html) / 1024:.0f} KB, iterations: {args.iterations}")
+    print(f"{'scenario':<40} {'mean µs/request':>16} {'p99 µs':>12}")
+    for name, mode, level, fn in scenarios:
+        _configure(mode, level, sink)
+        mean_us, p99_us = _measure(fn, args.iterations, html, messages, final_state, query)
+        print(f"{name:<40} {mean_us:>16.1f} {p99_us:>12.1f}")
+    logging_config.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
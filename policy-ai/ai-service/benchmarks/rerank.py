@@ -0,0 +1,140 @@
+"""
+Cross-encoder reranking: added latency vs. prompt tokens saved.
+
+For each query, over-fetches candidates and compares the context policy_rag_tool
+would pass to the agent:
+  - top-k raw (current behaviour)
+  - top-wide raw (raising k for recall)
+  - top-k after reranking the candidates with the CPU cross-encoder
+Reports context tokens, rerank latency (mean/p50/p95) and, when the queries file
+lists relevant passages, hit@k for each variant.
+
+Candidates come from Pinecone (--live, needs the usual API keys) or from a local
+JSON corpus ([{"text": ..., "source": ...}]) ranked by word overlap (--corpus).
+Queries file format: [{"question": ..., "relevant": ["substring of a relevant chunk", ...]}].
+
+Usage (from policy-ai/ai-service, requires sentence-transformers):
+    python -m benchmarks.rerank --corpus chunks.json [--queries queries.json] [--candidates 30] [--top-k 3]
+    python -m benchmarks.rerank --live [--queries queries.json]
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+
+from langchain_core.documents import Document
+
+from app.ai.reranker import rerank
+from app.core.config import RERANK_MODEL, RERANK_MAX_LENGTH
+from app.utils.tokens import count_tokens
+
+DEFAULT_QUERIES = [
+    {"question": "¿Qué cubre la póliza de hogar en caso de inundación?"},
+    {"question": "¿Cuál es el plazo para comunicar un siniestro?"},
+    {"question": "¿Qué exclusiones tiene la cobertura de responsabilidad civil?"},
+    {"question": "¿Cómo se calcula la indemnización por robo en vivienda?"},
+    {"question": "¿Se puede cancelar la póliza antes de su vencimiento?"},
+]
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _overlap_retriever(corpus_path: str):
+    with open(corpus_path, encoding="utf-8") as f:
+        corpus = json.load(f)
+    docs = [Document(page_content=item["text"], metadata={"source": item.get("source", "")}) for item in corpus]
+    tokens = [set(_TOKEN_RE.findall(doc.page_content.lower())) for doc in docs]
+
+    def retrieve(query: str, k: int):
+        query_tokens = set(_TOKEN_RE.findall(query.lower()))
+        ranked = sorted(range(len(docs)), key=lambda i: len(query_tokens & tokens[i]), reverse=True)
+        return [Document(page_content=docs[i].page_content, metadata=dict(docs[i].metadata)) for i in ranked[:k]]
+    return retrieve
+
+
+def _pinecone_retriever():
+    from app.ai.vector_store import get_embedding_model, query_chunks
+    embeddings = get_embedding_model()
+    return lambda query, k: query_chunks(embeddings.embed_query(query), k=k)
+
+
+def _context_tokens(docs) -> int:
+    return count_tokens("\n\n".join(doc.page_content for doc in docs))
+
+
+def _hit(docs, relevant) -> bool:
+    return any(snippet.lower() in doc.page_content.lower() for doc in docs for snippet in relevant)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", help="JSON list of chunks ranked by word overlap (offline)")
+    source.add_argument("--live", action="store_true", help="Fetch candidates from Pinecone")
+    parser.add_argument("--queries", help="JSON list of {question, relevant}")
+    parser.add_argument("--candidates", type=int, default=30)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--wide-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--model", default=RERANK_MODEL)
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = json.load(f)
+    retrieve = _pinecone_retriever() if args.live else _overlap_retriever(args.corpus)
+
+    from sentence_transformers import CrossEncoder
+    start = time.perf_counter()
+    model = CrossEncoder(args.model, max_length=RERANK_MAX_LENGTH, device="cpu")
+    print(f"Loaded {args.model} in {time.perf_counter() - start:.2f}s")
+    model.predict([("warm-up", "warm-up")], show_progress_bar=False)
+
+    rows = {"raw": [], "wide": [], "reranked": []}
+    hits = {"raw": [], "wide": [], "reranked": []}
+    latencies = []
+    for item in queries:
+        question, relevant = item["question"], item.get("relevant")
+        candidates = retrieve(question, args.candidates)
+        variants = {"raw": candidates[:args.top_k], "wide": candidates[:args.wide_k]}
+        start = time.perf_counter()
+        variants["reranked"] = rerank(question, list(candidates), top_n=args.top_k, model=_BatchSized(model, args.batch_size))
+        latencies.append(time.perf_counter() - start)
+        for name, docs in variants.items():
+            rows[name].append(_context_tokens(docs))
+            if relevant:
+                hits[name].append(_hit(docs, relevant))
+
+    print(f"\n{len(queries)} queries, {args.candidates} candidates, top-k={args.top_k}, wide-k={args.wide_k}")
+    print(f"Rerank latency: mean {statistics.mean(latencies) * 1000:.1f} ms, "
+          f"p50 {_percentile(latencies, 50) * 1000:.1f} ms, p95 {_percentile(latencies, 95) * 1000:.1f} ms")
+    print(f"{'variant':<22} {'context tokens':>15} {'hit@k':>8}")
+    labels = {"raw": f"top-{args.top_k} raw", "wide": f"top-{args.wide_k} raw", "reranked": f"top-{args.top_k} reranked"}
+    for name in ("raw", "wide", "reranked"):
+        hit_rate = f"{sum(hits[name]) / len(hits[name]):.2f}" if hits[name] else "-"
+        print(f"{labels[name]:<22} {statistics.mean(rows[name]):>15.0f} {hit_rate:>8}")
+    saved = statistics.mean(rows["wide"]) - statistics.mean(rows["reranked"])
+    print(f"\nTokens saved per turn vs. top-{args.wide_k}: {saved:.0f}")
+
+
+class _BatchSized:
+    """Applies the --batch-size argument to CrossEncoder.predict."""
+
+    def __init__(self, model, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+
+    def predict(self, pairs, **kwargs):
+        kwargs["batch_size"] = self.batch_size
+        return self.model.predict(pairs, **kwargs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup profile: import time of app.main (via `python -X importtime`) and
+warm-up time per lazily initialised component.
+
+Usage (from policy-ai/ai-service):
+    python -m benchmarks.startup [--top 15] [--output startup.json] [--baseline startup.json]
+
+--output saves the measurements; --baseline prints the difference against a
+previously saved run so import-time regressions show up in review.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def profile_imports(module: str = "app.main") -> dict:
+    """Runs a fresh interpreter with -X importtime and returns cumulative times (ms) per module."""
+    env = {**os.environ, "LOG_LEVEL": "ERROR"}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us) / 1000
+    return {"module": module, "import_ms": cumulative.get(module), "process_wall_ms": round(wall_ms, 1), "modules": cumulative}
+
+
+def profile_warmup() -> dict:
+    """Imports the app in-process and times the parallel warm-up of every registered component."""
+    start = time.perf_counter()
+    import app.main  # noqa: F401  (registers the components)
+    import_ms = (time.perf_counter() - start) * 1000
+    from app.core.components import warm_up
+    report = warm_up()
+    return {"in_process_import_ms": round(import_ms, 1), **report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports to show")
+    parser.add_argument("--output", help="Save the measurements as JSON")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON run")
+    parser.add_argument("--skip-warmup", action="store_true", help="Only profile imports")
+    args = parser.parse_args()
+
+    imports = profile_imports()
+    print(f"import app.main: {imports['import_ms']:.0f} ms (interpreter wall time {imports['process_wall_ms']:.0f} ms)")
+    top_level = {name: ms for name, ms in imports["modules"].items() if "." not in name or name.startswith("app.")}
+    print("\nSlowest imports (cumulative ms):")
+    for name, ms in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:<45} {ms:>8.1f}")
+
+    result = {"import_ms": imports["import_ms"], "top_imports": dict(sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top])}
+
+    if not args.skip_warmup:
+        warmup = profile_warmup()
+        print(f"\nWarm-up: {warmup['warmup']['seconds']:.2f}s total, ready={warmup['ready']}")
+        for name, component in warmup["components"].items():
+            seconds = component["init_seconds"]
+            print(f"  {name:<20} {component['status']:<12} {seconds if seconds is not None else '-':>8}  {component['error'] or ''}")
+        result["warmup"] = warmup
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        delta = imports["import_ms"] - baseline["import_ms"]
+        print(f"\nimport app.main vs baseline: {delta:+.0f} ms ({baseline['import_ms']:.0f} -> {imports['import_ms']:.0f})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
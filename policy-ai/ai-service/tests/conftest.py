@@ -0,0 +1,126 @@
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+_WRITE_CHUNK = 16 * 1024
+
+
+class DocumentServer:
+    """
+    Local HTTP/1.1 server for `documents` (path -> bytes) with strong ETags, keep-alive and
+    counters for connections, requests and body bytes sent. `failures` maps a path to a list of
+    status codes to answer before serving it normally.
+    """
+
+    def __init__(self, documents: dict, handshake_seconds: float = 0.0, bytes_per_second: float = 0.0,
+                 cache_control: str = "no-cache"):
+        self.documents = documents
+        self.failures: dict = {}
+        self.connections = self.requests = self.body_bytes = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+                time.sleep(handshake_seconds)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    pending = server.failures.get(self.path)
+                    status = pending.pop(0) if pending else None
+                if status is not None:
+                    self.send_response(status)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = server.documents.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Cache-Control", cache_control)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                for start in range(0, len(body), _WRITE_CHUNK):
+                    chunk = body[start:start + _WRITE_CHUNK]
+                    self.wfile.write(chunk)
+                    if bytes_per_second:
+                        time.sleep(len(chunk) / bytes_per_second)
+                with server._lock:
+                    server.body_bytes += len(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}{path}"
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.connections = self.requests = self.body_bytes = 0
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def document_server():
+    """Starts DocumentServer(documents, **kwargs) for the test; servers are stopped after it."""
+    servers = []
+
+    def start(documents: dict, **kwargs) -> DocumentServer:
+        servers.append(DocumentServer(documents, **kwargs).__enter__())
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.__exit__(None, None, None)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", help="Also run the tests marked slow")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "slow: end-to-end runs of the benchmarks/ tools (not in the service image); need --run-slow",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip = pytest.mark.skip(reason="slow: run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
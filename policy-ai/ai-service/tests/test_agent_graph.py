@@ -0,0 +1,106 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import app.ai.rag_agent as rag_agent
+import app.ai.tools.specific_doc_qa as specific_doc_qa
+from app.ai.graph import build_agent_executor
+
+
+class RecordingChatModel(BaseChatModel):
+    """Chat model stub that answers with a fixed text and records every call's messages."""
+    reply: str = "respuesta"
+    calls: list = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append(list(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+
+def test_document_question_skips_routing_call(monkeypatch):
+    monkeypatch.setattr(specific_doc_qa, "download_pdf_content", lambda url: b"%PDF")
+    monkeypatch.setattr(specific_doc_qa, "extract_text_from_pdf", lambda content: "Franquicia: 300 EUR")
+    router, synthesis = RecordingChatModel(calls=[]), RecordingChatModel(calls=[])
+    executor = build_agent_executor(router, synthesis)
+
+    state = executor.invoke({
+        "messages": [HumanMessage(content="¿Cuál es la franquicia?")],
+        "document_url": "https://example.com/poliza.pdf",
+    })
+
+    assert router.calls == []
+    assert len(synthesis.calls) == 1
+    tool_call = state["messages"][1].tool_calls[0]
+    assert tool_call["name"] == "specific_document_qa_tool"
+    assert tool_call["args"] == {"query": "¿Cuál es la franquicia?", "document_url": "https://example.com/poliza.pdf"}
+    assert isinstance(state["messages"][2], ToolMessage)
+    assert "Franquicia: 300 EUR" in state["messages"][2].content
+    assert state["messages"][-1].content == "respuesta"
+    assert state["tool_iterations"] == 1  # The direct tool call counts toward the cap
+
+
+def test_general_question_goes_through_router():
+    router, synthesis = RecordingChatModel(calls=[]), RecordingChatModel(calls=[])
+    executor = build_agent_executor(router, synthesis)
+
+    executor.invoke({"messages": [HumanMessage(content="Hola")]})
+
+    assert len(router.calls) == 1
+    assert synthesis.calls == []
+
+
+class ToolLoopChatModel(RecordingChatModel):
+    """Always asks for another tool call, unless called without tools bound."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"reply": "__tool__"})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append(list(messages))
+        if self.reply == "__tool__":
+            call = {"name": "policy_rag_tool", "args": {"query": "franquicia"}, "id": f"call_{len(self.calls)}"}
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content="", tool_calls=[call]))])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="respuesta final"))])
+
+
+def test_tool_loop_is_capped_and_answered_without_tools(monkeypatch):
+    import app.ai.graph as graph
+    monkeypatch.setattr(graph, "AGENT_MAX_TOOL_ITERATIONS", 2)
+    calls = []
+    router, synthesis = ToolLoopChatModel(calls=calls), ToolLoopChatModel(calls=calls)
+    executor = build_agent_executor(router, synthesis)
+
+    state = executor.invoke({"messages": [HumanMessage(content="¿Cuál es la franquicia?")]})
+
+    assert state["tool_iterations"] == 2
+    assert state["messages"][-1].content == "respuesta final"
+    # Every tool call id has a matching ToolMessage, including the one that was not run
+    call_ids = [c["id"] for m in state["messages"] if isinstance(m, AIMessage) for c in m.tool_calls]
+    result_ids = [m.tool_call_id for m in state["messages"] if isinstance(m, ToolMessage)]
+    assert call_ids == result_ids
+
+
+def test_agent_response_does_not_modify_the_callers_config(monkeypatch):
+    configs = []
+
+    class Executor:
+        def invoke(self, state, config):
+            configs.append(config)
+            return {"messages": [AIMessage(content="respuesta")]}
+
+    monkeypatch.setattr(rag_agent, "get_agent_executor", lambda: Executor())
+    config = {"configurable": {"thread_id": "t1"}}
+
+    for _ in range(2):
+        assert rag_agent.get_agent_response("¿Franquicia?", current_policy_text="Póliza", config=config) == "respuesta"
+
+    assert config == {"configurable": {"thread_id": "t1"}}
+    assert [len(used["callbacks"]) for used in configs] == [1, 1]
+    assert configs[0]["configurable"] == {"thread_id": "t1"}
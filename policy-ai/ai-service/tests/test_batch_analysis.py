@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.services.batch_analysis as batch_analysis
+from app.ai.rag_agent import PolicyAnalysisOutput
+from app.api.internal_v1 import router
+
+DOCUMENTS = {
+    "https://docs/a.pdf": "Póliza A " * 3000,
+    "https://docs/b.pdf": "Póliza B",
+    "https://docs/empty.pdf": "",
+    "https://docs/slow.pdf": "Póliza lenta",
+}
+
+
+def _fake_service(monkeypatch):
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def analyze(text, priority):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.8 if "lenta" in text else 0.05)
+        with lock:
+            in_flight[0] -= 1
+        return PolicyAnalysisOutput(score=70, strengths=[text[:8]], weaknesses=[], recommendations=[])
+
+    monkeypatch.setattr(batch_analysis, "download_pdf_content", lambda url: url.encode() if url in DOCUMENTS else None)
+    monkeypatch.setattr(batch_analysis, "extract_text_from_pdf", lambda pdf: DOCUMENTS[pdf.decode()] or None)
+    monkeypatch.setattr(batch_analysis, "analyze_policy_text", analyze)
+    return peak
+
+
+def test_results_stream_as_they_complete_with_per_document_errors(monkeypatch):
+    peak = _fake_service(monkeypatch)
+    urls = ["https://docs/slow.pdf", "https://docs/a.pdf", "https://docs/missing.pdf", "https://docs/empty.pdf"] + \
+           ["https://docs/b.pdf"] * 6
+
+    items = list(batch_analysis.analyze_documents(urls, concurrency=2))
+
+    results, summary = items[:-1], items[-1]
+    assert sorted(item["index"] for item in results) == list(range(len(urls)))
+    by_index = {item["index"]: item for item in results}
+    assert by_index[2]["error_code"] == batch_analysis.ERROR_DOWNLOAD
+    assert by_index[3]["error_code"] == batch_analysis.ERROR_NO_TEXT
+    assert by_index[1]["truncated"] and not by_index[4]["truncated"]
+    assert results[-1]["index"] == 0  # The slow document does not hold back the others
+    assert summary == {**summary, "type": "summary", "total": 10, "succeeded": 8, "failed": 2}
+    assert peak[0] == 2
+
+
+def test_endpoint_streams_ndjson(monkeypatch):
+    _fake_service(monkeypatch)
+    app = FastAPI()
+    app.include_router(router)
+
+    with TestClient(app) as client:
+        response = client.post("/analyze-policies", json={"document_urls": ["https://docs/b.pdf", "https://docs/missing.pdf"]})
+        rejected = client.post("/analyze-policies", json={"document_urls": []})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [line["type"] for line in lines] == ["result", "result", "summary"]
+    assert {line.get("status") for line in lines[:2]} == {"ok", "error"}
+    assert rejected.status_code == 422
+
+
+def test_downloads_wait_for_the_analyses_to_catch_up(monkeypatch):
+    monkeypatch.setattr(batch_analysis, "BATCH_FETCH_CONCURRENCY", 2)
+    monkeypatch.setattr(batch_analysis, "ANALYSIS_MAX_CHARS", 100)
+    counts, lock = {"fetched": 0, "analysed": 0, "ahead": 0}, threading.Lock()
+    lengths = []
+
+    def fetch_text(url):
+        with lock:
+            counts["fetched"] += 1
+            counts["ahead"] = max(counts["ahead"], counts["fetched"] - counts["analysed"])
+        return "x" * 1000
+
+    def analyze(text, priority):
+        lengths.append(len(text))
+        time.sleep(0.02)
+        with lock:
+            counts["analysed"] += 1
+        return PolicyAnalysisOutput(score=70, strengths=[], weaknesses=[], recommendations=[])
+
+    monkeypatch.setattr(batch_analysis, "_fetch_text", fetch_text)
+    monkeypatch.setattr(batch_analysis, "analyze_policy_text", analyze)
+
+    items = list(batch_analysis.analyze_documents([f"https://docs/{i}.pdf" for i in range(20)], concurrency=1))
+
+    assert items[-1]["succeeded"] == 20 and items[0]["truncated"] and items[0]["characters"] == 1000
+    assert counts["ahead"] <= 1 + 2  # Analysing plus at most BATCH_FETCH_CONCURRENCY waiting
+    assert set(lengths) == {100}  # Only the analysed prefix is kept while a text waits
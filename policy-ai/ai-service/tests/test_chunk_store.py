@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import app.ai.vector_store as vector_store
+from app.ai.chunk_store import ChunkStore
+
+
+class FakeIndex:
+    def __init__(self, matches=()):
+        self.matches = list(matches)
+        self.upserts = []
+
+    def upsert(self, vectors, namespace=""):
+        self.upserts.append(vectors)
+
+    def query(self, vector, top_k, include_metadata, include_values, filter=None, namespace=""):
+        return SimpleNamespace(matches=self.matches[:top_k])
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ChunkStore(db_path=str(tmp_path / "chunks.db"))
+    monkeypatch.setattr(vector_store, "get_chunk_store", lambda: store)
+    monkeypatch.setattr(vector_store, "CHUNK_STORE_ENABLED", True)
+    return store
+
+
+def test_store_round_trip_in_batches(store):
+    ids = [f"id-{i}" for i in range(1200)]  # More than one SQLite parameter batch
+    store.put_many(ids, [Document(page_content=f"Cláusula {i}", metadata={"chunk_index": i}) for i in range(1200)])
+    store.update_metadata("id-7", {"sources": ["a.pdf", "b.pdf"]})
+
+    found = store.get_many(ids + ["missing"])
+
+    assert len(found) == 1200
+    assert found["id-1100"].page_content == "Cláusula 1100"
+    assert found["id-7"].metadata == {"chunk_index": 7, "sources": ["a.pdf", "b.pdf"]}
+
+
+def test_vectors_carry_only_ids_and_filterable_fields(store, monkeypatch):
+    index = FakeIndex()
+    monkeypatch.setattr(vector_store, "get_pinecone_index", lambda: index)
+    monkeypatch.setattr(vector_store, "get_embedding_model", lambda: DeterministicFakeEmbedding(size=8))
+    docs = [Document(page_content="Artículo 1. Objeto del seguro",
+                     metadata={"source": "s3://b/hogar.pdf", "chunk_index": 0, "section": "Artículo 1", "page_start": 1})]
+
+    assert vector_store.add_documents_to_pinecone(docs, ids=["c0"])
+
+    [vector] = index.upserts[0]
+    assert vector["id"] == "c0" and len(vector["values"]) == 8
+    assert vector["metadata"] == {"source": "s3://b/hogar.pdf", "chunk_index": 0, "page_start": 1}
+    assert store.get_many(["c0"])["c0"].metadata["section"] == "Artículo 1"
+
+
+def test_query_fetches_text_from_store_with_legacy_fallback(store, monkeypatch):
+    store.put_many(["new"], [Document(page_content="texto del almacén", metadata={"source": "new.pdf"})])
+    index = FakeIndex([
+        SimpleNamespace(id="new", metadata={"source": "new.pdf"}),
+        SimpleNamespace(id="legacy", metadata={"source": "old.pdf", "text": "texto en metadatos"}),
+        SimpleNamespace(id="orphan", metadata={"source": "x.pdf"}),
+    ])
+    monkeypatch.setattr(vector_store, "get_pinecone_index", lambda: index)
+
+    docs = vector_store.query_chunks([0.0] * 8, k=3)
+
+    assert [doc.page_content for doc in docs] == ["texto del almacén", "texto en metadatos"]
+    assert docs[1].metadata == {"source": "old.pdf"}
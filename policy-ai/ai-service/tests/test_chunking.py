@@ -0,0 +1,48 @@
+from app.services.chunking import chunk_pages
+from app.utils.tokens import count_tokens
+
+HEADER = "Aseguradora Ejemplo S.A. - Seguro de Hogar"
+
+
+def _page(number, total, *lines):
+    return "\n".join([HEADER, *lines, f"Página {number} de {total}"])
+
+
+def _clause(number, sentences=3):
+    return f"{number}. " + " ".join(f"El asegurado comunicará el siniestro en el plazo de siete días ({i})." for i in range(sentences))
+
+
+def test_chunks_follow_articles_and_carry_page_and_section_metadata():
+    pages = [
+        _page(1, 3, "CAPÍTULO I. CONDICIONES GENERALES", "Artículo 1. Objeto del seguro", _clause("1.1"), _clause("1.2")),
+        _page(2, 3, "Artículo 2. Exclusiones", _clause("2.1"), "continúa en la página siguiente"),
+        _page(3, 3, "sin excepción.", "Artículo 3. Franquicia", _clause("3.1")),
+    ]
+
+    chunks = chunk_pages(pages, max_tokens=400, overlap_tokens=0, min_tokens=10)
+
+    assert [chunk.metadata["section"] for chunk in chunks] == [
+        "Artículo 1. Objeto del seguro", "Artículo 2. Exclusiones", "Artículo 3. Franquicia"]
+    assert chunks[0].metadata["chapter"] == "CAPÍTULO I. CONDICIONES GENERALES"
+    # The paragraph running onto page 3 stays with its article
+    assert (chunks[1].metadata["page_start"], chunks[1].metadata["page_end"]) == (2, 3)
+    assert chunks[1].page_content.endswith("continúa en la página siguiente\nsin excepción.")
+    text = "\n".join(chunk.page_content for chunk in chunks)
+    assert HEADER not in text and "Página" not in text
+
+
+def test_long_articles_split_on_clauses_within_token_budget():
+    clauses = [_clause(f"4.{i}", sentences=4) for i in range(1, 9)]
+    pages = ["\n".join(["Artículo 4. Declaración del siniestro", *clauses])]
+
+    chunks = chunk_pages(pages, max_tokens=150, overlap_tokens=80, min_tokens=10)
+
+    assert len(chunks) > 1
+    heading = "Artículo 4. Declaración del siniestro"
+    for chunk in chunks:
+        assert chunk.page_content.startswith(heading)  # Continuations repeat the heading
+        assert count_tokens(chunk.page_content) <= 150 + count_tokens(heading) + 1
+        body = chunk.page_content.split("\n")[1:]
+        assert all(line in clauses for line in body)  # No clause is cut in half
+    # Neighbouring chunks share a trailing clause as overlap
+    assert set(chunks[0].page_content.split("\n")) & set(chunks[1].page_content.split("\n")[1:])
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+import app.core.components as components
+from app.core.components import (
+    readiness_report, register_component, unbuilt_required_components, warm_up_in_background,
+    STATUS_NOT_STARTED,
+)
+
+
+@pytest.fixture(autouse=True)
+def _registry(monkeypatch):
+    monkeypatch.setattr(components, "_registry", {})
+    monkeypatch.setattr(components, "_warmup_state", {"status": STATUS_NOT_STARTED, "seconds": None})
+
+
+def _wait_for_warm_up(timeout: float = 5) -> dict:
+    deadline = time.monotonic() + timeout
+    while readiness_report()["warmup"]["status"] != "ready" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return readiness_report()
+
+
+def test_not_ready_until_required_components_are_built():
+    register_component("llm", lambda: time.sleep(0.05) or object())
+    register_component("web_search", lambda: None, required=False)
+
+    report = readiness_report()
+    assert report["ready"] is False and report["pending"] == ["llm"]
+
+    assert warm_up_in_background(unbuilt_required_components())
+    assert readiness_report()["ready"] is False  # Building
+    assert not warm_up_in_background(unbuilt_required_components())  # One warm-up at a time
+
+    report = _wait_for_warm_up()
+    assert report["ready"] is True and report["components"]["web_search"]["status"] == "not_started"
+
+
+def test_failed_required_component_is_retried_in_the_background():
+    attempts = []
+
+    def flaky():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise ConnectionError("vector store unreachable")
+        return object()
+
+    register_component("vector_store", flaky)
+    warm_up_in_background(unbuilt_required_components())
+    report = _wait_for_warm_up()
+    assert report["ready"] is False and report["components"]["vector_store"]["status"] == "failed"
+
+    assert unbuilt_required_components() == ["vector_store"]
+    warm_up_in_background(unbuilt_required_components())
+    assert _wait_for_warm_up()["ready"] is True
@@ -0,0 +1,71 @@
+import asyncio
+import gzip
+import zlib
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, choose_encoding
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/large")
+    def large():
+        return {"text": "<p>cláusula</p>" * 500}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    return app
+
+
+def test_large_responses_are_compressed():
+    with TestClient(_app()) as client:
+        large = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert large.headers["content-encoding"] == "gzip" and large.headers["vary"] == "Accept-Encoding"
+    assert large.json() == identity.json()
+    assert int(large.headers["content-length"]) < len(identity.content) / 10
+    assert "content-encoding" not in small.headers and "content-encoding" not in identity.headers
+
+
+def test_streamed_chunks_are_decodable_as_they_arrive():
+    async def ndjson_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson")]})
+        for i in range(3):
+            await send({"type": "http.response.body", "body": f'{{"line": {i}}}\n'.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    chunks, headers = [], {}
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            headers.update(message["headers"])
+        else:
+            chunks.append(message["body"])
+
+    scope = {"type": "http", "method": "GET", "path": "/stream", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(ndjson_app, minimum_size=500)(scope, receive, send))
+
+    decoder = zlib.decompressobj(31)
+    lines = [decoder.decompress(chunk) for chunk in chunks]
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    assert lines[:3] == [b'{"line": 0}\n', b'{"line": 1}\n', b'{"line": 2}\n']
+    assert gzip.decompress(b"".join(chunks)) == b"".join(lines)
+
+
+def test_encoding_negotiation():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("*") in ("gzip", "br")
+    assert choose_encoding("") is None
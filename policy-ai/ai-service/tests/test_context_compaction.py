@@ -0,0 +1,65 @@
+from langchain_core.documents import Document
+
+from app.ai.context_compaction import compact_documents
+from app.services.chunking import chunk_pages
+from app.utils.tokens import count_tokens
+
+
+def _chunk(text, source="s3://bucket/hogar.pdf", index=0):
+    return Document(page_content=text, metadata={"source": source, "chunk_index": index})
+
+
+def test_neighbouring_chunks_are_merged_without_the_splitter_overlap():
+    overlap = "el asegurado comunicará el siniestro en siete días."
+    first = _chunk("Artículo 5. Declaración del siniestro. " + overlap, index=4)
+    second = _chunk(overlap + " El incumplimiento permite reclamar daños y perjuicios.", index=5)
+
+    compacted = compact_documents([second, first], token_budget=1000)
+
+    assert len(compacted) == 1
+    assert compacted[0].page_content.count(overlap) == 1
+    assert compacted[0].page_content.startswith("Artículo 5.")
+    assert compacted[0].metadata["chunk_indices"] == [4, 5]
+
+
+def test_near_duplicates_from_other_versions_and_boilerplate_are_dropped():
+    clause = "Quedan cubiertos los daños por agua causados por roturas accidentales de tuberías fijas del edificio asegurado"
+    header = "Aseguradora Ejemplo S.A."
+    docs = [
+        _chunk(f"{header}\n{clause} con el límite de la suma asegurada.", source="v1.pdf"),
+        _chunk(f"{header}\n{clause} con el límite de la suma asegurada", source="v2.pdf"),
+        _chunk(f"{header}\nLa franquicia se fija en las condiciones particulares.", source="v3.pdf"),
+    ]
+
+    compacted = compact_documents(docs, token_budget=1000)
+
+    assert [doc.metadata["source"] for doc in compacted] == ["v1.pdf", "v3.pdf"]
+    assert "\n".join(doc.page_content for doc in compacted).count(header) == 1
+
+
+def test_token_budget_keeps_best_ranked_passages():
+    docs = [_chunk(f"Cláusula {i}. " + "texto de la póliza " * 200, source=f"doc{i}.pdf") for i in range(3)]
+
+    compacted = compact_documents(docs, token_budget=300)
+
+    assert compacted[0].page_content.startswith("Cláusula 0.")
+    assert count_tokens("\n\n".join(doc.page_content for doc in compacted)) <= 300
+
+
+def test_chunks_split_mid_article_merge_without_repeating_heading_or_clauses():
+    heading = "Artículo 5. Declaración del siniestro"
+    clauses = [f"5.{i}. El asegurado comunicará el siniestro número {i} en el plazo de siete días." for i in range(1, 13)]
+    chunks = chunk_pages(["\n".join([heading, *clauses])], max_tokens=80, overlap_tokens=25, min_tokens=10)
+    assert len(chunks) >= 3
+    assert all(chunk.page_content.startswith(heading) for chunk in chunks)  # Each repeats the heading
+    docs = [_chunk(chunk.page_content, index=i) for i, chunk in enumerate(chunks)]
+    for doc, chunk in zip(docs, chunks):
+        doc.metadata.update(chunk.metadata)
+
+    compacted = compact_documents(docs, token_budget=5000)
+
+    assert len(compacted) == 1
+    text = compacted[0].page_content
+    assert text.count(heading) == 1
+    assert text.splitlines() == [heading, *clauses]
+    assert "overlap_chars" not in compacted[0].metadata
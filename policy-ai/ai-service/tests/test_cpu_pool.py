@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+
+import pytest
+
+import app.utils.cpu_pool as cpu_pool
+from app.utils.cpu_pool import CpuPool, CpuTaskTimeout, CpuTaskTooLarge, CpuWorkerCrashed
+
+
+def _square(x):
+    return x * x
+
+
+def _crash(_):
+    os._exit(1)  # Like a segfault in a native parser: the worker process is gone
+
+
+def _hang(seconds):
+    time.sleep(seconds)
+
+
+def _slow_square(x):
+    time.sleep(1)
+    return x * x
+
+
+def _sleep_square(x):
+    time.sleep(0.7)
+    return x * x
+
+
+def _pid(_):
+    return os.getpid()
+
+
+@pytest.fixture
+def pool():
+    pool = CpuPool(workers=1, timeout=5, preload=())
+    yield pool
+    pool.shutdown()
+
+
+def test_crashed_or_hung_worker_is_replaced(pool):
+    assert pool.run("square", _square, 7) == 49
+    first_worker = pool.run("pid", _pid, None)
+
+    with pytest.raises(CpuWorkerCrashed):
+        pool.run("crash", _crash, None)
+    with pytest.raises(CpuTaskTimeout):
+        pool.run("hang", _hang, 30, timeout=0.5)
+
+    assert pool.run("square", _square, 3) == 9
+    assert pool.run("pid", _pid, None) != first_worker
+
+
+def test_only_the_crashing_task_fails():
+    pool = CpuPool(workers=2, timeout=10, preload=())
+    try:
+        pool.warm()
+        results = {}
+        innocent = threading.Thread(target=lambda: results.update(innocent=pool.run("square", _slow_square, 5)))
+        innocent.start()
+        time.sleep(0.2)  # Running when the other worker dies
+
+        with pytest.raises(CpuWorkerCrashed, match="crash crashed its worker"):
+            pool.run("crash", _crash, None)
+        innocent.join(timeout=20)
+
+        assert results == {"innocent": 25}
+        assert pool._generation == 1  # The retries ran on their own: the replacement pool never broke
+        assert pool.run("square", _square, 3) == 9
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_starts_when_a_worker_picks_up_the_task():
+    pool = CpuPool(workers=1, timeout=1.0, preload=())
+    try:
+        pool.warm()
+        results = {}
+        threads = [
+            threading.Thread(target=lambda x=x: results.update({x: pool.run("square", _sleep_square, x)}))
+            for x in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=20)
+
+        # Each waited behind the others for up to 1.4s but ran for 0.7s: none timed out
+        assert results == {0: 0, 1: 1, 2: 4}
+        assert pool._generation == 0
+    finally:
+        pool.shutdown()
+
+
+def test_run_cpu_size_limits(monkeypatch):
+    monkeypatch.setattr(cpu_pool, "CPU_TASK_MAX_BYTES", 100)
+    monkeypatch.setattr(cpu_pool, "CPU_TASK_INLINE_BYTES", 10)
+    monkeypatch.setattr(cpu_pool.cpu_pool_component, "get", lambda: pytest.fail("small tasks must run inline"))
+
+    assert cpu_pool.run_cpu("square", _square, 4, size=5) == 16
+    with pytest.raises(CpuTaskTooLarge):
+        cpu_pool.run_cpu("square", _square, 4, size=101)
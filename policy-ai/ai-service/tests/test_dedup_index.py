@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from app.services.dedup_index import DedupIndex
+
+CLAUSE = ("El tomador o el asegurado deberán comunicar al asegurador el acaecimiento del siniestro dentro del "
+          "plazo máximo de siete días de haberlo conocido, salvo que se haya fijado en la póliza un plazo más amplio. "
+          "En caso de incumplimiento, el asegurador podrá reclamar los daños y perjuicios causados por la falta de declaración.")
+OTHER = "La franquicia general de la póliza asciende a 300 euros por siniestro, salvo para los daños por agua."
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DedupIndex(db_path=str(tmp_path / "dedup.db"))
+
+
+def _file(source, *texts):
+    docs = [Document(page_content=text, metadata={"source": source, "chunk_index": i}) for i, text in enumerate(texts)]
+    return docs, [f"{source}#{i}" for i in range(len(texts))]
+
+
+def test_near_duplicate_from_another_version_is_indexed_once(index):
+    with index.deduplicate(*_file("v1.pdf", CLAUSE, OTHER)) as first:
+        pass
+    assert first.ids == ["v1.pdf#0", "v1.pdf#1"]
+    assert first.documents[0].metadata["sources"] == ["v1.pdf"]
+
+    # Same clause with a reflowed line ending and a trailing space
+    with index.deduplicate(*_file("v2.pdf", CLAUSE.replace("plazo más amplio.", "plazo más\namplio. "))) as second:
+        pass
+    assert second.documents == [] and second.duplicates == 1
+    assert second.updated_sources == {"v1.pdf#0": ["v1.pdf", "v2.pdf"]}
+
+    # Re-ingesting the same file changes nothing
+    with index.deduplicate(*_file("v2.pdf", CLAUSE)) as again:
+        pass
+    assert again.updated_sources == {}
+
+
+def test_clauses_that_differ_in_a_number_are_both_indexed(index):
+    with index.deduplicate(*_file("v1.pdf", CLAUSE)):
+        pass
+    with index.deduplicate(*_file("v2.pdf", CLAUSE.replace("siete días", "10 días"))) as result:
+        pass
+    assert result.ids == ["v2.pdf#0"]
+
+
+def test_failed_upload_rolls_back_the_signatures(index):
+    with pytest.raises(RuntimeError):
+        with index.deduplicate(*_file("v1.pdf", CLAUSE)):
+            raise RuntimeError("Pinecone upsert failed")
+    assert index.stats()["indexed_chunks"] == 0
+
+    with index.deduplicate(*_file("v2.pdf", CLAUSE)) as result:
+        pass
+    assert result.ids == ["v2.pdf#0"]
+
+
+def test_chunks_are_only_duplicates_within_their_scope(index):
+    with index.deduplicate(*_file("hogar.pdf", CLAUSE), scope="product_line=hogar"):
+        pass
+    with index.deduplicate(*_file("autos.pdf", CLAUSE), scope="product_line=autos") as other_scope:
+        pass
+    with index.deduplicate(*_file("hogar-v2.pdf", CLAUSE), scope="product_line=hogar") as same_scope:
+        pass
+
+    assert other_scope.duplicates == 0
+    assert same_scope.duplicates == 1 and same_scope.updated_sources == {"hogar.pdf#0": ["hogar.pdf", "hogar-v2.pdf"]}
+
+
+def test_index_is_not_locked_while_a_file_is_upserted(index):
+    with index.deduplicate(*_file("v1.pdf", CLAUSE)):
+        pass
+
+    other = {}
+    with index.deduplicate(*_file("v2.pdf", CLAUSE)) as second:
+        # Another file is de-duplicated and recorded while this one is still "upserting"
+        worker = threading.Thread(target=lambda: other.update(result=_run(index, "v3.pdf", CLAUSE, OTHER)))
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+
+    # Neither file's source overwrote the other's
+    assert other["result"].updated_sources == {"v1.pdf#0": ["v1.pdf", "v3.pdf"]}
+    assert second.updated_sources == {"v1.pdf#0": ["v1.pdf", "v3.pdf", "v2.pdf"]}
+
+
+def test_near_duplicates_within_a_file_are_indexed_once(index):
+    with index.deduplicate(*_file("v1.pdf", CLAUSE, CLAUSE + " ", OTHER)) as result:
+        pass
+    assert result.ids == ["v1.pdf#0", "v1.pdf#2"] and result.duplicates == 1
+
+
+def _run(index, source, *texts):
+    with index.deduplicate(*_file(source, *texts)) as result:
+        pass
+    return result
@@ -0,0 +1,46 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.api.internal_v1 as internal_v1
+from app.utils.diff_ops import apply_ops, diff_ops, same_content
+from app.utils.html_processor import prettify_html
+
+POLICY = ("<h2>Póliza de hogar</h2><p>El asegurador cubre daños por agua hasta 3.000 euros.</p>"
+          "<p>Exclusiones: guerra y terrorismo.</p><ul><li>Robo</li><li>Incendio</li></ul>")
+EDITED = ("<h2>Póliza de hogar</h2><p>El asegurador cubre daños por agua e incendio hasta 5.000 euros.</p>"
+          "<p>Franquicia de 150 euros.</p><p>Exclusiones: guerra y terrorismo.</p><ul><li>Robo</li></ul>")
+
+
+def test_operations_rebuild_the_edited_policy():
+    edited = prettify_html(EDITED)  # As the model's output is cleaned
+    changes = diff_ops(POLICY, edited)
+
+    assert changes["base_length"] == len(POLICY) and changes["blocks"] == 6
+    assert same_content(apply_ops(POLICY, changes["ops"]), edited)
+    # Word-level changes in the paragraph that was edited, not the whole paragraph
+    assert {"block": 1, "start": POLICY.index("3.000"), "end": POLICY.index("3.000") + 5, "text": "5.000"} in changes["ops"]
+    assert sum(len(op["text"]) for op in changes["ops"]) < 60
+
+
+def test_reformatting_is_not_a_change():
+    assert diff_ops(POLICY, prettify_html(POLICY))["ops"] == []
+    assert apply_ops("", diff_ops("", EDITED)["ops"]) == EDITED
+
+
+def test_endpoints_return_operations_on_request(monkeypatch):
+    monkeypatch.setattr(internal_v1, "edit_policy_html", lambda text, instruction: prettify_html(EDITED))
+    monkeypatch.setattr(internal_v1, "edit_policy", lambda text, instruction: "<p>diff</p>")
+    monkeypatch.setattr(internal_v1, "draft_policy_html", lambda prompt: prettify_html(EDITED))
+    app = FastAPI()
+    app.include_router(internal_v1.router)
+
+    with TestClient(app) as client:
+        ops = client.post("/edit-policy", json={"current_policy_text": POLICY, "edit_instruction": "x",
+                                                "response_format": "ops"}).json()
+        html = client.post("/edit-policy", json={"current_policy_text": POLICY, "edit_instruction": "x"}).json()
+        draft = client.post("/generate-policy-draft", json={"prompt": "x", "current_policy_text": POLICY,
+                                                            "response_format": "ops"}).json()
+
+    assert set(ops) == {"changes"} and same_content(apply_ops(POLICY, ops["changes"]["ops"]), EDITED)
+    assert html == {"edited_policy_text": "<p>diff</p>"}
+    assert draft["changes"] == ops["changes"]
@@ -0,0 +1,88 @@
+import pytest
+
+import app.core.config as config
+import app.core.resilience as resilience
+from app.core.resilience import DOCUMENT_DOWNLOAD, CLOSED, Dependency
+from app.utils.download_client import DocumentDownloadClient, DownloadError, DownloadTooLarge
+
+DOCUMENTS = {"/a.pdf": b"%PDF a" * 1000, "/b.pdf": b"%PDF b" * 1000, "/big.pdf": b"x" * 50_000}
+
+
+def _client(tmp_path, **kwargs):
+    return DocumentDownloadClient(cache_dir=str(tmp_path), backoff=0.01, **kwargs)
+
+
+def test_revalidates_cached_documents_over_one_connection(tmp_path, document_server):
+    server = document_server(dict(DOCUMENTS))
+    client = _client(tmp_path)
+    first = [client.get(server.url(path)) for path in ("/a.pdf", "/b.pdf")]
+    sent = server.body_bytes
+    again = [client.get(server.url(path)) for path in ("/a.pdf", "/b.pdf")]
+
+    assert first == again == [DOCUMENTS["/a.pdf"], DOCUMENTS["/b.pdf"]]
+    assert server.body_bytes == sent  # Answered with 304s
+    assert server.requests == 4 and server.connections == 1
+
+    server.documents["/a.pdf"] = b"%PDF changed"
+    assert client.get(server.url("/a.pdf")) == b"%PDF changed"
+
+
+def test_fresh_responses_are_served_without_a_request(tmp_path, document_server):
+    server = document_server(dict(DOCUMENTS), cache_control="max-age=60")
+    client = _client(tmp_path)
+    client.get(server.url("/a.pdf"))
+    assert client.get(server.url("/a.pdf")) == DOCUMENTS["/a.pdf"]
+    assert server.requests == 1
+
+
+def test_size_limit(tmp_path, document_server):
+    server = document_server(dict(DOCUMENTS))
+    client = _client(tmp_path, max_bytes=10_000, spool_bytes=1_000)
+    with pytest.raises(DownloadTooLarge):
+        client.get(server.url("/big.pdf"))
+    assert client.get(server.url("/a.pdf")) == DOCUMENTS["/a.pdf"]
+
+
+def test_retries_transient_failures(tmp_path, document_server):
+    server = document_server(dict(DOCUMENTS))
+    client = _client(tmp_path, retries=2)
+    server.failures["/a.pdf"] = [503, 429]
+    assert client.get(server.url("/a.pdf")) == DOCUMENTS["/a.pdf"]
+
+    server.failures["/b.pdf"] = [503, 503, 503]
+    with pytest.raises(DownloadError):
+        client.get(server.url("/b.pdf"))
+    with pytest.raises(DownloadError):
+        client.get(server.url("/missing.pdf"))
+    assert server.requests == 3 + 3 + 1  # 404s are not retried
+
+
+def test_cache_evicts_least_recently_used(tmp_path, document_server):
+    documents = {f"/{name}.pdf": f"%PDF {name}".encode() * 1000 for name in "abcde"}  # 6000 bytes each
+    server = document_server(documents)
+    client = _client(tmp_path, cache_max_bytes=4 * 6000)
+    for path in ("/a.pdf", "/b.pdf", "/c.pdf", "/d.pdf", "/a.pdf", "/e.pdf"):
+        client.get(server.url(path))
+
+    sent = server.body_bytes
+    client.get(server.url("/a.pdf"))
+    assert server.body_bytes == sent
+    client.get(server.url("/b.pdf"))
+    assert server.body_bytes == sent + 6000
+
+
+def test_adaptive_timeout_covers_headers_not_the_body(tmp_path, document_server, monkeypatch):
+    monkeypatch.setattr(config, "RESILIENCE_ENABLED", True)
+    guard = Dependency(DOCUMENT_DOWNLOAD, timeout_bounds=(0.2, 0.2))
+    monkeypatch.setitem(resilience._dependencies, DOCUMENT_DOWNLOAD, guard)
+    body = b"%PDF" + b"x" * 200_000
+    server = document_server({"/large.pdf": body}, bytes_per_second=400_000)  # ~0.5s of body
+
+    assert _client(tmp_path, retries=0, min_bytes_per_second=10_000).get(server.url("/large.pdf")) == body
+    assert server.requests == 1
+
+    # A body far below the minimum throughput is abandoned, without counting against the breaker
+    with pytest.raises(DownloadError, match="slow_body"):
+        _client(tmp_path, retries=0, timeout=0.1, min_bytes_per_second=10_000_000, cache_max_bytes=0).get(
+            server.url("/large.pdf"))
+    assert guard.breaker.state == CLOSED and guard.breaker._failures == 0
@@ -0,0 +1,48 @@
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import app.ai.draft_cache as draft_cache
+import app.ai.rag_agent as rag_agent
+from app.ai.draft_cache import DraftCache, draft_cache_key
+
+
+def test_keys_ignore_spacing_and_unicode_form_but_not_case_punctuation_model_or_template():
+    key = draft_cache_key("Póliza de hogar estándar con cobertura de robo", "gpt-4o", "v1")
+    decomposed = "Po\u0301liza de hogar  esta\u0301ndar\ncon cobertura de robo "
+    assert draft_cache_key(decomposed, "gpt-4o", "v1") == key
+    assert draft_cache_key("póliza de hogar estándar con cobertura de robo", "gpt-4o", "v1") != key
+    assert draft_cache_key("Póliza de hogar estándar con cobertura de robo.", "gpt-4o", "v1") != key
+    assert draft_cache_key("Póliza de hogar estándar con cobertura de robo", "gpt-4o-mini", "v1") != key
+    assert draft_cache_key("Póliza de hogar estándar con cobertura de robo", "gpt-4o", "v2") != key
+
+
+def test_drafts_persist_and_disk_keeps_most_recently_used(tmp_path):
+    path = str(tmp_path / "drafts.db")
+    cache = DraftCache(path, max_entries=1, max_disk_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, f"<h2>{key}</h2>")
+    assert cache.get("a") == "<h2>a</h2>"  # From disk: the memory LRU only holds "b"
+    cache.put("c", "<h2>c</h2>")
+
+    reopened = DraftCache(path, max_entries=4, max_disk_entries=2)
+    assert [reopened.get(key) for key in ("a", "b", "c")] == ["<h2>a</h2>", None, "<h2>c</h2>"]
+    assert DraftCache(path, ttl_seconds=0).get("a") is None
+
+
+def test_identical_prompts_are_drafted_once_and_diffed_per_request(monkeypatch, tmp_path):
+    calls = []
+
+    def model(prompt_value):
+        calls.append(prompt_value)
+        return AIMessage(content="<h2>Póliza de hogar</h2><p>Cubre robo y daños por agua.</p>")
+
+    monkeypatch.setattr(rag_agent, "get_llm", lambda: RunnableLambda(model))
+    monkeypatch.setattr(draft_cache, "_draft_cache", DraftCache(str(tmp_path / "drafts.db")))
+
+    first = rag_agent.generate_policy_draft("Póliza de hogar estándar con cobertura de robo")
+    diffed = rag_agent.generate_policy_draft("Póliza de hogar  estándar con cobertura de robo ",
+                                             current_policy_text="<h2>Póliza de hogar</h2><p>Cubre robo.</p>")
+
+    assert len(calls) == 1
+    assert "Cubre robo y daños por agua." in first and "<ins>" not in first
+    assert "<ins>" in diffed
@@ -0,0 +1,111 @@
+import time
+import pytest
+
+import app.services.document_processor as document_processor
+from app.services.job_store import (
+    JobStore, JobConflictError, JobReapedError,
+    JOB_CANCELLED, JOB_COMPLETED, JOB_INTERRUPTED, JOB_PENDING, JOB_RUNNING,
+    FILE_DONE, FILE_FAILED, FILE_PROCESSING,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(db_path=str(tmp_path / "jobs.db"), stale_after_seconds=60)
+
+
+def test_concurrency_guard_rejects_second_active_job(store):
+    job = store.create_job("s3_ingest")
+    with pytest.raises(JobConflictError) as exc:
+        store.create_job("s3_ingest")
+    assert exc.value.active_job_id == job["id"]
+
+    # A different kind of job is not blocked
+    store.create_job("other")
+
+
+def test_resume_only_processes_remaining_files(store):
+    job = store.create_job("s3_ingest")
+    store.mark_running(job["id"])
+    store.register_files(job["id"], ["a.pdf", "b.pdf", "c.pdf"])
+    store.set_file_state(job["id"], "a.pdf", FILE_DONE, chunks=10)
+    store.set_file_state(job["id"], "b.pdf", FILE_PROCESSING)
+    store.request_cancel(job["id"])
+    store.finish(job["id"], JOB_CANCELLED)
+
+    resumed = store.prepare_resume(job["id"])
+    assert resumed["status"] == JOB_PENDING
+    assert resumed["cancel_requested"] is False
+    # Re-listing the bucket must not reset checkpointed files
+    store.register_files(job["id"], ["a.pdf", "b.pdf", "c.pdf"])
+    assert store.pending_files(job["id"]) == ["b.pdf", "c.pdf"]
+
+
+def test_progress_reports_rates(store):
+    job = store.create_job("s3_ingest")
+    store.mark_running(job["id"])
+    store.register_files(job["id"], ["a.pdf", "b.pdf", "c.pdf"])
+    store.set_file_state(job["id"], "a.pdf", FILE_DONE, chunks=40)
+    store.set_file_state(job["id"], "b.pdf", FILE_FAILED, error="boom")
+    time.sleep(0.01)
+
+    progress = store.progress(job["id"])
+    assert progress["status"] == JOB_RUNNING
+    assert progress["files_total"] == 3
+    assert progress["files"] == {"pending": 1, "processing": 0, "done": 1, "skipped": 0, "failed": 1}
+    assert progress["chunks_indexed"] == 40
+    assert progress["files_per_sec"] > 0
+    assert progress["chunks_per_sec"] > progress["files_per_sec"]
+
+
+def test_stale_running_job_is_interrupted_and_unblocks_guard(tmp_path):
+    store = JobStore(db_path=str(tmp_path / "jobs.db"), stale_after_seconds=0.05)
+    job = store.create_job("s3_ingest")
+    store.mark_running(job["id"])
+    time.sleep(0.1)
+
+    assert store.get_job(job["id"])["status"] == JOB_INTERRUPTED
+    store.create_job("s3_ingest")
+
+
+def test_late_writes_to_a_reaped_job_are_refused(tmp_path):
+    store = JobStore(db_path=str(tmp_path / "jobs.db"), stale_after_seconds=0.05)
+    job = store.create_job("s3_ingest")
+    store.mark_running(job["id"])
+    store.register_files(job["id"], ["a.pdf"])
+    time.sleep(0.1)
+    assert store.get_job(job["id"])["status"] == JOB_INTERRUPTED
+
+    with pytest.raises(JobReapedError):
+        store.set_file_state(job["id"], "a.pdf", FILE_DONE, chunks=3)
+    store.finish(job["id"], JOB_COMPLETED)
+    assert store.get_job(job["id"])["status"] == JOB_INTERRUPTED
+    assert store.pending_files(job["id"]) == ["a.pdf"]
+
+
+def test_stale_pending_job_is_interrupted(tmp_path):
+    store = JobStore(db_path=str(tmp_path / "jobs.db"), stale_after_seconds=0.05)
+    job = store.create_job("s3_ingest")
+    time.sleep(0.1)
+
+    assert store.get_job(job["id"])["status"] == JOB_INTERRUPTED
+    with pytest.raises(JobReapedError):
+        store.mark_running(job["id"])  # A worker arriving after the reap does not run it
+    assert store.prepare_resume(job["id"])["status"] == JOB_PENDING  # Resuming restarts the timeout
+
+
+def test_keep_alive_heartbeats_while_the_worker_is_busy(tmp_path):
+    store = JobStore(db_path=str(tmp_path / "jobs.db"), stale_after_seconds=0.3)
+    job = store.create_job("s3_ingest")
+    store.mark_running(job["id"])
+    with store.keep_alive(job["id"], interval=0.05):
+        time.sleep(0.6)  # One long file, no checkpoints
+        assert store.get_job(job["id"])["status"] == JOB_RUNNING
+
+
+def test_processing_without_a_job_id_logs_a_conflict(store, monkeypatch, capsys):
+    monkeypatch.setattr(document_processor, "get_job_store", lambda: store)
+    active = store.create_job(document_processor.S3_INGEST_JOB_KIND)
+
+    assert document_processor.process_s3_documents() is None
+    assert active["id"] in capsys.readouterr().out
@@ -0,0 +1,104 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app.core.config as config
+import app.core.resilience as resilience
+from app.ai.llm_scheduler import LLMScheduler, Priority, SchedulerTimeout
+from app.core.resilience import OPENAI_CHAT_GENERATE, Dependency, DependencyTimeout
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeServerError(Exception):
+    status_code = 503
+
+    def __init__(self, retry_after_ms: int):
+        super().__init__("503 Service Unavailable")
+        self.response = SimpleNamespace(headers={"retry-after-ms": str(retry_after_ms)})
+
+
+def test_interactive_calls_are_admitted_before_queued_batch_calls():
+    scheduler = LLMScheduler(requests_per_minute=600, tokens_per_minute=1_000_000)
+    scheduler._requests.available = 0  # Budget exhausted: both callers must queue
+    order = []
+
+    def call(priority):
+        scheduler.run(lambda: order.append(priority), priority=priority, estimated_tokens=10)
+
+    batch = threading.Thread(target=call, args=(Priority.BATCH,))
+    batch.start()
+    time.sleep(0.02)  # The batch call is queued first
+    interactive = threading.Thread(target=call, args=(Priority.INTERACTIVE,))
+    interactive.start()
+    batch.join(timeout=2)
+    interactive.join(timeout=2)
+
+    assert order == [Priority.INTERACTIVE, Priority.BATCH]
+
+
+def test_rate_limit_errors_are_retried():
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000,
+                             max_retries=3, retry_base_seconds=0.01, retry_max_seconds=0.05)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FakeRateLimitError("429 Too Many Requests")
+        return "ok"
+
+    assert scheduler.run(flaky, priority=Priority.EDIT) == "ok"
+    assert len(attempts) == 3
+
+    with pytest.raises(ValueError):
+        scheduler.run(lambda: (_ for _ in ()).throw(ValueError("bad request")), priority=Priority.EDIT)
+
+
+def test_retries_wait_for_the_backoff_delay():
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000,
+                             max_retries=3, retry_base_seconds=0.001, retry_max_seconds=0.002)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise FakeServerError(retry_after_ms=80)  # Not a 429: no process-wide pause
+        return "ok"
+
+    assert scheduler.run(flaky, priority=Priority.EDIT) == "ok"
+    gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    assert len(gaps) == 2 and min(gaps) >= 0.08
+
+
+def test_call_not_admitted_before_its_deadline_times_out():
+    scheduler = LLMScheduler(requests_per_minute=1, tokens_per_minute=1_000_000)
+    scheduler._requests.available = 0  # Next slot is a minute away
+
+    start = time.monotonic()
+    with pytest.raises(SchedulerTimeout):
+        scheduler.run(lambda: "never", priority=Priority.INTERACTIVE, deadline_seconds=0.1)
+    assert time.monotonic() - start < 1
+    assert scheduler._queue == []
+
+
+def test_timed_out_generations_are_not_reissued(monkeypatch):
+    monkeypatch.setattr(config, "RESILIENCE_ENABLED", True)
+    monkeypatch.setitem(resilience._dependencies, OPENAI_CHAT_GENERATE,
+                        Dependency(OPENAI_CHAT_GENERATE, timeout_bounds=(0.05, 0.05)))
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000,
+                             max_retries=3, retry_base_seconds=0.001, retry_max_seconds=0.002)
+    release, attempts = threading.Event(), []
+
+    def slow_generation():
+        attempts.append(None)
+        release.wait(5)
+
+    with pytest.raises(DependencyTimeout):
+        scheduler.run(slow_generation, priority=Priority.EDIT, dependency=OPENAI_CHAT_GENERATE)
+    release.set()
+    assert len(attempts) == 1
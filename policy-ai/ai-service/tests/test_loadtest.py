@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.mark.slow
+def test_load_test_drives_every_endpoint_against_stubbed_service():
+    loadtest = pytest.importorskip("benchmarks.loadtest.__main__")
+    args = SimpleNamespace(
+        url=None, rps=12, duration=1.5, mix="answer_query=2,draft=1,edit=1,upload=1,login=1,register=1",
+        arrivals="uniform", users=3, max_in_flight=50, timeout=30, latency_scale=0, supabase_latency=0,
+        cassettes=None, documents=2, lag_interval=0.01, seed=0, stall_rate=0, stall_seconds=0,
+        stall_on="llm,embeddings", no_resilience=False,
+    )
+
+    result = loadtest.run(args)
+
+    endpoints = result["endpoints"]
+    assert {"answer_query", "draft", "edit", "upload", "login", "register", "all"} <= set(endpoints)
+    assert endpoints["all"]["error_rate"] == 0
+    assert result["loop_lag"]["count"] > 0
+    assert any(stage.startswith("llm tier") for stage in result["stages"])
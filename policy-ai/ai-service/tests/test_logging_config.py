@@ -0,0 +1,31 @@
+import logging
+import queue
+
+from app.core.logging_config import DeferredQueueHandler, Truncated
+
+
+def _queued(logger_name, msg, *args):
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger(logger_name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = DeferredQueueHandler(log_queue)
+    logger.addHandler(handler)
+    try:
+        logger.info(msg, *args)
+    finally:
+        logger.removeHandler(handler)
+    return log_queue.get_nowait()
+
+
+def test_deferred_records_do_not_show_later_changes_to_their_arguments():
+    sources, messages = ["hogar.pdf"], ["hola"]
+    eager = _queued("test.deferred", "Sources %s, attempt %d", sources, 1)
+    deferred = _queued("test.deferred", "State: %s", Truncated(messages))
+    sources.append("auto.pdf")
+    messages.append("adiós")
+
+    assert eager.getMessage() == "Sources ['hogar.pdf'], attempt 1"
+    assert eager.args is None  # Formatted in the caller's thread
+    assert deferred.getMessage() == "State: ['hola']"
+    assert isinstance(deferred.args[0], Truncated)  # Payloads are still formatted on the listener thread
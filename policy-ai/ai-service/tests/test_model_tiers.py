@@ -0,0 +1,61 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.ai.graph import select_tier
+from app.ai.model_tiers import TIER_ROUTER, TIER_SYNTHESIS
+from app.core.config import LLM_ROUTER_MAX_INPUT_TOKENS
+from app.core.metrics import estimate_cost
+
+
+def test_routing_turn_uses_router_tier():
+    assert select_tier([HumanMessage(content="¿Qué cubre mi póliza de hogar?")]) == (TIER_ROUTER, None)
+
+
+def test_answer_after_tool_output_uses_synthesis_tier():
+    messages = [
+        HumanMessage(content="¿Qué cubre mi póliza de hogar?"),
+        AIMessage(content="", tool_calls=[{"name": "policy_rag_tool", "args": {"query": "hogar"}, "id": "call_1"}]),
+        ToolMessage(content="Retrieved context: ...", tool_call_id="call_1"),
+    ]
+    assert select_tier(messages) == (TIER_SYNTHESIS, None)
+
+
+def test_long_context_escalates_to_synthesis_tier():
+    long_policy = "cláusula " * (LLM_ROUTER_MAX_INPUT_TOKENS * 4 // 9 + 100)
+    assert select_tier([HumanMessage(content=long_policy)]) == (TIER_SYNTHESIS, "long_context")
+
+
+def test_cost_uses_base_price_for_dated_model_names():
+    assert estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == estimate_cost("gpt-4o-mini", 1_000_000, 0)
+    assert estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_cached_input_tokens_are_counted_and_billed_at_the_cached_price():
+    from uuid import uuid4
+    from langchain_core.outputs import ChatGeneration, LLMResult
+    from app.core.metrics import MetricsCallbackHandler, track_token_usage
+
+    message = AIMessage(content="ok", usage_metadata={
+        "input_tokens": 3000, "output_tokens": 100, "total_tokens": 3100, "input_token_details": {"cache_read": 2048},
+    })
+    handler, run_id = MetricsCallbackHandler(), uuid4()
+    with track_token_usage() as usage:
+        handler.on_chat_model_start({}, [], run_id=run_id, invocation_params={"model": "gpt-4o"})
+        handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+
+    assert (usage.calls, usage.input_tokens, usage.cached_tokens, usage.output_tokens) == (1, 3000, 2048, 100)
+    assert estimate_cost("gpt-4o", 3000, 100, cached_tokens=2048) < estimate_cost("gpt-4o", 3000, 100)
+
+
+def test_prompts_keep_per_request_content_after_a_static_prefix():
+    from app.ai.rag_agent import DRAFT_PROMPT, EDIT_PROMPT, ANALYSIS_PROMPT
+
+    policy = "<h2>Póliza</h2><p>Cláusula</p>"
+    first = EDIT_PROMPT.format_messages(policy_text=policy, edit_instruction="Añade robo")
+    second = EDIT_PROMPT.format_messages(policy_text=policy, edit_instruction="Quita incendio")
+    drafts = [DRAFT_PROMPT.format_messages(user_request=r) for r in ("hogar", "autos")]
+    analyses = [ANALYSIS_PROMPT.format_messages(policy_text=t) for t in ("a", "b")]
+
+    for a, b in (first, second), drafts, analyses:
+        assert a[0].content == b[0].content  # The system message never varies
+    assert first[1].content.startswith(f"Existing Policy (HTML):\n{policy}")
+    assert first[1].content.split("Please apply the edit")[0] == second[1].content.split("Please apply the edit")[0]
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.ai.local_index import LocalVectorIndex
+
+
+def test_local_index_returns_nearest_with_metadata():
+    index = LocalVectorIndex()
+    index.upsert([
+        {"id": "a", "values": [1.0, 0.0, 0.0], "metadata": {"source": "a.pdf"}},
+        {"id": "b", "values": [0.0, 1.0, 0.0], "metadata": {"source": "b.pdf"}},
+        {"id": "c", "values": [0.7, 0.7, 0.0], "metadata": {"source": "c.pdf"}},
+    ])
+    index.update(id="a", set_metadata={"sources": ["a.pdf", "d.pdf"]})
+
+    result = index.query(vector=[1.0, 0.1, 0.0], top_k=2, include_metadata=True)
+
+    assert [match.id for match in result.matches] == ["a", "c"]
+    assert result.matches[0].metadata == {"source": "a.pdf", "sources": ["a.pdf", "d.pdf"]}
+
+
+@pytest.mark.slow
+def test_harness_runs_every_scenario_offline():
+    harness = pytest.importorskip("benchmarks.harness.__main__")
+    args = SimpleNamespace(
+        questions=harness.QUESTIONS_PATH, documents=3, seed=0, repeat=1, concurrency=2, latency_scale=0,
+        cassettes=None, record=False, ragas=False, no_tracemalloc=True,
+    )
+
+    result = harness.run(args)
+
+    assert set(result["scenarios"]) == {"ingest", "agent", "draft", "edit", "analysis"}
+    agent = result["scenarios"]["agent"]
+    assert agent["latency"]["count"] == 10
+    assert any(stage.startswith("tool ok,policy_rag_tool") for stage in agent["stages"])
+    # The extractive fake answers from retrieved chunks, so retrieval has to work end to end
+    assert result["quality"]["context_recall"] > 0.5
@@ -3,21 +3,26 @@ import logging
 import pytest
 import numpy as np
 import time
+from concurrent.futures import ThreadPoolExecutor
 from ragas.metrics import (
     faithfulness,
     answer_relevancy,
     context_precision,
     context_recall,
 )
+from ragas import RunConfig
 from ragas.evaluation import evaluate
 from datasets import Dataset
 from app.ai.tools.rag_tool import policy_rag_tool
+from app.ai.llm_scheduler import priority_scope, Priority
 
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 logging.basicConfig(level=logging.INFO)
 
+MAX_WORKERS = 6
+
 @pytest.fixture
 def raw_examples():
     return [
@@ -52,26 +57,28 @@ def raw_examples():
 
 def test_ragas_evaluation(raw_examples):
     warnings.filterwarnings("ignore", category=DeprecationWarning)
-    examples = []
     start_time = time.time()
 
-    for ex in raw_examples:
-        question = ex["question"]
-        ground_truth = ex["ground_truth"]
-
-        tool_output = policy_rag_tool.invoke(question)
+    def build_example(ex):
+        # Evaluation traffic must not compete with live chat for the rate budget
+        with priority_scope(Priority.BATCH):
+            tool_output = policy_rag_tool.invoke(ex["question"])
         context_text = tool_output.replace("Retrieved context:\n", "").strip()
 
         answer = context_text[:300] if context_text else "No se encontró información."
         if not answer:
             answer = "Respuesta vacía o incompleta"
 
-        examples.append({
-            "question": question,
+        return {
+            "question": ex["question"],
             "answer": answer,
             "contexts": [context_text],
-            "ground_truth": ground_truth
-        })
+            "ground_truth": ex["ground_truth"]
+        }
+
+    # Retrieval for every question runs concurrently; the scheduler still enforces the rate budget
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        examples = list(pool.map(build_example, raw_examples))
 
     dataset = Dataset.from_list(examples)
 
@@ -82,7 +89,8 @@ def test_ragas_evaluation(raw_examples):
             answer_relevancy,
             context_precision,
             context_recall,
-        ]
+        ],
+        run_config=RunConfig(max_workers=MAX_WORKERS),
     )
 
     assert results is not None, "The evaluation results should not be None"
@@ -0,0 +1,52 @@
+from langchain_core.documents import Document
+
+from app.ai.reranker import rerank
+
+
+class KeywordCrossEncoder:
+    """Stands in for CrossEncoder.predict: scores a pair by keyword occurrences."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batch_sizes.append(batch_size)
+        return [text.count(query) for query, text in pairs]
+
+
+def test_rerank_keeps_best_chunks_in_score_order():
+    docs = [Document(page_content=text) for text in ("robo", "inundación inundación", "incendio", "inundación")]
+    model = KeywordCrossEncoder()
+
+    best = rerank("inundación", docs, top_n=2, model=model)
+
+    assert [doc.page_content for doc in best] == ["inundación inundación", "inundación"]
+    assert best[0].metadata["rerank_score"] == 2.0
+    assert len(model.batch_sizes) == 1  # One batched predict call for all candidates
+
+
+def test_rerank_without_model_truncates_to_top_n(monkeypatch):
+    import app.ai.reranker as reranker
+    monkeypatch.setattr(reranker, "get_reranker", lambda: None)
+    docs = [Document(page_content=str(i)) for i in range(5)]
+    assert [doc.page_content for doc in rerank("q", docs, top_n=3)] == ["0", "1", "2"]
+
+
+def test_failed_load_is_not_retried_on_every_query(monkeypatch):
+    import app.ai.reranker as reranker
+    from app.core.components import LazyComponent
+    loads = []
+
+    def broken_load():
+        loads.append(None)
+        raise OSError("model download failed")
+
+    monkeypatch.setattr(reranker, "reranker_component", LazyComponent("reranker", broken_load, required=False))
+    monkeypatch.setattr(reranker, "_retry_after", 0.0)
+
+    assert [reranker.get_reranker() for _ in range(3)] == [None, None, None]
+    assert len(loads) == 1
+
+    monkeypatch.setattr(reranker, "_retry_after", 0.0)  # Backoff elapsed
+    assert reranker.get_reranker() is None
+    assert len(loads) == 2
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+import app.core.config as config
+from app.core.resilience import CircuitBreaker, CircuitOpenError, Dependency, DependencyTimeout, CLOSED, HALF_OPEN, OPEN
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch):
+    monkeypatch.setattr(config, "RESILIENCE_ENABLED", True)
+    monkeypatch.setattr(config, "RESILIENCE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(config, "RESILIENCE_HEDGE_MIN_SECONDS", 0.01)
+    monkeypatch.setattr(config, "RESILIENCE_HEDGE_MAX_RATIO", 0.5)
+
+
+def _warm(dependency: Dependency, seconds: float, calls: int = 10):
+    for _ in range(calls):
+        dependency.latency.add(seconds)
+        dependency.call(lambda: None)
+
+
+def test_hedge_answers_when_the_first_request_stalls():
+    dependency = Dependency("test_hedged", hedged=True, timeout_bounds=(1.0, 5.0))
+    _warm(dependency, 0.01)
+    calls = []
+    release = threading.Event()
+
+    def request():
+        calls.append(None)
+        if len(calls) == 1:
+            release.wait(5)  # The first request stalls
+            return "slow"
+        return "fast"
+
+    start = time.monotonic()
+    assert dependency.call(request) == "fast"
+    assert time.monotonic() - start < 0.5
+    assert len(calls) == 2
+    release.set()
+
+
+def test_hedges_are_capped_by_the_budget(monkeypatch):
+    monkeypatch.setattr(config, "RESILIENCE_HEDGE_MAX_RATIO", 0.0)
+    dependency = Dependency("test_unhedged", hedged=True, timeout_bounds=(1.0, 5.0))
+    _warm(dependency, 0.01)
+    calls = []
+
+    def request():
+        calls.append(None)
+        time.sleep(0.05)
+        return "ok"
+
+    assert dependency.call(request) == "ok"
+    assert len(calls) == 1
+
+
+def test_timeout_adapts_to_recent_latency():
+    dependency = Dependency("test_timeout", timeout_bounds=(0.05, 10.0))
+    assert dependency.timeout() == 10.0  # No history yet: the ceiling
+    _warm(dependency, 0.02)
+    assert dependency.timeout() == pytest.approx(0.02 * config.RESILIENCE_TIMEOUT_MULTIPLIER)
+
+    release = threading.Event()
+    with pytest.raises(DependencyTimeout):
+        dependency.call(lambda: release.wait(5))
+    assert dependency.call(lambda: release.wait(5), fallback=lambda: "fallback") == "fallback"
+    release.set()
+
+
+def test_min_timeout_covers_calls_slower_than_the_window():
+    dependency = Dependency("test_min_timeout", timeout_bounds=(0.05, 5.0))
+    _warm(dependency, 0.01)  # Short calls: the adaptive timeout is the 0.05s floor
+
+    with pytest.raises(DependencyTimeout):
+        dependency.call(lambda: time.sleep(0.3))
+    assert dependency.call(lambda: time.sleep(0.3) or "long", min_timeout=1.0) == "long"
+
+
+def test_breaker_opens_fails_fast_and_recovers_after_a_probe():
+    clock = _Clock()
+    breaker = CircuitBreaker("test_breaker", failure_threshold=3, cooldown_seconds=30, clock=clock)
+    dependency = Dependency("test_breaker", breaker=breaker)
+    calls = []
+
+    def failing():
+        calls.append(None)
+        raise ConnectionError("down")
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            dependency.call(failing)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        dependency.call(failing)
+    assert dependency.call(failing, fallback=lambda: []) == []
+    assert len(calls) == 3  # Rejected without being made
+
+    clock.now = 31
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(ConnectionError):
+        dependency.call(failing)  # The probe fails: open again
+    assert breaker.state == OPEN
+
+    clock.now = 62
+    assert dependency.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_client_errors_do_not_open_the_breaker():
+    class BadRequest(Exception):
+        status_code = 400
+
+    def bad_request():
+        raise BadRequest()
+
+    dependency = Dependency("test_client_errors", breaker=CircuitBreaker("test_client_errors", 2, 30))
+    for _ in range(3):
+        with pytest.raises(BadRequest):
+            dependency.call(bad_request)
+    assert dependency.breaker.state == CLOSED
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            dependency.call(lambda: int("x"), failures=(ConnectionError,))
+    assert dependency.breaker.state == CLOSED
+
+
+def test_disabled_calls_run_inline(monkeypatch):
+    monkeypatch.setattr(config, "RESILIENCE_ENABLED", False)
+    dependency = Dependency("test_disabled")
+    assert dependency.call(threading.current_thread) is threading.current_thread()
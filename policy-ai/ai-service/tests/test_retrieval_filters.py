@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+import app.ai.metadata_backfill as metadata_backfill
+import app.ai.retrieval_filters as retrieval_filters
+import app.ai.vector_store as vector_store
+import app.services.document_processor as document_processor
+from app.ai.local_index import LocalVectorIndex
+from app.ai.retrieval_filters import build_filter, resolve_tenant, TenantNotAllowedError
+from app.services.document_attributes import extract_attributes, dedup_scope, NOT_SUPERSEDED
+
+
+def _vectors(metadata_list, dimension=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{"id": f"c{i}", "values": rng.standard_normal(dimension).tolist(), "metadata": metadata}
+            for i, metadata in enumerate(metadata_list)]
+
+
+def _ids(response):
+    return {match.id for match in response.matches}
+
+
+def test_local_index_filters_match_pinecone_semantics():
+    index = LocalVectorIndex()
+    index.upsert(_vectors([
+        {"tenant": "default", "product_line": "hogar", "effective_date": 20230101, "superseded_on": NOT_SUPERSEDED,
+         "sources": ["a.pdf", "b.pdf"]},
+        {"tenant": "default", "product_line": "autos", "effective_date": 20240601, "superseded_on": NOT_SUPERSEDED},
+        {"tenant": "acme", "product_line": "hogar", "effective_date": 20220101, "superseded_on": 20230101},
+        {"product_line": "hogar"},  # Ingested before tenants and dates were recorded
+    ]))
+    query = np.ones(16).tolist()
+
+    def search(filter):
+        return _ids(index.query(vector=query, top_k=10, filter=filter))
+
+    assert search({"product_line": "hogar"}) == {"c0", "c2", "c3"}
+    assert search({"sources": {"$in": ["b.pdf"]}}) == {"c0"}
+    assert search({"effective_date": {"$lte": 20231231}}) == {"c0", "c2"}
+    assert search(build_filter(tenant="default", product_line="Hogar")) == {"c0"}
+    assert search(build_filter(tenant="acme", effective_on="2022-06-30")) == {"c2"}
+    assert search(build_filter(tenant="acme", effective_on="2023-06-30")) == set()  # Superseded by then
+    assert search({"$or": [{"product_line": "autos"}, {"tenant": {"$ne": "default"}}]}) == {"c1", "c2", "c3"}
+
+    # Updates move the row between bitmaps; re-upserting an id replaces it
+    index.update(id="c1", set_metadata={"product_line": "hogar"})
+    index.upsert(_vectors([{"tenant": "acme", "product_line": "vida"}], seed=1))
+    assert search({"product_line": "hogar"}) == {"c1", "c2", "c3"}
+    assert search({"product_line": "vida"}) == {"c0"}
+    assert len(index) == 4
+
+
+def test_local_index_namespaces_are_isolated():
+    index = LocalVectorIndex()
+    index.upsert(_vectors([{"tenant": "acme"}]), namespace="acme")
+    index.upsert(_vectors([{}, {}], seed=1))
+
+    assert _ids(index.query(vector=np.ones(16).tolist(), top_k=5, namespace="acme")) == {"c0"}
+    assert len(index.query(vector=np.ones(16).tolist(), top_k=5).matches) == 2
+    assert index.describe_index_stats()["namespaces"] == {"acme": {"vector_count": 1}, "": {"vector_count": 2}}
+
+
+def test_filtered_query_returns_the_best_matching_rows():
+    index = LocalVectorIndex()
+    vectors = _vectors([{"product_line": "hogar" if i % 10 == 0 else "autos"} for i in range(500)], seed=3)
+    index.upsert(vectors)
+    query = vectors[250]["values"]
+
+    [best] = index.query(vector=query, top_k=1, filter={"product_line": "hogar"}).matches
+
+    assert best.id == "c250" and abs(best.score - 1.0) < 1e-5
+
+
+def test_namespace_per_tenant_replaces_the_tenant_filter(monkeypatch):
+    monkeypatch.setattr(retrieval_filters, "VECTOR_NAMESPACE_PER_TENANT", True)
+
+    assert retrieval_filters.namespace_for("acme") == "acme"
+    assert retrieval_filters.namespace_for("default") == ""
+    assert build_filter(tenant="acme", insurer="Mutua Ejemplo") == {"insurer": {"$eq": "Mutua Ejemplo"}}
+
+
+def test_attributes_from_object_metadata_key_and_wording(monkeypatch):
+    pages = ["Mutua Ejemplo Seguros\nSEGURO MULTIRRIESGO DEL HOGAR\nCONDICIONES GENERALES\n"
+             "Fecha de efecto: 01/03/2024\nArtículo 1. Objeto. Ver condiciones particulares.",
+             "Mutua Ejemplo Seguros\nArtículo 2. Vehículo de sustitución no incluido."]
+    monkeypatch.setattr("app.services.document_attributes.INGEST_KEY_PATTERN",
+                        r"(?P<tenant>[^/]+)/(?P<product_line>[^/]+)/[^/]+\.pdf$")
+
+    from_wording = extract_attributes("https://example.com/poliza.pdf", pages)
+    from_key = extract_attributes("s3://bucket/Acme/Comercio/poliza.pdf", pages)
+    from_metadata = extract_attributes("s3://bucket/Acme/Comercio/poliza.pdf", pages, {"product-line": "vida"})
+
+    assert from_wording == {"tenant": "default", "product_line": "hogar", "document_type": "condiciones_generales",
+                            "insurer": "Mutua Ejemplo Seguros", "effective_date": 20240301}
+    assert (from_key["tenant"], from_key["product_line"]) == ("acme", "comercio")
+    assert from_metadata["product_line"] == "vida"
+    assert dedup_scope(from_wording) == "product_line=hogar|document_type=condiciones_generales|insurer=Mutua Ejemplo Seguros"
+
+
+def test_only_allowed_tenants_are_searched(monkeypatch):
+    monkeypatch.setattr(retrieval_filters, "ALLOWED_TENANTS", ["Acme"])
+
+    assert resolve_tenant(None) == "default"
+    assert resolve_tenant(" ACME ") == "acme"
+    with pytest.raises(TenantNotAllowedError):
+        resolve_tenant("globex")
+
+
+@pytest.fixture
+def local_index(monkeypatch):
+    index = LocalVectorIndex()
+    monkeypatch.setattr(vector_store, "get_vector_index", lambda: index)
+    monkeypatch.setattr(metadata_backfill, "get_vector_index", lambda: index)
+    monkeypatch.setattr(vector_store, "_uses_chunk_store", lambda: False)
+    return index
+
+
+def test_backfill_adds_tenant_and_superseded_on_to_legacy_vectors(local_index):
+    local_index.upsert(_vectors([{"source": "old.pdf"}, {"tenant": "default", "superseded_on": 20240101}]))
+    local_index.upsert(_vectors([{"source": "acme.pdf"}], seed=1), namespace="acme")
+
+    assert metadata_backfill.backfill() == {"": 1, "acme": 1}
+    assert local_index.fetch(["c0"]).vectors["c0"].metadata == {
+        "source": "old.pdf", "tenant": "default", "superseded_on": NOT_SUPERSEDED}
+    assert local_index.fetch(["c1"]).vectors["c1"].metadata["superseded_on"] == 20240101
+    assert local_index.fetch(["c0"], namespace="acme").vectors["c0"].metadata["tenant"] == "acme"
+    assert metadata_backfill.backfill() == {"": 0, "acme": 0}
+
+
+def test_a_new_version_supersedes_the_clauses_it_dropped(local_index, monkeypatch):
+    monkeypatch.setattr(document_processor, "INGEST_DEDUP", False)
+    monkeypatch.setattr(document_processor, "split_pages",
+                        lambda pages: [document_processor.Document(page_content=page, metadata={}) for page in pages])
+    rng = np.random.default_rng(0)
+
+    def index_chunks(source, docs, ids, namespace=""):
+        local_index.upsert([{"id": chunk_id, "values": rng.standard_normal(16).tolist(),
+                             "metadata": vector_store.index_metadata(doc.metadata)}
+                            for chunk_id, doc in zip(ids, docs)], namespace=namespace)
+    monkeypatch.setattr(document_processor, "_index_chunks", index_chunks)
+    attributes = {"tenant": "default", "product_line": "hogar", "document_type": "condiciones_generales",
+                  "insurer": "Mutua Ejemplo"}
+
+    def ingest(source, effective_date, insurer="Mutua Ejemplo"):
+        document_processor.index_document(source, ["Artículo 1", "Artículo 2"],
+                                          {**attributes, "insurer": insurer, "effective_date": effective_date})
+
+    def in_effect(date):
+        matches = local_index.query(vector=np.ones(16).tolist(), top_k=10, include_metadata=True,
+                                    filter=build_filter(product_line="hogar", effective_on=date)).matches
+        return {match.metadata["source"] for match in matches}
+
+    ingest("v2024.pdf", 20240101)
+    ingest("v2020.pdf", 20200101)  # Ingested out of order: superseded by the newer version already indexed
+    ingest("v2022.pdf", 20220101)
+    ingest("other.pdf", 20210101, insurer="Otra Mutua")  # Another wording: not a version of these
+
+    assert in_effect("2021-06-01") == {"v2020.pdf", "other.pdf"}
+    assert in_effect("2023-06-01") == {"v2022.pdf", "other.pdf"}
+    assert in_effect("2025-01-01") == {"v2024.pdf", "other.pdf"}
+    assert in_effect("2019-06-01") == set()
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from prometheus_client import REGISTRY
+
+from app.ai.speculative_retrieval import claim_speculative_retrieval, query_similarity, speculative_retrieval
+
+
+def _outcome_count(outcome):
+    return REGISTRY.get_sample_value("speculative_retrieval_total", {"outcome": outcome}) or 0.0
+
+
+def test_similar_query_is_served_from_the_prefetch():
+    retrieved = []
+
+    def retrieve(query):
+        retrieved.append(query)
+        return [f"doc for {query}"]
+
+    used_before = _outcome_count("used")
+    with speculative_retrieval("¿Qué cubre la póliza de hogar ante inundaciones?", retrieve):
+        docs = claim_speculative_retrieval("cobertura póliza de hogar inundaciones", timeout=1)
+        # A second RAG call in the same turn retrieves normally
+        assert claim_speculative_retrieval("cobertura póliza de hogar inundaciones") is None
+
+    assert docs == ["doc for ¿Qué cubre la póliza de hogar ante inundaciones?"]
+    assert retrieved == ["¿Qué cubre la póliza de hogar ante inundaciones?"]
+    assert _outcome_count("used") == used_before + 1
+
+
+def test_different_query_and_unused_prefetch_are_discarded():
+    mismatch_before, unused_before = _outcome_count("mismatch"), _outcome_count("unused")
+
+    with speculative_retrieval("franquicia del seguro de coche", lambda q: ["doc"]):
+        assert claim_speculative_retrieval("regulación europea de vehículos autónomos") is None
+    with speculative_retrieval("franquicia del seguro de coche", lambda q: ["doc"]):
+        pass  # The model answered without calling the RAG tool
+
+    assert _outcome_count("mismatch") == mismatch_before + 1
+    assert _outcome_count("unused") == unused_before + 1
+    assert claim_speculative_retrieval("franquicia del seguro de coche") is None
+
+
+def test_stalled_prefetch_is_abandoned_after_the_claim_timeout():
+    release = threading.Event()
+    timeouts_before = _outcome_count("timeout")
+
+    with speculative_retrieval("franquicia del seguro de coche", lambda q: release.wait(5) and ["doc"]):
+        start = time.monotonic()
+        assert claim_speculative_retrieval("franquicia del seguro de coche", timeout=0.1) is None
+        assert time.monotonic() - start < 1
+    release.set()
+
+    assert _outcome_count("timeout") == timeouts_before + 1
+
+
+def test_query_similarity():
+    assert query_similarity("Franquicia del seguro", "franquicia seguro") == 1.0
+    assert query_similarity("franquicia del seguro de coche", "franquicia hogar") == 0.5
+    assert query_similarity("", "franquicia") == 0.0
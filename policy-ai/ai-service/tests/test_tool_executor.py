@@ -0,0 +1,64 @@
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from app.ai.tool_executor import ConcurrentToolExecutor
+
+
+@tool
+def slow_tool(query: str) -> str:
+    """Sleeps before answering."""
+    time.sleep(0.3)
+    return f"slow: {query}"
+
+
+@tool
+def fast_tool(query: str) -> str:
+    """Answers immediately."""
+    return f"fast: {query}"
+
+
+@tool
+def broken_tool(query: str) -> str:
+    """Always fails."""
+    raise RuntimeError("backend down")
+
+
+def _message(*names):
+    return AIMessage(content="", tool_calls=[
+        {"name": name, "args": {"query": "q"}, "id": f"call_{i}"} for i, name in enumerate(names)
+    ])
+
+
+def test_tool_calls_run_concurrently():
+    executor = ConcurrentToolExecutor([slow_tool, fast_tool], timeouts={})
+    start = time.perf_counter()
+    results = executor.run(_message("slow_tool", "slow_tool", "fast_tool"))
+    assert time.perf_counter() - start < 0.55  # Sequential would take ~0.6s
+    assert [r.content for r in results] == ["slow: q", "slow: q", "fast: q"]
+    assert [r.tool_call_id for r in results] == ["call_0", "call_1", "call_2"]
+
+
+def test_timeouts_and_errors_return_fallback_messages():
+    executor = ConcurrentToolExecutor([slow_tool, fast_tool, broken_tool], timeouts={"slow_tool": 0.05})
+    slow, fast, broken, missing = executor.run(_message("slow_tool", "fast_tool", "broken_tool", "missing_tool"))
+    assert slow.status == "error" and "did not respond" in slow.content
+    assert fast.content == "fast: q"
+    assert broken.status == "error" and "backend down" in broken.content
+    assert missing.status == "error" and "not available" in missing.content
+
+
+def test_turn_deadline_caps_tool_timeouts():
+    executor = ConcurrentToolExecutor([slow_tool], timeouts={"slow_tool": 10})
+    start = time.perf_counter()
+    (result,) = executor.run(_message("slow_tool"), deadline=time.time() + 0.05)
+    assert result.status == "error"
+    assert time.perf_counter() - start < 0.25
+
+
+def test_passed_deadline_reports_the_turn_budget_not_a_negative_timeout():
+    executor = ConcurrentToolExecutor([slow_tool], timeouts={"slow_tool": 10})
+    (result,) = executor.run(_message("slow_tool"), deadline=time.time() - 3)
+    assert result.status == "error"
+    assert "time budget ran out" in result.content and "-" not in result.content
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+import app.ai.tools.web_search as web_search
+from app.ai.tools.web_search import LocalSearchBackend, build_web_search_tool
+from app.core.config import SERVICE_DIR, WEB_SEARCH_FIXTURES_PATH
+from app.utils.cache import TTLCache, normalize_query
+
+FIXTURES = [
+    {"url": "https://www.consorseguros.es/riesgos-extraordinarios", "title": "Consorcio de Compensación de Seguros",
+     "content": "El Consorcio cubre inundaciones y otros riesgos extraordinarios."},
+    {"url": "https://www.boe.es/ley-contrato-seguro", "title": "Ley de Contrato de Seguro",
+     "content": "Plazo de prescripción de las acciones derivadas del contrato de seguro."},
+    {"url": "https://example.com/inundaciones", "title": "Daños por agua",
+     "content": "Diferencias entre daños por agua e inundaciones."},
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingBackend:
+    def __init__(self):
+        self.queries = []
+
+    def search(self, query):
+        self.queries.append(query)
+        return [{"url": "https://example.com", "content": f"result for {query}"}]
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    clock = FakeClock()
+    cache = TTLCache("test", ttl_seconds=10, max_entries=2, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+
+
+def test_repeated_normalized_query_is_served_from_cache():
+    backend = CountingBackend()
+    tool = build_web_search_tool(backend, TTLCache("test_web_search", ttl_seconds=60, max_entries=10))
+
+    first = tool.invoke({"query": "¿Plazo de prescripción del seguro?"})
+    second = tool.invoke({"query": "  plazo de   prescripción del SEGURO "})
+
+    assert first == second
+    assert backend.queries == ["¿Plazo de prescripción del seguro?"]
+    assert normalize_query("¿Plazo de prescripción del seguro?") == "plazo de prescripción del seguro"
+
+
+def test_local_backend_ranks_fixtures_by_word_overlap(tmp_path):
+    fixtures = tmp_path / "web_search.json"
+    fixtures.write_text(json.dumps(FIXTURES), encoding="utf-8")
+    tool = build_web_search_tool(LocalSearchBackend(str(fixtures), max_results=2), TTLCache("test_local", 60, 10))
+    results = json.loads(tool.invoke({"query": "Consorcio de Compensación inundaciones"}))
+    assert len(results) == 2
+    assert results[0]["url"] == "https://www.consorseguros.es/riesgos-extraordinarios"
+
+
+def test_fixtures_path_does_not_depend_on_the_working_directory(monkeypatch, tmp_path):
+    assert os.path.isabs(WEB_SEARCH_FIXTURES_PATH) and os.path.isdir(os.path.join(SERVICE_DIR, "app"))
+
+    monkeypatch.setattr(web_search, "WEB_SEARCH_BACKEND", "local")
+    monkeypatch.setattr(web_search, "WEB_SEARCH_FIXTURES_PATH", str(tmp_path / "missing.json"))
+    with pytest.raises(FileNotFoundError, match="WEB_SEARCH_FIXTURES_PATH"):
+        web_search._build_web_search_tool()